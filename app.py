@@ -1,14 +1,129 @@
+import functools
+import time
+_script_t0 = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
+
+# Startup profile (CLINIC_PROFILE_STARTUP=1): per-phase timing of the run
+import startup
+startup.begin(_script_t0)
+
+# Rerun tracing (tracing.py): per-section spans, shown in a debug panel
+# with ?debug=1 (or for every session with CLINIC_TRACE=1)
+import tracing
+debug_mode = tracing.ENABLED or st.query_params.get("debug") == "1"
+tracing.begin("rerun", _script_t0, enabled=debug_mode)
+tracing.section("imports")
+
+# Rerun analytics (rerun_stats.py): the widget that triggered this rerun,
+# found by comparing widget values with the end of the previous run
+import rerun_stats
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+RERUN_STATE_KEYS = ("base_values", "calc_graph", "display_currency", "trace_runs", "rerun_snapshot")
+rerun_triggers = rerun_stats.changed_keys(st.session_state.get("rerun_snapshot"), st.session_state, RERUN_STATE_KEYS)
+# only the session id is kept: a global holding the run context (and through it
+# the script thread) keeps every run's globals alive via Streamlit's hash stacks
+rerun_session_id = getattr(get_script_run_ctx(), "session_id", "-")
+# bytes sent to the browser: counted only with CLINIC_RERUN_BYTES=1
+rerun_sent = rerun_stats.count_enqueued(get_script_run_ctx())
+
+
+@st.cache_resource
+def shared_rerun_stats():
+    """Rerun counts, latencies and bytes per trigger and session, for the whole process"""
+    return rerun_stats.new_stats()
+
+
+def analytics_fragment(func):
+    """
+    st.fragment whose own reruns are recorded in the rerun analytics.
+    A fragment rerun skips the end of the script, where full reruns are
+    recorded, so the fragment records itself and refreshes the widget
+    snapshot; inside a full rerun it just runs.
+    """
+    name = func.__name__.removesuffix("_fragment")
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        ctx = get_script_run_ctx()
+        if ctx is None or not ctx.fragment_ids_this_run:
+            return func(*args, **kwargs)
+        t0 = time.perf_counter()
+        triggers = rerun_stats.changed_keys(st.session_state.get("rerun_snapshot"), st.session_state, RERUN_STATE_KEYS)
+        sent = rerun_stats.count_enqueued(ctx)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            rerun_stats.record(
+                shared_rerun_stats(),
+                getattr(ctx, "session_id", "-"),
+                triggers or [rerun_stats.FRAGMENT_RERUN.format(name)],
+                (time.perf_counter() - t0) * 1000,
+                sent["bytes"] if sent is not None else None,
+                fragment=name,
+            )
+            st.session_state["rerun_snapshot"] = rerun_stats.snapshot(st.session_state, RERUN_STATE_KEYS)
+    return st.fragment(run)
+
+# Exchange rates: with nothing cached yet (first visitor after a deploy)
+# the fetch starts now and overlaps the imports below
+from rates import get_rates, prefetch_rates
+prefetch_rates()
+
+# pandas and plotly are imported further down, once the header, sidebar
+# and KPI cards are on screen (they are the bulk of a cold import)
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-import plotly.io as pio
 from pathlib import Path
 import base64
-import requests
+import json
 from datetime import datetime
 
+from model import (
+    scenario_row,
+    pnl_block,
+    breakeven_block,
+    kpi_block,
+    cash_flow_block,
+    valuation_block,
+    PNL_FIELDS,
+    BREAKEVEN_FIELDS,
+    CASH_FLOW_FIELDS,
+    mirr_from_cf,
+    npv_growth_discount_grid,
+    npv_zero_discount_rates,
+    DCF_YEARS,
+    DEFAULT_STRESS,
+    generate_stress_scenarios,
+    format_currency as model_format_currency,
+    format_percentage,
+    safe_divide,
+    INPUT_FIELDS,
+    INPUT_LABELS,
+    INPUT_UNITS,
+    CURRENCY_INPUTS,
+    to_currency,
+)
+from sensitivity import (
+    OUTPUT_METRICS, axis_values, sensitivity_surface, driver_sweep, goal_seek,
+    unit_rate, surface_in_currency, sweep_in_currency, goal_seek_in_currency,
+)
+from projection import project_cash_flows, PROJECTION_FIELDS, PROJECTION_CURRENCY_OUTPUTS, SEASONALITY_PROFILES, RAMP_CURVES
+from montecarlo import (
+    MC_FIELDS, DISTRIBUTIONS, DEFAULT_DISTRIBUTIONS, histogram_cdf, histogram_quantile, summary_in_currency,
+)
+from parallel import run_monte_carlo_parallel, available_workers
+from graph import new_state, begin_run, node, run_summary, new_lru, lru_get, lru_put, lru_stats, input_hash
+from styles import PALETTE, APP_CSS
+
+# Sweeps (tornado, 2D surface, goal seek) shard their rows over the shared
+# process pool; batches below parallel.MIN_SHARD rows stay in this process
+SWEEP_WORKERS = available_workers()
+# lado máximo de la malla NPV que se envía al navegador (cálculo y CSV a resolución completa)
+NPV_HEATMAP_MAX_SIDE = 200
+
+startup.phase("page setup")
+tracing.section("page setup")
+
 # =========================================================
 # PAGE CONFIGURATION
 # =========================================================
@@ -19,47 +134,19 @@ st.set_page_config(
 )
 
 # =========================================================
-# UNIFIED PROFESSIONAL PALETTE
-# One single blue scale for the whole app
-# =========================================================
-PALETTE = {
-    "bg_page": "#F8FAFC",
-    "surface": "#FFFFFF",
-    "surface_alt": "#F1F5F9",
-    "primary": "#1E40AF",
-    "primary_light": "#3B82F6",
-    "primary_dark": "#1E3A8A",
-    "secondary": "#0EA5E9",
-    "accent": "#60A5FA",
-    "success": "#10B981",
-    "warning": "#F59E0B",
-    "danger": "#EF4444",
-    "text_primary": "#0F172A",
-    "text_secondary": "#475569",
-    "text_tertiary": "#64748B",
-    "border": "#E2E8F0",
-    "grid": "#F1F5F9",
-    "chart": ["#1E40AF", "#3B82F6", "#0EA5E9", "#60A5FA", "#93C5FD", "#BFDBFE"],
-}
-
-# =========================================================
-# PLOTLY THEME (force white background + blue colorway)
+# STATIC ASSETS – served by Streamlit from ./static
+# (server.enableStaticServing): the sidebar logo is a plain
+# URL instead of inline base64, fonts live in static/fonts.
 # =========================================================
-clinic_template = go.layout.Template()
-clinic_template.layout.paper_bgcolor = "white"
-clinic_template.layout.plot_bgcolor = "white"
-clinic_template.layout.font = dict(color=PALETTE["text_primary"], family="Inter, system-ui, sans-serif")
-clinic_template.layout.colorway = PALETTE["chart"]
-pio.templates["clinic_blue"] = clinic_template
-pio.templates.default = "clinic_blue"
+STATIC_DIR = Path(__file__).parent / "static"
+LOGO_FILE = "logo-colombiana-trasplantes-2024-blanco-2.png"
+LOGO_PATH = STATIC_DIR / LOGO_FILE
+LOGO_URL = f"app/static/{LOGO_FILE}"
 
-# =========================================================
-# LOGO HANDLING - Safe loading with graceful fallback
-# =========================================================
-LOGO_PATH = "logo-colombiana-trasplantes-2024-blanco-2.png"
 
+@st.cache_resource
 def load_logo_base64(path: str) -> str:
-    """Safely load and encode logo image to base64."""
+    """Logo encoded to base64, read once per process (embedded by the standalone HTML report)."""
     try:
         logo_path = Path(path)
         if logo_path.exists():
@@ -68,473 +155,11 @@ def load_logo_base64(path: str) -> str:
         st.warning(f"Logo not found: {e}")
     return None
 
-logo_b64 = load_logo_base64(LOGO_PATH)
-
-# =========================================================
-# GLOBAL STYLES – force white cards even in dark theme
-# =========================================================
-st.markdown(
-    f"""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap');
-
-    /* Force light theme - override system preferences */
-    :root {{
-        color-scheme: light !important;
-    }}
-
-    * {{
-        font-family: 'Inter', -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-        box-sizing: border-box;
-    }}
-
-    /* Override Streamlit's dark theme completely */
-    .stApp {{
-        background: {PALETTE["bg_page"]} !important;
-        color: {PALETTE["text_primary"]} !important;
-    }}
-
-    /* Force all backgrounds to light */
-    [data-testid="stAppViewContainer"] {{
-        background: {PALETTE["bg_page"]} !important;
-    }}
-
-    [data-testid="stHeader"] {{
-        background: transparent !important;
-    }}
-
-    /* Force all text to dark on light background */
-    .stMarkdown, .stMarkdown p, .stMarkdown li, .stMarkdown span {{
-        color: {PALETTE["text_primary"]} !important;
-    }}
-
-    .block-container {{
-        padding-top: 0rem !important;
-        max-width: 1900px;
-        padding-left: 2.5rem !important;
-        padding-right: 2.5rem !important;
-    }}
-
-    /* HEADER */
-    .ct-header {{
-        background: linear-gradient(135deg, {PALETTE["primary"]} 0%, {PALETTE["primary_dark"]} 100%);
-        padding: 2.5rem 3rem;
-        margin-top: 3.4rem;
-        margin-bottom: 2.5rem;
-        border-radius: 0 0 24px 24px;
-        box-shadow: 0 4px 20px rgba(30,64,175,0.15);
-    }}
-    .ct-main-title {{
-        font-size: 2rem;
-        font-weight: 800;
-        color: #FFFFFF;
-        margin: 0;
-        letter-spacing: -0.03em;
-        line-height: 1.2;
-    }}
-    .ct-subtitle {{
-        font-size: 1rem;
-        color: rgba(255,255,255,0.9);
-        margin: 0.75rem 0 0 0;
-        font-weight: 400;
-        line-height: 1.4;
-    }}
-
-    /* SIDEBAR */
-    section[data-testid="stSidebar"] {{
-        background: linear-gradient(180deg, {PALETTE["primary_dark"]} 0%, #1E293B 100%) !important;
-        border-right: 1px solid rgba(255,255,255,0.08);
-    }}
-    .sidebar-logo {{
-        text-align: center;
-        padding: 0rem 1rem 1.5rem 1rem;
-        margin-top: -2.5rem;
-        border-bottom: 2px solid rgba(255,255,255,0.12);
-        margin-bottom: 1.5rem;
-    }}
-    .sidebar-logo img {{
-        max-width: 110%;
-        height: auto;
-        filter: brightness(1.2);
-    }}
-    .ct-side-title {{
-        color: #E2E8F0 !important;
-        font-size: 0.7rem !important;
-        font-weight: 700 !important;
-        text-transform: uppercase;
-        letter-spacing: 0.08em;
-        margin-top: 1.6rem !important;
-        margin-bottom: 0.6rem !important;
-    }}
-
-    /* Sidebar labels - always white */
-    section[data-testid="stSidebar"] label {{
-        color: #F9FAFB !important;
-        font-size: 0.75rem !important;
-        font-weight: 600 !important;
-        letter-spacing: 0.03em;
-    }}
-
-    /* Sidebar subheaders - white */
-    section[data-testid="stSidebar"] h3,
-    section[data-testid="stSidebar"] .stMarkdown h3 {{
-        color: #FFFFFF !important;
-        font-size: 0.85rem !important;
-        font-weight: 700 !important;
-        margin-top: 1.5rem !important;
-        margin-bottom: 0.8rem !important;
-        padding-bottom: 0.5rem !important;
-        border-bottom: 1px solid rgba(255,255,255,0.2) !important;
-    }}
-
-    /* Inputs: white background, black text */
-    section[data-testid="stSidebar"] .stNumberInput input,
-    section[data-testid="stSidebar"] .stSelectbox select,
-    section[data-testid="stSidebar"] select {{
-        background: #FFFFFF !important;
-        border: 1px solid rgba(255,255,255,0.3) !important;
-        color: #0F172A !important;
-        border-radius: 8px !important;
-        font-weight: 600 !important;
-        font-size: 0.875rem !important;
-        padding: 0.5rem !important;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1) !important;
-        transition: all 0.2s ease !important;
-    }}
-
-    section[data-testid="stSidebar"] .stNumberInput input:focus,
-    section[data-testid="stSidebar"] .stSelectbox select:focus,
-    section[data-testid="stSidebar"] select:focus {{
-        border: 2px solid {PALETTE["primary_light"]} !important;
-        box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.1) !important;
-        outline: none !important;
-    }}
-
-    /* Selectbox specific styling */
-    section[data-testid="stSidebar"] .stSelectbox > div > div {{
-        background: #FFFFFF !important;
-        border-radius: 8px !important;
-    }}
-
-    /* Help icon styling - visible in both light and dark mode */
-    section[data-testid="stSidebar"] .stTooltipIcon {{
-        color: #FFFFFF !important;
-        background-color: rgba(255,255,255,0.25) !important;
-        border-radius: 50% !important;
-        padding: 3px !important;
-        width: 18px !important;
-        height: 18px !important;
-        display: inline-flex !important;
-        align-items: center !important;
-        justify-content: center !important;
-    }}
-
-    section[data-testid="stSidebar"] .stTooltipIcon:hover {{
-        background-color: {PALETTE["primary_light"]} !important;
-    }}
-
-    section[data-testid="stSidebar"] .stTooltipIcon svg {{
-        fill: #FFFFFF !important;
-        stroke: #FFFFFF !important;
-        color: #FFFFFF !important;
-        width: 12px !important;
-        height: 12px !important;
-    }}
-
-    section[data-testid="stSidebar"] .stTooltipIcon svg path {{
-        fill: #FFFFFF !important;
-        stroke: #FFFFFF !important;
-    }}
-
-    section[data-testid="stSidebar"] .stTooltipIcon svg circle {{
-        stroke: #FFFFFF !important;
-        fill: none !important;
-    }}
-
-    section[data-testid="stSidebar"] .stTooltipIcon svg text {{
-        fill: #FFFFFF !important;
-    }}
-
-    section[data-testid="stSidebar"] .stTooltipIcon * {{
-        color: #FFFFFF !important;
-    }}
-
-    /* Number input buttons */
-    section[data-testid="stSidebar"] .stNumberInput button {{
-        color: #0F172A !important;
-    }}
-
-    /* Input spacing and containers */
-    section[data-testid="stSidebar"] .stNumberInput,
-    section[data-testid="stSidebar"] .stSelectbox {{
-        margin-bottom: 1rem !important;
-    }}
-
-    /* Sidebar dividers for visual separation */
-    section[data-testid="stSidebar"] hr {{
-        border: none !important;
-        border-top: 1px solid rgba(255,255,255,0.15) !important;
-        margin: 1.5rem 0 !important;
-    }}
-
-    /* Download button container - remove ALL background circles and elements */
-    section[data-testid="stSidebar"] .stDownloadButton {{
-        background: transparent !important;
-    }}
-
-    section[data-testid="stSidebar"] .stDownloadButton * {{
-        background: transparent !important;
-    }}
-
-    section[data-testid="stSidebar"] .stDownloadButton > div {{
-        background: transparent !important;
-    }}
-
-    section[data-testid="stSidebar"] .stDownloadButton div {{
-        background: transparent !important;
-    }}
-
-    section[data-testid="stSidebar"] .stDownloadButton::before,
-    section[data-testid="stSidebar"] .stDownloadButton::after,
-    section[data-testid="stSidebar"] .stDownloadButton *::before,
-    section[data-testid="stSidebar"] .stDownloadButton *::after {{
-        display: none !important;
-        background: transparent !important;
-        content: none !important;
-    }}
-
-    section[data-testid="stSidebar"] .stDownloadButton button {{
-        background: {PALETTE["primary_light"]} !important;
-    }}
-
-    /* Download button - simple and clean */
-    section[data-testid="stSidebar"] .stDownloadButton button {{
-        background: {PALETTE["primary_light"]} !important;
-        color: #FFFFFF !important;
-        border-radius: 8px !important;
-        border: none !important;
-        font-weight: 600 !important;
-        padding: 0.75rem 1rem !important;
-        width: 100% !important;
-        margin-top: 3.5rem !important;
-        margin-left: 16rem !important;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1) !important;
-        transition: all 0.2s ease !important;
-        font-size: 0.8rem !important;
-        line-height: 1.5 !important;
-        text-align: center !important;
-        white-space: pre-line !important;
-        min-height: 3.5rem !important;
-    }}
-
-    section[data-testid="stSidebar"] .stDownloadButton button:hover {{
-        background: {PALETTE["primary"]} !important;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.15) !important;
-        transform: translateY(-1px) !important;
-    }}
-
-    section[data-testid="stSidebar"] .stDownloadButton button p,
-    section[data-testid="stSidebar"] .stDownloadButton button div,
-    section[data-testid="stSidebar"] .stDownloadButton button span {{
-        writing-mode: horizontal-tb !important;
-        display: inline !important;
-        white-space: nowrap !important;
-    }}
-
-    /* Markdown text in sidebar */
-    section[data-testid="stSidebar"] .stMarkdown p {{
-        color: rgba(255,255,255,0.9) !important;
-        font-size: 0.75rem !important;
-        line-height: 1.5 !important;
-    }}
-
-    /* DATAFRAMES */
-    div[data-testid="stDataFrame"] {{
-        background: white !important;
-        border: 1px solid {PALETTE["border"]} !important;
-        border-radius: 16px !important;
-        overflow: hidden;
-        box-shadow: 0 2px 8px rgba(15,23,42,0.04);
-    }}
-    .dataframe thead tr th {{
-        background: {PALETTE["primary"]} !important;
-        color: white !important;
-        text-transform: uppercase;
-    }}
-
-    /* Download button style (report) */
-    .report-btn button {{
-        background: {PALETTE["primary"]} !important;
-        color: #ffffff !important;
-        border-radius: 9999px !important;
-        border: none !important;
-        font-weight: 600 !important;
-        padding: .5rem 1.5rem !important;
-    }}
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
-
-st.markdown(
-    f"""
-    <style>
-    /* ===== SCENARIO BAR ===== */
-    .ct-scenario {{
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(140px, 1fr));
-        gap: 1rem;
-        background: {PALETTE["surface"]};
-        border: 1px solid {PALETTE["border"]};
-        border-radius: 18px;
-        padding: 1.2rem 1.4rem;
-        margin-bottom: 1.8rem;
-        box-shadow: 0 2px 8px rgba(15,23,42,0.03);
-    }}
-    .scenario-item {{
-        display: flex;
-        flex-direction: column;
-        gap: .15rem;
-    }}
-    .scenario-label {{
-        font-size: .65rem;
-        text-transform: uppercase;
-        letter-spacing: .05em;
-        color: {PALETTE["text_tertiary"]};
-        font-weight: 600;
-    }}
-    .scenario-value {{
-        font-size: 1rem;
-        font-weight: 700;
-        color: {PALETTE["text_primary"]};
-    }}
-
-    /* ===== KPI CARDS (4 en una fila) ===== */
-    .kpi-grid {{
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(210px, 1fr));
-        gap: 1.25rem;
-        margin-bottom: 2rem;
-    }}
-    .kpi-card {{
-        background: {PALETTE["surface"]};
-        border: 1px solid {PALETTE["border"]};
-        border-radius: 1rem;
-        padding: 1.2rem 1.2rem 1.05rem 1.2rem;
-        box-shadow: 0 6px 20px rgba(15,23,42,0.04);
-        position: relative;
-        overflow: hidden;
-    }}
-    .kpi-accent {{
-        position: absolute;
-        inset: 0;
-        height: 4px;
-        background: linear-gradient(90deg, {PALETTE["primary"]} 0%, {PALETTE["secondary"]} 100%);
-    }}
-    .kpi-label {{
-        margin-top: .6rem;
-        font-size: .70rem;
-        text-transform: uppercase;
-        letter-spacing: .05em;
-        color: {PALETTE["text_tertiary"]};
-        font-weight: 600;
-    }}
-    .kpi-value {{
-        font-size: 1.5rem;
-        font-weight: 800;
-        color: {PALETTE["text_primary"]};
-        margin-top: .3rem;
-        margin-bottom: .2rem;
-    }}
-    .kpi-meta {{
-        font-size: .72rem;
-        color: {PALETTE["text_secondary"]};
-    }}
-
-    /* ===== SECTION HEADERS ===== */
-    .section-header {{
-        display: flex;
-        align-items: center;
-        justify-content: space-between;
-        gap: 1rem;
-        margin: 1.5rem 0 1rem 0;
-    }}
-    .section-title {{
-        font-size: 1.1rem;
-        font-weight: 700;
-        color: {PALETTE["text_primary"]};
-    }}
-
-    /* ===== INSIGHT BOXES ===== */
-    .insight-box {{
-        background: {PALETTE["surface"]};
-        border: 1px solid {PALETTE["border"]};
-        border-radius: 1rem;
-        padding: 1.2rem 1.2rem 1rem 1.2rem;
-        margin-top: 1.1rem;
-        margin-bottom: 1.1rem;
-        box-shadow: 0 6px 18px rgba(15,23,42,0.03);
-    }}
-    .insight-title {{
-        font-weight: 700;
-        margin-bottom: .9rem;
-        display: flex;
-        gap: .5rem;
-        align-items: center;
-    }}
-    .insight-number {{
-        background: {PALETTE["primary_light"]};
-        color: white;
-        width: 28px;
-        height: 28px;
-        border-radius: 999px;
-        display: grid;
-        place-items: center;
-        font-size: .7rem;
-    }}
-    .insight-content {{
-        font-size: .78rem;
-        color: {PALETTE["text_secondary"]};
-        line-height: 1.45;
-    }}
-
-    /* TAGS */
-    .insight-tag {{
-        display: inline-block;
-        padding: .20rem .55rem .25rem .55rem;
-        border-radius: 9999px;
-        background: rgba(99, 102, 241, .1);
-        color: {PALETTE["text_primary"]};
-        font-size: .63rem;
-        font-weight: 600;
-        text-transform: uppercase;
-        letter-spacing: .04em;
-        margin-right: .35rem;
-    }}
-    .insight-tag.positive {{
-        background: rgba(16, 185, 129, .12);
-        color: #065f46;
-    }}
-    .insight-tag.warning {{
-        background: rgba(245, 158, 11, .12);
-        color: #92400e;
-    }}
-    .insight-tag.negative {{
-        background: rgba(239, 68, 68, .1);
-        color: #7f1d1d;
-    }}
-
-    /* FOOTER */
-    .footer {{
-        text-align: center;
-        font-size: .7rem;
-        color: {PALETTE["text_tertiary"]};
-        margin-bottom: 2rem;
-    }}
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+# =========================================================
+# GLOBAL STYLES (styles.py, built once per process)
+# =========================================================
+with tracing.span("css injection"):
+    st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # =========================================================
 # PROFESSIONAL HEADER
@@ -548,20 +173,23 @@ header_html = f"""
 </div>
 """
 st.markdown(header_html, unsafe_allow_html=True)
+startup.first_render()
+startup.phase("sidebar")
+tracing.section("sidebar")
 
 # =========================================================
 # SIDEBAR – Unified, NO removed variables, all same style
 # Removed:
-#   - Start-up variable months
+#   - Start-up variable months (now: Ramp-up & Seasonality)
 #   - Initial investment (% of Y1 profit)
 # Kept:
 #   - Initial investment (only one source of truth)
 # =========================================================
-if logo_b64:
+if LOGO_PATH.exists():
     st.sidebar.markdown(
         f"""
         <div class="sidebar-logo">
-            <img src="data:image/png;base64,{logo_b64}" alt="Colombiana de Trasplantes">
+            <img src="{LOGO_URL}" alt="Colombiana de Trasplantes">
         </div>
         """,
         unsafe_allow_html=True
@@ -570,64 +198,18 @@ if logo_b64:
 # MODEL SETUP
 st.sidebar.markdown('<div class="ct-side-title">Model Setup</div>', unsafe_allow_html=True)
 
-# Function to fetch live exchange rates from Currency API
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def get_exchange_rates():
-    """
-    Fetch current exchange rates from Currency API (fawazahmed0/currency-api).
-    Free, no API key required, updates daily. Supports 150+ currencies including COP.
-    Falls back to static rates if API fails.
-    """
-    try:
-        # Get rates with USD as base
-        response_usd = requests.get('https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json', timeout=5)
-        response_usd.raise_for_status()
-        data_usd = response_usd.json()
-
-        # Get rates with EUR as base
-        response_eur = requests.get('https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/eur.json', timeout=5)
-        response_eur.raise_for_status()
-        data_eur = response_eur.json()
-
-        # Get rates with COP as base
-        response_cop = requests.get('https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/cop.json', timeout=5)
-        response_cop.raise_for_status()
-        data_cop = response_cop.json()
-
-        # Extract rates
-        usd_to_cop = data_usd['usd']['cop']
-        usd_to_eur = data_usd['usd']['eur']
-        eur_to_usd = data_eur['eur']['usd']
-        eur_to_cop = data_eur['eur']['cop']
-        cop_to_usd = data_cop['cop']['usd']
-        cop_to_eur = data_cop['cop']['eur']
-
-        rates = {
-            "USD": {"USD": 1.0, "COP": usd_to_cop, "EUR": usd_to_eur},
-            "COP": {"USD": cop_to_usd, "COP": 1.0, "EUR": cop_to_eur},
-            "EUR": {"USD": eur_to_usd, "COP": eur_to_cop, "EUR": 1.0}
-        }
-
-        return rates, data_usd['date']
-
-    except Exception as e:
-        # Fallback to static rates if API fails
-        st.warning(f"Using cached exchange rates. Live rates unavailable: {str(e)}")
-        fallback_rates = {
-            "USD": {"USD": 1.0, "COP": 3855.0, "EUR": 0.868},
-            "COP": {"USD": 1/3855.0, "COP": 1.0, "EUR": 0.868/3855.0},
-            "EUR": {"USD": 1/0.868, "COP": 3855.0/0.868, "EUR": 1.0}
-        }
-        return fallback_rates, "Cached"
-
-# Get live exchange rates
-EXCHANGE_RATES, rates_date = get_exchange_rates()
-
-# Initialize session state for currency tracking
-if 'previous_currency' not in st.session_state:
-    st.session_state.previous_currency = "USD"
+# Exchange rates (rates.py): one USD payload, disk cache with
+# stale-while-revalidate; never blocks a rerun once rates are cached.
+# Offline: CLINIC_RATES_OFFLINE=1 or CLINIC_RATES_FILE=<json>.
+with tracing.span("exchange rates"):
+    rates_info = get_rates()
+EXCHANGE_RATES, rates_date = rates_info["rates"], rates_info["date"]
+if rates_info["status"] == "fallback":
+    st.warning(f"Using cached exchange rates. Live rates unavailable: {rates_info['error']}")
+
+# Currency-denominated inputs are kept in canonical USD (base_values);
+# the selected currency only changes how they are shown and entered.
 if 'base_values' not in st.session_state:
-    # Store base values in USD
     st.session_state.base_values = {
         'tariff': 54.0,
         'drugs_base': 1.34,
@@ -642,14 +224,15 @@ if 'base_values' not in st.session_state:
         'mal_md_y': 20.0,
         'mal_np_y': 3.0,
         'initial_investment': 650.0,
-        'low_tariff': 42.0
+        'low_tariff': DEFAULT_STRESS['low_tariff']
     }
 
 currency = st.sidebar.selectbox(
     "Currency",
     ["USD", "COP", "EUR"],
     index=0,
-    help=f"Select the currency for all financial values throughout the model (USD: US Dollar, COP: Colombian Peso, EUR: Euro). Exchange rates updated: {rates_date}"
+    help=f"Select the currency for all financial values throughout the model (USD: US Dollar, COP: Colombian Peso, EUR: Euro). Exchange rates updated: {rates_date}",
+    key="currency",
 )
 
 # Show exchange rates info
@@ -661,498 +244,791 @@ if rates_date != "Cached":
 currency_label = f"k{currency}"
 currency_symbol = "$" if currency == "USD" else "€" if currency == "EUR" else "$"
 
-# Convert values when currency changes
-if currency != st.session_state.previous_currency:
-    conversion_rate = EXCHANGE_RATES[st.session_state.previous_currency][currency]
-    for key in st.session_state.base_values:
-        st.session_state.base_values[key] *= conversion_rate
-    st.session_state.previous_currency = currency
+# Display rate (units of the selected currency per USD). When the
+# currency or its rate changes, the widgets are re-filled from the USD
+# values; base_values itself is never converted, so switching back and
+# forth cannot drift.
+display_rate = EXCHANGE_RATES["USD"][currency]
+if st.session_state.get("display_currency") != (currency, display_rate):
+    for key, usd_value in st.session_state.base_values.items():
+        st.session_state[f"in_{key}"] = usd_value * display_rate
+    st.session_state.display_currency = (currency, display_rate)
+
+# =========================================================
+# ASSUMPTION INPUTS – keyed sidebar widgets
+# Every assumption below lives in session state under "in_<name>"
+# (seeded once from its default), so it can be set in bulk: edit
+# mode draws them inside a form (all changes applied in a single
+# rerun on "Apply changes") and the paste-in block writes a whole
+# assumption set before the script runs.
+# =========================================================
+ASSUMPTION_INPUTS = {}   # name -> (min, max) or list of options
+
+edit_mode = st.sidebar.toggle(
+    "Edit mode",
+    key="sidebar_edit_mode",
+    help="Collect changes to the inputs below and apply them together in one recalculation."
+)
+inputs_panel = st.sidebar.form("assumptions_form", border=False) if edit_mode else st.sidebar.container()
+
+
+def assumption_input(label, name, min_value, max_value, default, step, help):
+    """Keyed number input on the assumptions panel (default only seeds the first run)"""
+    ASSUMPTION_INPUTS[name] = (min_value, max_value)
+    st.session_state.setdefault(f"in_{name}", default)
+    return inputs_panel.number_input(
+        label, min_value=min_value, max_value=max_value, step=step, help=help, key=f"in_{name}"
+    )
+
+
+def assumption_choice(label, name, options, help):
+    """Keyed selectbox on the assumptions panel (first option by default)"""
+    ASSUMPTION_INPUTS[name] = list(options)
+    return inputs_panel.selectbox(label, options, help=help, key=f"in_{name}")
+
+
+def parse_assumptions(text):
+    """
+    Parse a pasted assumption set: one "name = value" per line (":"
+    also accepted, "#" starts a comment), values in sidebar units.
+    Returns ({name: value}, [errors]).
+    """
+    values, errors = {}, []
+    for n, line in enumerate(text.splitlines(), start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        sep = "=" if "=" in line else ":"
+        name, _, raw = (part.strip() for part in line.partition(sep))
+        spec = ASSUMPTION_INPUTS.get(name)
+        if spec is None:
+            errors.append(f"Line {n}: unknown input '{name}'")
+        elif isinstance(spec, list):
+            if raw in spec:
+                values[name] = raw
+            else:
+                errors.append(f"Line {n}: {name} must be one of {', '.join(spec)}")
+        else:
+            lo, hi = spec
+            try:
+                value = float(raw)
+            except ValueError:
+                errors.append(f"Line {n}: '{raw}' is not a number")
+                continue
+            if not lo <= value <= hi:
+                errors.append(f"Line {n}: {name} must be between {lo:,} and {hi:,}")
+            elif isinstance(lo, int) and not value.is_integer():
+                errors.append(f"Line {n}: {name} must be a whole number")
+            else:
+                values[name] = int(value) if isinstance(lo, int) else value
+    return values, errors
+
+
+def apply_pasted_assumptions():
+    """Button callback: write a valid pasted set into the input state (all or nothing)"""
+    values, errors = parse_assumptions(st.session_state.get("assumption_paste", ""))
+    if not values and not errors:
+        errors = ["Nothing to apply"]
+    if not errors:
+        for name, value in values.items():
+            st.session_state[f"in_{name}"] = value
+    st.session_state.assumption_paste_result = (len(values), errors)
+
 
 # VOLUME & PRICING
-st.sidebar.markdown('<div class="ct-side-title">Volume & Pricing</div>', unsafe_allow_html=True)
-patients = st.sidebar.number_input(
+inputs_panel.markdown('<div class="ct-side-title">Volume & Pricing</div>', unsafe_allow_html=True)
+patients = assumption_input(
     "Patients per year",
+    "patients",
     min_value=0,
     max_value=2000,
-    value=250,
+    default=250,
     step=5,
     help="Total annual patient volume served by the clinic. This is the primary revenue driver and affects variable costs like drugs and labs."
 )
-tariff = st.sidebar.number_input(
+tariff = assumption_input(
     f"Tariff per patient/year ({currency_label})",
+    "tariff",
     min_value=0.0,
     max_value=1000000.0,
-    value=st.session_state.base_values['tariff'],
+    default=st.session_state.base_values['tariff'],
     step=1.0 if currency != "COP" else 1000.0,
     help="Average annual reimbursement received per patient from insurance payers or healthcare system. This is your primary revenue per patient."
 )
-st.session_state.base_values['tariff'] = tariff
 
 # VARIABLE COSTS
-st.sidebar.markdown('<div class="ct-side-title">Variable Costs</div>', unsafe_allow_html=True)
-drugs_base = st.sidebar.number_input(
+inputs_panel.markdown('<div class="ct-side-title">Variable Costs</div>', unsafe_allow_html=True)
+drugs_base = assumption_input(
     f"Drugs ({currency_label}/patient/month)",
+    "drugs_base",
     min_value=0.0,
     max_value=100000.0,
-    value=st.session_state.base_values['drugs_base'],
+    default=st.session_state.base_values['drugs_base'],
     step=0.01 if currency != "COP" else 100.0,
     help="Base monthly pharmaceutical cost per patient. Includes immunosuppressants and other medications required for transplant follow-up care."
 )
-st.session_state.base_values['drugs_base'] = drugs_base
-drugs_cont = st.sidebar.number_input(
+drugs_cont = assumption_input(
     "Drugs contingency (%)",
+    "drugs_cont",
     min_value=0.0,
     max_value=100.0,
-    value=20.0,
+    default=20.0,
     step=1.0,
     help="Safety buffer percentage to account for drug price fluctuations, dosage adjustments, or unexpected medication needs."
 ) / 100.0
 
-labs_base = st.sidebar.number_input(
+labs_base = assumption_input(
     f"Labs & imaging ({currency_label}/patient/month)",
+    "labs_base",
     min_value=0.0,
     max_value=50000.0,
-    value=st.session_state.base_values['labs_base'],
+    default=st.session_state.base_values['labs_base'],
     step=0.01 if currency != "COP" else 100.0,
     help="Base monthly cost for laboratory tests and imaging studies per patient. Includes routine monitoring and diagnostic procedures."
 )
-st.session_state.base_values['labs_base'] = labs_base
-labs_cont = st.sidebar.number_input(
+labs_cont = assumption_input(
     "Labs contingency (%)",
+    "labs_cont",
     min_value=0.0,
     max_value=100.0,
-    value=20.0,
+    default=20.0,
     step=1.0,
     help="Safety buffer percentage for unexpected tests, additional imaging, or price variations in diagnostic services."
 ) / 100.0
 
 # PAYROLL
-st.sidebar.markdown(f'<div class="ct-side-title">Payroll (Annual, {currency_label})</div>', unsafe_allow_html=True)
-clinical_pay = st.sidebar.number_input(
+inputs_panel.markdown(f'<div class="ct-side-title">Payroll (Annual, {currency_label})</div>', unsafe_allow_html=True)
+clinical_pay = assumption_input(
     "Clinical staff",
+    "clinical_pay",
     min_value=0.0,
     max_value=50000000.0,
-    value=st.session_state.base_values['clinical_pay'],
+    default=st.session_state.base_values['clinical_pay'],
     step=5.0 if currency != "COP" else 5000.0,
     help="Total annual base salaries for all clinical personnel including physicians, nurses, nurse practitioners, and medical assistants."
 )
-st.session_state.base_values['clinical_pay'] = clinical_pay
-clinical_bur = st.sidebar.number_input(
+clinical_bur = assumption_input(
     "Clinical burden (%)",
+    "clinical_bur",
     min_value=0.0,
     max_value=100.0,
-    value=25.0,
+    default=25.0,
     step=1.0,
     help="Payroll burden rate covering benefits, payroll taxes, health insurance, retirement contributions, and other employment costs."
 ) / 100.0
 
-admin_pay = st.sidebar.number_input(
+admin_pay = assumption_input(
     "Administrative staff",
+    "admin_pay",
     min_value=0.0,
     max_value=50000000.0,
-    value=st.session_state.base_values['admin_pay'],
+    default=st.session_state.base_values['admin_pay'],
     step=5.0 if currency != "COP" else 5000.0,
     help="Total annual base salaries for administrative personnel including office managers, billing staff, schedulers, and support staff."
 )
-st.session_state.base_values['admin_pay'] = admin_pay
-admin_bur = st.sidebar.number_input(
+admin_bur = assumption_input(
     "Admin burden (%)",
+    "admin_bur",
     min_value=0.0,
     max_value=100.0,
-    value=25.0,
+    default=25.0,
     step=1.0,
     help="Payroll burden rate for administrative staff covering benefits, taxes, insurance, and other employment-related costs."
 ) / 100.0
 
 # FACILITIES & OPEX
-st.sidebar.markdown('<div class="ct-side-title">Facilities & OPEX</div>', unsafe_allow_html=True)
-rent = st.sidebar.number_input(
+inputs_panel.markdown('<div class="ct-side-title">Facilities & OPEX</div>', unsafe_allow_html=True)
+rent = assumption_input(
     f"Rent (annual, {currency_label})",
+    "rent",
     min_value=0.0,
     max_value=10000000.0,
-    value=st.session_state.base_values['rent'],
+    default=st.session_state.base_values['rent'],
     step=5.0 if currency != "COP" else 5000.0,
     help="Total annual facility lease or occupancy cost for clinic space. Includes rent, property fees, and basic facility charges."
 )
-st.session_state.base_values['rent'] = rent
-util_pct = st.sidebar.number_input(
+util_pct = assumption_input(
     "Utilities (% of rent)",
+    "util_pct",
     min_value=0.0,
     max_value=100.0,
-    value=15.0,
+    default=15.0,
     step=1.0,
     help="Utilities cost as a percentage of rent. Covers electricity, water, gas, heating/cooling, and other building services."
 ) / 100.0
-ehr_m = st.sidebar.number_input(
+ehr_m = assumption_input(
     f"EHR ({currency_label}/month)",
+    "ehr_m",
     min_value=0.0,
     max_value=500000.0,
-    value=st.session_state.base_values['ehr_m'],
+    default=st.session_state.base_values['ehr_m'],
     step=0.5 if currency != "COP" else 500.0,
     help="Monthly subscription cost for Electronic Health Record (EHR) system. Includes software licensing, hosting, and support."
 )
-st.session_state.base_values['ehr_m'] = ehr_m
-it_m = st.sidebar.number_input(
+it_m = assumption_input(
     f"IT/phone/internet ({currency_label}/month)",
+    "it_m",
     min_value=0.0,
     max_value=500000.0,
-    value=st.session_state.base_values['it_m'],
+    default=st.session_state.base_values['it_m'],
     step=0.5 if currency != "COP" else 500.0,
     help="Monthly technology and communications costs including internet service, phone systems, IT support, and network infrastructure."
 )
-st.session_state.base_values['it_m'] = it_m
-office_y = st.sidebar.number_input(
+office_y = assumption_input(
     f"Office & supplies (annual, {currency_label})",
+    "office_y",
     min_value=0.0,
     max_value=5000000.0,
-    value=st.session_state.base_values['office_y'],
+    default=st.session_state.base_values['office_y'],
     step=1.0 if currency != "COP" else 1000.0,
     help="Annual cost for general office supplies, medical supplies, stationery, forms, and other consumables needed for operations."
 )
-st.session_state.base_values['office_y'] = office_y
-licenses_y = st.sidebar.number_input(
+licenses_y = assumption_input(
     f"Licenses & dues (annual, {currency_label})",
+    "licenses_y",
     min_value=0.0,
     max_value=5000000.0,
-    value=st.session_state.base_values['licenses_y'],
+    default=st.session_state.base_values['licenses_y'],
     step=1.0 if currency != "COP" else 1000.0,
     help="Annual professional licenses, certifications, association memberships, and regulatory compliance fees for the clinic and staff."
 )
-st.session_state.base_values['licenses_y'] = licenses_y
-mal_md_y = st.sidebar.number_input(
+mal_md_y = assumption_input(
     f"Malpractice MD (annual, {currency_label})",
+    "mal_md_y",
     min_value=0.0,
     max_value=2000000.0,
-    value=st.session_state.base_values['mal_md_y'],
+    default=st.session_state.base_values['mal_md_y'],
     step=1.0 if currency != "COP" else 1000.0,
     help="Annual malpractice insurance premium per physician (MD/DO). Protects against professional liability claims."
 )
-st.session_state.base_values['mal_md_y'] = mal_md_y
-mal_np_y = st.sidebar.number_input(
+mal_np_y = assumption_input(
     f"Malpractice NP (annual, {currency_label})",
+    "mal_np_y",
     min_value=0.0,
     max_value=2000000.0,
-    value=st.session_state.base_values['mal_np_y'],
+    default=st.session_state.base_values['mal_np_y'],
     step=1.0 if currency != "COP" else 1000.0,
     help="Annual malpractice insurance premium per nurse practitioner (NP/PA). Generally lower than physician coverage."
 )
-st.session_state.base_values['mal_np_y'] = mal_np_y
 
 # TAX, GROWTH, INVESTMENT
 # Tax, Growth & Valuation
-st.sidebar.subheader("Tax & Valuation")
+inputs_panel.subheader("Tax & Valuation")
 
-tax_rate = st.sidebar.number_input(
+tax_rate = assumption_input(
     "Income tax rate (%)",
+    "tax_rate",
     min_value=0.0,
     max_value=100.0,
-    value=21.0,
+    default=21.0,
     step=1.0,
     help="Effective corporate income tax rate applied to EBITDA. Varies by jurisdiction (e.g., 21% US federal, ~32% Colombia)."
 ) / 100.0
 
-rev_growth = st.sidebar.number_input(
+rev_growth = assumption_input(
     "Revenue/FCF growth (%)",
+    "rev_growth",
     min_value=0.0,
     max_value=100.0,
-    value=15.0,
+    default=15.0,
     step=1.0,
     help="Expected annual growth rate for revenue and free cash flow projections. Used in 5-year DCF valuation model."
 ) / 100.0
 
-ke = st.sidebar.number_input(
+ke = assumption_input(
     "Discount rate / Ke (%)",
+    "ke",
     min_value=0.0,
     max_value=100.0,
-    value=18.0,
+    default=18.0,
     step=0.5,
     help="Cost of equity (Ke) - the required rate of return investors expect. Used as discount rate in NPV calculations."
 ) / 100.0
 
 # Initial investment parameter
-initial_investment = st.sidebar.number_input(
+initial_investment = assumption_input(
     f"Initial investment ({currency_label})",
+    "initial_investment",
     min_value=0.0,
     max_value=50000000.0,
-    value=st.session_state.base_values['initial_investment'],
+    default=st.session_state.base_values['initial_investment'],
     step=50.0 if currency != "COP" else 50000.0,
     help="Upfront capital required for clinic setup including equipment, furniture, initial inventory, and startup costs (Year 0 cash flow)."
 )
-st.session_state.base_values['initial_investment'] = initial_investment
 
 # FCF factor for DCF valuation
-fcf_factor = st.sidebar.number_input(
+fcf_factor = assumption_input(
     "FCF as % of net profit",
+    "fcf_factor",
     min_value=5.0,
     max_value=100.0,
-    value=40.0,
+    default=40.0,
     step=5.0,
     help="Free Cash Flow conversion rate - the percentage of net profit that converts to actual distributable cash after working capital needs."
 ) / 100.0
 
+# RAMP-UP, SEASONALITY & HIRING (monthly projection)
+inputs_panel.markdown('<div class="ct-side-title">Ramp-up & Seasonality</div>', unsafe_allow_html=True)
+proj_months = assumption_input(
+    "Projection horizon (months)",
+    "proj_months",
+    min_value=60,
+    max_value=120,
+    default=60,
+    step=12,
+    help="Length of the monthly projection. Rolled up to annual cash flows for the DCF (60 months = 5-year DCF)."
+)
+ramp_months = assumption_input(
+    "Ramp-up to full volume (months)",
+    "ramp_months",
+    min_value=0,
+    max_value=36,
+    default=0,
+    step=1,
+    help="Months needed to reach the steady-state patient volume. 0 = full volume from the first month."
+)
+ramp_start = assumption_input(
+    "Opening volume (% of full)",
+    "ramp_start",
+    min_value=0.0,
+    max_value=100.0,
+    default=30.0,
+    step=5.0,
+    help="Patient volume in the first month as a share of steady state. Only used when ramp-up months > 0."
+) / 100.0
+ramp_curve = assumption_choice(
+    "Ramp-up curve",
+    "ramp_curve",
+    RAMP_CURVES,
+    help="Linear: constant monthly build-up. S-curve: slow start, faster middle, gentle landing."
+)
+season_profile = assumption_choice(
+    "Seasonality",
+    "season_profile",
+    list(SEASONALITY_PROFILES),
+    help="Monthly volume pattern (average = 1). The projection starts in January."
+)
+clinical_opening = assumption_input(
+    "Clinical staff at opening (%)",
+    "clinical_opening",
+    min_value=0.0,
+    max_value=100.0,
+    default=100.0,
+    step=5.0,
+    help="Share of the annual clinical payroll in place in month 1."
+) / 100.0
+clinical_full_month = assumption_input(
+    "Clinical team complete (month)",
+    "clinical_full_month",
+    min_value=1,
+    max_value=36,
+    default=1,
+    step=1,
+    help="Month in which the full clinical team is hired."
+)
+admin_opening = assumption_input(
+    "Admin staff at opening (%)",
+    "admin_opening",
+    min_value=0.0,
+    max_value=100.0,
+    default=100.0,
+    step=5.0,
+    help="Share of the annual administrative payroll in place in month 1."
+) / 100.0
+admin_full_month = assumption_input(
+    "Admin team complete (month)",
+    "admin_full_month",
+    min_value=1,
+    max_value=36,
+    default=1,
+    step=1,
+    help="Month in which the full administrative team is hired."
+)
+
 # STRESS TESTING – no sliders, only number inputs
-st.sidebar.markdown('<div class="ct-side-title">Stress Testing</div>', unsafe_allow_html=True)
-mix_low_pct = st.sidebar.number_input(
+inputs_panel.markdown('<div class="ct-side-title">Stress Testing</div>', unsafe_allow_html=True)
+mix_low_pct = assumption_input(
     "Low-tariff patients (%)",
+    "mix_low_pct",
     min_value=0.0,
     max_value=50.0,
-    value=30.0,
+    default=DEFAULT_STRESS["mix_low_pct"] * 100,
     step=5.0,
     help="Percentage of patient volume receiving lower reimbursement rates (e.g., Medicaid, discounted plans). Used for downside scenario analysis."
 ) / 100.0
-low_tariff = st.sidebar.number_input(
+low_tariff = assumption_input(
     f"Low tariff ({currency_label})",
+    "low_tariff",
     min_value=0.0,
     max_value=2000000.0,
-    value=st.session_state.base_values['low_tariff'],
+    default=st.session_state.base_values['low_tariff'],
     step=1.0 if currency != "COP" else 1000.0,
     help="Reduced annual reimbursement rate for low-payer mix patients. Typically 20-30% below standard tariff."
 )
-st.session_state.base_values['low_tariff'] = low_tariff
-stress_costs = st.sidebar.number_input(
+stress_costs = assumption_input(
     "Clinical cost stress (%)",
+    "stress_costs",
     min_value=0.0,
     max_value=30.0,
-    value=10.0,
+    default=DEFAULT_STRESS["stress_costs"] * 100,
     step=5.0,
     help="Cost inflation percentage applied to clinical expenses in stress scenario. Simulates wage increases, supply chain issues, or market pressures."
 ) / 100.0
 
+if edit_mode:
+    inputs_panel.form_submit_button("Apply changes", type="primary", width="stretch")
+
+# Commit the currency-denominated inputs in one update (back to USD,
+# only the ones actually edited): in edit mode the widgets only return
+# new values when the form is submitted.
+committed_values = {
+    'tariff': tariff,
+    'drugs_base': drugs_base,
+    'labs_base': labs_base,
+    'clinical_pay': clinical_pay,
+    'admin_pay': admin_pay,
+    'rent': rent,
+    'ehr_m': ehr_m,
+    'it_m': it_m,
+    'office_y': office_y,
+    'licenses_y': licenses_y,
+    'mal_md_y': mal_md_y,
+    'mal_np_y': mal_np_y,
+    'initial_investment': initial_investment,
+    'low_tariff': low_tariff,
+}
+edited_values = {
+    key: value / display_rate
+    for key, value in committed_values.items()
+    if value != st.session_state.base_values[key] * display_rate
+}
+if edited_values:
+    st.session_state.base_values.update(edited_values)
+
+# PASTE-IN ASSUMPTION SET
+with st.sidebar.expander("Paste assumptions"):
+    st.caption(
+        f"One `name = value` per line, in the units shown above ({currency_label}, % as 0–100). "
+        "The current set below can be copied as a template."
+    )
+    st.code(
+        "\n".join(f"{name} = {st.session_state[f'in_{name}']}" for name in ASSUMPTION_INPUTS),
+        language=None,
+    )
+    st.text_area("Assumption set", key="assumption_paste", height=180, label_visibility="collapsed")
+    st.button("Apply pasted assumptions", on_click=apply_pasted_assumptions, width="stretch")
+    if "assumption_paste_result" in st.session_state:
+        n_applied, paste_errors = st.session_state.pop("assumption_paste_result")
+        if paste_errors:
+            st.error("Nothing applied:\n\n" + "\n\n".join(paste_errors))
+        else:
+            st.success(f"Applied {n_applied} assumption{'s' if n_applied != 1 else ''}.")
+
+startup.phase("model")
+tracing.section("model")
+
 # =========================================================
 # PART 2: CORE FINANCIAL CALCULATIONS & FUNCTIONS
 # All metrics, calculations, and interpretation functions
 # =========================================================
 
 # =========================================================
-# REVENUE CALCULATIONS
+# CORE P&L – evaluated by the batch engine (model.py)
+# The sidebar scenario is a batch of size one, so every
+# metric below is the first (and only) row of the result.
+# Each stage is a node of the recalculation graph (graph.py):
+# it only runs again when the inputs it reads change.
 # =========================================================
-rev_m = patients * tariff / 12  # Monthly revenue (kUSD)
-rev_y = rev_m * 12              # Annual revenue (kUSD)
+calc_graph = st.session_state.setdefault("calc_graph", new_state())
+begin_run(calc_graph)
+
+
+@st.cache_resource
+def shared_figure_cache():
+    """
+    One figure LRU per server process, shared by every session: users
+    looking at the same scenario (e.g. the defaults) reuse each other's
+    figures. Figure nodes are looked up here by a hash of their inputs.
+    """
+    return new_lru(max_bytes=64 * 2**20)
+
+
+figure_cache = shared_figure_cache()
+model_inputs = {
+    "patients": patients,
+    "tariff": tariff,
+    "drugs_base": drugs_base,
+    "drugs_cont": drugs_cont,
+    "labs_base": labs_base,
+    "labs_cont": labs_cont,
+    "clinical_pay": clinical_pay,
+    "clinical_bur": clinical_bur,
+    "admin_pay": admin_pay,
+    "admin_bur": admin_bur,
+    "rent": rent,
+    "util_pct": util_pct,
+    "ehr_m": ehr_m,
+    "it_m": it_m,
+    "office_y": office_y,
+    "licenses_y": licenses_y,
+    "mal_md_y": mal_md_y,
+    "mal_np_y": mal_np_y,
+    "tax_rate": tax_rate,
+    "rev_growth": rev_growth,
+    "ke": ke,
+    "initial_investment": initial_investment,
+    "fcf_factor": fcf_factor,
+}
+
+# The model runs on canonical inputs: money amounts in USD straight
+# from base_values (model_inputs holds them as shown in the sidebar).
+# Every "<stage>_usd" node below has a display twin "<stage>" that only
+# scales the money outputs by display_rate, so a currency switch
+# re-runs those cheap conversions and nothing else.
+canonical_inputs = {
+    k: st.session_state.base_values[k] if k in CURRENCY_INPUTS else v
+    for k, v in model_inputs.items()
+}
+
+
+def stage_inputs(fields):
+    """Subset of canonical_inputs read by one stage"""
+    return {"values": {k: canonical_inputs[k] for k in fields}}
+
+
+def display_node(name, convert=to_currency, **inputs):
+    """Stage `name` in the display currency: convert(<name>_usd result, rate=display_rate, **inputs)"""
+    return node(
+        calc_graph, name,
+        lambda rate, **kw: convert(kw.pop(f"{name}_usd"), rate=rate, **kw),
+        deps=(f"{name}_usd",), inputs={"rate": display_rate, **inputs},
+    )
+
+
+node(calc_graph, "pnl_usd", pnl_block, inputs=stage_inputs(PNL_FIELDS))
+node(
+    calc_graph, "breakeven_usd",
+    lambda pnl_usd, values: breakeven_block(values, pnl_usd),
+    deps=("pnl_usd",), inputs=stage_inputs(BREAKEVEN_FIELDS),
+)
+node(
+    calc_graph, "kpis_usd",
+    lambda pnl_usd, values: kpi_block(values, pnl_usd),
+    deps=("pnl_usd",), inputs=stage_inputs(("patients",)),
+)
+node(
+    calc_graph, "steady_cash_flows_usd",
+    lambda pnl_usd, values: cash_flow_block(values, pnl_usd["net_y"]),
+    deps=("pnl_usd",), inputs=stage_inputs(CASH_FLOW_FIELDS),
+)
+node(
+    calc_graph, "steady_valuation_usd",
+    lambda steady_cash_flows_usd, ke: valuation_block(steady_cash_flows_usd["cf"], ke),
+    deps=("steady_cash_flows_usd",), inputs={"ke": ke},
+)
+pnl_lines = display_node("pnl")
+breakeven_stage = display_node("breakeven")
+kpi_stage = display_node("kpis")
+steady_flows = display_node("steady_cash_flows")
+steady_value = display_node("steady_valuation")
+base_case = scenario_row({**pnl_lines, **breakeven_stage, **kpi_stage, **steady_flows, **steady_value})
+
+# REVENUE (kUSD)
+rev_m = base_case["rev_m"]
+rev_y = base_case["rev_y"]
 
-# =========================================================
 # CLINICAL STAFF COSTS (Fixed)
-# =========================================================
-clinical_m = clinical_pay * (1 + clinical_bur) / 12
-clinical_y = clinical_m * 12
+clinical_m = base_case["clinical_m"]
+clinical_y = base_case["clinical_y"]
 
-# =========================================================
 # VARIABLE COSTS - Drugs and Labs
-# =========================================================
-drugs_m = drugs_base * patients * (1 + drugs_cont)
-labs_m = labs_base * patients * (1 + labs_cont)
-drugs_y = drugs_m * 12
-labs_y = labs_m * 12
+drugs_m = base_case["drugs_m"]
+labs_m = base_case["labs_m"]
+drugs_y = base_case["drugs_y"]
+labs_y = base_case["labs_y"]
 
-# =========================================================
 # GROSS PROFIT
-# =========================================================
-gross_m = rev_m - (clinical_m + drugs_m + labs_m)
-gross_y = gross_m * 12
+gross_m = base_case["gross_m"]
+gross_y = base_case["gross_y"]
 
-# =========================================================
 # ADMINISTRATIVE COSTS (Fixed)
-# =========================================================
-admin_m = admin_pay * (1 + admin_bur) / 12
-admin_y = admin_m * 12
+admin_m = base_case["admin_m"]
+admin_y = base_case["admin_y"]
 
-# =========================================================
 # OTHER OPERATING EXPENSES (Fixed)
-# =========================================================
-other_m = (
-    (rent / 12) * (1 + util_pct) +             # rent + utilities
-    (ehr_m + it_m) +                           # monthly IT/EHR
-    (office_y + licenses_y + mal_md_y + mal_np_y) / 12   # annual overhead to monthly
-)
-other_y = other_m * 12
+other_m = base_case["other_m"]
+other_y = base_case["other_y"]
 
-# =========================================================
-# EBITDA - Operating Profit
-# =========================================================
-ebitda_m = gross_m - admin_m - other_m
-ebitda_y = ebitda_m * 12
+# EBITDA, TAXES AND NET PROFIT
+ebitda_m = base_case["ebitda_m"]
+ebitda_y = base_case["ebitda_y"]
+taxes_y = base_case["taxes_y"]
+net_y = base_case["net_y"]
 
 # =========================================================
-# TAXES AND NET PROFIT
+# BREAK-EVEN ANALYSIS
 # =========================================================
-taxes_y = max(0, ebitda_y * tax_rate)
-net_y = ebitda_y - taxes_y
+var_pp_m = base_case["var_pp_m"]        # variable cost per patient per month (kUSD)
+var_pp_y = base_case["var_pp_y"]
+contrib_pp = base_case["contrib_pp"]    # contribution per patient per year
+fixed_y = base_case["fixed_y"]
+be_patients = base_case["be_patients"]
+be_revenue = base_case["be_revenue"]
+mos_pat = base_case["mos_pat"]
+mos_pct = base_case["mos_pct"]
+be_tariff_at_plan = base_case["be_tariff_at_plan"]   # tariff needed to break even AT CURRENT VOLUME
+tariff_headroom = base_case["tariff_headroom"]
 
 # =========================================================
-# BREAK-EVEN ANALYSIS
+# KEY PERFORMANCE METRICS
 # =========================================================
-# variable cost per patient per month (kUSD)
-var_pp_m = (drugs_base * (1 + drugs_cont)) + (labs_base * (1 + labs_cont))
-var_pp_y = var_pp_m * 12
-# contribution per patient per year
-contrib_pp = tariff - var_pp_y
-fixed_y = clinical_y + admin_y + other_y
-
-if contrib_pp > 0:
-    be_patients = fixed_y / contrib_pp
-    be_revenue = be_patients * tariff
-    mos_pat = patients - be_patients
-    mos_pct = (patients - be_patients) / patients if patients > 0 else 0
-else:
-    be_patients = np.nan
-    be_revenue = np.nan
-    mos_pat = np.nan
-    mos_pct = np.nan
-
-if patients > 0:
-    # tariff needed to break even AT CURRENT VOLUME
-    be_tariff_at_plan = var_pp_y + (fixed_y / patients)
-    tariff_headroom = max(0, tariff - be_tariff_at_plan)
-else:
-    be_tariff_at_plan = np.nan
-    tariff_headroom = np.nan
+ebitda_margin = base_case["ebitda_margin"]
+net_margin = base_case["net_margin"]
+gross_margin = base_case["gross_margin"]
+fixed_ratio = base_case["fixed_ratio"]
+var_ratio = base_case["var_ratio"]
+ebitda_per_patient = base_case["ebitda_per_patient"]
+revenue_per_patient = base_case["revenue_per_patient"]
+
+total_costs = base_case["total_costs"]
+revenue_per_dollar_cost = base_case["revenue_per_dollar_cost"]
+clinical_cost_per_patient = base_case["clinical_cost_per_patient"]
+total_cost_per_patient = base_case["total_cost_per_patient"]
 
 # =========================================================
-# KEY PERFORMANCE METRICS
+# STRESS SCENARIOS (shared by the Strategic Analysis and
+# report sections; the Sensitivity section re-runs them with
+# its own severity settings)
 # =========================================================
-ebitda_margin = ebitda_y / rev_y if rev_y > 0 else 0
-net_margin = net_y / rev_y if rev_y > 0 else 0
-gross_margin = gross_y / rev_y if rev_y > 0 else 0
-fixed_ratio = fixed_y / rev_y if rev_y > 0 else 0
-var_ratio = (drugs_y + labs_y) / rev_y if rev_y > 0 else 0
-ebitda_per_patient = ebitda_y / patients if patients > 0 else 0
-revenue_per_patient = rev_y / patients if patients > 0 else 0
+def stress_from_pnl(pnl, **stress):
+    """Stress scenarios on the cost lines of the current P&L"""
+    return generate_stress_scenarios(
+        clinical_y=float(pnl["clinical_y"][0]),
+        drugs_y=float(pnl["drugs_y"][0]),
+        labs_y=float(pnl["labs_y"][0]),
+        admin_y=float(pnl["admin_y"][0]),
+        other_y=float(pnl["other_y"][0]),
+        **stress,
+    )
 
-total_costs = clinical_y + drugs_y + labs_y + admin_y + other_y
-revenue_per_dollar_cost = rev_y / total_costs if total_costs > 0 else 0
-clinical_cost_per_patient = clinical_y / patients if patients > 0 else 0
-total_cost_per_patient = total_costs / patients if patients > 0 else 0
+stress_inputs = dict(
+    patients=patients, tariff=tariff, mix_low_pct=mix_low_pct, low_tariff=low_tariff,
+    stress_costs=stress_costs, currency_label=currency_label, currency_symbol=currency_symbol,
+)
+stress_results = node(calc_graph, "stress_scenarios", stress_from_pnl, deps=("pnl",), inputs=stress_inputs)
 
 # =========================================================
-# CASH FLOW PROJECTIONS - 5-Year DCF
+# CASH FLOW PROJECTIONS – monthly engine (projection.py)
 # IMPORTANT: we removed "startup_var_months" and
 # "Initial investment (% of Y1 profit)".
 # Now Year 0 = -(initial_investment)
+# Years 1..N = roll-up of the monthly projection (ramp-up,
+# seasonality, hiring). Without them it reduces to:
+# Year 1 = net profit × FCF conversion, later years grow at rev_growth
 # =========================================================
+projection_settings = dict(
+    months=proj_months,
+    ramp_months=ramp_months,
+    ramp_start=ramp_start,
+    ramp_curve=ramp_curve,
+    seasonality=season_profile,
+    clinical_opening=clinical_opening,
+    clinical_full_month=clinical_full_month,
+    admin_opening=admin_opening,
+    admin_full_month=admin_full_month,
+)
+node(
+    calc_graph, "cash_flows_usd",
+    lambda values, settings: project_cash_flows(values, **settings),
+    inputs={**stage_inputs(PROJECTION_FIELDS), "settings": projection_settings},
+)
+node(
+    calc_graph, "valuation_usd",
+    lambda cash_flows_usd, ke: valuation_block(cash_flows_usd["cf"], ke),
+    deps=("cash_flows_usd",), inputs={"ke": ke},
+)
+cash_flows = display_node("cash_flows", lambda usd, rate: to_currency(usd, rate, PROJECTION_CURRENCY_OUTPUTS))
+valuation = display_node("valuation")
+projection = {**cash_flows, **valuation}
+steady_state_projection = (
+    ramp_months == 0
+    and season_profile == "Flat"
+    and (clinical_opening == 1 or clinical_full_month == 1)
+    and (admin_opening == 1 or admin_full_month == 1)
+)
 
-# Year 0 cash flow (kUSD): only the initial investment the user entered
-cf0 = -initial_investment
-
-# Base free cash flow = net profit × FCF conversion
-cf1 = net_y * fcf_factor
-cf2 = cf1 * (1 + rev_growth)
-cf3 = cf2 * (1 + rev_growth)
-cf4 = cf3 * (1 + rev_growth)
-cf5 = cf4 * (1 + rev_growth)
-
-cf_vec = np.array([cf0, cf1, cf2, cf3, cf4, cf5], dtype=float)
+cf_vec = np.array(projection["cf"][0], dtype=float)
+cf0, cf1 = cf_vec[0], cf_vec[1]
 
-cf_df = pd.DataFrame({
-    "Year": ["Year 0 (Initial)", "Year 1", "Year 2", "Year 3", "Year 4", "Year 5"],
-    f"Cash Flow ({currency_label})": [f"{currency_symbol}{v:,.0f}k" for v in cf_vec],
-    f"Cumulative CF ({currency_label})": [f"{currency_symbol}{v:,.0f}k" for v in np.cumsum(cf_vec)],
-    "Description": [
-        f"Initial investment: {currency_symbol}{initial_investment:,.0f}k",
-        f"Year 1 FCF: {fcf_factor*100:.0f}% of net profit",
-        f"Year 2 FCF: Y1 × (1 + {rev_growth*100:.0f}%)",
-        f"Year 3 FCF: Y2 × (1 + {rev_growth*100:.0f}%)",
-        f"Year 4 FCF: Y3 × (1 + {rev_growth*100:.0f}%)",
-        f"Year 5 FCF: Y4 × (1 + {rev_growth*100:.0f}%)"
+if steady_state_projection:
+    cf_descriptions = [f"Year 1 FCF: {fcf_factor*100:.0f}% of net profit"] + [
+        f"Year {t} FCF: Y{t-1} × (1 + {rev_growth*100:.0f}%)" for t in range(2, len(cf_vec))
+    ]
+else:
+    cf_descriptions = [
+        f"Year {t} FCF: {fcf_factor*100:.0f}% of net profit, monthly roll-up (ramp-up / seasonality / hiring)"
+        for t in range(1, len(cf_vec))
     ]
-})
-
-# =========================================================
-# DCF VALUATION FUNCTIONS
-# =========================================================
-def npv_calc(rate, cfs):
-    """Calculate Net Present Value"""
-    years = np.arange(len(cfs))
-    return float(np.sum(cfs / (1 + rate) ** years))
-
-def irr_calc(cfs, guess=0.2):
-    """Calculate Internal Rate of Return using Newton-Raphson"""
-    r = guess
-    for _ in range(100):
-        yrs = np.arange(len(cfs))
-        f = np.sum(cfs / (1 + r) ** yrs)
-        df = np.sum(-yrs * cfs / (1 + r) ** (yrs + 1))
-        if abs(df) < 1e-9:
-            break
-        nr = r - f / df
-        if abs(nr - r) < 1e-7:
-            return float(nr)
-        r = nr
-    return None
 
-npv_val = npv_calc(ke, cf_vec)
-irr_val = irr_calc(cf_vec)
+npv_val = float(projection["npv"][0])
+irr_val = None if np.isnan(projection["irr"][0]) else float(projection["irr"][0])
 cum_cf = np.cumsum(cf_vec)
-payback_year = next((i for i, v in enumerate(cum_cf) if v >= 0), None)
+payback_year = None if np.isnan(projection["payback_year"][0]) else int(projection["payback_year"][0])
 
-# =========================================================
-# P&L DATAFRAME
-# =========================================================
-pnl_df = pd.DataFrame({
-    "Line Item": [
-        "Revenue",
-        "Clinical Staff",
-        "Drugs (with contingency)",
-        "Exams / Labs (with contingency)",
-        "Gross Profit",
-        "Administrative Staff",
-        "Other Operating Expenses",
-        "EBITDA",
-        "Income Tax",
-        "Net Profit",
-    ],
-    f"Monthly ({currency_label})": [
-        f"{currency_symbol}{rev_m:,.0f}",
-        f"-{currency_symbol}{clinical_m:,.0f}",
-        f"-{currency_symbol}{drugs_m:,.0f}",
-        f"-{currency_symbol}{labs_m:,.0f}",
-        f"{currency_symbol}{gross_m:,.0f}",
-        f"-{currency_symbol}{admin_m:,.0f}",
-        f"-{currency_symbol}{other_m:,.0f}",
-        f"{currency_symbol}{ebitda_m:,.0f}",
-        f"-{currency_symbol}{taxes_y/12:,.0f}",
-        f"{currency_symbol}{net_y/12:,.0f}",
-    ],
-    f"Annual ({currency_label})": [
-        f"{currency_symbol}{rev_y:,.0f}",
-        f"-{currency_symbol}{clinical_y:,.0f}",
-        f"-{currency_symbol}{drugs_y:,.0f}",
-        f"-{currency_symbol}{labs_y:,.0f}",
-        f"{currency_symbol}{gross_y:,.0f}",
-        f"-{currency_symbol}{admin_y:,.0f}",
-        f"-{currency_symbol}{other_y:,.0f}",
-        f"{currency_symbol}{ebitda_y:,.0f}",
-        f"-{currency_symbol}{taxes_y:,.0f}",
-        f"{currency_symbol}{net_y:,.0f}",
-    ],
-    "% of Revenue": [
-        "100.0%",
-        f"{(clinical_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-        f"{(drugs_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-        f"{(labs_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-        f"{(gross_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-        f"{(admin_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-        f"{(other_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-        f"{(ebitda_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-        f"{(taxes_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-        f"{(net_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
-    ],
-})
+# caja mensual: mínimo acumulado (trough) y mes de recuperación
+cash_trough = float(projection["cash_trough"][0])
+trough_month = int(projection["trough_month"][0])
+payback_month = None if np.isnan(projection["payback_month"][0]) else int(projection["payback_month"][0])
 
 # =========================================================
 # UTILITY FUNCTIONS
 # =========================================================
 def format_currency(value, decimals=0, curr_label=None, curr_symbol=None):
-    """Format currency values consistently"""
-    label = curr_label if curr_label else currency_label
-    symbol = curr_symbol if curr_symbol else currency_symbol
-    return f"{symbol}{value:,.{decimals}f}{label[-1]}"
-
-def format_percentage(value, decimals=1):
-    """Format percentage values consistently"""
-    return f"{value*100:.{decimals}f}%"
+    """Format currency values consistently (defaults to the selected currency)"""
+    return model_format_currency(
+        value,
+        decimals,
+        curr_label=curr_label if curr_label else currency_label,
+        curr_symbol=curr_symbol if curr_symbol else currency_symbol,
+    )
 
-def safe_divide(numerator, denominator, default=0):
-    """Safe division with default value"""
-    return numerator / denominator if denominator != 0 else default
+def format_input_value(field, value):
+    """Format a model input according to its unit"""
+    unit = INPUT_UNITS[field]
+    if unit == "percent":
+        return format_percentage(value)
+    if unit == "currency":
+        return format_currency(value, decimals=1)
+    return f"{value:,.0f}"
+
+def format_output_value(output, value):
+    """Format an output metric according to its unit"""
+    if value is None or np.isnan(value):
+        return "n/a"
+    if OUTPUT_METRICS[output]["unit"] == "percent":
+        return format_percentage(value)
+    return format_currency(value)
+
+def input_axis_title(field):
+    """Axis title for a model input (with unit)"""
+    unit = INPUT_UNITS[field]
+    if unit == "currency":
+        return f"{INPUT_LABELS[field]} ({currency_label})"
+    if unit == "percent" and "%" not in INPUT_LABELS[field]:
+        return f"{INPUT_LABELS[field]} (%)"
+    return INPUT_LABELS[field]
+
+def persistent_data_editor(data, key, **kwargs):
+    """
+    st.data_editor whose edits survive while its section is hidden:
+    the edited table is fed back as the starting data for as long as
+    the default table it was edited from stays the same.
+    """
+    saved = st.session_state.get(f"_{key}_edited")
+    start = saved[1] if saved is not None and saved[0].equals(data) else data
+    edited = st.data_editor(start, key=key, **kwargs)
+    st.session_state[f"_{key}_edited"] = (data, edited)
+    return edited
 
 def apply_chart_layout(fig, height=400, title=""):
     """Apply consistent styling to Plotly charts (white bg + blue)"""
@@ -1361,85 +1237,8 @@ def interpret_valuation(npv_val, irr_val, payback_year, ebitda_y, ke):
     
     return result
 
-def generate_stress_scenarios(
-    patients,
-    tariff,
-    mix_low_pct,
-    low_tariff,
-    clinical_y,
-    drugs_y,
-    labs_y,
-    admin_y,
-    other_y,
-    stress_costs
-):
-    """Generate stress scenarios with same blue logic"""
-    scenarios = []
-    
-    base_rev = patients * tariff
-    base_costs = clinical_y + drugs_y + labs_y + admin_y + other_y
-    base_ebitda = base_rev - base_costs
-    base_margin = safe_divide(base_ebitda, base_rev)
-    
-    # 1. Payer mix erosion
-    stress1_rev = (patients * (1 - mix_low_pct) * tariff) + (patients * mix_low_pct * low_tariff)
-    stress1_ebitda = stress1_rev - base_costs
-    stress1_margin = safe_divide(stress1_ebitda, stress1_rev)
-    stress1_impact = safe_divide((stress1_ebitda - base_ebitda) * 100, base_ebitda, -100)
-    scenarios.append({
-        "name": "Payer Mix Erosion",
-        "description": f"{mix_low_pct*100:.0f}% patients at {format_currency(low_tariff)} tariff",
-        "ebitda": stress1_ebitda,
-        "margin": stress1_margin,
-        "impact_pct": stress1_impact,
-    })
-    
-    # 2. Volume decline
-    stress2_patients = patients * 0.85
-    stress2_rev = stress2_patients * tariff
-    stress2_var_costs = (drugs_y + labs_y) * 0.85
-    stress2_costs = clinical_y + stress2_var_costs + admin_y + other_y
-    stress2_ebitda = stress2_rev - stress2_costs
-    stress2_margin = safe_divide(stress2_ebitda, stress2_rev)
-    stress2_impact = safe_divide((stress2_ebitda - base_ebitda) * 100, base_ebitda, -100)
-    scenarios.append({
-        "name": "Volume Decline",
-        "description": "15% patient volume reduction",
-        "ebitda": stress2_ebitda,
-        "margin": stress2_margin,
-        "impact_pct": stress2_impact,
-    })
-    
-    # 3. Cost inflation
-    stress3_clinical = clinical_y * (1 + stress_costs)
-    stress3_costs = stress3_clinical + drugs_y + labs_y + admin_y + other_y
-    stress3_ebitda = base_rev - stress3_costs
-    stress3_margin = safe_divide(stress3_ebitda, base_rev)
-    stress3_impact = safe_divide((stress3_ebitda - base_ebitda) * 100, base_ebitda, -100)
-    scenarios.append({
-        "name": "Clinical Cost Inflation",
-        "description": f"{stress_costs*100:.0f}% clinical cost increase",
-        "ebitda": stress3_ebitda,
-        "margin": stress3_margin,
-        "impact_pct": stress3_impact,
-    })
-    
-    # 4. Combined stress
-    stress4_rev = stress2_patients * ((1 - mix_low_pct) * tariff + mix_low_pct * low_tariff)
-    stress4_var_costs = (drugs_y + labs_y) * 0.85
-    stress4_costs = stress3_clinical + stress4_var_costs + admin_y + other_y
-    stress4_ebitda = stress4_rev - stress4_costs
-    stress4_margin = safe_divide(stress4_ebitda, stress4_rev)
-    stress4_impact = safe_divide((stress4_ebitda - base_ebitda) * 100, base_ebitda, -100)
-    scenarios.append({
-        "name": "Combined Stress",
-        "description": "All adverse conditions",
-        "ebitda": stress4_ebitda,
-        "margin": stress4_margin,
-        "impact_pct": stress4_impact,
-    })
-    
-    return scenarios, base_ebitda, base_margin
+startup.phase("scenario bar + KPIs")
+tracing.section("scenario bar + KPIs")
 
 # =========================================================
 # PART 3: SCENARIO BAR & KPI CARDS
@@ -1506,244 +1305,1228 @@ kpi_html = f"""
 st.markdown(kpi_html, unsafe_allow_html=True)
 
 # =========================================================
-# TABS - Main navigation
+# DEFERRED IMPORTS – pandas and plotly, first needed by the
+# tables and charts below. Everything above (header, sidebar,
+# scenario bar, KPI cards) is already on screen by now.
 # =========================================================
-tab_pl, tab_sens, tab_dash, tab_val, tab_analysis = st.tabs([
-    "P&L Statement",
-    "Sensitivity Analysis",
-    "Visual Dashboard",
-    "Valuation Model",
-    "Strategic Analysis"
-])
+startup.phase("pandas + plotly import")
+tracing.section("pandas + plotly import")
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
 
+# PLOTLY THEME (force white background + blue colorway)
+if "clinic_blue" not in pio.templates:
+    clinic_template = go.layout.Template()
+    clinic_template.layout.paper_bgcolor = "white"
+    clinic_template.layout.plot_bgcolor = "white"
+    clinic_template.layout.font = dict(color=PALETTE["text_primary"], family="Inter, system-ui, sans-serif")
+    clinic_template.layout.colorway = PALETTE["chart"]
+    pio.templates["clinic_blue"] = clinic_template
+pio.templates.default = "clinic_blue"
+
+startup.phase("tables")
+tracing.section("tables")
 # =========================================================
-# TAB 1: P&L STATEMENT  (solo P&L y análisis de P&L)
+# CASH FLOW TABLE
 # =========================================================
-with tab_pl:
-    st.markdown(
-        '<div class="section-header"><h2 class="section-title">Operating Profit & Loss Statement</h2></div>',
-        unsafe_allow_html=True
-    )
-    st.dataframe(pnl_df, use_container_width=True, hide_index=True)
-
-    st.markdown(
-        '<div class="section-header"><h2 class="section-title">P&L Waterfall Analysis</h2></div>',
-        unsafe_allow_html=True
-    )
-    fig_wf = go.Figure(go.Waterfall(
-        name="P&L Flow",
-        orientation="v",
-        measure=["relative", "relative", "relative", "relative", "total", "relative", "relative", "total"],
-        x=["Revenue", "Clinical Staff", "Drugs", "Labs", "Gross Profit", "Admin Staff", "Other OpEx", "EBITDA"],
-        y=[rev_y, -clinical_y, -drugs_y, -labs_y, 0, -admin_y, -other_y, 0],
-        increasing={"marker": {"color": PALETTE["chart"][0]}},
-        decreasing={"marker": {"color": PALETTE["chart"][2]}},
-        totals={"marker": {"color": PALETTE["chart"][1]}},
-        connector={"line": {"color": PALETTE["border"], "width": 2}},
-        textposition="outside",
-        textfont=dict(size=11, color=PALETTE["text_primary"], family="Inter")
-    ))
-    apply_chart_layout(fig_wf, height=450)
-    fig_wf.update_yaxes(title=f"Thousands {currency}")
-    st.plotly_chart(fig_wf, use_container_width=True)
-
-    # insight solo de P&L
-    content_pl = (
-        f"Revenue of <b>{format_currency(rev_y)}</b> flows through gross margin of "
-        f"<b>{format_percentage(gross_margin)}</b> to EBITDA of <b>{format_currency(ebitda_y)}</b>.<br><br>"
-        f"{interpret_margin(ebitda_margin, 'EBITDA')}<br><br>"
-        f"{interpret_margin(net_margin, 'Net')}<br><br>"
-        f"<b>Profitability cascade:</b> For every dollar of revenue, <b>{gross_margin*100:.1f}%</b> remains after direct costs, "
-        f"<b>{ebitda_margin*100:.1f}%</b> after operating expenses, and <b>{net_margin*100:.1f}%</b> flows to bottom line.<br><br>"
-        f"<b>Cost efficiency:</b> The business generates <b>{currency_symbol}{revenue_per_dollar_cost:.2f}</b> of revenue for every {currency_symbol}1 of total costs "
-        f"{'(excellent efficiency)' if revenue_per_dollar_cost >= 1.5 else '(good efficiency)' if revenue_per_dollar_cost >= 1.3 else '(adequate efficiency)' if revenue_per_dollar_cost >= 1.2 else '(low efficiency - requires attention)'}."
-    )
-    st.markdown(create_insight_box("1", "P&L STRUCTURE ANALYSIS", content_pl), unsafe_allow_html=True)
-
+cf_df = pd.DataFrame({
+    "Year": ["Year 0 (Initial)"] + [f"Year {t}" for t in range(1, len(cf_vec))],
+    f"Cash Flow ({currency_label})": [f"{currency_symbol}{v:,.0f}k" for v in cf_vec],
+    f"Cumulative CF ({currency_label})": [f"{currency_symbol}{v:,.0f}k" for v in np.cumsum(cf_vec)],
+    "Description": [f"Initial investment: {currency_symbol}{initial_investment:,.0f}k"] + cf_descriptions
+})
 
 # =========================================================
-# TAB 2: SENSITIVITY ANALYSIS (CVP, Tornado, Break-even, 2D, Stress)
+# P&L DATAFRAME
 # =========================================================
-with tab_sens:
-    
-    # =====================================================
-    # SECTION 1: CVP FUNDAMENTALS (AUTOMATED, CORPORATE TONE)
-    # =====================================================
-    st.markdown(
-        '<div class="section-header"><h2 class="section-title">Cost-Volume-Profit Analysis</h2></div>',
-        unsafe_allow_html=True
-    )
-
-    # -----------------------------------------------------
-    # 1. AUTOMATED CVP BUILD
-    # -----------------------------------------------------
-    # unit contribution per patient/year
-    contrib_pp = max(tariff - var_pp_y, 0)
-
-    # fixed costs = structure that does NOT depend on patient volume
-    # (clinical staff + admin + other OpEx)
-    fixed_y = max((clinical_y + admin_y + other_y), 0)
-
-    # break-even in patients
-    if contrib_pp > 0:
-        be_patients = fixed_y / contrib_pp
-        be_revenue = be_patients * tariff
-    else:
-        be_patients = np.nan
-        be_revenue = np.nan
-
-    # margin of safety vs planned volume
-    if not np.isnan(be_patients) and patients > 0:
-        mos_pat = max(patients - be_patients, 0)
-        mos_pct = mos_pat / patients
-    else:
-        mos_pat = 0
-        mos_pct = 0
-
-    # fixed-cost share at current volume
-    total_variable_at_plan = var_pp_y * patients
-    fixed_share = safe_divide(fixed_y, fixed_y + total_variable_at_plan)
-
-    if not np.isnan(be_patients):
-
-        # ===== 4 KPI CARDS IN ONE ROW =====
-        c1, c2, c3, c4 = st.columns(4)
-
-        # -------------------------------------------------
-        # CARD 1 – Unit Contribution
-        # -------------------------------------------------
-        with c1:
-            st.markdown(
-                f"""
-                <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                            border-radius:1rem;padding:1.4rem;box-shadow:0 6px 20px rgba(15,23,42,0.06);
-                            position:relative;overflow:hidden;min-height:210px;">
-                    <div style="position:absolute;top:0;left:0;right:0;height:4px;
-                                background:linear-gradient(90deg,{PALETTE['primary']},{PALETTE['secondary']});"></div>
-                    <div style="font-size:0.68rem;text-transform:uppercase;letter-spacing:0.06em;
-                                color:{PALETTE['text_tertiary']};font-weight:700;margin:.75rem 0 .45rem 0;">
-                        Unit Contribution
+pnl_df = pd.DataFrame({
+    "Line Item": [
+        "Revenue",
+        "Clinical Staff",
+        "Drugs (with contingency)",
+        "Exams / Labs (with contingency)",
+        "Gross Profit",
+        "Administrative Staff",
+        "Other Operating Expenses",
+        "EBITDA",
+        "Income Tax",
+        "Net Profit",
+    ],
+    f"Monthly ({currency_label})": [
+        f"{currency_symbol}{rev_m:,.0f}",
+        f"-{currency_symbol}{clinical_m:,.0f}",
+        f"-{currency_symbol}{drugs_m:,.0f}",
+        f"-{currency_symbol}{labs_m:,.0f}",
+        f"{currency_symbol}{gross_m:,.0f}",
+        f"-{currency_symbol}{admin_m:,.0f}",
+        f"-{currency_symbol}{other_m:,.0f}",
+        f"{currency_symbol}{ebitda_m:,.0f}",
+        f"-{currency_symbol}{taxes_y/12:,.0f}",
+        f"{currency_symbol}{net_y/12:,.0f}",
+    ],
+    f"Annual ({currency_label})": [
+        f"{currency_symbol}{rev_y:,.0f}",
+        f"-{currency_symbol}{clinical_y:,.0f}",
+        f"-{currency_symbol}{drugs_y:,.0f}",
+        f"-{currency_symbol}{labs_y:,.0f}",
+        f"{currency_symbol}{gross_y:,.0f}",
+        f"-{currency_symbol}{admin_y:,.0f}",
+        f"-{currency_symbol}{other_y:,.0f}",
+        f"{currency_symbol}{ebitda_y:,.0f}",
+        f"-{currency_symbol}{taxes_y:,.0f}",
+        f"{currency_symbol}{net_y:,.0f}",
+    ],
+    "% of Revenue": [
+        "100.0%",
+        f"{(clinical_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+        f"{(drugs_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+        f"{(labs_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+        f"{(gross_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+        f"{(admin_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+        f"{(other_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+        f"{(ebitda_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+        f"{(taxes_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+        f"{(net_y/rev_y*100):.1f}%" if rev_y > 0 else "0.0%",
+    ],
+})
+
+# =========================================================
+# SECTIONS - Main navigation
+# Stateful section selector instead of st.tabs: tabs only hide
+# content in the browser, so every rerun built all six of them.
+# Now only the selected section's code (tables, figures,
+# sweeps) runs.
+# =========================================================
+SECTIONS = (
+    "P&L Statement",
+    "Sensitivity Analysis",
+    "Visual Dashboard",
+    "Valuation Model",
+    "Monte Carlo",
+    "Strategic Analysis",
+)
+active_section = st.radio(
+    "Section",
+    SECTIONS,
+    horizontal=True,
+    key="section",
+    label_visibility="collapsed",
+)
+
+# Widgets of the hidden sections are not drawn this run, and Streamlit
+# drops the state of widgets that are not drawn: re-save it so their
+# settings are still there when the user comes back. Data editors
+# can't be written this way (see persistent_data_editor).
+SECTION_WIDGET_PREFIXES = {
+    "Sensitivity Analysis": ("tornado_", "spider_", "surf_", "stress_", "gs_"),
+    "Valuation Model": ("npv_grid_",),
+    "Monte Carlo": ("mc_",),
+}
+DATA_EDITOR_KEYS = ("tornado_ranges", "mc_distributions")
+for _section, _prefixes in SECTION_WIDGET_PREFIXES.items():
+    if _section == active_section:
+        continue
+    for _key in list(st.session_state.keys()):
+        if _key.startswith(_prefixes) and _key not in DATA_EDITOR_KEYS:
+            st.session_state[_key] = st.session_state[_key]
+
+startup.phase(f"section: {active_section}")
+tracing.section(f"section: {active_section}")
+
+# =========================================================
+# SECTION 1: P&L STATEMENT  (solo P&L y análisis de P&L)
+# =========================================================
+if active_section == "P&L Statement":
+    st.markdown(
+        '<div class="section-header"><h2 class="section-title">Operating Profit & Loss Statement</h2></div>',
+        unsafe_allow_html=True
+    )
+    st.dataframe(pnl_df, width="stretch", hide_index=True)
+
+    st.markdown(
+        '<div class="section-header"><h2 class="section-title">P&L Waterfall Analysis</h2></div>',
+        unsafe_allow_html=True
+    )
+
+    def build_waterfall_figure(pnl, currency):
+        rev_y, clinical_y, drugs_y, labs_y, admin_y, other_y = (
+            float(pnl[k][0]) for k in ("rev_y", "clinical_y", "drugs_y", "labs_y", "admin_y", "other_y")
+        )
+        fig_wf = go.Figure(go.Waterfall(
+            name="P&L Flow",
+            orientation="v",
+            measure=["relative", "relative", "relative", "relative", "total", "relative", "relative", "total"],
+            x=["Revenue", "Clinical Staff", "Drugs", "Labs", "Gross Profit", "Admin Staff", "Other OpEx", "EBITDA"],
+            y=[rev_y, -clinical_y, -drugs_y, -labs_y, 0, -admin_y, -other_y, 0],
+            increasing={"marker": {"color": PALETTE["chart"][0]}},
+            decreasing={"marker": {"color": PALETTE["chart"][2]}},
+            totals={"marker": {"color": PALETTE["chart"][1]}},
+            connector={"line": {"color": PALETTE["border"], "width": 2}},
+            textposition="outside",
+            textfont=dict(size=11, color=PALETTE["text_primary"], family="Inter")
+        ))
+        apply_chart_layout(fig_wf, height=450)
+        fig_wf.update_yaxes(title=f"Thousands {currency}")
+        return fig_wf
+
+    fig_wf = node(calc_graph, "fig_waterfall", build_waterfall_figure, deps=("pnl",), cutoff=False, shared=figure_cache, inputs=dict(currency=currency))
+
+    st.plotly_chart(fig_wf, width="stretch")
+
+    # insight solo de P&L
+    content_pl = (
+        f"Revenue of <b>{format_currency(rev_y)}</b> flows through gross margin of "
+        f"<b>{format_percentage(gross_margin)}</b> to EBITDA of <b>{format_currency(ebitda_y)}</b>.<br><br>"
+        f"{interpret_margin(ebitda_margin, 'EBITDA')}<br><br>"
+        f"{interpret_margin(net_margin, 'Net')}<br><br>"
+        f"<b>Profitability cascade:</b> For every dollar of revenue, <b>{gross_margin*100:.1f}%</b> remains after direct costs, "
+        f"<b>{ebitda_margin*100:.1f}%</b> after operating expenses, and <b>{net_margin*100:.1f}%</b> flows to bottom line.<br><br>"
+        f"<b>Cost efficiency:</b> The business generates <b>{currency_symbol}{revenue_per_dollar_cost:.2f}</b> of revenue for every {currency_symbol}1 of total costs "
+        f"{'(excellent efficiency)' if revenue_per_dollar_cost >= 1.5 else '(good efficiency)' if revenue_per_dollar_cost >= 1.3 else '(adequate efficiency)' if revenue_per_dollar_cost >= 1.2 else '(low efficiency - requires attention)'}."
+    )
+    st.markdown(create_insight_box("1", "P&L STRUCTURE ANALYSIS", content_pl), unsafe_allow_html=True)
+
+
+# =========================================================
+# SECTION 2: SENSITIVITY ANALYSIS (CVP, Tornado, Break-even, 2D, Stress)
+# =========================================================
+if active_section == "Sensitivity Analysis":
+    # Each analysis below is its own fragment: its local controls
+    # (tornado ranges, grid resolution, stress severity, goal seek)
+    # only re-run that fragment. Shared base-case results come from
+    # the core section / calc_graph nodes, never recomputed here.
+
+    @analytics_fragment
+    def cvp_fragment():
+        """Cost-volume-profit cards and commentary"""
+        # =====================================================
+        # SECTION 1: CVP FUNDAMENTALS (AUTOMATED, CORPORATE TONE)
+        # =====================================================
+        st.markdown(
+            '<div class="section-header"><h2 class="section-title">Cost-Volume-Profit Analysis</h2></div>',
+            unsafe_allow_html=True
+        )
+
+        # -----------------------------------------------------
+        # 1. AUTOMATED CVP BUILD
+        # -----------------------------------------------------
+        # unit contribution per patient/year
+        contrib_pp = max(tariff - var_pp_y, 0)
+
+        # fixed costs = structure that does NOT depend on patient volume
+        # (clinical staff + admin + other OpEx)
+        fixed_y = max((clinical_y + admin_y + other_y), 0)
+
+        # break-even in patients
+        if contrib_pp > 0:
+            be_patients = fixed_y / contrib_pp
+            be_revenue = be_patients * tariff
+        else:
+            be_patients = np.nan
+            be_revenue = np.nan
+
+        # margin of safety vs planned volume
+        if not np.isnan(be_patients) and patients > 0:
+            mos_pat = max(patients - be_patients, 0)
+            mos_pct = mos_pat / patients
+        else:
+            mos_pat = 0
+            mos_pct = 0
+
+        # fixed-cost share at current volume
+        total_variable_at_plan = var_pp_y * patients
+        fixed_share = safe_divide(fixed_y, fixed_y + total_variable_at_plan)
+
+        if not np.isnan(be_patients):
+
+            # ===== 4 KPI CARDS IN ONE ROW =====
+            c1, c2, c3, c4 = st.columns(4)
+
+            # -------------------------------------------------
+            # CARD 1 – Unit Contribution
+            # -------------------------------------------------
+            with c1:
+                st.markdown(
+                    f"""
+                    <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                                border-radius:1rem;padding:1.4rem;box-shadow:0 6px 20px rgba(15,23,42,0.06);
+                                position:relative;overflow:hidden;min-height:210px;">
+                        <div style="position:absolute;top:0;left:0;right:0;height:4px;
+                                    background:linear-gradient(90deg,{PALETTE['primary']},{PALETTE['secondary']});"></div>
+                        <div style="font-size:0.68rem;text-transform:uppercase;letter-spacing:0.06em;
+                                    color:{PALETTE['text_tertiary']};font-weight:700;margin:.75rem 0 .45rem 0;">
+                            Unit Contribution
+                        </div>
+                        <div style="font-size:2rem;font-weight:800;color:{PALETTE['text_primary']};line-height:1;">
+                            {format_currency(contrib_pp)}
+                        </div>
+                        <div style="font-size:0.74rem;color:{PALETTE['text_secondary']};margin:.4rem 0 1.05rem 0;">
+                            {format_percentage(safe_divide(contrib_pp, tariff))} of tariff
+                        </div>
+                        <div style="background:{PALETTE['surface_alt']};padding:.6rem .85rem;border-radius:10px;
+                                    font-size:0.7rem;color:{PALETTE['text_secondary']};line-height:1.45;">
+                            Tariff: <b>{format_currency(tariff)}</b><br>
+                            Variable cost: <b>{format_currency(var_pp_y)}</b><br>
+                            <span style="color:{PALETTE['primary']};font-weight:600;">
+                                → Contribution: {format_currency(contrib_pp)}
+                            </span>
+                        </div>
                     </div>
-                    <div style="font-size:2rem;font-weight:800;color:{PALETTE['text_primary']};line-height:1;">
-                        {format_currency(contrib_pp)}
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            # -------------------------------------------------
+            # CARD 2 – Break-Even Volume
+            # -------------------------------------------------
+            with c2:
+                st.markdown(
+                    f"""
+                    <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                                border-radius:1rem;padding:1.4rem;box-shadow:0 6px 20px rgba(15,23,42,0.06);
+                                position:relative;overflow:hidden;min-height:210px;">
+                        <div style="position:absolute;top:0;left:0;right:0;height:4px;
+                                    background:linear-gradient(90deg,{PALETTE['primary']},{PALETTE['secondary']});"></div>
+                        <div style="font-size:0.68rem;text-transform:uppercase;letter-spacing:0.06em;
+                                    color:{PALETTE['text_tertiary']};font-weight:700;margin:.75rem 0 .45rem 0;">
+                            Break-Even Volume
+                        </div>
+                        <div style="font-size:2rem;font-weight:800;color:{PALETTE['text_primary']};line-height:1;">
+                            {be_patients:,.0f}
+                        </div>
+                        <div style="font-size:0.74rem;color:{PALETTE['text_secondary']};margin:.4rem 0 1.05rem 0;">
+                            patients per year
+                        </div>
+                        <div style="background:{PALETTE['surface_alt']};padding:.6rem .85rem;border-radius:10px;
+                                    font-size:0.7rem;color:{PALETTE['text_secondary']};line-height:1.45;">
+                            Fixed costs: <b>{format_currency(fixed_y)}</b><br>
+                            Formula: <b>Fixed ÷ Contribution</b><br>
+                            <span style="color:{PALETTE['primary']};font-weight:600;">
+                                → BE revenue: {format_currency(be_revenue)}
+                            </span>
+                        </div>
                     </div>
-                    <div style="font-size:0.74rem;color:{PALETTE['text_secondary']};margin:.4rem 0 1.05rem 0;">
-                        {format_percentage(safe_divide(contrib_pp, tariff))} of tariff
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            # -------------------------------------------------
+            # CARD 3 – Margin of Safety
+            # -------------------------------------------------
+            with c3:
+                safety_color = '#065f46' if mos_pct >= 0.40 else '#92400e' if mos_pct >= 0.25 else '#7f1d1d'
+                safety_bg = 'rgba(16,185,129,.12)' if mos_pct >= 0.40 else 'rgba(245,158,11,.12)' if mos_pct >= 0.25 else 'rgba(239,68,68,.12)'
+                safety_label = 'ROBUST BUFFER' if mos_pct >= 0.40 else 'MODERATE RISK' if mos_pct >= 0.25 else 'HIGH RISK'
+
+                st.markdown(
+                    f"""
+                    <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                                border-radius:1rem;padding:1.4rem;box-shadow:0 6px 20px rgba(15,23,42,0.06);
+                                position:relative;overflow:hidden;min-height:210px;">
+                        <div style="position:absolute;top:0;left:0;right:0;height:4px;
+                                    background:linear-gradient(90deg,{PALETTE['primary']},{PALETTE['secondary']});"></div>
+                        <div style="font-size:0.68rem;text-transform:uppercase;letter-spacing:0.06em;
+                                    color:{PALETTE['text_tertiary']};font-weight:700;margin:.75rem 0 .45rem 0;">
+                            Margin of Safety
+                        </div>
+                        <div style="font-size:2rem;font-weight:800;color:{PALETTE['text_primary']};line-height:1;">
+                            {format_percentage(mos_pct)}
+                        </div>
+                        <div style="font-size:0.74rem;color:{PALETTE['text_secondary']};margin:.4rem 0 1.05rem 0;">
+                            {mos_pat:,.0f} patients buffer
+                        </div>
+                        <div style="background:{safety_bg};padding:.6rem .85rem;border-radius:10px;
+                                    font-size:0.7rem;line-height:1.45;">
+                            <div style="color:{safety_color};font-weight:700;font-size:0.67rem;
+                                        text-transform:uppercase;letter-spacing:0.04em;margin-bottom:0.35rem;">
+                                {safety_label}
+                            </div>
+                            Up to <b style="color:{safety_color};">{format_percentage(mos_pct)}</b> of current volume
+                            can be absorbed before break-even is reached.
+                        </div>
                     </div>
-                    <div style="background:{PALETTE['surface_alt']};padding:.6rem .85rem;border-radius:10px;
-                                font-size:0.7rem;color:{PALETTE['text_secondary']};line-height:1.45;">
-                        Tariff: <b>{format_currency(tariff)}</b><br>
-                        Variable cost: <b>{format_currency(var_pp_y)}</b><br>
-                        <span style="color:{PALETTE['primary']};font-weight:600;">
-                            → Contribution: {format_currency(contrib_pp)}
-                        </span>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            # -------------------------------------------------
+            # CARD 4 – Fixed-Cost Share
+            # -------------------------------------------------
+            with c4:
+                st.markdown(
+                    f"""
+                    <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                                border-radius:1rem;padding:1.4rem;box-shadow:0 6px 20px rgba(15,23,42,0.06);
+                                position:relative;overflow:hidden;min-height:210px;">
+                        <div style="position:absolute;top:0;left:0;right:0;height:4px;
+                                    background:linear-gradient(90deg,{PALETTE['primary']},{PALETTE['secondary']});"></div>
+                        <div style="font-size:0.68rem;text-transform:uppercase;letter-spacing:0.06em;
+                                    color:{PALETTE['text_tertiary']};font-weight:700;margin:.75rem 0 .45rem 0;">
+                            Fixed-Cost Share
+                        </div>
+                        <div style="font-size:2rem;font-weight:800;color:{PALETTE['text_primary']};line-height:1;">
+                            {format_percentage(fixed_share)}
+                        </div>
+                        <div style="font-size:0.74rem;color:{PALETTE['text_secondary']};margin:.4rem 0 1.05rem 0;">
+                            of operating cost base
+                        </div>
+                        <div style="background:{PALETTE['surface_alt']};padding:.6rem .85rem;border-radius:10px;
+                                    font-size:0.7rem;color:{PALETTE['text_secondary']};line-height:1.45;">
+                            Fixed: <b>{format_currency(fixed_y)}</b><br>
+                            Variable @ {patients} pts: <b>{format_currency(total_variable_at_plan)}</b><br>
+                            <span style="color:{PALETTE['primary']};font-weight:600;">
+                                → Additional volume improves EBITDA directly
+                            </span>
+                        </div>
                     </div>
-                </div>
-                """,
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            st.markdown("<br>", unsafe_allow_html=True)
+
+            # -----------------------------------------------------
+            # 2. SINGLE, NON-REPETITIVE INTERPRETATION (NO “YOU”)
+            # -----------------------------------------------------
+            # choose headline by strength of CVP
+            if contrib_pp > 0 and mos_pct >= 0.6:
+                headline = "Scalable, low-risk CVP"
+                tone = (
+                    "Current unit economics generate enough contribution to cover the fixed clinical and administrative "
+                    "structure, so incremental volume is largely accretive."
+                )
+            elif contrib_pp > 0 and mos_pct >= 0.35:
+                headline = "Healthy CVP with acceptable buffer"
+                tone = (
+                    "The model tolerates moderate fluctuations in patient volume, provided tariff conditions remain aligned "
+                    "with current contribution levels."
+                )
+            else:
+                headline = "Tight CVP – volume and tariff must be defended"
+                tone = (
+                    "A high fixed-cost base relative to contribution per patient leaves limited room for simultaneous volume "
+                    "contraction and tariff pressure."
+                )
+
+            cvp_content = (
+                f"<b>{headline}</b><br>{tone}<br><br>"
+                f"The break-even volume (<b>{be_patients:,.0f} patients</b>) results from dividing the current fixed-cost "
+                f"structure (<b>{format_currency(fixed_y)}</b>) by the effective contribution per patient "
+                f"(<b>{format_currency(contrib_pp)}</b>). At the present operating level "
+                f"(<b>{patients} patients</b>), the model maintains a volume margin of safety of "
+                f"<b>{mos_pat:,.0f} patients</b> ({format_percentage(mos_pct)})."
+            )
+
+            st.markdown(
+                create_insight_box("1", "CVP STRATEGIC ANALYSIS", cvp_content),
                 unsafe_allow_html=True
             )
 
-        # -------------------------------------------------
-        # CARD 2 – Break-Even Volume
-        # -------------------------------------------------
-        with c2:
+        else:
+            st.warning("Break-even analysis unavailable with current parameters. Check tariff and variable cost.")
+
+    cvp_fragment()
+
+
+    @analytics_fragment
+    def tornado_fragment():
+        """Tornado and spider charts with their own driver controls"""
+        # =====================================================
+        # SECCIÓN 2: TORNADO & SPIDER ANALYSIS (driver level)
+        # =====================================================
+        st.markdown(
+            '<div class="section-header"><h2 class="section-title">Tornado Sensitivity Analysis</h2></div>',
+            unsafe_allow_html=True
+        )
+
+        tor_c1, tor_c2, tor_c3, tor_c4 = st.columns(4)
+        with tor_c1:
+            tornado_out = st.selectbox(
+                "Output",
+                list(OUTPUT_METRICS),
+                format_func=lambda k: OUTPUT_METRICS[k]["label"],
+                key="tornado_out",
+            )
+        with tor_c2:
+            tornado_span = st.number_input(
+                "Default range (± %)",
+                min_value=1.0,
+                max_value=95.0,
+                value=20.0,
+                step=5.0,
+                key="tornado_span",
+            ) / 100.0
+        with tor_c3:
+            spider_points = st.number_input(
+                "Spider points per input",
+                min_value=3,
+                max_value=201,
+                value=41,
+                step=2,
+                key="spider_points",
+            )
+        with tor_c4:
+            spider_top = st.number_input(
+                "Spider: top drivers shown",
+                min_value=1,
+                max_value=len(INPUT_FIELDS),
+                value=6,
+                step=1,
+                key="spider_top",
+            )
+
+        tornado_fields = st.multiselect(
+            "Inputs",
+            INPUT_FIELDS,
+            default=list(INPUT_FIELDS),
+            format_func=lambda k: INPUT_LABELS[k],
+            key="tornado_fields",
+        )
+
+        # rangos por variable (editables); por defecto ± el rango general
+        with st.expander("Per-input ranges"):
+            ranges_df = pd.DataFrame(
+                {
+                    "Input": [INPUT_LABELS[k] for k in tornado_fields],
+                    "Low (%)": [-tornado_span * 100] * len(tornado_fields),
+                    "High (%)": [tornado_span * 100] * len(tornado_fields),
+                },
+                index=tornado_fields,
+            )
+            ranges_df = persistent_data_editor(
+                ranges_df,
+                disabled=["Input"],
+                hide_index=True,
+                width="stretch",
+                key="tornado_ranges",
+            )
+        tornado_ranges = {
+            k: (row["Low (%)"] / 100.0, row["High (%)"] / 100.0)
+            for k, row in ranges_df.iterrows()
+        }
+
+        tor_label = OUTPUT_METRICS[tornado_out]["label"]
+        tor_pct = OUTPUT_METRICS[tornado_out]["unit"] == "percent"
+        tor_scale = 100.0 if tor_pct else 1.0
+        tor_unit = "pp" if tor_pct else "k"
+
+        st.markdown(
+            f"""
+            <div style="background:{PALETTE['surface_alt']};padding:1rem 1.2rem;border-radius:12px;
+                        margin-bottom:1.5rem;font-size:0.78rem;color:{PALETTE['text_secondary']};
+                        border-left:5px solid {PALETTE['primary']};line-height:1.6;">
+                <b style="color:{PALETTE['text_primary']};font-size:0.8rem;">Univariate Sensitivity Analysis</b><br>
+                Shows {tor_label} impact when each sidebar input moves across its own range independently
+                (default ±{tornado_span*100:.0f}%). Identifies which drivers have the most leverage.
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+        # todas las perturbaciones (inputs × puntos) en una sola evaluación
+        node(
+            calc_graph, "tornado_sweep_usd",
+            driver_sweep,
+            inputs=dict(
+                base_inputs=canonical_inputs,
+                fields=tornado_fields,
+                ranges=tornado_ranges,
+                points=spider_points,
+                output=tornado_out,
+                workers=SWEEP_WORKERS,
+            ),
+        )
+        sweep = display_node("tornado_sweep", sweep_in_currency, output=tornado_out)
+
+        tornado_data = []
+        for i, field in enumerate(sweep["fields"]):
+            delta_low = (sweep["values"][i, 0] - sweep["base"]) * tor_scale
+            delta_high = (sweep["values"][i, -1] - sweep["base"]) * tor_scale
+            total_swing = abs(delta_high - delta_low)
+            # entradas en cero (o sin efecto) no aportan barra
+            if total_swing == 0:
+                continue
+
+            tornado_data.append({
+                "field": field,
+                "variable": INPUT_LABELS[field],
+                "low": sweep["offsets"][i, 0],
+                "high": sweep["offsets"][i, -1],
+                "delta_low": delta_low,
+                "delta_high": delta_high,
+                "swing": total_swing
+            })
+
+        # ordenar de mayor a menor impacto (forma de tornado); n/a al final
+        tornado_data.sort(key=lambda x: -1 if np.isnan(x["swing"]) else x["swing"], reverse=True)
+
+        if tornado_data:
+            def build_tornado_figure(tornado_data, tor_label, tor_pct, tor_unit, currency_label):
+                # Crear gráfico tornado mejorado (SOLO AZULES)
+                fig_tornado = go.Figure()
+
+                y_labels = [item["variable"] for item in tornado_data]
+
+                fig_tornado.add_trace(go.Bar(
+                    y=y_labels,
+                    x=[item["delta_low"] for item in tornado_data],
+                    customdata=[item["low"] * 100 for item in tornado_data],
+                    orientation='h',
+                    name='Low end',
+                    marker=dict(
+                        color=PALETTE["chart"][0],
+                        line=dict(width=2, color="white")
+                    ),
+                    text=[f"{item['delta_low']:+.0f}{tor_unit}" for item in tornado_data],
+                    textposition='inside',
+                    textfont=dict(color="white", size=11, family="Inter", weight="bold"),
+                    hovertemplate=f"<b>%{{y}}</b><br>%{{customdata:+.0f}}% impact: %{{x:+,.1f}}{tor_unit}<extra></extra>"
+                ))
+
+                fig_tornado.add_trace(go.Bar(
+                    y=y_labels,
+                    x=[item["delta_high"] for item in tornado_data],
+                    customdata=[item["high"] * 100 for item in tornado_data],
+                    orientation='h',
+                    name='High end',
+                    marker=dict(
+                        color=PALETTE["chart"][2],
+                        line=dict(width=2, color="white")
+                    ),
+                    text=[f"{item['delta_high']:+.0f}{tor_unit}" for item in tornado_data],
+                    textposition='inside',
+                    textfont=dict(color="white", size=11, family="Inter", weight="bold"),
+                    hovertemplate=f"<b>%{{y}}</b><br>%{{customdata:+.0f}}% impact: %{{x:+,.1f}}{tor_unit}<extra></extra>"
+                ))
+
+                fig_tornado.add_vline(
+                    x=0,
+                    line_dash="solid",
+                    line_color=PALETTE["text_primary"],
+                    line_width=3,
+                    annotation_text="Base Case",
+                    annotation_position="top",
+                    annotation_font=dict(size=12, color=PALETTE["text_primary"], family="Inter", weight="bold")
+                )
+
+                apply_chart_layout(fig_tornado, height=max(480, 120 + 28 * len(tornado_data)))
+                fig_tornado.update_layout(
+                    barmode='overlay',
+                    xaxis_title=f"{tor_label} Impact ({'pp' if tor_pct else currency_label})",
+                    yaxis_title="",
+                    yaxis=dict(
+                        autorange="reversed",
+                        tickfont=dict(size=11, color=PALETTE["text_primary"])
+                    ),
+                    showlegend=True,
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="right",
+                        x=1,
+                        bgcolor="rgba(255,255,255,0.9)",
+                        bordercolor=PALETTE["border"],
+                        borderwidth=1
+                    )
+                )
+                return fig_tornado
+
+            fig_tornado = node(
+                calc_graph, "fig_tornado", build_tornado_figure, cutoff=False, shared=figure_cache,
+                inputs=dict(tornado_data=tornado_data, tor_label=tor_label, tor_pct=tor_pct,
+                            tor_unit=tor_unit, currency_label=currency_label),
+            )
+
+            st.plotly_chart(fig_tornado, width="stretch")
+
+            # spider: curva completa de cada driver (mismo batch)
+            def build_spider_figure(tornado_sweep, lines, tor_scale, tor_label, tor_pct, currency_label):
+                fig_spider = go.Figure()
+                field_pos = {k: i for i, k in enumerate(tornado_sweep["fields"])}
+                for n_line, (field, variable) in enumerate(lines):
+                    i = field_pos[field]
+                    fig_spider.add_trace(go.Scatter(
+                        x=tornado_sweep["offsets"][i] * 100,
+                        y=tornado_sweep["values"][i] * tor_scale,
+                        customdata=tornado_sweep["inputs"][i] * (100.0 if INPUT_UNITS[field] == "percent" else 1.0),
+                        mode="lines",
+                        name=variable,
+                        line=dict(color=PALETTE["chart"][n_line % len(PALETTE["chart"])], width=2.5),
+                        hovertemplate=(
+                            f"<b>{variable}</b><br>Change: %{{x:+.1f}}%<br>"
+                            f"Input: %{{customdata:,.2f}}<br>{tor_label}: %{{y:,.1f}}<extra></extra>"
+                        )
+                    ))
+
+                fig_spider.add_hline(
+                    y=tornado_sweep["base"] * tor_scale,
+                    line_dash="dot",
+                    line_color=PALETTE["text_primary"],
+                    line_width=1.5,
+                    annotation_text="Base Case",
+                    annotation_position="top left",
+                )
+
+                apply_chart_layout(fig_spider, height=420)
+                fig_spider.update_layout(
+                    xaxis_title="Change in input (%)",
+                    yaxis_title=f"{tor_label} ({'%' if tor_pct else currency_label})",
+                    xaxis=dict(ticksuffix="%"),
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="right",
+                        x=1,
+                        bgcolor="rgba(255,255,255,0.9)",
+                        bordercolor=PALETTE["border"],
+                        borderwidth=1
+                    )
+                )
+                return fig_spider
+
+            fig_spider = node(
+                calc_graph, "fig_spider", build_spider_figure, deps=("tornado_sweep",), cutoff=False, shared=figure_cache,
+                inputs=dict(lines=[(item["field"], item["variable"]) for item in tornado_data[:spider_top]],
+                            tor_scale=tor_scale, tor_label=tor_label, tor_pct=tor_pct, currency_label=currency_label),
+            )
+
+            st.plotly_chart(fig_spider, width="stretch")
+
+            most_sensitive = tornado_data[0]
+            least_sensitive = tornado_data[-1]
+
+            def _fmt_delta(value):
+                if tor_pct:
+                    return f"{value:+.1f}pp"
+                return ("+" if value >= 0 else "-") + format_currency(abs(value))
+
+            def _fmt_swing(value):
+                return f"{value:.1f}pp" if tor_pct else format_currency(value)
+
+            tornado_content = (
+                f"<b>Primary value driver:</b> <b>{most_sensitive['variable']}</b> — "
+                f"total {tor_label} swing of <b>{_fmt_swing(most_sensitive['swing'])}</b> across "
+                f"{most_sensitive['low']*100:+.0f}% / {most_sensitive['high']*100:+.0f}% variation.<br><br>"
+                f"<b>Low end ({most_sensitive['low']*100:+.0f}%):</b> {_fmt_delta(most_sensitive['delta_low'])} {tor_label}.<br>"
+                f"<b>High end ({most_sensitive['high']*100:+.0f}%):</b> {_fmt_delta(most_sensitive['delta_high'])} {tor_label}.<br><br>"
+                f"<b>Least sensitive:</b> {least_sensitive['variable']} ({_fmt_swing(least_sensitive['swing'])}).<br>"
+                f"{len(sweep['fields'])} inputs × {spider_points} points evaluated in one batch."
+            )
+
+            st.markdown(
+                create_insight_box("2", "TORNADO ANALYSIS INTERPRETATION", tornado_content),
+                unsafe_allow_html=True
+            )
+        else:
+            st.info("Select at least one input with a non-zero value to build the tornado.")
+
+    tornado_fragment()
+
+
+    @analytics_fragment
+    def frontier_fragment():
+        """Break-even frontier (volume × tariff)"""
+        # =====================================================
+        # 3. BREAK-EVEN FRONTIER (Volume × Tariff) – FULL CURVE
+        # =====================================================
+        st.markdown(
+            '<div class="section-header"><h2 class="section-title">Break-Even Frontier (Volume × Tariff)</h2></div>',
+            unsafe_allow_html=True
+        )
+
+        # parámetros base (ya existen arriba en la app)
+        fixed_costs_y = fixed_y            # kUSD/year – fixed staff, admin, overhead
+        var_cost_pp_y = var_pp_y           # kUSD/patient/year – drugs+labs+variable clínico
+
+        # rango automático de volumen para dibujar TODA la curva
+        min_vol = 30
+        max_vol = max(int(patients * 1.6), 400)
+        be_x = np.linspace(min_vol, max_vol, 160)
+
+        # curva teórica de equilibrio: tarifa(p) = (CF + CV * p) / p
+        be_y = (fixed_costs_y + var_cost_pp_y * be_x) / be_x
+
+        # métricas derivadas para la interpretación
+        # break-even al TARIF actual (ya lo tenías como be_patients)
+        be_vol_at_current_tariff = be_patients
+        # tarifa mínima al VOLUMEN actual
+        be_tariff_at_current_vol = (fixed_costs_y + var_cost_pp_y * patients) / patients
+        # buffer de volumen
+        vol_buffer = max(patients - be_vol_at_current_tariff, 0)
+        vol_buffer_pct = vol_buffer / patients if patients > 0 else 0
+        # holgura de tarifa
+        tariff_headroom = max(tariff - be_tariff_at_current_vol, 0)
+        tariff_headroom_pct = tariff_headroom / tariff if tariff > 0 else 0
+
+        def build_breakeven_figure(be_x, be_y, min_vol, max_vol, patients, tariff, currency_label, currency_symbol):
+            fig_be = go.Figure()
+
+            # zona rentable (por debajo de la curva)
+            fig_be.add_trace(go.Scatter(
+                x=np.concatenate([be_x, [be_x.max(), be_x.min()]]),
+                y=np.concatenate([be_y, [be_y.min() * 0.9, be_y.min() * 0.9]]),
+                fill='toself',
+                fillcolor='rgba(37, 99, 235, 0.04)',
+                line=dict(width=0),
+                name="Profitable zone",
+                hoverinfo="skip"
+            ))
+
+            # curva de break-even completa
+            fig_be.add_trace(go.Scatter(
+                x=be_x,
+                y=be_y,
+                mode="lines",
+                name="Break-even curve",
+                line=dict(color=PALETTE["chart"][0], width=4),
+                hovertemplate=f"<b>Break-even</b><br>Patients: %{{x:.0f}}<br>Tariff: {currency_symbol}%{{y:.1f}}k<extra></extra>"
+            ))
+
+            # punto operativo actual
+            fig_be.add_trace(go.Scatter(
+                x=[patients],
+                y=[tariff],
+                mode="markers+text",
+                name="Current position",
+                marker=dict(
+                    size=12,
+                    color="white",
+                    line=dict(width=3, color=PALETTE["primary"])
+                ),
+                text=["Current"],
+                textposition="middle right",
+                textfont=dict(size=11, color=PALETTE["text_primary"]),
+                hovertemplate=(
+                    f"<b>Current position</b><br>"
+                    f"Patients: {patients}<br>"
+                    f"Tariff: {format_currency(tariff)}<extra></extra>"
+                )
+            ))
+
+            # layout
+            apply_chart_layout(fig_be, height=420)
+            fig_be.update_layout(
+                xaxis_title="Patients per year",
+                yaxis_title=f"Tariff ({currency_label}/patient/year)",
+                xaxis=dict(
+                    range=[min_vol, max_vol],
+                    tickmode="auto",
+                    nticks=8,
+                ),
+                yaxis=dict(
+                    range=[max(0, be_y.min() * 0.85), max(tariff, be_y.max()) * 1.05],
+                ),
+                legend=dict(
+                    orientation="h",
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="right",
+                    x=1,
+                    bgcolor="rgba(255,255,255,0.9)",
+                    bordercolor=PALETTE["border"],
+                    borderwidth=1
+                )
+            )
+            return fig_be
+
+        fig_be = node(
+            calc_graph, "fig_breakeven", build_breakeven_figure, cutoff=False, shared=figure_cache,
+            inputs=dict(be_x=be_x, be_y=be_y, min_vol=min_vol, max_vol=max_vol, patients=patients, tariff=tariff,
+                        currency_label=currency_label, currency_symbol=currency_symbol),
+        )
+
+        st.plotly_chart(fig_be, width="stretch")
+
+        # interpretación 100% automática
+        be_text = (
+            f"Frontier derived from a fixed-cost base of <b>{format_currency(fixed_costs_y)}</b> and an effective "
+            f"variable cost per patient of <b>{format_currency(var_cost_pp_y)}</b>."
+            f"<br><br>At the current operating point (<b>{patients} patients</b> at <b>{format_currency(tariff)}</b>), "
+            f"the model breaks even at <b>{be_vol_at_current_tariff:.0f} patients</b>, which implies a volume buffer of "
+            f"<b>{vol_buffer:.0f} patients</b> ({format_percentage(vol_buffer_pct)} of present volume). "
+            f"The minimum sustainable tariff at the current volume is <b>{format_currency(be_tariff_at_current_vol)}</b>, "
+            f"so the present tariff includes a pricing headroom of <b>{format_percentage(tariff_headroom_pct)}</b>."
+        )
+        st.markdown(
+            create_insight_box(
+                "3",
+                "BREAK-EVEN FRONTIER – AUTOMATED INTERPRETATION",
+                be_text
+            ),
+            unsafe_allow_html=True
+        )
+
+    frontier_fragment()
+
+
+    @analytics_fragment
+    def surface_fragment():
+        """2D sensitivity surface with its own grid controls"""
+        # =====================================================
+        # 4. 2D SENSITIVITY SURFACE (any two inputs × any output)
+        # =====================================================
+        surf_c1, surf_c2, surf_c3, surf_c4, surf_c5 = st.columns([0.24, 0.24, 0.2, 0.16, 0.16])
+        with surf_c1:
+            surf_x = st.selectbox(
+                "X axis",
+                INPUT_FIELDS,
+                index=INPUT_FIELDS.index("patients"),
+                format_func=lambda k: INPUT_LABELS[k],
+                key="surf_x",
+            )
+        surf_y_options = [k for k in INPUT_FIELDS if k != surf_x]
+        with surf_c2:
+            surf_y = st.selectbox(
+                "Y axis",
+                surf_y_options,
+                index=surf_y_options.index("tariff") if "tariff" in surf_y_options else 0,
+                format_func=lambda k: INPUT_LABELS[k],
+                key="surf_y",
+            )
+        with surf_c3:
+            surf_out = st.selectbox(
+                "Output",
+                list(OUTPUT_METRICS),
+                format_func=lambda k: OUTPUT_METRICS[k]["label"],
+                key="surf_out",
+            )
+        with surf_c4:
+            surf_points = st.number_input(
+                "Points per axis",
+                min_value=5,
+                max_value=400,
+                value=15,
+                step=5,
+                key="surf_points",
+                help="Grid resolution. The whole grid is evaluated in one batch call.",
+            )
+        with surf_c5:
+            surf_span = st.number_input(
+                "Range (± % of current)",
+                min_value=5.0,
+                max_value=95.0,
+                value=40.0,
+                step=5.0,
+                key="surf_span",
+            ) / 100.0
+
+        surf_label = OUTPUT_METRICS[surf_out]["label"]
+        surf_pct = OUTPUT_METRICS[surf_out]["unit"] == "percent"
+        st.markdown(
+            f'<div class="section-header"><h2 class="section-title">2D Sensitivity: '
+            f'{INPUT_LABELS[surf_x]} × {INPUT_LABELS[surf_y]} → {surf_label}</h2></div>',
+            unsafe_allow_html=True
+        )
+
+        # rangos centrados en el punto actual
+        surf_x_usd = axis_values(surf_x, canonical_inputs[surf_x], span=surf_span, points=surf_points)
+        surf_y_usd = axis_values(surf_y, canonical_inputs[surf_y], span=surf_span, points=surf_points)
+        node(
+            calc_graph, "surface_usd", sensitivity_surface,
+            inputs=dict(
+                base_inputs=canonical_inputs, x_field=surf_x, x_values=surf_x_usd,
+                y_field=surf_y, y_values=surf_y_usd, output=surf_out,
+                workers=SWEEP_WORKERS,
+            ),
+        )
+        surf_grid, surf_hurdle = display_node("surface", surface_in_currency, output=surf_out)
+        surf_x_vals = surf_x_usd * unit_rate(INPUT_UNITS[surf_x], display_rate)
+        surf_y_vals = surf_y_usd * unit_rate(INPUT_UNITS[surf_y], display_rate)
+        surf_excess = surf_grid - surf_hurdle
+
+        # % de celdas por encima del umbral para la interpretación
+        profitable_share = float(np.mean(surf_excess >= 0)) if surf_grid.size > 0 else 0
+        surf_base_val = base_case[surf_out]
+
+        def build_surface_figure(surface, surf_x, surf_y, surf_out, surf_x_vals, surf_y_vals,
+                                 current_x, current_y, surf_base_val, currency_label, currency_symbol):
+            surf_grid, surf_hurdle = surface
+            surf_excess = surf_grid - surf_hurdle
+            surf_label = OUTPUT_METRICS[surf_out]["label"]
+            surf_pct = OUTPUT_METRICS[surf_out]["unit"] == "percent"
+
+            # escala de presentación: porcentajes en %, importes tal cual
+            def _axis_scale(field):
+                return 100.0 if INPUT_UNITS[field] == "percent" else 1.0
+
+            x_scale, y_scale = _axis_scale(surf_x), _axis_scale(surf_y)
+            z_scale = 100.0 if surf_pct else 1.0
+            x_plot, y_plot = surf_x_vals * x_scale, surf_y_vals * y_scale
+            z_unit = "%" if surf_pct else currency_label
+            z_fmt = "%{z:.1f}%" if surf_pct else f"{currency_symbol}%{{z:,.0f}}"
+
+            # color centrado en el umbral cuando es constante en toda la malla
+            hurdle_const = np.ptp(surf_hurdle) == 0
+
+            fig_2d = go.Figure(
+                data=go.Heatmap(
+                    z=surf_grid * z_scale,
+                    x=x_plot,
+                    y=y_plot,
+                    colorscale=[
+                        [0.00, "#E2E8F0"],
+                        [0.48, "#CBD5F5"],
+                        [0.50, "#FFFFFF"],           # break-even
+                        [0.80, PALETTE["chart"][1]],
+                        [1.00, PALETTE["chart"][2]],
+                    ],
+                    zmid=float(surf_hurdle.flat[0]) * z_scale if hurdle_const else None,
+                    showscale=True,
+                    colorbar=dict(
+                        title=f"{surf_label} ({z_unit})",
+                        len=0.65,
+                        thickness=14
+                    ),
+                    hovertemplate=(
+                        f"<b>Scenario</b><br>{INPUT_LABELS[surf_x]}: %{{x:,.2f}}<br>"
+                        f"{INPUT_LABELS[surf_y]}: %{{y:,.2f}}<br>{surf_label}: {z_fmt}<extra></extra>"
+                    )
+                )
+            )
+
+            # línea de equilibrio: contorno exacto del umbral sobre la misma malla
+            if np.nanmin(surf_excess) < 0 < np.nanmax(surf_excess):
+                fig_2d.add_trace(go.Contour(
+                    z=surf_excess,
+                    x=x_plot,
+                    y=y_plot,
+                    contours=dict(start=0, end=0, size=1, coloring="lines"),
+                    line=dict(color=PALETTE["primary"], width=3),
+                    showscale=False,
+                    showlegend=True,
+                    name=OUTPUT_METRICS[surf_out]["line"],
+                    hoverinfo="skip",
+                ))
+
+            # punto actual
+            fig_2d.add_trace(go.Scatter(
+                x=[current_x * x_scale],
+                y=[current_y * y_scale],
+                mode="markers+text",
+                marker=dict(
+                    size=12,
+                    color="white",
+                    line=dict(width=3, color=PALETTE["primary"])
+                ),
+                text=["Current"],
+                textposition="middle right",
+                textfont=dict(size=11, color=PALETTE["text_primary"]),
+                name="Current position",
+                hovertemplate=(
+                    f"<b>Current</b><br>"
+                    f"{INPUT_LABELS[surf_x]}: {format_input_value(surf_x, current_x)}<br>"
+                    f"{INPUT_LABELS[surf_y]}: {format_input_value(surf_y, current_y)}<br>"
+                    f"{surf_label}: {format_output_value(surf_out, surf_base_val)}<extra></extra>"
+                )
+            ))
+
+            apply_chart_layout(fig_2d, height=430)
+            fig_2d.update_layout(
+                xaxis_title=input_axis_title(surf_x),
+                yaxis_title=input_axis_title(surf_y),
+                xaxis=dict(
+                    tickmode="auto",
+                    nticks=8,
+                    ticksuffix="%" if x_scale != 1.0 else "",
+                ),
+                yaxis=dict(
+                    tickmode="auto",
+                    nticks=7,
+                    ticksuffix="%" if y_scale != 1.0 else "",
+                ),
+                legend=dict(
+                    orientation="h",
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="right",
+                    x=1,
+                    bgcolor="rgba(255,255,255,0.9)",
+                    bordercolor=PALETTE["border"],
+                    borderwidth=1
+                )
+            )
+            return fig_2d
+
+        fig_2d = node(
+            calc_graph, "fig_2d", build_surface_figure, deps=("surface",), cutoff=False, shared=figure_cache,
+            inputs=dict(
+                surf_x=surf_x, surf_y=surf_y, surf_out=surf_out, surf_x_vals=surf_x_vals, surf_y_vals=surf_y_vals,
+                current_x=model_inputs[surf_x], current_y=model_inputs[surf_y], surf_base_val=surf_base_val,
+                currency_label=currency_label, currency_symbol=currency_symbol,
+            ),
+        )
+
+        st.plotly_chart(fig_2d, width="stretch")
+
+        # interpretación 100% automática de la matriz
+        surf_base_excess = surf_base_val - (ke if surf_out == "irr" else 0.0)
+        if np.isnan(surf_base_excess):
+            surf_side = f"has no defined {surf_label}"
+        elif surf_base_excess >= 0:
+            surf_side = f"stays on the favourable side of the {OUTPUT_METRICS[surf_out]['line']} line"
+        else:
+            surf_side = f"sits on the unfavourable side of the {OUTPUT_METRICS[surf_out]['line']} line"
+        matrix_text = (
+            f"Surface built for {INPUT_LABELS[surf_x]} between <b>{format_input_value(surf_x, surf_x_vals.min())}</b> "
+            f"and <b>{format_input_value(surf_x, surf_x_vals.max())}</b> and {INPUT_LABELS[surf_y]} between "
+            f"<b>{format_input_value(surf_y, surf_y_vals.min())}</b> and <b>{format_input_value(surf_y, surf_y_vals.max())}</b> "
+            f"({surf_grid.size:,} scenarios, one batch evaluation). "
+            f"{format_percentage(profitable_share)} of simulated combinations keep "
+            f"{OUTPUT_METRICS[surf_out]['line'].replace(' = ', ' ≥ ')} with all other inputs at their current values. "
+            f"The operating point {surf_side}."
+        )
+        st.markdown(
+            create_insight_box(
+                "4",
+                "2D SENSITIVITY – AUTOMATED INTERPRETATION",
+                matrix_text
+            ),
+            unsafe_allow_html=True
+        )
+
+    surface_fragment()
+
+
+    @analytics_fragment
+    def stress_fragment():
+        """Downside stress scenarios with their own severity settings"""
+        # =====================================================
+        # SECTION 5: DOWNSIDE STRESS TESTING
+        # =====================================================
+        st.markdown(
+            '<div class="section-header"><h2 class="section-title">Downside Stress Testing</h2></div>',
+            unsafe_allow_html=True
+        )
+
+        st.markdown(
+            f"""
+            <div style="background:{PALETTE['surface_alt']};padding:0.8rem 1rem;border-radius:10px;
+                        margin-bottom:1.2rem;font-size:0.75rem;color:{PALETTE['text_secondary']};
+                        border-left:4px solid {PALETTE['primary']};">
+                <b>Stress methodology:</b> Multi-factor stress framework evaluating EBITDA resilience under isolated and 
+                combined adverse scenarios. Stress parameters calibrated to historical volatility and market conditions.
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+        # -----------------------------------------------------
+        # LOCAL STRESS SETTINGS (only re-run this section)
+        # -----------------------------------------------------
+        stress_c1, stress_c2 = st.columns(2)
+        with stress_c1:
+            stress_severity = st.number_input(
+                "Stress severity (× sidebar shocks)",
+                min_value=0.5, max_value=3.0, value=1.0, step=0.25,
+                help="Scales every shock together: payer shift, volume decline and clinical cost inflation.",
+                key="stress_severity",
+            )
+        with stress_c2:
+            stress_volume_drop = st.number_input(
+                "Volume decline (%)",
+                min_value=0.0, max_value=50.0, value=15.0, step=5.0,
+                help="Patient volume lost in the volume decline scenario (before severity).",
+                key="stress_volume_drop",
+            ) / 100.0
+
+        # -----------------------------------------------------
+        # GENERATE SCENARIOS
+        # -----------------------------------------------------
+        local_stress = node(
+            calc_graph, "stress_sensitivity", stress_from_pnl, deps=("pnl",),
+            inputs=dict(stress_inputs, volume_drop=stress_volume_drop, severity=stress_severity),
+        )
+        scenarios, base_ebitda_stress, base_margin_stress = local_stress
+
+        stress_df = pd.DataFrame(scenarios)
+
+        # Extract parameters (shocks after severity, as applied by the model)
+        base_volume = patients
+        base_tariff = tariff
+        volume_drop_pct = min(stress_volume_drop * stress_severity, 1.0)
+        stressed_volume = int(round(base_volume * (1 - volume_drop_pct), 0))
+        payer_shift_pct = min(float(mix_low_pct) * stress_severity, 1.0) if mix_low_pct is not None else 0.0
+        low_tariff_val = float(low_tariff) if low_tariff is not None else base_tariff * 0.7
+        clinical_infl_pct = stress_costs * stress_severity
+
+        # -----------------------------------------------------
+        # STRESS PARAMETERS - COMPACT
+        # -----------------------------------------------------
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
             st.markdown(
                 f"""
                 <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                            border-radius:1rem;padding:1.4rem;box-shadow:0 6px 20px rgba(15,23,42,0.06);
-                            position:relative;overflow:hidden;min-height:210px;">
-                    <div style="position:absolute;top:0;left:0;right:0;height:4px;
-                                background:linear-gradient(90deg,{PALETTE['primary']},{PALETTE['secondary']});"></div>
-                    <div style="font-size:0.68rem;text-transform:uppercase;letter-spacing:0.06em;
-                                color:{PALETTE['text_tertiary']};font-weight:700;margin:.75rem 0 .45rem 0;">
-                        Break-Even Volume
-                    </div>
-                    <div style="font-size:2rem;font-weight:800;color:{PALETTE['text_primary']};line-height:1;">
-                        {be_patients:,.0f}
+                            border-radius:1rem;padding:1rem;text-align:center;
+                            box-shadow:0 4px 12px rgba(15,23,42,0.04);">
+                    <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                                letter-spacing:0.05em;margin-bottom:0.5rem;font-weight:600;">Baseline</div>
+                    <div style="font-size:1.3rem;font-weight:800;color:{PALETTE['primary']};line-height:1;">
+                        {base_volume}
                     </div>
-                    <div style="font-size:0.74rem;color:{PALETTE['text_secondary']};margin:.4rem 0 1.05rem 0;">
-                        patients per year
-                    </div>
-                    <div style="background:{PALETTE['surface_alt']};padding:.6rem .85rem;border-radius:10px;
-                                font-size:0.7rem;color:{PALETTE['text_secondary']};line-height:1.45;">
-                        Fixed costs: <b>{format_currency(fixed_y)}</b><br>
-                        Formula: <b>Fixed ÷ Contribution</b><br>
-                        <span style="color:{PALETTE['primary']};font-weight:600;">
-                            → BE revenue: {format_currency(be_revenue)}
-                        </span>
+                    <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
+                        patients @ {format_currency(base_tariff)}
                     </div>
                 </div>
                 """,
                 unsafe_allow_html=True
             )
 
-        # -------------------------------------------------
-        # CARD 3 – Margin of Safety
-        # -------------------------------------------------
-        with c3:
-            safety_color = '#065f46' if mos_pct >= 0.40 else '#92400e' if mos_pct >= 0.25 else '#7f1d1d'
-            safety_bg = 'rgba(16,185,129,.12)' if mos_pct >= 0.40 else 'rgba(245,158,11,.12)' if mos_pct >= 0.25 else 'rgba(239,68,68,.12)'
-            safety_label = 'ROBUST BUFFER' if mos_pct >= 0.40 else 'MODERATE RISK' if mos_pct >= 0.25 else 'HIGH RISK'
-
+        with col2:
             st.markdown(
                 f"""
                 <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                            border-radius:1rem;padding:1.4rem;box-shadow:0 6px 20px rgba(15,23,42,0.06);
-                            position:relative;overflow:hidden;min-height:210px;">
-                    <div style="position:absolute;top:0;left:0;right:0;height:4px;
-                                background:linear-gradient(90deg,{PALETTE['primary']},{PALETTE['secondary']});"></div>
-                    <div style="font-size:0.68rem;text-transform:uppercase;letter-spacing:0.06em;
-                                color:{PALETTE['text_tertiary']};font-weight:700;margin:.75rem 0 .45rem 0;">
-                        Margin of Safety
-                    </div>
-                    <div style="font-size:2rem;font-weight:800;color:{PALETTE['text_primary']};line-height:1;">
-                        {format_percentage(mos_pct)}
+                            border-radius:1rem;padding:1rem;text-align:center;
+                            box-shadow:0 4px 12px rgba(15,23,42,0.04);">
+                    <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                                letter-spacing:0.05em;margin-bottom:0.5rem;font-weight:600;">Volume Shock</div>
+                    <div style="font-size:1.3rem;font-weight:800;color:{PALETTE['chart'][0]};line-height:1;">
+                        -{int(volume_drop_pct*100)}%
                     </div>
-                    <div style="font-size:0.74rem;color:{PALETTE['text_secondary']};margin:.4rem 0 1.05rem 0;">
-                        {mos_pat:,.0f} patients buffer
-                    </div>
-                    <div style="background:{safety_bg};padding:.6rem .85rem;border-radius:10px;
-                                font-size:0.7rem;line-height:1.45;">
-                        <div style="color:{safety_color};font-weight:700;font-size:0.67rem;
-                                    text-transform:uppercase;letter-spacing:0.04em;margin-bottom:0.35rem;">
-                            {safety_label}
-                        </div>
-                        Up to <b style="color:{safety_color};">{format_percentage(mos_pct)}</b> of current volume
-                        can be absorbed before break-even is reached.
+                    <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
+                        → {stressed_volume} patients
                     </div>
                 </div>
                 """,
                 unsafe_allow_html=True
             )
 
-        # -------------------------------------------------
-        # CARD 4 – Fixed-Cost Share
-        # -------------------------------------------------
-        with c4:
+        with col3:
             st.markdown(
                 f"""
                 <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                            border-radius:1rem;padding:1.4rem;box-shadow:0 6px 20px rgba(15,23,42,0.06);
-                            position:relative;overflow:hidden;min-height:210px;">
-                    <div style="position:absolute;top:0;left:0;right:0;height:4px;
-                                background:linear-gradient(90deg,{PALETTE['primary']},{PALETTE['secondary']});"></div>
-                    <div style="font-size:0.68rem;text-transform:uppercase;letter-spacing:0.06em;
-                                color:{PALETTE['text_tertiary']};font-weight:700;margin:.75rem 0 .45rem 0;">
-                        Fixed-Cost Share
+                            border-radius:1rem;padding:1rem;text-align:center;
+                            box-shadow:0 4px 12px rgba(15,23,42,0.04);">
+                    <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                                letter-spacing:0.05em;margin-bottom:0.5rem;font-weight:600;">Payer Shift</div>
+                    <div style="font-size:1.3rem;font-weight:800;color:{PALETTE['chart'][0]};line-height:1;">
+                        {int(payer_shift_pct*100)}%
                     </div>
-                    <div style="font-size:2rem;font-weight:800;color:{PALETTE['text_primary']};line-height:1;">
-                        {format_percentage(fixed_share)}
+                    <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
+                        to {format_currency(low_tariff_val)} tier
                     </div>
-                    <div style="font-size:0.74rem;color:{PALETTE['text_secondary']};margin:.4rem 0 1.05rem 0;">
-                        of operating cost base
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+
+        with col4:
+            st.markdown(
+                f"""
+                <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                            border-radius:1rem;padding:1rem;text-align:center;
+                            box-shadow:0 4px 12px rgba(15,23,42,0.04);">
+                    <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                                letter-spacing:0.05em;margin-bottom:0.5rem;font-weight:600;">Cost Inflation</div>
+                    <div style="font-size:1.3rem;font-weight:800;color:{PALETTE['chart'][0]};line-height:1;">
+                        +{int(clinical_infl_pct*100)}%
                     </div>
-                    <div style="background:{PALETTE['surface_alt']};padding:.6rem .85rem;border-radius:10px;
-                                font-size:0.7rem;color:{PALETTE['text_secondary']};line-height:1.45;">
-                        Fixed: <b>{format_currency(fixed_y)}</b><br>
-                        Variable @ {patients} pts: <b>{format_currency(total_variable_at_plan)}</b><br>
-                        <span style="color:{PALETTE['primary']};font-weight:600;">
-                            → Additional volume improves EBITDA directly
-                        </span>
+                    <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
+                        clinical cost base
                     </div>
                 </div>
                 """,
@@ -1753,888 +2536,504 @@ with tab_sens:
         st.markdown("<br>", unsafe_allow_html=True)
 
         # -----------------------------------------------------
-        # 2. SINGLE, NON-REPETITIVE INTERPRETATION (NO “YOU”)
+        # RESULTS TABLE - WITH STATUS COLUMN
         # -----------------------------------------------------
-        # choose headline by strength of CVP
-        if contrib_pp > 0 and mos_pct >= 0.6:
-            headline = "Scalable, low-risk CVP"
-            tone = (
-                "Current unit economics generate enough contribution to cover the fixed clinical and administrative "
-                "structure, so incremental volume is largely accretive."
-            )
-        elif contrib_pp > 0 and mos_pct >= 0.35:
-            headline = "Healthy CVP with acceptable buffer"
-            tone = (
-                "The model tolerates moderate fluctuations in patient volume, provided tariff conditions remain aligned "
-                "with current contribution levels."
-            )
-        else:
-            headline = "Tight CVP – volume and tariff must be defended"
-            tone = (
-                "A high fixed-cost base relative to contribution per patient leaves limited room for simultaneous volume "
-                "contraction and tariff pressure."
-            )
-
-        cvp_content = (
-            f"<b>{headline}</b><br>{tone}<br><br>"
-            f"The break-even volume (<b>{be_patients:,.0f} patients</b>) results from dividing the current fixed-cost "
-            f"structure (<b>{format_currency(fixed_y)}</b>) by the effective contribution per patient "
-            f"(<b>{format_currency(contrib_pp)}</b>). At the present operating level "
-            f"(<b>{patients} patients</b>), the model maintains a volume margin of safety of "
-            f"<b>{mos_pat:,.0f} patients</b> ({format_percentage(mos_pct)})."
+        display_rows = [{
+            "Scenario": "Baseline",
+            "EBITDA": format_currency(base_ebitda_stress),
+            "Margin": format_percentage(base_margin_stress),
+            "Δ EBITDA": "—",
+            "Δ%": "—",
+            "Status": "Profitable" if base_ebitda_stress > 0 else "Unprofitable"
+        }]
+
+        for _, r in stress_df.iterrows():
+            status = "Profitable" if r["ebitda"] > 0 else "Unprofitable"
+            display_rows.append({
+                "Scenario": r["name"],
+                "EBITDA": format_currency(r["ebitda"]),
+                "Margin": format_percentage(r["margin"]),
+                "Δ EBITDA": format_currency(r['ebitda'] - base_ebitda_stress),
+                "Δ%": f"{r['impact_pct']:+.1f}%",
+                "Status": status
+            })
+
+        st.dataframe(
+            pd.DataFrame(display_rows),
+            width="stretch",
+            hide_index=True,
+            column_config={
+                "Status": st.column_config.TextColumn(
+                    "Status",
+                    help="Profitability status: whether EBITDA remains positive under this scenario"
+                )
+            }
         )
 
-        st.markdown(
-            create_insight_box("1", "CVP STRATEGIC ANALYSIS", cvp_content),
-            unsafe_allow_html=True
-        )
-
-    else:
-        st.warning("Break-even analysis unavailable with current parameters. Check tariff and variable cost.")
-    
-    # =====================================================
-    # SECCIÓN 2: TORNADO ANALYSIS
-    # =====================================================
-    st.markdown(
-        '<div class="section-header"><h2 class="section-title">Tornado Sensitivity Analysis</h2></div>',
-        unsafe_allow_html=True
-    )
-    
-    st.markdown(
-        f"""
-        <div style="background:{PALETTE['surface_alt']};padding:1rem 1.2rem;border-radius:12px;
-                    margin-bottom:1.5rem;font-size:0.78rem;color:{PALETTE['text_secondary']};
-                    border-left:5px solid {PALETTE['primary']};line-height:1.6;">
-            <b style="color:{PALETTE['text_primary']};font-size:0.8rem;">Univariate Sensitivity Analysis</b><br>
-            Shows EBITDA impact when each variable changes ±20% independently. 
-            Identifies which drivers have the most leverage on profitability.
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
-    
-    # Calcular sensibilidades
-    tornado_data = []
-    base_ebitda_tornado = ebitda_y
-    
-    sensitivity_vars = [
-        ("Volume (patients)", patients, 
-         lambda x: (x * tariff) - (clinical_y + (drugs_y + labs_y) * x / patients + admin_y + other_y)),
-        ("Tariff", tariff, 
-         lambda x: (patients * x) - (clinical_y + drugs_y + labs_y + admin_y + other_y)),
-        ("Clinical costs", clinical_y, 
-         lambda x: rev_y - (x + drugs_y + labs_y + admin_y + other_y)),
-        ("Drug costs", drugs_y, 
-         lambda x: rev_y - (clinical_y + x + labs_y + admin_y + other_y)),
-        ("Lab costs", labs_y, 
-         lambda x: rev_y - (clinical_y + drugs_y + x + admin_y + other_y)),
-        ("Admin costs", admin_y, 
-         lambda x: rev_y - (clinical_y + drugs_y + labs_y + x + other_y)),
-        ("Other OpEx", other_y, 
-         lambda x: rev_y - (clinical_y + drugs_y + labs_y + admin_y + x)),
-    ]
-    
-    for var_name, base_val, calc_func in sensitivity_vars:
-        if base_val == 0:
-            continue
-        
-        low_val = base_val * 0.8
-        ebitda_low = calc_func(low_val)
-        delta_low = ebitda_low - base_ebitda_tornado
-        
-        high_val = base_val * 1.2
-        ebitda_high = calc_func(high_val)
-        delta_high = ebitda_high - base_ebitda_tornado
-        
-        total_swing = abs(delta_high - delta_low)
-        
-        tornado_data.append({
-            "variable": var_name,
-            "delta_low": delta_low,
-            "delta_high": delta_high,
-            "swing": total_swing
-        })
-    
-    # ordenar de mayor a menor impacto (forma de tornado)
-    tornado_data.sort(key=lambda x: x["swing"], reverse=True)
-    
-    # Crear gráfico tornado mejorado (SOLO AZULES)
-    fig_tornado = go.Figure()
-    
-    y_labels = [item["variable"] for item in tornado_data]
-    
-    fig_tornado.add_trace(go.Bar(
-        y=y_labels,
-        x=[item["delta_low"] for item in tornado_data],
-        orientation='h',
-        name='-20%',
-        marker=dict(
-            color=PALETTE["chart"][0],
-            line=dict(width=2, color="white")
-        ),
-        text=[f"{item['delta_low']:+.0f}k" for item in tornado_data],
-        textposition='inside',
-        textfont=dict(color="white", size=11, family="Inter", weight="bold"),
-        hovertemplate="<b>%{y}</b><br>-20% impact: %{x:+,.0f}k<extra></extra>"
-    ))
-    
-    fig_tornado.add_trace(go.Bar(
-        y=y_labels,
-        x=[item["delta_high"] for item in tornado_data],
-        orientation='h',
-        name='+20%',
-        marker=dict(
-            color=PALETTE["chart"][2],
-            line=dict(width=2, color="white")
-        ),
-        text=[f"{item['delta_high']:+.0f}k" for item in tornado_data],
-        textposition='inside',
-        textfont=dict(color="white", size=11, family="Inter", weight="bold"),
-        hovertemplate="<b>%{y}</b><br>+20% impact: %{x:+,.0f}k<extra></extra>"
-    ))
-    
-    fig_tornado.add_vline(
-        x=0,
-        line_dash="solid",
-        line_color=PALETTE["text_primary"],
-        line_width=3,
-        annotation_text="Base Case",
-        annotation_position="top",
-        annotation_font=dict(size=12, color=PALETTE["text_primary"], family="Inter", weight="bold")
-    )
-    
-    apply_chart_layout(fig_tornado, height=480)
-    fig_tornado.update_layout(
-        barmode='overlay',
-        xaxis_title=f"EBITDA Impact ({currency_label})",
-        yaxis_title="",
-        yaxis=dict(
-            autorange="reversed",
-            tickfont=dict(size=11, color=PALETTE["text_primary"])
-        ),
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            bgcolor="rgba(255,255,255,0.9)",
-            bordercolor=PALETTE["border"],
-            borderwidth=1
-        )
-    )
-    
-    st.plotly_chart(fig_tornado, use_container_width=True)
-    
-    most_sensitive = tornado_data[0]
-    least_sensitive = tornado_data[-1]
-    
-    tornado_content = (
-        f"<b>Primary value driver:</b> <b>{most_sensitive['variable']}</b> — "
-        f"total swing of <b>{format_currency(most_sensitive['swing'])}</b> across ±20% variation.<br><br>"
-        f"<b>Downside (-20%):</b> {format_currency(abs(most_sensitive['delta_low']))} EBITDA reduction.<br>"
-        f"<b>Upside (+20%):</b> {format_currency(most_sensitive['delta_high'])} EBITDA increase.<br><br>"
-        f"<b>Least sensitive:</b> {least_sensitive['variable']} ({format_currency(least_sensitive['swing'])})."
-    )
-    
-    st.markdown(
-        create_insight_box("2", "TORNADO ANALYSIS INTERPRETATION", tornado_content),
-        unsafe_allow_html=True
-    )
-
-    # =====================================================
-    # 3. BREAK-EVEN FRONTIER (Volume × Tariff) – FULL CURVE
-    # =====================================================
-    st.markdown(
-        '<div class="section-header"><h2 class="section-title">Break-Even Frontier (Volume × Tariff)</h2></div>',
-        unsafe_allow_html=True
-    )
-
-    # parámetros base (ya existen arriba en la app)
-    fixed_costs_y = fixed_y            # kUSD/year – fixed staff, admin, overhead
-    var_cost_pp_y = var_pp_y           # kUSD/patient/year – drugs+labs+variable clínico
-
-    # rango automático de volumen para dibujar TODA la curva
-    min_vol = 30
-    max_vol = max(int(patients * 1.6), 400)
-    be_x = np.linspace(min_vol, max_vol, 160)
-
-    # curva teórica de equilibrio: tarifa(p) = (CF + CV * p) / p
-    be_y = (fixed_costs_y + var_cost_pp_y * be_x) / be_x
-
-    # métricas derivadas para la interpretación
-    # break-even al TARIF actual (ya lo tenías como be_patients)
-    be_vol_at_current_tariff = be_patients
-    # tarifa mínima al VOLUMEN actual
-    be_tariff_at_current_vol = (fixed_costs_y + var_cost_pp_y * patients) / patients
-    # buffer de volumen
-    vol_buffer = max(patients - be_vol_at_current_tariff, 0)
-    vol_buffer_pct = vol_buffer / patients if patients > 0 else 0
-    # holgura de tarifa
-    tariff_headroom = max(tariff - be_tariff_at_current_vol, 0)
-    tariff_headroom_pct = tariff_headroom / tariff if tariff > 0 else 0
-
-    fig_be = go.Figure()
-
-    # zona rentable (por debajo de la curva)
-    fig_be.add_trace(go.Scatter(
-        x=np.concatenate([be_x, [be_x.max(), be_x.min()]]),
-        y=np.concatenate([be_y, [be_y.min() * 0.9, be_y.min() * 0.9]]),
-        fill='toself',
-        fillcolor='rgba(37, 99, 235, 0.04)',
-        line=dict(width=0),
-        name="Profitable zone",
-        hoverinfo="skip"
-    ))
-
-    # curva de break-even completa
-    fig_be.add_trace(go.Scatter(
-        x=be_x,
-        y=be_y,
-        mode="lines",
-        name="Break-even curve",
-        line=dict(color=PALETTE["chart"][0], width=4),
-        hovertemplate=f"<b>Break-even</b><br>Patients: %{{x:.0f}}<br>Tariff: {currency_symbol}%{{y:.1f}}k<extra></extra>"
-    ))
-
-    # punto operativo actual
-    fig_be.add_trace(go.Scatter(
-        x=[patients],
-        y=[tariff],
-        mode="markers+text",
-        name="Current position",
-        marker=dict(
-            size=12,
-            color="white",
-            line=dict(width=3, color=PALETTE["primary"])
-        ),
-        text=["Current"],
-        textposition="middle right",
-        textfont=dict(size=11, color=PALETTE["text_primary"]),
-        hovertemplate=(
-            f"<b>Current position</b><br>"
-            f"Patients: {patients}<br>"
-            f"Tariff: {format_currency(tariff)}<extra></extra>"
-        )
-    ))
-
-    # layout
-    apply_chart_layout(fig_be, height=420)
-    fig_be.update_layout(
-        xaxis_title="Patients per year",
-        yaxis_title=f"Tariff ({currency_label}/patient/year)",
-        xaxis=dict(
-            range=[min_vol, max_vol],
-            tickmode="auto",
-            nticks=8,
-        ),
-        yaxis=dict(
-            range=[max(0, be_y.min() * 0.85), max(tariff, be_y.max()) * 1.05],
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            bgcolor="rgba(255,255,255,0.9)",
-            bordercolor=PALETTE["border"],
-            borderwidth=1
-        )
-    )
-
-    st.plotly_chart(fig_be, use_container_width=True)
-
-    # interpretación 100% automática
-    be_text = (
-        f"Frontier derived from a fixed-cost base of <b>{format_currency(fixed_costs_y)}</b> and an effective "
-        f"variable cost per patient of <b>{format_currency(var_cost_pp_y)}</b>."
-        f"<br><br>At the current operating point (<b>{patients} patients</b> at <b>{format_currency(tariff)}</b>), "
-        f"the model breaks even at <b>{be_vol_at_current_tariff:.0f} patients</b>, which implies a volume buffer of "
-        f"<b>{vol_buffer:.0f} patients</b> ({format_percentage(vol_buffer_pct)} of present volume). "
-        f"The minimum sustainable tariff at the current volume is <b>{format_currency(be_tariff_at_current_vol)}</b>, "
-        f"so the present tariff includes a pricing headroom of <b>{format_percentage(tariff_headroom_pct)}</b>."
-    )
-    st.markdown(
-        create_insight_box(
-            "3",
-            "BREAK-EVEN FRONTIER – AUTOMATED INTERPRETATION",
-            be_text
-        ),
-        unsafe_allow_html=True
-    )
-
+        # -----------------------------------------------------
+        # VISUAL - BLUE GRADIENT
+        # -----------------------------------------------------
+        def build_stress_figure(stress_sensitivity, currency, currency_label, currency_symbol):
+            scenarios, base_ebitda_stress, _ = stress_sensitivity
+            stress_df = pd.DataFrame(scenarios)
+            fig_stress = go.Figure()
+
+            x_labels = ["Baseline"] + stress_df["name"].tolist()
+            y_values = [base_ebitda_stress] + stress_df["ebitda"].tolist()
+
+            # Blue gradient by severity
+            bar_colors = [PALETTE["chart"][3]]
+            for e in stress_df["ebitda"]:
+                if base_ebitda_stress > 0:
+                    retention = e / base_ebitda_stress
+                else:
+                    retention = 0
+
+                if retention >= 0.9:
+                    bar_colors.append("#60A5FA")
+                elif retention >= 0.7:
+                    bar_colors.append("#3B82F6")
+                elif retention >= 0.5:
+                    bar_colors.append("#2563EB")
+                elif retention >= 0 :
+                    bar_colors.append("#1E40AF")
+                else:
+                    bar_colors.append("#0F3F72")
+
+            fig_stress.add_bar(
+                x=x_labels,
+                y=y_values,
+                marker=dict(color=bar_colors, line=dict(width=2, color="white")),
+                text=[format_currency(v) for v in y_values],
+                textposition="outside",
+                textfont=dict(size=11, family="Inter", weight="bold"),
+                hovertemplate="<b>%{x}</b><br>EBITDA: %{y:,.0f}k<extra></extra>",
+                showlegend=False
+            )
 
-    # =====================================================
-    # 4. 2D SENSITIVITY MATRIX (same BE curve on top)
-    # =====================================================
-    st.markdown(
-        '<div class="section-header"><h2 class="section-title">2D Sensitivity: Patients × Tariff → EBITDA</h2></div>',
-        unsafe_allow_html=True
-    )
+            fig_stress.add_hline(
+                y=0, line_dash="solid", line_color=PALETTE["chart"][0], line_width=2,
+                annotation_text="Break-Even", annotation_position="right"
+            )
 
-    # rangos centrados en el punto actual, coherentes con la curva anterior
-    pts_min = max(30, int(patients * 0.55))
-    pts_max = int(patients * 1.45)
-    pts_step = max(1, (pts_max - pts_min) // 14)
-    pts_range = np.arange(pts_min, pts_max + 1, pts_step)
-    # asegurar que el volumen actual esté en el eje
-    if patients not in pts_range:
-        pts_range = np.sort(np.append(pts_range, patients))
-
-    tariff_min = max(10, round(tariff * 0.65, 1))
-    tariff_max = round(tariff * 1.35, 1)
-    tariff_step = max(0.5, (tariff_max - tariff_min) / 14)
-    tariff_range = np.round(np.arange(tariff_min, tariff_max + 0.001, tariff_step), 1)
-
-    # grid EBITDA
-    ebitda_grid = np.zeros((len(tariff_range), len(pts_range)))
-    for i, t in enumerate(tariff_range):
-        for j, p in enumerate(pts_range):
-            rev_tmp   = p * t
-            drugs_tmp = (drugs_base * 12 * (1 + drugs_cont)) * p
-            labs_tmp  = (labs_base  * 12 * (1 + labs_cont))  * p
-            ebitda_tmp = rev_tmp - clinical_y - drugs_tmp - labs_tmp - admin_y - other_y
-            ebitda_grid[i, j] = ebitda_tmp
-
-    # % de celdas rentables para la interpretación
-    profitable_cells = np.sum(ebitda_grid >= 0)
-    total_cells = ebitda_grid.size
-    profitable_share = profitable_cells / total_cells if total_cells > 0 else 0
-
-    fig_2d = go.Figure(
-        data=go.Heatmap(
-            z=ebitda_grid,
-            x=pts_range,
-            y=tariff_range,
-            colorscale=[
-                [0.00, "#E2E8F0"],
-                [0.48, "#CBD5F5"],
-                [0.50, "#FFFFFF"],           # break-even
-                [0.80, PALETTE["chart"][1]],
-                [1.00, PALETTE["chart"][2]],
-            ],
-            zmid=0,
-            showscale=True,
-            colorbar=dict(
-                title=f"EBITDA ({currency_label})",
-                len=0.65,
-                thickness=14
-            ),
-            hovertemplate=f"<b>Scenario</b><br>Patients: %{{x}}<br>Tariff: {currency_symbol}%{{y}}k<br>EBITDA: %{{z:,.0f}}k<extra></extra>"
-        )
-    )
+            apply_chart_layout(fig_stress, height=440)
+            fig_stress.update_yaxes(title=f"EBITDA (Thousands {currency})")
+            fig_stress.update_xaxes(tickangle=-15)
+            return fig_stress
 
-    # misma curva, pero acotada al rango mostrado
-    be_x_local = np.linspace(pts_range.min(), pts_range.max(), 140)
-    be_y_local = (fixed_costs_y + var_cost_pp_y * be_x_local) / be_x_local
-    mask = (be_y_local >= tariff_min) & (be_y_local <= tariff_max)
-    be_x_local = be_x_local[mask]
-    be_y_local = be_y_local[mask]
-
-    fig_2d.add_trace(go.Scatter(
-        x=be_x_local,
-        y=be_y_local,
-        mode="lines",
-        name="Break-even line",
-        line=dict(color=PALETTE["primary"], width=3),
-        hovertemplate=f"<b>Break-even</b><br>Patients: %{{x:.0f}}<br>Tariff: {currency_symbol}%{{y:.1f}}k<extra></extra>"
-    ))
-
-    # punto actual
-    fig_2d.add_trace(go.Scatter(
-        x=[patients],
-        y=[tariff],
-        mode="markers+text",
-        marker=dict(
-            size=12,
-            color="white",
-            line=dict(width=3, color=PALETTE["primary"])
-        ),
-        text=["Current"],
-        textposition="middle right",
-        textfont=dict(size=11, color=PALETTE["text_primary"]),
-        name="Current position",
-        hovertemplate=(
-            f"<b>Current</b><br>"
-            f"Patients: {patients}<br>"
-            f"Tariff: {format_currency(tariff)}<br>"
-            f"EBITDA: {format_currency(ebitda_y)}<extra></extra>"
-        )
-    ))
-
-    apply_chart_layout(fig_2d, height=430)
-    fig_2d.update_layout(
-        xaxis_title="Patients per year",
-        yaxis_title=f"Tariff ({currency_label}/patient/year)",
-        xaxis=dict(
-            tickmode="auto",
-            nticks=8,
-        ),
-        yaxis=dict(
-            tickmode="auto",
-            nticks=7,
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            bgcolor="rgba(255,255,255,0.9)",
-            bordercolor=PALETTE["border"],
-            borderwidth=1
+        fig_stress = node(
+            calc_graph, "fig_stress", build_stress_figure, deps=("stress_sensitivity",), cutoff=False, shared=figure_cache,
+            inputs=dict(currency=currency, currency_label=currency_label, currency_symbol=currency_symbol),
         )
-    )
 
-    st.plotly_chart(fig_2d, use_container_width=True)
+        st.plotly_chart(fig_stress, width="stretch")
 
-    # interpretación 100% automática de la matriz
-    matrix_text = (
-        f"Matrix built for volumes between <b>{pts_range.min()}</b> and <b>{pts_range.max()}</b> patients/year "
-        f"and tariffs between <b>{tariff_min:.1f}k</b> and <b>{tariff_max:.1f}k</b>. "
-        f"{format_percentage(profitable_share)} of simulated combinations remain at EBITDA ≥ 0 with the current fixed-cost base. "
-        f"The operating point ({patients} pts, {format_currency(tariff)}) stays on the profitable side of the same break-even line used in the frontier."
-    )
-    st.markdown(
-        create_insight_box(
-            "4",
-            "2D SENSITIVITY – AUTOMATED INTERPRETATION",
-            matrix_text
-        ),
-        unsafe_allow_html=True
-    )
-    
-    # =====================================================
-    # SECTION 5: DOWNSIDE STRESS TESTING
-    # =====================================================
-    st.markdown(
-        '<div class="section-header"><h2 class="section-title">Downside Stress Testing</h2></div>',
-        unsafe_allow_html=True
-    )
-
-    st.markdown(
-        f"""
-        <div style="background:{PALETTE['surface_alt']};padding:0.8rem 1rem;border-radius:10px;
-                    margin-bottom:1.2rem;font-size:0.75rem;color:{PALETTE['text_secondary']};
-                    border-left:4px solid {PALETTE['primary']};">
-            <b>Stress methodology:</b> Multi-factor stress framework evaluating EBITDA resilience under isolated and 
-            combined adverse scenarios. Stress parameters calibrated to historical volatility and market conditions.
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
-
-    # -----------------------------------------------------
-    # GENERATE SCENARIOS
-    # -----------------------------------------------------
-    scenarios, base_ebitda_stress, base_margin_stress = generate_stress_scenarios(
-        patients, tariff, mix_low_pct, low_tariff,
-        clinical_y, drugs_y, labs_y, admin_y, other_y, stress_costs
-    )
-
-    stress_df = pd.DataFrame(scenarios)
+        # -----------------------------------------------------
+        # AUTOMATED ANALYSIS
+        # -----------------------------------------------------
 
-    # Extract parameters
-    base_volume = patients
-    base_tariff = tariff
-    volume_drop_pct = 0.15
-    stressed_volume = int(round(base_volume * (1 - volume_drop_pct), 0))
-    payer_shift_pct = float(mix_low_pct) if mix_low_pct is not None else 0.0
-    low_tariff_val = float(low_tariff) if low_tariff is not None else base_tariff * 0.7
+        def _find_scenario(df, keyword: str):
+            if df.empty or "name" not in df.columns:
+                return None
+            sub = df[df["name"].str.lower().str.contains(keyword.lower(), na=False)]
+            return sub.iloc[0].to_dict() if not sub.empty else None
+
+        # Find scenarios
+        sc_vol = _find_scenario(stress_df, "volume")
+        sc_mix = _find_scenario(stress_df, "mix")
+        sc_cost = _find_scenario(stress_df, "cost")
+        sc_comb = _find_scenario(stress_df, "combined")
+        if sc_comb is None:
+            sc_comb = _find_scenario(stress_df, "worst")
+
+        # Calculate metrics
+        min_ebitda = stress_df["ebitda"].min() if not stress_df.empty else base_ebitda_stress
+        worst_ebitda = sc_comb["ebitda"] if sc_comb else min_ebitda
+        max_drawdown = base_ebitda_stress - min_ebitda
+        drawdown_pct = safe_divide(max_drawdown, base_ebitda_stress)
+
+        # Resilience score (0-100)
+        # 100 = no impact, 0 = complete EBITDA loss
+        if base_ebitda_stress > 0:
+            resilience_score = max(0, min(100, safe_divide(worst_ebitda, base_ebitda_stress) * 100))
+        else:
+            resilience_score = 0
+
+        # Risk factors
+        impacts = []
+        if sc_mix: impacts.append(("Payer Mix", abs(sc_mix["impact_pct"]), sc_mix))
+        if sc_vol: impacts.append(("Volume", abs(sc_vol["impact_pct"]), sc_vol))
+        if sc_cost: impacts.append(("Cost", abs(sc_cost["impact_pct"]), sc_cost))
+        impacts.sort(key=lambda x: x[1], reverse=True)
+
+        # Primary risk
+        if impacts:
+            primary_label, primary_impact, primary_sc = impacts[0]
+        else:
+            primary_label, primary_impact = "N/A", 0
+
+        # Resilience classification
+        if resilience_score >= 75:
+            res_tag = '<span class="insight-tag positive">ROBUST</span>'
+            res_txt = "Business retains >75% of baseline EBITDA under combined stress."
+        elif resilience_score >= 50:
+            res_tag = '<span class="insight-tag">ADEQUATE</span>'
+            res_txt = "Business retains 50-75% of baseline EBITDA under combined stress."
+        elif worst_ebitda >= 0:
+            res_tag = '<span class="insight-tag">LIMITED</span>'
+            res_txt = "Business remains profitable but retains <50% of baseline EBITDA."
+        else:
+            res_tag = '<span class="insight-tag">FRAGILE</span>'
+            res_txt = "Combined stress pushes EBITDA below zero (unprofitable)."
+
+        # Mitigation action
+        if primary_label == "Payer Mix":
+            action = "Implement tiered contract strategy with minimum reimbursement floors and quarterly payer mix rebalancing."
+        elif primary_label == "Volume":
+            action = "Establish systematic referral network development and patient retention programs targeting high-risk cohorts."
+        elif primary_label == "Cost":
+            action = "Negotiate multi-year supply contracts and improve clinical productivity through process optimization."
+        else:
+            action = "Deploy integrated risk management framework with real-time monitoring and quarterly stress testing."
 
-    if isinstance(stress_costs, dict) and "clinical" in stress_costs:
-        clinical_infl_pct = float(stress_costs["clinical"])
-    else:
-        clinical_infl_pct = 0.10
+        # -----------------------------------------------------
+        # INSIGHT BOX - CLEAN, VISUAL, NO COMPLEX HTML
+        # -----------------------------------------------------
 
-    # -----------------------------------------------------
-    # STRESS PARAMETERS - COMPACT
-    # -----------------------------------------------------
-    col1, col2, col3, col4 = st.columns(4)
+        # Calculate summary stats
+        profitable_scenarios = sum(1 for _, r in stress_df.iterrows() if r["ebitda"] > 0)
+        total_scenarios = len(stress_df)
+        survival_rate = safe_divide(profitable_scenarios, total_scenarios)
 
-    with col1:
+        # 3 KPI CARDS usando columnas de Streamlit
         st.markdown(
-            f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:1rem;padding:1rem;text-align:center;
-                        box-shadow:0 4px 12px rgba(15,23,42,0.04);">
-                <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                            letter-spacing:0.05em;margin-bottom:0.5rem;font-weight:600;">Baseline</div>
-                <div style="font-size:1.3rem;font-weight:800;color:{PALETTE['primary']};line-height:1;">
-                    {base_volume}
-                </div>
-                <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
-                    patients @ {format_currency(base_tariff)}
-                </div>
-            </div>
-            """,
+            f'<div style="font-size:0.85rem;font-weight:600;color:{PALETTE["text_primary"]};margin:1rem 0 0.8rem 0;">Key Metrics</div>',
             unsafe_allow_html=True
         )
 
-    with col2:
-        st.markdown(
-            f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:1rem;padding:1rem;text-align:center;
-                        box-shadow:0 4px 12px rgba(15,23,42,0.04);">
-                <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                            letter-spacing:0.05em;margin-bottom:0.5rem;font-weight:600;">Volume Shock</div>
-                <div style="font-size:1.3rem;font-weight:800;color:{PALETTE['chart'][0]};line-height:1;">
-                    -{int(volume_drop_pct*100)}%
-                </div>
-                <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
-                    → {stressed_volume} patients
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            st.markdown(
+                f"""
+                <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                            border-radius:0.8rem;padding:1rem;text-align:center;">
+                    <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                                letter-spacing:0.05em;margin-bottom:0.4rem;">Resilience Score</div>
+                    <div style="font-size:2rem;font-weight:800;color:{PALETTE['primary']};line-height:1;">
+                        {resilience_score:.0f}<span style="font-size:1.2rem;color:{PALETTE['text_secondary']};">/100</span>
+                    </div>
+                    <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
+                        Retains {resilience_score:.0f}% of base EBITDA
+                    </div>
                 </div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+                """,
+                unsafe_allow_html=True
+            )
 
-    with col3:
-        st.markdown(
-            f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:1rem;padding:1rem;text-align:center;
-                        box-shadow:0 4px 12px rgba(15,23,42,0.04);">
-                <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                            letter-spacing:0.05em;margin-bottom:0.5rem;font-weight:600;">Payer Shift</div>
-                <div style="font-size:1.3rem;font-weight:800;color:{PALETTE['chart'][0]};line-height:1;">
-                    {int(payer_shift_pct*100)}%
+        with col2:
+            st.markdown(
+                f"""
+                <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                            border-radius:0.8rem;padding:1rem;text-align:center;">
+                    <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                                letter-spacing:0.05em;margin-bottom:0.4rem;">Max Drawdown</div>
+                    <div style="font-size:2rem;font-weight:800;color:{PALETTE['chart'][0]};line-height:1;">
+                        {format_percentage(drawdown_pct)}
+                    </div>
+                    <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
+                        {format_currency(max_drawdown)} worst-case loss
+                    </div>
                 </div>
-                <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
-                    to {format_currency(low_tariff_val)} tier
+                """,
+                unsafe_allow_html=True
+            )
+
+        with col3:
+            st.markdown(
+                f"""
+                <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                            border-radius:0.8rem;padding:1rem;text-align:center;">
+                    <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                                letter-spacing:0.05em;margin-bottom:0.4rem;">Scenario Survival</div>
+                    <div style="font-size:2rem;font-weight:800;color:{PALETTE['primary']};line-height:1;">
+                        {profitable_scenarios}/{total_scenarios}
+                    </div>
+                    <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
+                        {format_percentage(survival_rate)} remain profitable
+                    </div>
                 </div>
+                """,
+                unsafe_allow_html=True
+            )
+
+        st.markdown("<br>", unsafe_allow_html=True)
+
+        # ASSESSMENT BOX
+        assessment_box = f"""
+        <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                    border-radius:1rem;padding:1.2rem;margin-bottom:1rem;">
+            <div style="display:flex;align-items:center;gap:0.8rem;margin-bottom:0.8rem;">
+                <div style="font-size:0.7rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                            letter-spacing:0.05em;font-weight:700;">Assessment</div>
+                {res_tag}
+            </div>
+            <div style="font-size:0.8rem;color:{PALETTE['text_primary']};line-height:1.6;">
+                {res_txt}
             </div>
-            """,
-            unsafe_allow_html=True
-        )
+        </div>
+        """
+        st.markdown(assessment_box, unsafe_allow_html=True)
 
-    with col4:
-        st.markdown(
-            f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:1rem;padding:1rem;text-align:center;
-                        box-shadow:0 4px 12px rgba(15,23,42,0.04);">
-                <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                            letter-spacing:0.05em;margin-bottom:0.5rem;font-weight:600;">Cost Inflation</div>
-                <div style="font-size:1.3rem;font-weight:800;color:{PALETTE['chart'][0]};line-height:1;">
-                    +{int(clinical_infl_pct*100)}%
+        # PRIMARY RISK BOX
+        risk_box = f"""
+        <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                    border-radius:1rem;padding:1.2rem;margin-bottom:1rem;">
+            <div style="font-size:0.7rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                        letter-spacing:0.05em;font-weight:700;margin-bottom:0.8rem;">Primary Risk Factor</div>
+            <div style="display:flex;align-items:center;justify-content:space-between;margin-bottom:0.5rem;">
+                <div style="font-size:1.1rem;font-weight:700;color:{PALETTE['text_primary']};">
+                    {primary_label}
                 </div>
-                <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
-                    clinical cost base
+                <div style="font-size:1.1rem;font-weight:700;color:{PALETTE['chart'][0]};">
+                    {primary_impact:.1f}% impact
                 </div>
             </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-    st.markdown("<br>", unsafe_allow_html=True)
-
-    # -----------------------------------------------------
-    # RESULTS TABLE - WITH STATUS COLUMN
-    # -----------------------------------------------------
-    display_rows = [{
-        "Scenario": "Baseline",
-        "EBITDA": format_currency(base_ebitda_stress),
-        "Margin": format_percentage(base_margin_stress),
-        "Δ EBITDA": "—",
-        "Δ%": "—",
-        "Status": "Profitable" if base_ebitda_stress > 0 else "Unprofitable"
-    }]
-
-    for _, r in stress_df.iterrows():
-        status = "Profitable" if r["ebitda"] > 0 else "Unprofitable"
-        display_rows.append({
-            "Scenario": r["name"],
-            "EBITDA": format_currency(r["ebitda"]),
-            "Margin": format_percentage(r["margin"]),
-            "Δ EBITDA": format_currency(r['ebitda'] - base_ebitda_stress),
-            "Δ%": f"{r['impact_pct']:+.1f}%",
-            "Status": status
-        })
+            <div style="font-size:0.75rem;color:{PALETTE['text_secondary']};line-height:1.5;">
+                {action}
+            </div>
+        </div>
+        """
+        st.markdown(risk_box, unsafe_allow_html=True)
 
-    st.dataframe(
-        pd.DataFrame(display_rows),
-        use_container_width=True,
-        hide_index=True,
-        column_config={
-            "Status": st.column_config.TextColumn(
-                "Status",
-                help="Profitability status: whether EBITDA remains positive under this scenario"
+        # RISK RANKING
+        if len(impacts) > 1:
+            st.markdown(
+                f"""
+                <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                            border-radius:1rem;padding:1.2rem;">
+                    <div style="font-size:0.7rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
+                                letter-spacing:0.05em;font-weight:700;margin-bottom:0.8rem;">Risk Ranking</div>
+                </div>
+                """,
+                unsafe_allow_html=True
             )
-        }
-    )
-
-    # -----------------------------------------------------
-    # VISUAL - BLUE GRADIENT
-    # -----------------------------------------------------
-    fig_stress = go.Figure()
 
-    x_labels = ["Baseline"] + stress_df["name"].tolist()
-    y_values = [base_ebitda_stress] + stress_df["ebitda"].tolist()
+            for i, (label, impact, sc) in enumerate(impacts, 1):
+                status_color = PALETTE["success"] if sc["ebitda"] > 0 else PALETTE["danger"]
+                status_icon = "+" if sc["ebitda"] > 0 else "-"
+                bar_width = (impact / impacts[0][1]) * 100
 
-    # Blue gradient by severity
-    bar_colors = [PALETTE["chart"][3]]
-    for e in stress_df["ebitda"]:
-        if base_ebitda_stress > 0:
-            retention = e / base_ebitda_stress
-        else:
-            retention = 0
-        
-        if retention >= 0.9:
-            bar_colors.append("#60A5FA")
-        elif retention >= 0.7:
-            bar_colors.append("#3B82F6")
-        elif retention >= 0.5:
-            bar_colors.append("#2563EB")
-        elif retention >= 0 :
-            bar_colors.append("#1E40AF")
-        else:
-            bar_colors.append("#0F3F72")
-
-    fig_stress.add_bar(
-        x=x_labels,
-        y=y_values,
-        marker=dict(color=bar_colors, line=dict(width=2, color="white")),
-        text=[format_currency(v) for v in y_values],
-        textposition="outside",
-        textfont=dict(size=11, family="Inter", weight="bold"),
-        hovertemplate="<b>%{x}</b><br>EBITDA: %{y:,.0f}k<extra></extra>",
-        showlegend=False
-    )
-
-    fig_stress.add_hline(
-        y=0, line_dash="solid", line_color=PALETTE["chart"][0], line_width=2,
-        annotation_text="Break-Even", annotation_position="right"
-    )
-
-    apply_chart_layout(fig_stress, height=440)
-    fig_stress.update_yaxes(title=f"EBITDA (Thousands {currency})")
-    fig_stress.update_xaxes(tickangle=-15)
-
-    st.plotly_chart(fig_stress, use_container_width=True)
-
-    # -----------------------------------------------------
-    # AUTOMATED ANALYSIS
-    # -----------------------------------------------------
-
-    def _find_scenario(df, keyword: str):
-        if df.empty or "name" not in df.columns:
-            return None
-        sub = df[df["name"].str.lower().str.contains(keyword.lower(), na=False)]
-        return sub.iloc[0].to_dict() if not sub.empty else None
-
-    # Find scenarios
-    sc_vol = _find_scenario(stress_df, "volume")
-    sc_mix = _find_scenario(stress_df, "mix")
-    sc_cost = _find_scenario(stress_df, "cost")
-    sc_comb = _find_scenario(stress_df, "combined")
-    if sc_comb is None:
-        sc_comb = _find_scenario(stress_df, "worst")
-
-    # Calculate metrics
-    min_ebitda = stress_df["ebitda"].min() if not stress_df.empty else base_ebitda_stress
-    worst_ebitda = sc_comb["ebitda"] if sc_comb else min_ebitda
-    max_drawdown = base_ebitda_stress - min_ebitda
-    drawdown_pct = safe_divide(max_drawdown, base_ebitda_stress)
-
-    # Resilience score (0-100)
-    # 100 = no impact, 0 = complete EBITDA loss
-    if base_ebitda_stress > 0:
-        resilience_score = max(0, min(100, safe_divide(worst_ebitda, base_ebitda_stress) * 100))
-    else:
-        resilience_score = 0
-
-    # Risk factors
-    impacts = []
-    if sc_mix: impacts.append(("Payer Mix", abs(sc_mix["impact_pct"]), sc_mix))
-    if sc_vol: impacts.append(("Volume", abs(sc_vol["impact_pct"]), sc_vol))
-    if sc_cost: impacts.append(("Cost", abs(sc_cost["impact_pct"]), sc_cost))
-    impacts.sort(key=lambda x: x[1], reverse=True)
-
-    # Primary risk
-    if impacts:
-        primary_label, primary_impact, primary_sc = impacts[0]
-    else:
-        primary_label, primary_impact = "N/A", 0
-
-    # Resilience classification
-    if resilience_score >= 75:
-        res_tag = '<span class="insight-tag positive">ROBUST</span>'
-        res_txt = "Business retains >75% of baseline EBITDA under combined stress."
-    elif resilience_score >= 50:
-        res_tag = '<span class="insight-tag">ADEQUATE</span>'
-        res_txt = "Business retains 50-75% of baseline EBITDA under combined stress."
-    elif worst_ebitda >= 0:
-        res_tag = '<span class="insight-tag">LIMITED</span>'
-        res_txt = "Business remains profitable but retains <50% of baseline EBITDA."
-    else:
-        res_tag = '<span class="insight-tag">FRAGILE</span>'
-        res_txt = "Combined stress pushes EBITDA below zero (unprofitable)."
-
-    # Mitigation action
-    if primary_label == "Payer Mix":
-        action = "Implement tiered contract strategy with minimum reimbursement floors and quarterly payer mix rebalancing."
-    elif primary_label == "Volume":
-        action = "Establish systematic referral network development and patient retention programs targeting high-risk cohorts."
-    elif primary_label == "Cost":
-        action = "Negotiate multi-year supply contracts and improve clinical productivity through process optimization."
-    else:
-        action = "Deploy integrated risk management framework with real-time monitoring and quarterly stress testing."
-
-    # -----------------------------------------------------
-    # INSIGHT BOX - CLEAN, VISUAL, NO COMPLEX HTML
-    # -----------------------------------------------------
-
-    # Calculate summary stats
-    profitable_scenarios = sum(1 for _, r in stress_df.iterrows() if r["ebitda"] > 0)
-    total_scenarios = len(stress_df)
-    survival_rate = safe_divide(profitable_scenarios, total_scenarios)
+                rank_html = f"""
+                <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
+                            border-radius:0.8rem;padding:0.8rem 1rem;margin-bottom:0.5rem;">
+                    <div style="display:flex;align-items:center;gap:0.8rem;">
+                        <div style="font-size:0.75rem;font-weight:700;color:{PALETTE['text_primary']};
+                                    min-width:80px;">{label}</div>
+                        <div style="flex:1;background:{PALETTE['surface_alt']};border-radius:999px;height:8px;
+                                    position:relative;overflow:hidden;">
+                            <div style="position:absolute;left:0;top:0;bottom:0;width:{bar_width}%;
+                                        background:{PALETTE['chart'][0]};border-radius:999px;"></div>
+                        </div>
+                        <div style="font-size:0.75rem;font-weight:600;color:{PALETTE['chart'][0]};
+                                    min-width:60px;text-align:right;">{impact:.1f}%</div>
+                        <div style="font-size:0.9rem;color:{status_color};min-width:20px;">{status_icon}</div>
+                    </div>
+                </div>
+                """
+                st.markdown(rank_html, unsafe_allow_html=True)
 
-    # 3 KPI CARDS usando columnas de Streamlit
-    st.markdown(
-        f'<div style="font-size:0.85rem;font-weight:600;color:{PALETTE["text_primary"]};margin:1rem 0 0.8rem 0;">Key Metrics</div>',
-        unsafe_allow_html=True
-    )
+    stress_fragment()
 
-    col1, col2, col3 = st.columns(3)
 
-    with col1:
+    @analytics_fragment
+    def goal_seek_fragment():
+        """Goal seek with its own target controls"""
+        # =====================================================
+        # SECTION 6: GOAL SEEK (any input → target on any output)
+        # =====================================================
         st.markdown(
-            f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:0.8rem;padding:1rem;text-align:center;">
-                <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                            letter-spacing:0.05em;margin-bottom:0.4rem;">Resilience Score</div>
-                <div style="font-size:2rem;font-weight:800;color:{PALETTE['primary']};line-height:1;">
-                    {resilience_score:.0f}<span style="font-size:1.2rem;color:{PALETTE['text_secondary']};">/100</span>
-                </div>
-                <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
-                    Retains {resilience_score:.0f}% of base EBITDA
-                </div>
-            </div>
-            """,
+            '<div class="section-header"><h2 class="section-title">Goal Seek</h2></div>',
             unsafe_allow_html=True
         )
 
-    with col2:
-        st.markdown(
-            f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:0.8rem;padding:1rem;text-align:center;">
-                <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                            letter-spacing:0.05em;margin-bottom:0.4rem;">Max Drawdown</div>
-                <div style="font-size:2rem;font-weight:800;color:{PALETTE['chart'][0]};line-height:1;">
-                    {format_percentage(drawdown_pct)}
-                </div>
-                <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
-                    {format_currency(max_drawdown)} worst-case loss
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        gs_c1, gs_c2, gs_c3 = st.columns(3)
+        with gs_c1:
+            gs_field = st.selectbox(
+                "Solve for",
+                INPUT_FIELDS,
+                index=INPUT_FIELDS.index("tariff"),
+                format_func=lambda k: INPUT_LABELS[k],
+                key="gs_field",
+            )
+        with gs_c2:
+            gs_out = st.selectbox(
+                "Output",
+                list(OUTPUT_METRICS),
+                index=list(OUTPUT_METRICS).index("npv"),
+                format_func=lambda k: OUTPUT_METRICS[k]["label"],
+                key="gs_out",
+            )
+        gs_out_pct = OUTPUT_METRICS[gs_out]["unit"] == "percent"
+        with gs_c3:
+            gs_target = st.number_input(
+                f"Target {OUTPUT_METRICS[gs_out]['label']} ({'%' if gs_out_pct else currency_label})",
+                value=0.0,
+                step=1.0,
+                key=f"gs_target_{gs_out}",
+            )
+        gs_target_model = gs_target / 100.0 if gs_out_pct else gs_target
+
+        gs_sweep_options = ["none"] + [k for k in INPUT_FIELDS if k != gs_field]
+        gs_c4, gs_c5, gs_c6, gs_c7 = st.columns(4)
+        with gs_c4:
+            gs_sweep = st.selectbox(
+                "Across values of",
+                gs_sweep_options,
+                index=gs_sweep_options.index("patients") if "patients" in gs_sweep_options else 0,
+                format_func=lambda k: "— current scenario only —" if k == "none" else INPUT_LABELS[k],
+                key="gs_sweep",
+            )
 
-    with col3:
-        st.markdown(
-            f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:0.8rem;padding:1rem;text-align:center;">
-                <div style="font-size:0.65rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                            letter-spacing:0.05em;margin-bottom:0.4rem;">Scenario Survival</div>
-                <div style="font-size:2rem;font-weight:800;color:{PALETTE['primary']};line-height:1;">
-                    {profitable_scenarios}/{total_scenarios}
-                </div>
-                <div style="font-size:0.7rem;color:{PALETTE['text_secondary']};margin-top:0.3rem;">
-                    {format_percentage(survival_rate)} remain profitable
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True
+        if gs_sweep != "none":
+            # rango por defecto: 0.4× – 2.4× del valor actual (en unidades de pantalla)
+            gs_scale = 100.0 if INPUT_UNITS[gs_sweep] == "percent" else 1.0
+            gs_base = model_inputs[gs_sweep] * gs_scale
+            gs_max = 100.0 if gs_scale != 1.0 else None
+            with gs_c5:
+                gs_from = st.number_input(
+                    "From",
+                    min_value=0.0,
+                    max_value=gs_max,
+                    value=float(gs_base * 0.4),
+                    key=f"gs_from_{gs_sweep}",
+                )
+            with gs_c6:
+                gs_to = st.number_input(
+                    "To",
+                    min_value=0.0,
+                    max_value=gs_max,
+                    value=float(min(gs_base * 2.4, gs_max or np.inf)) if gs_base > 0 else 10.0,
+                    key=f"gs_to_{gs_sweep}",
+                )
+            with gs_c7:
+                gs_points = st.number_input(
+                    "Points",
+                    min_value=2,
+                    max_value=2000,
+                    value=51,
+                    step=10,
+                    key="gs_points",
+                )
+            # el punto actual va en el mismo batch (última fila)
+            gs_values = np.append(np.linspace(gs_from, gs_to, int(gs_points)), gs_base) / gs_scale
+            # el solver trabaja en USD: barrido convertido, punto actual exacto
+            gs_overrides = {gs_sweep: np.append(
+                gs_values[:-1] / unit_rate(INPUT_UNITS[gs_sweep], display_rate), canonical_inputs[gs_sweep]
+            )}
+        else:
+            gs_overrides = {}
+
+        # todas las resoluciones en una sola llamada vectorizada
+        node(
+            calc_graph, "goal_seek_usd",
+            lambda overrides, **solve: goal_seek(**solve, **overrides),
+            inputs=dict(
+                base_inputs=canonical_inputs, solve_field=gs_field, output=gs_out,
+                target=gs_target_model / unit_rate(OUTPUT_METRICS[gs_out]["unit"], display_rate),
+                overrides=gs_overrides, workers=SWEEP_WORKERS,
+            ),
         )
+        gs_res = display_node("goal_seek", goal_seek_in_currency, solve_field=gs_field, output=gs_out)
+        gs_current_solution = gs_res["value"][-1]
+
+        gs_field_scale = 100.0 if INPUT_UNITS[gs_field] == "percent" else 1.0
+        gs_target_label = format_output_value(gs_out, gs_target_model)
+
+        if gs_sweep != "none":
+            def build_goal_seek_figure(goal_seek, gs_field, gs_sweep, gs_values, gs_scale, gs_base, gs_field_scale, current_value, currency_label):
+                fig_gs = go.Figure()
+                fig_gs.add_scatter(
+                    x=gs_values[:-1] * gs_scale,
+                    y=goal_seek["value"][:-1] * gs_field_scale,
+                    mode="lines",
+                    name=f"Required {INPUT_LABELS[gs_field]}",
+                    line=dict(color=PALETTE["chart"][1], width=3),
+                    hovertemplate=(
+                        f"{INPUT_LABELS[gs_sweep]}: %{{x:,.2f}}<br>"
+                        f"Required {INPUT_LABELS[gs_field]}: %{{y:,.2f}}<extra></extra>"
+                    )
+                )
+                fig_gs.add_scatter(
+                    x=[gs_base],
+                    y=[current_value * gs_field_scale],
+                    mode="markers+text",
+                    marker=dict(size=12, color="white", line=dict(width=3, color=PALETTE["primary"])),
+                    text=["Current"],
+                    textposition="middle right",
+                    textfont=dict(size=11, color=PALETTE["text_primary"]),
+                    name="Current position",
+                )
+                apply_chart_layout(fig_gs, height=400)
+                fig_gs.update_layout(
+                    xaxis_title=input_axis_title(gs_sweep),
+                    yaxis_title=f"Required {input_axis_title(gs_field)}",
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="right",
+                        x=1,
+                        bgcolor="rgba(255,255,255,0.9)",
+                        bordercolor=PALETTE["border"],
+                        borderwidth=1
+                    )
+                )
+                return fig_gs
+
+            fig_gs = node(
+                calc_graph, "fig_goal_seek", build_goal_seek_figure, deps=("goal_seek",), cutoff=False, shared=figure_cache,
+                inputs=dict(gs_field=gs_field, gs_sweep=gs_sweep, gs_values=gs_values, gs_scale=gs_scale, gs_base=gs_base,
+                            gs_field_scale=gs_field_scale, current_value=model_inputs[gs_field], currency_label=currency_label),
+            )
 
-    st.markdown("<br>", unsafe_allow_html=True)
+            st.plotly_chart(fig_gs, width="stretch")
 
-    # ASSESSMENT BOX
-    assessment_box = f"""
-    <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                border-radius:1rem;padding:1.2rem;margin-bottom:1rem;">
-        <div style="display:flex;align-items:center;gap:0.8rem;margin-bottom:0.8rem;">
-            <div style="font-size:0.7rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                        letter-spacing:0.05em;font-weight:700;">Assessment</div>
-            {res_tag}
-        </div>
-        <div style="font-size:0.8rem;color:{PALETTE['text_primary']};line-height:1.6;">
-            {res_txt}
-        </div>
-    </div>
-    """
-    st.markdown(assessment_box, unsafe_allow_html=True)
-
-    # PRIMARY RISK BOX
-    risk_box = f"""
-    <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                border-radius:1rem;padding:1.2rem;margin-bottom:1rem;">
-        <div style="font-size:0.7rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                    letter-spacing:0.05em;font-weight:700;margin-bottom:0.8rem;">Primary Risk Factor</div>
-        <div style="display:flex;align-items:center;justify-content:space-between;margin-bottom:0.5rem;">
-            <div style="font-size:1.1rem;font-weight:700;color:{PALETTE['text_primary']};">
-                {primary_label}
-            </div>
-            <div style="font-size:1.1rem;font-weight:700;color:{PALETTE['chart'][0]};">
-                {primary_impact:.1f}% impact
-            </div>
-        </div>
-        <div style="font-size:0.75rem;color:{PALETTE['text_secondary']};line-height:1.5;">
-            {action}
-        </div>
-    </div>
-    """
-    st.markdown(risk_box, unsafe_allow_html=True)
+            gs_reach = int(gs_res["converged"][:-1].sum())
+            gs_text = (
+                f"Solved {INPUT_LABELS[gs_field]} for {OUTPUT_METRICS[gs_out]['label']} = <b>{gs_target_label}</b> "
+                f"across <b>{int(gs_points)}</b> values of {INPUT_LABELS[gs_sweep]} in one batch; the target is reachable "
+                f"in <b>{gs_reach}</b> of them (search range 0 – 10× current, 0 – 100% for rates). "
+            )
+        else:
+            gs_text = (
+                f"Solved {INPUT_LABELS[gs_field]} for {OUTPUT_METRICS[gs_out]['label']} = <b>{gs_target_label}</b> "
+                f"with all other inputs at their current values. "
+            )
+
+        if np.isnan(gs_current_solution):
+            gs_text += "At the current scenario the target cannot be reached by moving this input alone."
+        else:
+            gs_gap = safe_divide(gs_current_solution - model_inputs[gs_field], model_inputs[gs_field], default=np.nan)
+            gs_text += (
+                f"At the current scenario the required {INPUT_LABELS[gs_field]} is "
+                f"<b>{format_input_value(gs_field, gs_current_solution)}</b> vs "
+                f"<b>{format_input_value(gs_field, model_inputs[gs_field])}</b> today"
+                + ("." if np.isnan(gs_gap) else f" ({gs_gap*100:+.1f}%).")
+            )
 
-    # RISK RANKING
-    if len(impacts) > 1:
         st.markdown(
-            f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:1rem;padding:1.2rem;">
-                <div style="font-size:0.7rem;text-transform:uppercase;color:{PALETTE['text_tertiary']};
-                            letter-spacing:0.05em;font-weight:700;margin-bottom:0.8rem;">Risk Ranking</div>
-            </div>
-            """,
+            create_insight_box("6", "GOAL SEEK", gs_text),
             unsafe_allow_html=True
         )
-        
-        for i, (label, impact, sc) in enumerate(impacts, 1):
-            status_color = PALETTE["success"] if sc["ebitda"] > 0 else PALETTE["danger"]
-            status_icon = "+" if sc["ebitda"] > 0 else "-"
-            bar_width = (impact / impacts[0][1]) * 100
-            
-            rank_html = f"""
-            <div style="background:{PALETTE['surface']};border:1px solid {PALETTE['border']};
-                        border-radius:0.8rem;padding:0.8rem 1rem;margin-bottom:0.5rem;">
-                <div style="display:flex;align-items:center;gap:0.8rem;">
-                    <div style="font-size:0.75rem;font-weight:700;color:{PALETTE['text_primary']};
-                                min-width:80px;">{label}</div>
-                    <div style="flex:1;background:{PALETTE['surface_alt']};border-radius:999px;height:8px;
-                                position:relative;overflow:hidden;">
-                        <div style="position:absolute;left:0;top:0;bottom:0;width:{bar_width}%;
-                                    background:{PALETTE['chart'][0]};border-radius:999px;"></div>
-                    </div>
-                    <div style="font-size:0.75rem;font-weight:600;color:{PALETTE['chart'][0]};
-                                min-width:60px;text-align:right;">{impact:.1f}%</div>
-                    <div style="font-size:0.9rem;color:{status_color};min-width:20px;">{status_icon}</div>
-                </div>
-            </div>
-            """
-            st.markdown(rank_html, unsafe_allow_html=True)
-    
+
+    goal_seek_fragment()
+
+
 # =========================================================
-# TAB 3: VISUAL DASHBOARD  (solo gráficos)
+# SECTION 3: VISUAL DASHBOARD  (solo gráficos)
 # =========================================================
-with tab_dash:
+if active_section == "Visual Dashboard":
     st.markdown(
         '<div class="section-header"><h2 class="section-title">Cost Structure Breakdown</h2></div>',
         unsafe_allow_html=True
@@ -2643,45 +3042,64 @@ with tab_dash:
     col1, col2 = st.columns(2)
 
     with col1:
-        cost_labels = ["Clinical", "Drugs", "Labs", "Admin", "Other OpEx"]
-        cost_values = [clinical_y, drugs_y, labs_y, admin_y, other_y]
-        fig_cost = go.Figure(data=[go.Pie(
-            labels=cost_labels,
-            values=cost_values,
-            hole=0.5,
-            marker=dict(colors=PALETTE["chart"][:5], line=dict(color="white", width=3)),
-            textposition='outside',
-            textinfo='label+percent',
-            textfont=dict(size=12, family="Inter", color=PALETTE["text_primary"])
-        )])
-        apply_chart_layout(fig_cost, height=400)
-        fig_cost.update_layout(showlegend=False)
-        st.plotly_chart(fig_cost, use_container_width=True)
+        def build_cost_mix_figure(pnl):
+            clinical_y, drugs_y, labs_y, admin_y, other_y = (
+                float(pnl[k][0]) for k in ("clinical_y", "drugs_y", "labs_y", "admin_y", "other_y")
+            )
+            cost_labels = ["Clinical", "Drugs", "Labs", "Admin", "Other OpEx"]
+            cost_values = [clinical_y, drugs_y, labs_y, admin_y, other_y]
+            fig_cost = go.Figure(data=[go.Pie(
+                labels=cost_labels,
+                values=cost_values,
+                hole=0.5,
+                marker=dict(colors=PALETTE["chart"][:5], line=dict(color="white", width=3)),
+                textposition='outside',
+                textinfo='label+percent',
+                textfont=dict(size=12, family="Inter", color=PALETTE["text_primary"])
+            )])
+            apply_chart_layout(fig_cost, height=400)
+            fig_cost.update_layout(showlegend=False)
+            return fig_cost
+
+        fig_cost = node(calc_graph, "fig_cost_mix", build_cost_mix_figure, deps=("pnl",), cutoff=False, shared=figure_cache)
+
+        st.plotly_chart(fig_cost, width="stretch")
 
     with col2:
-        fig_fixed_var = go.Figure(data=[
-            go.Bar(
-                name="Fixed Costs",
-                x=["Cost Structure"],
-                y=[fixed_y],
-                marker=dict(color=PALETTE["chart"][0], line=dict(width=2, color="white")),
-                text=[f"{format_currency(fixed_y)} ({format_percentage(fixed_ratio)})"],
-                textposition="inside",
-                textfont=dict(size=12, color="white")
-            ),
-            go.Bar(
-                name="Variable Costs",
-                x=["Cost Structure"],
-                y=[drugs_y + labs_y],
-                marker=dict(color=PALETTE["chart"][1], line=dict(width=2, color="white")),
-                text=[f"{format_currency(drugs_y + labs_y)} ({format_percentage(var_ratio)})"],
-                textposition="inside",
-                textfont=dict(size=12, color="white")
-            )
-        ])
-        apply_chart_layout(fig_fixed_var, height=400)
-        fig_fixed_var.update_layout(barmode="stack", yaxis_title=f"Annual Costs ({currency_label})")
-        st.plotly_chart(fig_fixed_var, use_container_width=True)
+        def build_fixed_var_figure(pnl, breakeven, kpis, currency_label, currency_symbol):
+            drugs_y, labs_y = float(pnl["drugs_y"][0]), float(pnl["labs_y"][0])
+            fixed_y = float(breakeven["fixed_y"][0])
+            fixed_ratio, var_ratio = float(kpis["fixed_ratio"][0]), float(kpis["var_ratio"][0])
+            fig_fixed_var = go.Figure(data=[
+                go.Bar(
+                    name="Fixed Costs",
+                    x=["Cost Structure"],
+                    y=[fixed_y],
+                    marker=dict(color=PALETTE["chart"][0], line=dict(width=2, color="white")),
+                    text=[f"{format_currency(fixed_y)} ({format_percentage(fixed_ratio)})"],
+                    textposition="inside",
+                    textfont=dict(size=12, color="white")
+                ),
+                go.Bar(
+                    name="Variable Costs",
+                    x=["Cost Structure"],
+                    y=[drugs_y + labs_y],
+                    marker=dict(color=PALETTE["chart"][1], line=dict(width=2, color="white")),
+                    text=[f"{format_currency(drugs_y + labs_y)} ({format_percentage(var_ratio)})"],
+                    textposition="inside",
+                    textfont=dict(size=12, color="white")
+                )
+            ])
+            apply_chart_layout(fig_fixed_var, height=400)
+            fig_fixed_var.update_layout(barmode="stack", yaxis_title=f"Annual Costs ({currency_label})")
+            return fig_fixed_var
+
+        fig_fixed_var = node(
+            calc_graph, "fig_fixed_var", build_fixed_var_figure, deps=("pnl", "breakeven", "kpis"), cutoff=False, shared=figure_cache,
+            inputs=dict(currency_label=currency_label, currency_symbol=currency_symbol),
+        )
+
+        st.plotly_chart(fig_fixed_var, width="stretch")
 
     st.markdown(create_insight_box("1", "COST STRUCTURE ANALYSIS", interpret_cost_structure(fixed_ratio, var_ratio, clinical_y, admin_y)), unsafe_allow_html=True)
 
@@ -2693,33 +3111,50 @@ with tab_dash:
     col1, col2 = st.columns(2)
 
     with col1:
-        metrics = ["Revenue", "EBITDA", "Net Profit"]
-        values = [rev_y, ebitda_y, net_y]
-        fig_rev = go.Figure()
-        fig_rev.add_bar(
-            x=metrics,
-            y=values,
-            marker=dict(color=PALETTE["chart"][:3], line=dict(width=2, color="white")),
-            text=[format_currency(v) for v in values],
-            textposition='outside'
-        )
-        apply_chart_layout(fig_rev, height=400)
-        fig_rev.update_yaxes(title=f"Thousands {currency}")
-        fig_rev.update_layout(showlegend=False)
-        st.plotly_chart(fig_rev, use_container_width=True)
+        def build_profit_figure(pnl, currency, currency_label, currency_symbol):
+            rev_y, ebitda_y, net_y = (float(pnl[k][0]) for k in ("rev_y", "ebitda_y", "net_y"))
+            metrics = ["Revenue", "EBITDA", "Net Profit"]
+            values = [rev_y, ebitda_y, net_y]
+            fig_rev = go.Figure()
+            fig_rev.add_bar(
+                x=metrics,
+                y=values,
+                marker=dict(color=PALETTE["chart"][:3], line=dict(width=2, color="white")),
+                text=[format_currency(v) for v in values],
+                textposition='outside'
+            )
+            apply_chart_layout(fig_rev, height=400)
+            fig_rev.update_yaxes(title=f"Thousands {currency}")
+            fig_rev.update_layout(showlegend=False)
+            return fig_rev
+
+        fig_rev = node(
+            calc_graph, "fig_profit", build_profit_figure, deps=("pnl",), cutoff=False, shared=figure_cache,
+            inputs=dict(currency=currency, currency_label=currency_label, currency_symbol=currency_symbol),
+        )
+
+        st.plotly_chart(fig_rev, width="stretch")
 
     with col2:
-        fig_margins = go.Figure(data=[go.Bar(
-            x=["Gross", "EBITDA", "Net"],
-            y=[gross_margin * 100, ebitda_margin * 100, net_margin * 100],
-            marker=dict(color=PALETTE["chart"][:3], line=dict(width=2, color="white")),
-            text=[f"{v*100:.1f}%" for v in [gross_margin, ebitda_margin, net_margin]],
-            textposition='outside'
-        )])
-        apply_chart_layout(fig_margins, height=400)
-        fig_margins.update_yaxes(title="Margin %")
-        fig_margins.update_layout(showlegend=False)
-        st.plotly_chart(fig_margins, use_container_width=True)
+        def build_margins_figure(kpis):
+            gross_margin, ebitda_margin, net_margin = (
+                float(kpis[k][0]) for k in ("gross_margin", "ebitda_margin", "net_margin")
+            )
+            fig_margins = go.Figure(data=[go.Bar(
+                x=["Gross", "EBITDA", "Net"],
+                y=[gross_margin * 100, ebitda_margin * 100, net_margin * 100],
+                marker=dict(color=PALETTE["chart"][:3], line=dict(width=2, color="white")),
+                text=[f"{v*100:.1f}%" for v in [gross_margin, ebitda_margin, net_margin]],
+                textposition='outside'
+            )])
+            apply_chart_layout(fig_margins, height=400)
+            fig_margins.update_yaxes(title="Margin %")
+            fig_margins.update_layout(showlegend=False)
+            return fig_margins
+
+        fig_margins = node(calc_graph, "fig_margins", build_margins_figure, deps=("kpis",), cutoff=False, shared=figure_cache)
+
+        st.plotly_chart(fig_margins, width="stretch")
 
     st.markdown(create_insight_box("2", "PROFITABILITY ANALYSIS", 
         f"<b>Revenue generation:</b> {format_currency(rev_y)} from {patients} patients at {format_currency(tariff)} average tariff.<br><br>"
@@ -2731,90 +3166,70 @@ with tab_dash:
         '<div class="section-header"><h2 class="section-title">Unit Economics</h2></div>',
         unsafe_allow_html=True
     )
-    fig_unit = go.Figure()
-    fig_unit.add_bar(
-        name="Variable Costs",
-        x=["Per Patient Economics"],
-        y=[var_pp_y],
-        marker=dict(color=PALETTE["chart"][1], line=dict(width=2, color="white")),
-        text=[format_currency(var_pp_y)],
-        textposition="inside",
-        textfont=dict(color="white", size=12)
-    )
-    fig_unit.add_bar(
-        name="Fixed Costs Allocation",
-        x=["Per Patient Economics"],
-        y=[fixed_y / patients if patients > 0 else 0],
-        marker=dict(color=PALETTE["chart"][0], line=dict(width=2, color="white")),
-        text=[format_currency(fixed_y / patients if patients > 0 else 0)],
-        textposition="inside",
-        textfont=dict(color="white", size=12)
-    )
-    fig_unit.add_bar(
-        name="EBITDA per Patient",
-        x=["Per Patient Economics"],
-        y=[ebitda_per_patient],
-        marker=dict(color=PALETTE["chart"][3], line=dict(width=2, color="white")),
-        text=[format_currency(ebitda_per_patient)],
-        textposition="inside",
-        textfont=dict(color="white", size=12)
-    )
-    fig_unit.add_scatter(
-        name="Tariff (Revenue)",
-        x=["Per Patient Economics"],
-        y=[tariff],
-        mode="markers+text",
-        marker=dict(size=20, color=PALETTE["danger"], symbol="diamond", line=dict(width=3, color="white")),
-        text=[format_currency(tariff)],
-        textposition="top center",
-        textfont=dict(size=14, color=PALETTE["danger"])
+    def build_unit_economics_figure(breakeven, kpis, patients, tariff, currency_label, currency_symbol):
+        var_pp_y, fixed_y = float(breakeven["var_pp_y"][0]), float(breakeven["fixed_y"][0])
+        ebitda_per_patient = float(kpis["ebitda_per_patient"][0])
+        fig_unit = go.Figure()
+        fig_unit.add_bar(
+            name="Variable Costs",
+            x=["Per Patient Economics"],
+            y=[var_pp_y],
+            marker=dict(color=PALETTE["chart"][1], line=dict(width=2, color="white")),
+            text=[format_currency(var_pp_y)],
+            textposition="inside",
+            textfont=dict(color="white", size=12)
+        )
+        fig_unit.add_bar(
+            name="Fixed Costs Allocation",
+            x=["Per Patient Economics"],
+            y=[fixed_y / patients if patients > 0 else 0],
+            marker=dict(color=PALETTE["chart"][0], line=dict(width=2, color="white")),
+            text=[format_currency(fixed_y / patients if patients > 0 else 0)],
+            textposition="inside",
+            textfont=dict(color="white", size=12)
+        )
+        fig_unit.add_bar(
+            name="EBITDA per Patient",
+            x=["Per Patient Economics"],
+            y=[ebitda_per_patient],
+            marker=dict(color=PALETTE["chart"][3], line=dict(width=2, color="white")),
+            text=[format_currency(ebitda_per_patient)],
+            textposition="inside",
+            textfont=dict(color="white", size=12)
+        )
+        fig_unit.add_scatter(
+            name="Tariff (Revenue)",
+            x=["Per Patient Economics"],
+            y=[tariff],
+            mode="markers+text",
+            marker=dict(size=20, color=PALETTE["danger"], symbol="diamond", line=dict(width=3, color="white")),
+            text=[format_currency(tariff)],
+            textposition="top center",
+            textfont=dict(size=14, color=PALETTE["danger"])
+        )
+        apply_chart_layout(fig_unit, height=400)
+        fig_unit.update_layout(barmode="stack", yaxis_title=f"Per Patient ({currency_label})", showlegend=True)
+        return fig_unit
+
+    fig_unit = node(
+        calc_graph, "fig_unit_economics", build_unit_economics_figure, deps=("breakeven", "kpis"), cutoff=False, shared=figure_cache,
+        inputs=dict(patients=patients, tariff=tariff, currency_label=currency_label, currency_symbol=currency_symbol),
     )
-    apply_chart_layout(fig_unit, height=400)
-    fig_unit.update_layout(barmode="stack", yaxis_title=f"Per Patient ({currency_label})", showlegend=True)
-    st.plotly_chart(fig_unit, use_container_width=True)
+
+    st.plotly_chart(fig_unit, width="stretch")
 
     st.markdown(create_insight_box("3", "UNIT ECONOMICS ANALYSIS", interpret_unit_economics(contrib_pp, ebitda_per_patient, tariff)), unsafe_allow_html=True)
 
 
 # =========================================================
-# TAB 4: VALUATION MODEL (DCF + IRR + MIRR + Sensitivity)
+# SECTION 4: VALUATION MODEL (DCF + IRR + MIRR + Sensitivity)
 # =========================================================
-with tab_val:
+if active_section == "Valuation Model":
     st.markdown(
         '<div class="section-header"><h2 class="section-title">Discounted Cash Flow (DCF) Valuation</h2></div>',
         unsafe_allow_html=True
     )
 
-    # -----------------------------------------------------
-    # 0. HELPERS (IRR, MIRR)
-    # -----------------------------------------------------
-    def mirr_from_cf(cash_flows, finance_rate, reinvest_rate):
-        """
-        cash_flows: array-like, cash_flows[0] = CF0
-        finance_rate: rate for negative CFs (cost of capital)
-        reinvest_rate: rate at which positive CFs are reinvested
-        """
-        cf = np.array(cash_flows, dtype=float)
-        n = len(cf) - 1  # años posteriores al 0
-
-        # PV de los negativos (traídos a t0 con finance_rate)
-        pv_neg = 0.0
-        for t, c in enumerate(cf):
-            if c < 0:
-                pv_neg += c / ((1 + finance_rate) ** t)
-
-        # FV de los positivos (llevados a tN con reinvest_rate)
-        fv_pos = 0.0
-        for t, c in enumerate(cf):
-            if c > 0:
-                fv_pos += c * ((1 + reinvest_rate) ** (n - t))
-
-        if pv_neg == 0 or n == 0:
-            return None
-
-        mirr_val = (abs(fv_pos / pv_neg) ** (1 / n)) - 1
-        return mirr_val
-
     # -----------------------------------------------------
     # 1. CASH FLOWS – table + chart
     # -----------------------------------------------------
@@ -2822,41 +3237,136 @@ with tab_val:
 
     with col_cf_table:
         # cf_df ya viene del modelo principal
-        st.dataframe(cf_df, use_container_width=True, hide_index=True)
+        st.dataframe(cf_df, width="stretch", hide_index=True)
 
     with col_cf_chart:
-        years_cf = list(range(len(cf_vec)))
-        fig_cf_val = go.Figure()
-
-        fig_cf_val.add_bar(
-            name="Annual Cash Flow",
-            x=[f"Y{y}" for y in years_cf],
-            y=cf_vec,
-            marker=dict(
-                color=[PALETTE["chart"][0] if v < 0 else PALETTE["chart"][1] for v in cf_vec],
-                line=dict(width=2, color="white")
-            ),
-            text=[format_currency(v) for v in cf_vec],
-            textposition="outside"
+        def build_cash_flow_figure(cash_flows, currency_label, currency_symbol):
+            cf_vec = cash_flows["cf"][0]
+            years_cf = list(range(len(cf_vec)))
+            fig_cf_val = go.Figure()
+
+            fig_cf_val.add_bar(
+                name="Annual Cash Flow",
+                x=[f"Y{y}" for y in years_cf],
+                y=cf_vec,
+                marker=dict(
+                    color=[PALETTE["chart"][0] if v < 0 else PALETTE["chart"][1] for v in cf_vec],
+                    line=dict(width=2, color="white")
+                ),
+                text=[format_currency(v) for v in cf_vec],
+                textposition="outside"
+            )
+
+            fig_cf_val.add_scatter(
+                name="Cumulative CF",
+                x=[f"Y{y}" for y in years_cf],
+                y=np.cumsum(cf_vec),
+                mode="lines+markers",
+                line=dict(color=PALETTE["chart"][3], width=4),
+                marker=dict(size=10, color=PALETTE["chart"][3], line=dict(width=2, color="white")),
+                yaxis="y2"
+            )
+
+            apply_chart_layout(fig_cf_val, height=420)
+            fig_cf_val.update_layout(
+                xaxis=dict(title="Year"),
+                yaxis=dict(title=f"Annual Cash Flow ({currency_label})"),
+                yaxis2=dict(title=f"Cumulative CF ({currency_label})", overlaying="y", side="right", showgrid=False)
+            )
+            return fig_cf_val
+
+        fig_cf_val = node(
+            calc_graph, "fig_cash_flows", build_cash_flow_figure, deps=("cash_flows",), cutoff=False, shared=figure_cache,
+            inputs=dict(currency_label=currency_label, currency_symbol=currency_symbol),
         )
 
-        fig_cf_val.add_scatter(
-            name="Cumulative CF",
-            x=[f"Y{y}" for y in years_cf],
-            y=np.cumsum(cf_vec),
-            mode="lines+markers",
-            line=dict(color=PALETTE["chart"][3], width=4),
-            marker=dict(size=10, color=PALETTE["chart"][3], line=dict(width=2, color="white")),
-            yaxis="y2"
+        st.plotly_chart(fig_cf_val, width="stretch")
+
+    # -----------------------------------------------------
+    # 1b. MONTHLY PROJECTION – cash trough + annual roll-up
+    # -----------------------------------------------------
+    st.markdown(
+        f'<div class="section-header"><h2 class="section-title">Monthly Projection ({proj_months} months)</h2></div>',
+        unsafe_allow_html=True
+    )
+
+    def build_monthly_figure(cash_flows, currency_label, currency_symbol):
+        month_axis = np.arange(1, cash_flows["cash"].shape[1] + 1)
+        trough_month = int(cash_flows["trough_month"][0])
+        fig_month = go.Figure()
+        fig_month.add_bar(
+            name="Monthly FCF",
+            x=month_axis,
+            y=cash_flows["fcf"][0],
+            marker=dict(color=[PALETTE["chart"][0] if v < 0 else PALETTE["chart"][1] for v in cash_flows["fcf"][0]]),
+            hovertemplate=f"Month %{{x}}<br>FCF: {currency_symbol}%{{y:,.1f}}k<extra></extra>"
+        )
+        fig_month.add_scatter(
+            name="Cash position",
+            x=month_axis,
+            y=cash_flows["cash"][0],
+            mode="lines",
+            line=dict(color=PALETTE["chart"][3], width=3),
+            yaxis="y2",
+            hovertemplate=f"Month %{{x}}<br>Cash: {currency_symbol}%{{y:,.0f}}k<extra></extra>"
+        )
+        fig_month.add_scatter(
+            name="Cash trough",
+            x=[max(trough_month, 1)],
+            y=[cash_flows["cash_trough"][0]],
+            mode="markers",
+            marker=dict(size=12, color="white", line=dict(width=3, color=PALETTE["primary"])),
+            yaxis="y2",
+            hovertemplate=f"<b>Cash trough</b><br>Month %{{x}}<br>{currency_symbol}%{{y:,.0f}}k<extra></extra>"
         )
+        apply_chart_layout(fig_month, height=400)
+        fig_month.update_layout(
+            xaxis=dict(title="Month"),
+            yaxis=dict(title=f"Monthly FCF ({currency_label})"),
+            yaxis2=dict(title=f"Cash position ({currency_label})", overlaying="y", side="right", showgrid=False)
+        )
+        return fig_month
+
+    fig_month = node(
+        calc_graph, "fig_monthly", build_monthly_figure, deps=("cash_flows",), cutoff=False, shared=figure_cache,
+        inputs=dict(currency_label=currency_label, currency_symbol=currency_symbol),
+    )
 
-        apply_chart_layout(fig_cf_val, height=420)
-        fig_cf_val.update_layout(
-            xaxis=dict(title="Year"),
-            yaxis=dict(title=f"Annual Cash Flow ({currency_label})"),
-            yaxis2=dict(title=f"Cumulative CF ({currency_label})", overlaying="y", side="right", showgrid=False)
+    st.plotly_chart(fig_month, width="stretch")
+
+    # P&L anual a partir de la proyección mensual
+    annual_pnl_df = pd.DataFrame(
+        {
+            f"Year {t + 1}": [projection[f"{k}_y"][0, t] for k in ("rev", "clinical", "drugs", "labs", "admin", "other", "ebitda", "taxes", "net", "fcf")]
+            for t in range(proj_months // 12)
+        },
+        index=["Revenue", "Clinical Staff", "Drugs", "Exams / Labs", "Admin Staff", "Other OpEx", "EBITDA", "Taxes", "Net Profit", "FCF"],
+    ).map(lambda v: f"{currency_symbol}{v:,.0f}k")
+    st.dataframe(annual_pnl_df, width="stretch")
+
+    if trough_month > 0:
+        trough_text = (
+            f"Cumulative cash bottoms out at <b>{format_currency(cash_trough)}</b> in month <b>{trough_month}</b>, "
+            f"i.e. <b>{format_currency(-(cash_trough + initial_investment))}</b> of operating losses on top of the initial investment. "
+        )
+    else:
+        trough_text = (
+            f"Monthly free cash flow is positive from the start, so the funding need is the initial investment "
+            f"(<b>{format_currency(initial_investment)}</b>). "
+        )
+    trough_text += (
+        f"Cash is recovered in month <b>{payback_month}</b>." if payback_month is not None
+        else f"Cash is not recovered within {proj_months} months."
+    )
+    if not steady_state_projection:
+        trough_text += (
+            f"<br><br>Year 1 FCF with ramp-up / seasonality / hiring: <b>{format_currency(cf1)}</b> vs "
+            f"<b>{format_currency(base_case['cf'][1])}</b> at steady state."
         )
-        st.plotly_chart(fig_cf_val, use_container_width=True)
+    st.markdown(
+        create_insight_box("1", "MONTHLY CASH PROFILE", trough_text),
+        unsafe_allow_html=True
+    )
 
     # -----------------------------------------------------
     # 2. VALUATION SUMMARY – KPI DECK
@@ -3030,7 +3540,7 @@ with tab_val:
 
     st.markdown(
         create_insight_box(
-            "1",
+            "2",
             "DCF VALUATION ANALYSIS",
             (
                 f"<b>NPV at current Ke:</b> {format_currency(npv_val)}.<br><br>"
@@ -3051,46 +3561,122 @@ with tab_val:
         unsafe_allow_html=True
     )
 
+    # resolución y horizonte seleccionables (closed form → instantáneo)
+    col_res, col_hz, _ = st.columns([0.25, 0.25, 0.5])
+    with col_res:
+        npv_grid_points = st.number_input(
+            "Grid resolution (points per axis)",
+            min_value=5,
+            max_value=1000,
+            value=50,
+            step=5,
+            key="npv_grid_points",
+            help=(
+                "Number of growth and discount-rate points evaluated. The grid is computed in closed form, so even "
+                f"1000×1000 stays instant; the chart shows at most {NPV_HEATMAP_MAX_SIDE} points per axis and the "
+                "CSV download keeps the full grid."
+            )
+        )
+    with col_hz:
+        npv_grid_years = st.number_input(
+            "Projection horizon (years)",
+            min_value=1,
+            max_value=30,
+            value=DCF_YEARS,
+            step=1,
+            key="npv_grid_years",
+            help="Years of growing free cash flow after Year 0 used for this sensitivity. The base model uses 5 years."
+        )
+
     # rangos dinámicos alrededor de los valores del sidebar
     dr_low = max(0.08, ke - 0.06)
     dr_high = ke + 0.06
-    discount_rates_val = np.round(np.linspace(dr_low, dr_high, 7), 4)
+    discount_rates_val = np.linspace(dr_low, dr_high, npv_grid_points)
 
     gr_low = max(-0.05, rev_growth - 0.08)
     gr_high = rev_growth + 0.15
-    growth_rates_val = np.round(np.linspace(gr_low, gr_high, 9), 4)
-
-    npv_matrix_val = np.zeros((len(discount_rates_val), len(growth_rates_val)))
-    for i, dr in enumerate(discount_rates_val):
-        for j, gr in enumerate(growth_rates_val):
-            # reconstruimos flujo con ese growth
-            cf_temp = np.array([cf0, cf1])
-            for _ in range(4):
-                cf_temp = np.append(cf_temp, cf_temp[-1] * (1 + gr))
-            npv_matrix_val[i, j] = npv_calc(dr, cf_temp)
-
-    fig_heatmap_val = go.Figure(
-        data=go.Heatmap(
-            z=npv_matrix_val,
-            x=[f"{g*100:.0f}%" for g in growth_rates_val],
-            y=[f"{d*100:.1f}%" for d in discount_rates_val],
-            colorscale=[
-                [0, "#E2E8F0"],
-                [0.4, "#BFDBFE"],
-                [1, "#1D4ED8"],
-            ],
-            zmid=0,
-            showscale=True,
-            hovertemplate=f"<b>Scenario</b><br>Growth: %{{x}}<br>Discount: %{{y}}<br>NPV: {currency_symbol}%{{z:,.0f}}k<extra></extra>",
-            colorbar=dict(title=f"NPV ({currency_label})", len=0.65, thickness=14)
+    growth_rates_val = np.linspace(gr_low, gr_high, npv_grid_points)
+
+    # NPV de toda la matriz en una sola pasada (serie geométrica desde cf1)
+    # la malla usa la senda estacionaria (Y1 × crecimiento geométrico)
+    steady_cf1 = float(base_case["cf"][1])
+    if not steady_state_projection:
+        st.caption(
+            "Grid uses the steady-state growth path (no ramp-up, seasonality or staged hiring); "
+            "the headline NPV above uses the monthly projection."
         )
+    # contorno NPV = 0 exacto: tasa de descuento de equilibrio para cada growth
+    node(
+        calc_graph, "npv_grid_usd",
+        lambda steady_cash_flows_usd, growth_rates, discount_rates, years: (
+            npv_growth_discount_grid(*steady_cash_flows_usd["cf"][0, :2], growth_rates, discount_rates, years=years),
+            npv_zero_discount_rates(*steady_cash_flows_usd["cf"][0, :2], growth_rates, years=years),
+        ),
+        deps=("steady_cash_flows_usd",),
+        inputs=dict(growth_rates=growth_rates_val, discount_rates=discount_rates_val, years=npv_grid_years),
+    )
+    # la tasa de descuento de equilibrio no depende de la moneda
+    npv_matrix_val, be_discount_val = display_node(
+        "npv_grid", lambda grid, rate: (grid[0] * rate, grid[1])
+    )
+
+    def build_npv_heatmap(npv_grid, growth_rates_val, discount_rates_val, currency_label, currency_symbol):
+        npv_matrix_val, be_discount_val = npv_grid
+        be_mask = (be_discount_val >= discount_rates_val.min()) & (be_discount_val <= discount_rates_val.max())
+        # el navegador solo dibuja una malla submuestreada; la línea NPV = 0 va a resolución completa
+        step = -(-len(growth_rates_val) // NPV_HEATMAP_MAX_SIDE)
+        fig_heatmap_val = go.Figure(
+            data=go.Heatmap(
+                z=npv_matrix_val[::step, ::step],
+                x=growth_rates_val[::step] * 100,
+                y=discount_rates_val[::step] * 100,
+                colorscale=[
+                    [0, "#E2E8F0"],
+                    [0.4, "#BFDBFE"],
+                    [1, "#1D4ED8"],
+                ],
+                zmid=0,
+                showscale=True,
+                hovertemplate=f"<b>Scenario</b><br>Growth: %{{x:.1f}}%<br>Discount: %{{y:.1f}}%<br>NPV: {currency_symbol}%{{z:,.0f}}k<extra></extra>",
+                colorbar=dict(title=f"NPV ({currency_label})", len=0.65, thickness=14)
+            )
+        )
+        if be_mask.any():
+            fig_heatmap_val.add_trace(go.Scatter(
+                x=growth_rates_val[be_mask] * 100,
+                y=be_discount_val[be_mask] * 100,
+                mode="lines",
+                name="NPV = 0",
+                line=dict(color=PALETTE["primary_dark"], width=3),
+                hovertemplate="<b>NPV = 0</b><br>Growth: %{x:.1f}%<br>Discount: %{y:.2f}%<extra></extra>"
+            ))
+        apply_chart_layout(fig_heatmap_val, height=400)
+        fig_heatmap_val.update_layout(
+            xaxis=dict(title="Growth rate", ticksuffix="%"),
+            yaxis=dict(title="Discount rate", ticksuffix="%"),
+        )
+        return fig_heatmap_val
+
+    fig_heatmap_val = node(
+        calc_graph, "fig_npv_heatmap", build_npv_heatmap, deps=("npv_grid",), cutoff=False, shared=figure_cache,
+        inputs=dict(growth_rates_val=growth_rates_val, discount_rates_val=discount_rates_val,
+                    currency_label=currency_label, currency_symbol=currency_symbol),
     )
-    apply_chart_layout(fig_heatmap_val, height=400)
-    fig_heatmap_val.update_layout(
-        xaxis=dict(title="Growth rate"),
-        yaxis=dict(title="Discount rate"),
+
+    st.plotly_chart(fig_heatmap_val, width="stretch")
+
+    # descarga de la malla completa; solo las etiquetas se redondean
+    st.download_button(
+        f"NPV grid ({npv_grid_points}×{npv_grid_points}, CSV)",
+        data=pd.DataFrame(
+            npv_matrix_val,
+            index=pd.Index([f"{d * 100:.4f}%" for d in discount_rates_val], name="Discount rate \\ Growth"),
+            columns=[f"{g * 100:.4f}%" for g in growth_rates_val],
+        ).to_csv(),
+        file_name="npv-sensitivity-grid.csv",
+        mime="text/csv",
+        on_click="ignore",
     )
-    st.plotly_chart(fig_heatmap_val, use_container_width=True)
 
     # interpretación automática de la matriz
     npv_min = float(npv_matrix_val.min())
@@ -3101,33 +3687,305 @@ with tab_val:
     nearest_gr_idx = int(np.argmin(np.abs(growth_rates_val - rev_growth)))
     npv_model_cell = float(npv_matrix_val[nearest_dr_idx, nearest_gr_idx])
 
+    be_discount_model = npv_zero_discount_rates(cf0, steady_cf1, [rev_growth], years=npv_grid_years)[0]
+    if np.isnan(be_discount_model):
+        be_discount_sentence = "No single break-even discount rate exists for the current cash-flow pattern."
+    else:
+        be_discount_sentence = (
+            f"Over a {npv_grid_years}-year horizon at {rev_growth*100:.0f}% growth, NPV reaches zero at a discount rate of "
+            f"<b>{format_percentage(be_discount_model)}</b>"
+            f"{' (inside the tested range, shown as the NPV = 0 line).' if dr_low <= be_discount_model <= dr_high else ', outside the tested range.'}"
+        )
+
     st.markdown(
         create_insight_box(
-            "2",
+            "3",
             "VALUATION SENSITIVITY INTERPRETATION",
             (
                 f"Current modelling point (growth {rev_growth*100:.0f}%, discount {ke*100:.1f}%) "
                 f"yields an NPV of <b>{format_currency(npv_model_cell)}</b> inside the tested grid.<br><br>"
                 f"Across the range, NPV moves from {format_currency(npv_min)} to {format_currency(npv_max)} "
-                f"(spread of {format_currency(npv_span)}), indicating normal sensitivity to growth and to the cost of capital."
+                f"(spread of {format_currency(npv_span)}), indicating normal sensitivity to growth and to the cost of capital.<br><br>"
+                f"{be_discount_sentence}"
             ),
         ),
         unsafe_allow_html=True,
     )
 
 # =========================================================
-# TAB 5: STRATEGIC ANALYSIS
+# SECTION 5: MONTE CARLO SIMULATION
+# =========================================================
+if active_section == "Monte Carlo":
+    st.markdown(
+        '<div class="section-header"><h2 class="section-title">Monte Carlo Simulation</h2></div>',
+        unsafe_allow_html=True
+    )
+
+    st.markdown(
+        f"""
+        <div style="background:{PALETTE['surface_alt']};padding:1rem 1.2rem;border-radius:12px;
+                    margin-bottom:1.5rem;font-size:0.78rem;color:{PALETTE['text_secondary']};
+                    border-left:5px solid {PALETTE['primary']};line-height:1.6;">
+            <b style="color:{PALETTE['text_primary']};font-size:0.8rem;">Probabilistic P&L and DCF</b><br>
+            Key drivers are drawn from the distributions below around the current sidebar values and pushed
+            through the P&L and DCF in fixed-size chunks. Only running statistics are kept, so very large
+            runs (up to 10 million draws) use bounded memory.
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+    with st.form("mc_form"):
+        mc_c1, mc_c2, mc_c3, mc_c4, mc_c5 = st.columns(5)
+        with mc_c1:
+            mc_draws = st.number_input("Draws", min_value=1_000, max_value=10_000_000, value=100_000, step=50_000, key="mc_draws")
+        with mc_c2:
+            mc_chunk = st.number_input("Chunk size", min_value=1_000, max_value=1_000_000, value=100_000, step=10_000, key="mc_chunk")
+        with mc_c3:
+            mc_seed = st.number_input("Random seed", min_value=0, max_value=2**31 - 1, value=42, step=1, key="mc_seed")
+        with mc_c4:
+            mc_workers = st.number_input(
+                "Worker processes",
+                min_value=1,
+                max_value=max(1, available_workers()),
+                value=max(1, available_workers()),
+                step=1,
+                help="Chunks are sharded over this many processes. Results are identical for any worker count.",
+                key="mc_workers",
+            )
+        with mc_c5:
+            mc_with_irr = st.checkbox("Include IRR", value=False, help="Solves the IRR of every draw (slower).", key="mc_with_irr")
+
+        mc_dist_df = pd.DataFrame(
+            {
+                "Input": [INPUT_LABELS[k] for k in MC_FIELDS],
+                "Distribution": [DEFAULT_DISTRIBUTIONS[k][0] for k in MC_FIELDS],
+                "Spread (%)": [DEFAULT_DISTRIBUTIONS[k][1] * 100 for k in MC_FIELDS],
+            },
+            index=list(MC_FIELDS),
+        )
+        mc_dist_df = persistent_data_editor(
+            mc_dist_df,
+            disabled=["Input"],
+            hide_index=True,
+            width="stretch",
+            column_config={
+                "Distribution": st.column_config.SelectboxColumn("Distribution", options=DISTRIBUTIONS, required=True),
+                "Spread (%)": st.column_config.NumberColumn("Spread (%)", min_value=0.0, max_value=200.0, step=1.0),
+            },
+            key="mc_distributions",
+        )
+        st.caption(
+            "Spread: Normal = standard deviation, Lognormal = sigma, Triangular / Uniform = ± range, "
+            "all relative to the current sidebar value. An empty spread keeps the input fixed."
+        )
+        mc_run = st.form_submit_button("Run simulation")
+
+    # DCF del motor mensual cuando hay ramp-up / estacionalidad / contratación
+    mc_projection = None if steady_state_projection else projection_settings
+    if mc_run:
+        mc_distributions = {
+            # celdas vacías del editor: sin incertidumbre
+            k: (row["Distribution"] or "Fixed", 0.0 if pd.isna(row["Spread (%)"]) else row["Spread (%)"] / 100.0)
+            for k, row in mc_dist_df.iterrows()
+        }
+        # el motor mensual guarda (filas × meses): chunks más pequeños
+        mc_chunk_eff = int(mc_chunk) if mc_projection is None else min(int(mc_chunk), 10_000)
+        mc_start = datetime.now()
+        with st.spinner(f"Simulating {int(mc_draws):,} draws..."):
+            mc_summary = run_monte_carlo_parallel(
+                canonical_inputs,
+                mc_distributions,
+                int(mc_draws),
+                workers=int(mc_workers),
+                chunk_size=mc_chunk_eff,
+                seed=int(mc_seed),
+                with_irr=mc_with_irr,
+                projection=mc_projection,
+            )
+        st.session_state.mc_result = {
+            "summary": mc_summary,
+            "inputs": dict(canonical_inputs),
+            "projection": mc_projection,
+            "seconds": (datetime.now() - mc_start).total_seconds(),
+            "chunk": mc_chunk_eff,
+            "workers": int(mc_workers),
+        }
+
+    mc_result = st.session_state.get("mc_result")
+    if mc_result is None:
+        st.info("Set the distributions and press **Run simulation**.")
+    else:
+        if (
+            mc_result["inputs"] != canonical_inputs
+            or mc_result["projection"] != mc_projection
+        ):
+            st.warning("Sidebar inputs changed since the last run – results refer to the previous scenario. Run the simulation again to refresh.")
+
+        # la simulación corre en USD; solo la presentación usa la moneda elegida
+        mc = summary_in_currency(mc_result["summary"], display_rate)
+        mc_stats, mc_layout = mc["stats"], mc["layout"]
+        q_labels = [f"P{int(q * 100)}" for q in mc["quantiles"]]
+        q_idx = {label: i for i, label in enumerate(q_labels)}
+
+        mc_kpi_html = f"""
+        <div class="kpi-grid">
+            <div class="kpi-card">
+                <div class="kpi-accent"></div>
+                <div class="kpi-label">Mean NPV</div>
+                <div class="kpi-value">{format_currency(mc['npv']['mean'][0])}</div>
+                <div class="kpi-meta">P5 {format_currency(mc['npv']['q'][0][q_idx['P5']])} · P95 {format_currency(mc['npv']['q'][0][q_idx['P95']])}</div>
+            </div>
+            <div class="kpi-card">
+                <div class="kpi-accent"></div>
+                <div class="kpi-label">P(NPV &lt; 0)</div>
+                <div class="kpi-value">{format_percentage(mc['p_npv_neg'])}</div>
+                <div class="kpi-meta">{mc['draws']:,} draws</div>
+            </div>
+            <div class="kpi-card">
+                <div class="kpi-accent"></div>
+                <div class="kpi-label">Mean EBITDA</div>
+                <div class="kpi-value">{format_currency(mc['ebitda_y']['mean'][0])}</div>
+                <div class="kpi-meta">σ {format_currency(mc['ebitda_y']['std'][0])}</div>
+            </div>
+            <div class="kpi-card">
+                <div class="kpi-accent"></div>
+                <div class="kpi-label">P(EBITDA &lt; 0)</div>
+                <div class="kpi-value">{format_percentage(mc['p_ebitda_neg'])}</div>
+                <div class="kpi-meta">{mc_result['seconds']:.1f}s · {mc_result['workers']} worker(s) · chunks of {mc_result['chunk']:,}</div>
+            </div>
+        </div>
+        """
+        st.markdown(mc_kpi_html, unsafe_allow_html=True)
+
+        # -----------------------------------------------------
+        # FAN CHART – cumulative cash flow by year
+        # -----------------------------------------------------
+        st.markdown(
+            '<div class="section-header"><h2 class="section-title">Cumulative Cash Flow – Fan Chart</h2></div>',
+            unsafe_allow_html=True
+        )
+        fan_q = mc["cum_cf"]["q"]              # (years + 1, quantiles)
+        fan_years = [f"Y{y}" for y in range(fan_q.shape[0])]
+        fig_fan = go.Figure()
+        for lo_label, hi_label, band_name, color in (
+            ("P5", "P95", "P5–P95", "rgba(59,130,246,0.15)"),
+            ("P25", "P75", "P25–P75", "rgba(59,130,246,0.35)"),
+        ):
+            fig_fan.add_scatter(
+                x=fan_years, y=fan_q[:, q_idx[hi_label]],
+                mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip",
+            )
+            fig_fan.add_scatter(
+                x=fan_years, y=fan_q[:, q_idx[lo_label]],
+                mode="lines", line=dict(width=0), fill="tonexty", fillcolor=color, name=band_name,
+                hoverinfo="skip",
+            )
+        fig_fan.add_scatter(
+            x=fan_years, y=fan_q[:, q_idx["P50"]],
+            mode="lines+markers", name="Median",
+            line=dict(color=PALETTE["chart"][0], width=3),
+            hovertemplate=f"%{{x}}<br>Median: {currency_symbol}%{{y:,.0f}}k<extra></extra>",
+        )
+        fig_fan.add_scatter(
+            x=fan_years, y=np.cumsum(cf_vec)[:fan_q.shape[0]] if mc_result["inputs"] == canonical_inputs else mc["cum_cf"]["mean"],
+            mode="lines", name="Base case" if mc_result["inputs"] == canonical_inputs else "Mean",
+            line=dict(color=PALETTE["text_primary"], width=2, dash="dot"),
+        )
+        fig_fan.add_hline(y=0, line_color=PALETTE["border"], line_width=1)
+        apply_chart_layout(fig_fan, height=420)
+        fig_fan.update_layout(
+            xaxis_title="Year",
+            yaxis_title=f"Cumulative cash flow ({currency_label})",
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        )
+        st.plotly_chart(fig_fan, width="stretch")
+
+        # -----------------------------------------------------
+        # HISTOGRAMS – NPV and EBITDA (from the streamed bins)
+        # -----------------------------------------------------
+        st.markdown(
+            '<div class="section-header"><h2 class="section-title">Distribution of Outcomes</h2></div>',
+            unsafe_allow_html=True
+        )
+
+        def mc_histogram(key, title):
+            """Re-bin the streamed histogram to ~60 bars between P0.5 and P99.5"""
+            lo, hi = histogram_quantile(mc_stats[key], mc_layout[key], [0.005, 0.995])
+            if not np.isfinite(lo) or hi <= lo:
+                lo, hi = mc_stats[key]["min"][0], mc_stats[key]["max"][0] + 1e-9
+            edges = np.linspace(lo, hi, 61)
+            share = np.diff(histogram_cdf(mc_stats[key], mc_layout[key], edges))
+            centres = 0.5 * (edges[:-1] + edges[1:])
+            fig = go.Figure()
+            fig.add_bar(
+                x=centres,
+                y=share * 100,
+                width=np.diff(edges),
+                marker=dict(color=[PALETTE["chart"][0] if c < 0 else PALETTE["chart"][1] for c in centres]),
+                hovertemplate=f"{title}: {currency_symbol}%{{x:,.0f}}k<br>Share: %{{y:.2f}}%<extra></extra>",
+            )
+            fig.add_vline(x=0, line_color=PALETTE["text_primary"], line_width=1.5)
+            apply_chart_layout(fig, height=360)
+            fig.update_layout(
+                xaxis_title=f"{title} ({currency_label})",
+                yaxis_title="Share of draws (%)",
+                showlegend=False,
+                bargap=0.02,
+            )
+            return fig
+
+        hist_c1, hist_c2 = st.columns(2)
+        with hist_c1:
+            st.plotly_chart(mc_histogram("npv", "NPV"), width="stretch")
+        with hist_c2:
+            st.plotly_chart(mc_histogram("ebitda_y", "EBITDA"), width="stretch")
+
+        # tabla de cuantiles
+        mc_rows = [("EBITDA", "ebitda_y", False), ("Net profit", "net_y", False), ("NPV", "npv", False)]
+        if "irr" in mc:
+            mc_rows.append(("IRR", "irr", True))
+        mc_table = pd.DataFrame(
+            [
+                [label, format_percentage(mc[key]["mean"][0]) if is_pct else format_currency(mc[key]["mean"][0])]
+                + [format_percentage(v) if is_pct else format_currency(v) for v in mc[key]["q"][0]]
+                for label, key, is_pct in mc_rows
+            ],
+            columns=["Metric", "Mean"] + q_labels,
+        )
+        st.dataframe(mc_table, width="stretch", hide_index=True)
+
+        mc_text = (
+            f"Across <b>{mc['draws']:,}</b> simulated scenarios, NPV has a median of "
+            f"<b>{format_currency(mc['npv']['q'][0][q_idx['P50']])}</b> with a 90% range of "
+            f"{format_currency(mc['npv']['q'][0][q_idx['P5']])} to {format_currency(mc['npv']['q'][0][q_idx['P95']])}. "
+            f"The probability of destroying value (NPV &lt; 0) is <b>{format_percentage(mc['p_npv_neg'])}</b> and the "
+            f"probability of an operating loss (EBITDA &lt; 0) is <b>{format_percentage(mc['p_ebitda_neg'])}</b>."
+        )
+        if "p_irr_below_ke" in mc:
+            irr_undefined = mc["irr"]["nan_share"][0]
+            if irr_undefined >= 1:
+                mc_text += " No draw has a defined IRR."
+            else:
+                mc_text += f" IRR falls below Ke in <b>{format_percentage(mc['p_irr_below_ke'])}</b> of the draws with an IRR"
+                mc_text += f" (undefined in {format_percentage(irr_undefined)})." if irr_undefined > 0 else "."
+        if mc_result["projection"] is not None:
+            mc_text += "<br><br>DCF taken from the monthly projection (ramp-up / seasonality / hiring)."
+        st.markdown(
+            create_insight_box("1", "MONTE CARLO INTERPRETATION", mc_text),
+            unsafe_allow_html=True
+        )
+
+# =========================================================
+# SECTION 6: STRATEGIC ANALYSIS
 # =========================================================
-with tab_analysis:
+if active_section == "Strategic Analysis":
     st.markdown(
         '<div class="section-header"><h2 class="section-title">Executive Strategic Analysis</h2></div>',
         unsafe_allow_html=True
     )
 
-    scenarios_strat, base_ebitda_strat, base_margin_strat = generate_stress_scenarios(
-        patients, tariff, mix_low_pct, low_tariff,
-        clinical_y, drugs_y, labs_y, admin_y, other_y, stress_costs
-    )
+    scenarios_strat, base_ebitda_strat, base_margin_strat = stress_results
 
     # ROIC proxy calculation
     roic_proxy = safe_divide(ebitda_y, initial_investment)
@@ -3232,6 +4090,9 @@ with tab_analysis:
         unsafe_allow_html=True
     )
 
+startup.phase("report + logs")
+tracing.section("report")
+
 # =========================================================
 # PROFESSIONAL REPORT EXPORT - CONSULTANT-GRADE STRUCTURE
 # Place this code right before the footer, after all tabs
@@ -3283,751 +4144,761 @@ def create_insight_section(number: str, title: str, content: str) -> str:
     </div>
     """
 
-# =========================================================
-# COLLECT ALL NECESSARY DATA SAFELY
-# =========================================================
-
-# Core metrics (always available)
-report_date = datetime.now().strftime("%B %d, %Y at %H:%M")
 report_filename = datetime.now().strftime('%Y%m%d_%H%M')
 
-# Investment recommendation logic (from Tab 5)
-if npv_val > 500 and ebitda_margin >= 0.25 and (not np.isnan(mos_pct) and mos_pct >= 0.40) and (irr_val and irr_val > ke + 0.05):
-    recommendation = "STRONG BUY"
-    rec_class = "positive"
-    rec_text = "Superior performance across all metrics supports immediate investment with high confidence."
-elif npv_val > 0 and ebitda_margin >= 0.18 and (not np.isnan(mos_pct) and mos_pct >= 0.25):
-    recommendation = "BUY"
-    rec_class = "positive"
-    rec_text = "Solid fundamentals and positive value creation support investment thesis with standard risk management."
-elif npv_val > -200 and ebitda_margin >= 0.12:
-    recommendation = "CONDITIONAL"
-    rec_class = "warning"
-    rec_text = "Marginal value creation warrants careful evaluation and may require operational improvements as investment condition."
-else:
-    recommendation = "AVOID"
-    rec_class = "negative"
-    rec_text = "Weak performance and negative value creation do not support investment at current parameters."
-
-# Strategic positioning (from Tab 5)
-if ebitda_margin >= 0.35 and mos_pct >= 0.5 and revenue_per_dollar_cost >= 1.5:
-    strategic_position = "MARKET LEADER"
-    position_class = "positive"
-elif ebitda_margin >= 0.25 and mos_pct >= 0.3 and revenue_per_dollar_cost >= 1.3:
-    strategic_position = "STRONG PERFORMER"
-    position_class = "positive"
-elif ebitda_margin >= 0.15 and mos_pct >= 0.2 and revenue_per_dollar_cost >= 1.2:
-    strategic_position = "MARKET PARTICIPANT"
-    position_class = "neutral"
-else:
-    strategic_position = "CHALLENGED POSITION"
-    position_class = "warning"
-
-# EV/EBITDA multiple
-ev_ebitda = safe_divide(npv_val, ebitda_y)
-ev_ebitda_str = f"{ev_ebitda:.1f}x" if not np.isnan(ev_ebitda) and ev_ebitda > 0 else "N/A"
-
-# Stress scenarios (safely)
-try:
-    scenarios_report, _, _ = generate_stress_scenarios(
-        patients, tariff, mix_low_pct, low_tariff,
-        clinical_y, drugs_y, labs_y, admin_y, other_y, stress_costs
-    )
-    stress_df_report = pd.DataFrame(scenarios_report)
-    worst_ebitda = stress_df_report.iloc[-1]["ebitda"]
-    worst_impact = stress_df_report.iloc[-1]["impact_pct"]
-    has_stress_data = True
-except:
-    has_stress_data = False
-    worst_ebitda = 0
-    worst_impact = 0
-
-# ROIC proxy
-roic_proxy = safe_divide(ebitda_y, initial_investment)
-
-# Safe formatting helpers for conditional values
-be_patients_str = f"{be_patients:,.0f}" if not np.isnan(be_patients) else "N/A"
-be_revenue_str = format_currency(be_revenue) if not np.isnan(be_revenue) else "N/A"
-mos_pct_str = format_percentage(mos_pct) if not np.isnan(mos_pct) else "N/A"
-mos_pat_str = f"{mos_pat:,.0f}" if not np.isnan(mos_pat) else "N/A"
-irr_str = format_percentage(irr_val) if irr_val else "N/A"
-payback_str = f"{payback_year} years" if payback_year else "N/A"
-
-# Logo handling for report
-logo_html = ""
-if logo_b64:
-    logo_html = f'<img src="data:image/png;base64,{logo_b64}" alt="Colombiana de Trasplantes" style="max-height: 60px; margin-bottom: 1rem;">'
-
-# =========================================================
-# BUILD COMPLETE HTML REPORT
-# =========================================================
-
-report_html = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Financial Analysis Report - Colombiana de Trasplantes</title>
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap');
-        
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-        
-        body {{
-            font-family: 'Inter', -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-            background: #f8fafc;
-            color: #0f172a;
-            line-height: 1.6;
-            padding: 0;
-        }}
-        
-        .container {{
-            max-width: 1400px;
-            margin: 0 auto;
-            background: white;
-        }}
-        
-        /* HEADER */
-        .header {{
-            background: linear-gradient(135deg, {PALETTE["primary"]} 0%, {PALETTE["primary_dark"]} 100%);
-            color: white;
-            padding: 2.5rem 3rem 2.5rem 3rem;
-            border-bottom: 4px solid {PALETTE["primary_dark"]};
-        }}
-        
-        .header-logo {{
-            margin-bottom: 1.25rem;
-        }}
-        
-        .header h1 {{
-            font-size: 2.2rem;
-            font-weight: 800;
-            letter-spacing: -0.03em;
-            margin-bottom: 0.75rem;
-        }}
-        
-        .header .subtitle {{
-            font-size: 1rem;
-            opacity: 0.95;
-            font-weight: 400;
-        }}
-        
-        .header .meta {{
-            font-size: 0.82rem;
-            opacity: 0.8;
-            margin-top: 1rem;
-            padding-top: 1rem;
-            border-top: 1px solid rgba(255,255,255,0.2);
-        }}
-        
-        /* CONTENT */
-        .content {{
-            padding: 2.5rem 3rem 4rem 3rem;
-        }}
-        
-        .section {{
-            margin-bottom: 3.5rem;
-            page-break-inside: avoid;
-        }}
-        
-        .section-title {{
-            font-size: 1.4rem;
-            font-weight: 700;
-            color: {PALETTE["text_primary"]};
-            margin-bottom: 1.2rem;
-            padding-bottom: 0.6rem;
-            border-bottom: 3px solid {PALETTE["primary"]};
-        }}
-        
-        .subsection-title {{
-            font-size: 1.1rem;
-            font-weight: 600;
-            color: {PALETTE["text_primary"]};
-            margin: 2rem 0 1rem 0;
-        }}
-        
-        /* KPI GRID */
-        .kpi-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
-            gap: 1.25rem;
-            margin: 1.5rem 0 2.5rem 0;
-        }}
-        
-        .kpi-card {{
-            background: white;
-            border: 1px solid #e2e8f0;
-            border-radius: 12px;
-            padding: 1.3rem 1.4rem;
-            box-shadow: 0 2px 8px rgba(15,23,42,0.04);
-            position: relative;
-            overflow: hidden;
-        }}
-        
-        .kpi-card::before {{
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            height: 4px;
-            background: linear-gradient(90deg, {PALETTE["primary"]}, {PALETTE["secondary"]});
-        }}
-        
-        .kpi-label {{
-            font-size: 0.7rem;
-            text-transform: uppercase;
-            letter-spacing: 0.05em;
-            color: {PALETTE["text_tertiary"]};
-            font-weight: 600;
-            margin-bottom: 0.5rem;
-        }}
-        
-        .kpi-value {{
-            font-size: 1.6rem;
-            font-weight: 800;
-            color: {PALETTE["text_primary"]};
-            margin-bottom: 0.3rem;
-        }}
-        
-        .kpi-meta {{
-            font-size: 0.75rem;
-            color: {PALETTE["text_secondary"]};
-        }}
-        
-        /* TABLES */
-        table.report-table {{
-            width: 100%;
-            border-collapse: collapse;
-            background: white;
-            border: 1px solid #e2e8f0;
-            border-radius: 12px;
-            overflow: hidden;
-            margin: 1rem 0 2rem 0;
-            font-size: 0.85rem;
-        }}
-        
-        table.report-table thead th {{
-            background: {PALETTE["primary"]};
-            color: white;
-            text-align: left;
-            padding: 0.7rem 0.9rem;
-            font-size: 0.72rem;
-            text-transform: uppercase;
-            letter-spacing: 0.04em;
-            font-weight: 600;
-        }}
-        
-        table.report-table tbody td {{
-            padding: 0.65rem 0.9rem;
-            border-bottom: 1px solid #f1f5f9;
-        }}
-        
-        table.report-table tbody tr:last-child td {{
-            border-bottom: none;
-        }}
-        
-        table.report-table tbody tr:hover {{
-            background: #f8fafc;
-        }}
-        
-        /* INSIGHT BOXES */
-        .insight-box {{
-            background: white;
-            border: 1px solid #e2e8f0;
-            border-radius: 12px;
-            padding: 1.5rem;
-            margin: 1.5rem 0;
-            box-shadow: 0 2px 8px rgba(15,23,42,0.03);
-        }}
-        
-        .insight-header {{
-            display: flex;
-            align-items: center;
-            gap: 0.75rem;
-            margin-bottom: 1rem;
-        }}
-        
-        .insight-number {{
-            background: {PALETTE["primary"]};
-            color: white;
-            width: 32px;
-            height: 32px;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 0.75rem;
-            font-weight: 700;
-        }}
-        
-        .insight-title {{
-            font-size: 1.05rem;
-            font-weight: 700;
-            color: {PALETTE["text_primary"]};
-        }}
-        
-        .insight-content {{
-            font-size: 0.85rem;
-            line-height: 1.7;
-            color: {PALETTE["text_secondary"]};
-        }}
-        
-        .insight-content ul {{
-            margin: 0.75rem 0;
-            padding-left: 1.5rem;
-        }}
-        
-        .insight-content li {{
-            margin: 0.4rem 0;
-        }}
-        
-        .insight-content b {{
-            color: {PALETTE["text_primary"]};
-            font-weight: 600;
-        }}
-        
-        .insight-content p {{
-            margin: 0.75rem 0;
-        }}
-        
-        /* TAGS */
-        .tag {{
-            display: inline-block;
-            padding: 0.25rem 0.65rem;
-            border-radius: 999px;
-            font-size: 0.65rem;
-            text-transform: uppercase;
-            letter-spacing: 0.04em;
-            font-weight: 600;
-            margin: 0 0.25rem 0.25rem 0;
-        }}
-        
-        .tag.positive {{
-            background: rgba(16,185,129,0.12);
-            color: #065f46;
-        }}
-        
-        .tag.warning {{
-            background: rgba(245,158,11,0.12);
-            color: #92400e;
-        }}
-        
-        .tag.negative {{
-            background: rgba(239,68,68,0.12);
-            color: #7f1d1d;
-        }}
-        
-        .tag.neutral {{
-            background: rgba(99,102,241,0.1);
-            color: #3730a3;
-        }}
-        
-        /* RECOMMENDATION BOX */
-        .recommendation-box {{
-            background: linear-gradient(135deg, {PALETTE["surface"]} 0%, {PALETTE["surface_alt"]} 100%);
-            border: 2px solid {PALETTE["primary"]};
-            border-radius: 16px;
-            padding: 2rem;
-            margin: 2rem 0;
-            box-shadow: 0 8px 24px rgba(30,64,175,0.08);
-        }}
-        
-        .recommendation-box .rec-label {{
-            font-size: 0.7rem;
-            text-transform: uppercase;
-            letter-spacing: 0.06em;
-            color: {PALETTE["text_tertiary"]};
-            font-weight: 600;
-            margin-bottom: 0.75rem;
-        }}
-        
-        .recommendation-box .rec-value {{
-            font-size: 2rem;
-            font-weight: 800;
-            margin-bottom: 1rem;
-        }}
-        
-        .recommendation-box .rec-text {{
-            font-size: 0.9rem;
-            line-height: 1.6;
-            color: {PALETTE["text_secondary"]};
-        }}
-        
-        /* CHARTS */
-        .chart-container {{
-            margin: 1.5rem 0 2.5rem 0;
-            background: white;
-            border: 1px solid #e2e8f0;
-            border-radius: 12px;
-            padding: 1rem;
-        }}
-        
-        /* PARAMETER GRID */
-        .param-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 0.75rem;
-            background: {PALETTE["surface_alt"]};
-            padding: 1.5rem;
-            border-radius: 12px;
-            margin: 1.5rem 0;
-        }}
-        
-        .param-item {{
-            font-size: 0.78rem;
-        }}
-        
-        .param-item .label {{
-            color: {PALETTE["text_tertiary"]};
-            font-size: 0.68rem;
-            text-transform: uppercase;
-            letter-spacing: 0.04em;
-            font-weight: 600;
-        }}
-        
-        .param-item .value {{
-            color: {PALETTE["text_primary"]};
-            font-weight: 700;
-            font-size: 0.9rem;
-            margin-top: 0.2rem;
-        }}
-        
-        /* FOOTER */
-        .footer {{
-            background: {PALETTE["surface_alt"]};
-            padding: 2rem 3rem;
-            text-align: center;
-            font-size: 0.75rem;
-            color: {PALETTE["text_tertiary"]};
-            border-top: 1px solid #e2e8f0;
-        }}
-        
-        /* PRINT STYLES */
-        @media print {{
+# Built reports are cached per inputs (report_download), so the generation
+# time is left as this mark and filled in when each download is served
+REPORT_DATE_MARK = "<!--report-date-->"
+
+
+def build_report_html():
+    """
+    Complete HTML report for this run's inputs. Only called when the
+    download is requested (deferred download data), never on a rerun.
+    """
+    # =========================================================
+    # COLLECT ALL NECESSARY DATA SAFELY
+    # =========================================================
+
+    # Core metrics (always available)
+    report_date = REPORT_DATE_MARK
+
+    # Investment recommendation logic (from Tab 5)
+    if npv_val > 500 and ebitda_margin >= 0.25 and (not np.isnan(mos_pct) and mos_pct >= 0.40) and (irr_val and irr_val > ke + 0.05):
+        recommendation = "STRONG BUY"
+        rec_class = "positive"
+        rec_text = "Superior performance across all metrics supports immediate investment with high confidence."
+    elif npv_val > 0 and ebitda_margin >= 0.18 and (not np.isnan(mos_pct) and mos_pct >= 0.25):
+        recommendation = "BUY"
+        rec_class = "positive"
+        rec_text = "Solid fundamentals and positive value creation support investment thesis with standard risk management."
+    elif npv_val > -200 and ebitda_margin >= 0.12:
+        recommendation = "CONDITIONAL"
+        rec_class = "warning"
+        rec_text = "Marginal value creation warrants careful evaluation and may require operational improvements as investment condition."
+    else:
+        recommendation = "AVOID"
+        rec_class = "negative"
+        rec_text = "Weak performance and negative value creation do not support investment at current parameters."
+
+    # Strategic positioning (from Tab 5)
+    if ebitda_margin >= 0.35 and mos_pct >= 0.5 and revenue_per_dollar_cost >= 1.5:
+        strategic_position = "MARKET LEADER"
+        position_class = "positive"
+    elif ebitda_margin >= 0.25 and mos_pct >= 0.3 and revenue_per_dollar_cost >= 1.3:
+        strategic_position = "STRONG PERFORMER"
+        position_class = "positive"
+    elif ebitda_margin >= 0.15 and mos_pct >= 0.2 and revenue_per_dollar_cost >= 1.2:
+        strategic_position = "MARKET PARTICIPANT"
+        position_class = "neutral"
+    else:
+        strategic_position = "CHALLENGED POSITION"
+        position_class = "warning"
+
+    # EV/EBITDA multiple
+    ev_ebitda = safe_divide(npv_val, ebitda_y)
+    ev_ebitda_str = f"{ev_ebitda:.1f}x" if not np.isnan(ev_ebitda) and ev_ebitda > 0 else "N/A"
+
+    # Stress scenarios (safely)
+    try:
+        scenarios_report, _, _ = stress_results
+        stress_df_report = pd.DataFrame(scenarios_report)
+        worst_ebitda = stress_df_report.iloc[-1]["ebitda"]
+        worst_impact = stress_df_report.iloc[-1]["impact_pct"]
+        has_stress_data = True
+    except:
+        has_stress_data = False
+        worst_ebitda = 0
+        worst_impact = 0
+
+    # ROIC proxy
+    roic_proxy = safe_divide(ebitda_y, initial_investment)
+
+    # Safe formatting helpers for conditional values
+    be_patients_str = f"{be_patients:,.0f}" if not np.isnan(be_patients) else "N/A"
+    be_revenue_str = format_currency(be_revenue) if not np.isnan(be_revenue) else "N/A"
+    mos_pct_str = format_percentage(mos_pct) if not np.isnan(mos_pct) else "N/A"
+    mos_pat_str = f"{mos_pat:,.0f}" if not np.isnan(mos_pat) else "N/A"
+    irr_str = format_percentage(irr_val) if irr_val else "N/A"
+    payback_str = f"{payback_year} years" if payback_year else "N/A"
+
+    # Logo handling for report
+    logo_html = ""
+    logo_b64 = load_logo_base64(str(LOGO_PATH))
+    if logo_b64:
+        logo_html = f'<img src="data:image/png;base64,{logo_b64}" alt="Colombiana de Trasplantes" style="max-height: 60px; margin-bottom: 1rem;">'
+
+    # =========================================================
+    # BUILD COMPLETE HTML REPORT
+    # =========================================================
+
+    report_html = f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Financial Analysis Report - Colombiana de Trasplantes</title>
+        <style>
+            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap');
+
+            * {{
+                margin: 0;
+                padding: 0;
+                box-sizing: border-box;
+            }}
+
             body {{
-                background: white;
+                font-family: 'Inter', -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
+                background: #f8fafc;
+                color: #0f172a;
+                line-height: 1.6;
+                padding: 0;
             }}
+
             .container {{
-                box-shadow: none;
+                max-width: 1400px;
+                margin: 0 auto;
+                background: white;
+            }}
+
+            /* HEADER */
+            .header {{
+                background: linear-gradient(135deg, {PALETTE["primary"]} 0%, {PALETTE["primary_dark"]} 100%);
+                color: white;
+                padding: 2.5rem 3rem 2.5rem 3rem;
+                border-bottom: 4px solid {PALETTE["primary_dark"]};
+            }}
+
+            .header-logo {{
+                margin-bottom: 1.25rem;
+            }}
+
+            .header h1 {{
+                font-size: 2.2rem;
+                font-weight: 800;
+                letter-spacing: -0.03em;
+                margin-bottom: 0.75rem;
             }}
+
+            .header .subtitle {{
+                font-size: 1rem;
+                opacity: 0.95;
+                font-weight: 400;
+            }}
+
+            .header .meta {{
+                font-size: 0.82rem;
+                opacity: 0.8;
+                margin-top: 1rem;
+                padding-top: 1rem;
+                border-top: 1px solid rgba(255,255,255,0.2);
+            }}
+
+            /* CONTENT */
+            .content {{
+                padding: 2.5rem 3rem 4rem 3rem;
+            }}
+
             .section {{
+                margin-bottom: 3.5rem;
                 page-break-inside: avoid;
             }}
+
+            .section-title {{
+                font-size: 1.4rem;
+                font-weight: 700;
+                color: {PALETTE["text_primary"]};
+                margin-bottom: 1.2rem;
+                padding-bottom: 0.6rem;
+                border-bottom: 3px solid {PALETTE["primary"]};
+            }}
+
+            .subsection-title {{
+                font-size: 1.1rem;
+                font-weight: 600;
+                color: {PALETTE["text_primary"]};
+                margin: 2rem 0 1rem 0;
+            }}
+
+            /* KPI GRID */
+            .kpi-grid {{
+                display: grid;
+                grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
+                gap: 1.25rem;
+                margin: 1.5rem 0 2.5rem 0;
+            }}
+
+            .kpi-card {{
+                background: white;
+                border: 1px solid #e2e8f0;
+                border-radius: 12px;
+                padding: 1.3rem 1.4rem;
+                box-shadow: 0 2px 8px rgba(15,23,42,0.04);
+                position: relative;
+                overflow: hidden;
+            }}
+
+            .kpi-card::before {{
+                content: '';
+                position: absolute;
+                top: 0;
+                left: 0;
+                right: 0;
+                height: 4px;
+                background: linear-gradient(90deg, {PALETTE["primary"]}, {PALETTE["secondary"]});
+            }}
+
+            .kpi-label {{
+                font-size: 0.7rem;
+                text-transform: uppercase;
+                letter-spacing: 0.05em;
+                color: {PALETTE["text_tertiary"]};
+                font-weight: 600;
+                margin-bottom: 0.5rem;
+            }}
+
+            .kpi-value {{
+                font-size: 1.6rem;
+                font-weight: 800;
+                color: {PALETTE["text_primary"]};
+                margin-bottom: 0.3rem;
+            }}
+
+            .kpi-meta {{
+                font-size: 0.75rem;
+                color: {PALETTE["text_secondary"]};
+            }}
+
+            /* TABLES */
+            table.report-table {{
+                width: 100%;
+                border-collapse: collapse;
+                background: white;
+                border: 1px solid #e2e8f0;
+                border-radius: 12px;
+                overflow: hidden;
+                margin: 1rem 0 2rem 0;
+                font-size: 0.85rem;
+            }}
+
+            table.report-table thead th {{
+                background: {PALETTE["primary"]};
+                color: white;
+                text-align: left;
+                padding: 0.7rem 0.9rem;
+                font-size: 0.72rem;
+                text-transform: uppercase;
+                letter-spacing: 0.04em;
+                font-weight: 600;
+            }}
+
+            table.report-table tbody td {{
+                padding: 0.65rem 0.9rem;
+                border-bottom: 1px solid #f1f5f9;
+            }}
+
+            table.report-table tbody tr:last-child td {{
+                border-bottom: none;
+            }}
+
+            table.report-table tbody tr:hover {{
+                background: #f8fafc;
+            }}
+
+            /* INSIGHT BOXES */
+            .insight-box {{
+                background: white;
+                border: 1px solid #e2e8f0;
+                border-radius: 12px;
+                padding: 1.5rem;
+                margin: 1.5rem 0;
+                box-shadow: 0 2px 8px rgba(15,23,42,0.03);
+            }}
+
+            .insight-header {{
+                display: flex;
+                align-items: center;
+                gap: 0.75rem;
+                margin-bottom: 1rem;
+            }}
+
+            .insight-number {{
+                background: {PALETTE["primary"]};
+                color: white;
+                width: 32px;
+                height: 32px;
+                border-radius: 50%;
+                display: flex;
+                align-items: center;
+                justify-content: center;
+                font-size: 0.75rem;
+                font-weight: 700;
+            }}
+
+            .insight-title {{
+                font-size: 1.05rem;
+                font-weight: 700;
+                color: {PALETTE["text_primary"]};
+            }}
+
+            .insight-content {{
+                font-size: 0.85rem;
+                line-height: 1.7;
+                color: {PALETTE["text_secondary"]};
+            }}
+
+            .insight-content ul {{
+                margin: 0.75rem 0;
+                padding-left: 1.5rem;
+            }}
+
+            .insight-content li {{
+                margin: 0.4rem 0;
+            }}
+
+            .insight-content b {{
+                color: {PALETTE["text_primary"]};
+                font-weight: 600;
+            }}
+
+            .insight-content p {{
+                margin: 0.75rem 0;
+            }}
+
+            /* TAGS */
+            .tag {{
+                display: inline-block;
+                padding: 0.25rem 0.65rem;
+                border-radius: 999px;
+                font-size: 0.65rem;
+                text-transform: uppercase;
+                letter-spacing: 0.04em;
+                font-weight: 600;
+                margin: 0 0.25rem 0.25rem 0;
+            }}
+
+            .tag.positive {{
+                background: rgba(16,185,129,0.12);
+                color: #065f46;
+            }}
+
+            .tag.warning {{
+                background: rgba(245,158,11,0.12);
+                color: #92400e;
+            }}
+
+            .tag.negative {{
+                background: rgba(239,68,68,0.12);
+                color: #7f1d1d;
+            }}
+
+            .tag.neutral {{
+                background: rgba(99,102,241,0.1);
+                color: #3730a3;
+            }}
+
+            /* RECOMMENDATION BOX */
+            .recommendation-box {{
+                background: linear-gradient(135deg, {PALETTE["surface"]} 0%, {PALETTE["surface_alt"]} 100%);
+                border: 2px solid {PALETTE["primary"]};
+                border-radius: 16px;
+                padding: 2rem;
+                margin: 2rem 0;
+                box-shadow: 0 8px 24px rgba(30,64,175,0.08);
+            }}
+
+            .recommendation-box .rec-label {{
+                font-size: 0.7rem;
+                text-transform: uppercase;
+                letter-spacing: 0.06em;
+                color: {PALETTE["text_tertiary"]};
+                font-weight: 600;
+                margin-bottom: 0.75rem;
+            }}
+
+            .recommendation-box .rec-value {{
+                font-size: 2rem;
+                font-weight: 800;
+                margin-bottom: 1rem;
+            }}
+
+            .recommendation-box .rec-text {{
+                font-size: 0.9rem;
+                line-height: 1.6;
+                color: {PALETTE["text_secondary"]};
+            }}
+
+            /* CHARTS */
             .chart-container {{
-                page-break-inside: avoid;
+                margin: 1.5rem 0 2.5rem 0;
+                background: white;
+                border: 1px solid #e2e8f0;
+                border-radius: 12px;
+                padding: 1rem;
             }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <!-- HEADER -->
-        <div class="header">
-            <div class="header-logo">
-                {logo_html}
-            </div>
-            <h1>Clinic P&L Financial Analysis Report</h1>
-            <div class="subtitle">Colombiana de Trasplantes · Outpatient Follow-up Division</div>
-            <div class="meta">Generated on {report_date} · All figures in thousands {currency} ({currency_label})</div>
-        </div>
-        
-        <div class="content">
-            <!-- ========================================== -->
-            <!-- SECTION 1: EXECUTIVE SUMMARY -->
-            <!-- ========================================== -->
-            <div class="section">
-                <h2 class="section-title">1. Executive Summary & Investment Recommendation</h2>
-                
-                <div class="recommendation-box">
-                    <div class="rec-label">Investment Recommendation</div>
-                    <div class="rec-value">
-                        <span class="tag {rec_class}" style="font-size: 1.1rem; padding: 0.4rem 1rem;">
-                            {recommendation}
-                        </span>
-                    </div>
-                    <div class="rec-text">{rec_text}</div>
-                </div>
-                
-                <h3 class="subsection-title">Financial Profile</h3>
-                <div class="kpi-grid">
-                    {create_kpi_card("Annual Revenue", format_currency(rev_y), f"{patients} pts × {format_currency(tariff)}")}
-                    {create_kpi_card("EBITDA", format_currency(ebitda_y), f"{format_percentage(ebitda_margin)} margin")}
-                    {create_kpi_card("Net Profit", format_currency(net_y), f"{format_percentage(net_margin)} after tax")}
-                    {create_kpi_card("Free Cash Flow", format_currency(net_y * fcf_factor), f"{format_percentage(fcf_factor)} conversion")}
-                </div>
-                
-                <h3 class="subsection-title">Investment Metrics</h3>
-                <div class="kpi-grid">
-                    {create_kpi_card("NPV", format_currency(npv_val), f"@ {format_percentage(ke)} discount rate")}
-                    {create_kpi_card("IRR", irr_str, f"vs {format_percentage(ke)} hurdle")}
-                    {create_kpi_card("Payback Period", payback_str, f"EV/EBITDA: {ev_ebitda_str}")}
-                    {create_kpi_card("ROIC (proxy)", format_percentage(roic_proxy), f"on {format_currency(initial_investment)} invested")}
-                </div>
-                
-                <h3 class="subsection-title">Risk Profile</h3>
-                <div class="kpi-grid">
-                    {create_kpi_card("Break-Even Volume", f"{be_patients_str} pts", f"Current: {patients} pts")}
-                    {create_kpi_card("Margin of Safety", mos_pct_str, f"{mos_pat_str} patient buffer")}
-                    {create_kpi_card("Strategic Position", strategic_position, f"vs industry benchmarks")}
-                    {create_kpi_card("Stress EBITDA", format_currency(worst_ebitda) if has_stress_data else "N/A", f"{worst_impact:+.1f}% worst case" if has_stress_data else "N/A")}
+
+            /* PARAMETER GRID */
+            .param-grid {{
+                display: grid;
+                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+                gap: 0.75rem;
+                background: {PALETTE["surface_alt"]};
+                padding: 1.5rem;
+                border-radius: 12px;
+                margin: 1.5rem 0;
+            }}
+
+            .param-item {{
+                font-size: 0.78rem;
+            }}
+
+            .param-item .label {{
+                color: {PALETTE["text_tertiary"]};
+                font-size: 0.68rem;
+                text-transform: uppercase;
+                letter-spacing: 0.04em;
+                font-weight: 600;
+            }}
+
+            .param-item .value {{
+                color: {PALETTE["text_primary"]};
+                font-weight: 700;
+                font-size: 0.9rem;
+                margin-top: 0.2rem;
+            }}
+
+            /* FOOTER */
+            .footer {{
+                background: {PALETTE["surface_alt"]};
+                padding: 2rem 3rem;
+                text-align: center;
+                font-size: 0.75rem;
+                color: {PALETTE["text_tertiary"]};
+                border-top: 1px solid #e2e8f0;
+            }}
+
+            /* PRINT STYLES */
+            @media print {{
+                body {{
+                    background: white;
+                }}
+                .container {{
+                    box-shadow: none;
+                }}
+                .section {{
+                    page-break-inside: avoid;
+                }}
+                .chart-container {{
+                    page-break-inside: avoid;
+                }}
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <!-- HEADER -->
+            <div class="header">
+                <div class="header-logo">
+                    {logo_html}
                 </div>
-                
-                {create_insight_section(
-                    "1",
-                    "Executive Assessment",
-                    f'''<p>This outpatient clinic generates <b>{format_currency(ebitda_y)}</b> in annual EBITDA 
-                    with a <b>{format_percentage(ebitda_margin)}</b> margin on <b>{format_currency(rev_y)}</b> of revenue 
-                    from {patients} patients. The business is positioned as a <span class="tag {position_class}">{strategic_position}</span> 
-                    within the specialized healthcare services sector.</p>
-                    
-                    <p><b>Value creation:</b> {'Positive NPV of <b>' + format_currency(npv_val) + '</b> and IRR of <b>' + irr_str + '</b> (above the ' + format_percentage(ke) + ' hurdle rate) support the investment thesis.' if npv_val > 0 and irr_val and irr_val > ke else 'Current parameters do not create sufficient value; operational improvements or structural changes required before investment.'}</p>
-                    
-                    <p><b>Risk assessment:</b> The model maintains a <b>{mos_pct_str}</b> 
-                    margin of safety, breaking even at <b>{be_patients_str} patients</b>. 
-                    {'Resilience to downside scenarios is adequate for healthcare operations.' if not np.isnan(mos_pct) and mos_pct >= 0.3 else 'Limited buffer requires tight operational discipline and continuous monitoring.'}</p>
-                    
-                    <p><b>Strategic implications:</b> Revenue efficiency of <b>{currency_symbol}{revenue_per_dollar_cost:.2f}</b> per {currency_symbol}1 of cost 
-                    and an implied <b>{ev_ebitda_str}</b> EV/EBITDA multiple {'aligns with market valuations for specialized outpatient facilities (6–10x benchmark).' if ev_ebitda and 5 <= ev_ebitda <= 12 else 'suggests reassessment of operating model or exit strategy.'}</p>'''
-                )}
+                <h1>Clinic P&L Financial Analysis Report</h1>
+                <div class="subtitle">Colombiana de Trasplantes · Outpatient Follow-up Division</div>
+                <div class="meta">Generated on {report_date} · All figures in thousands {currency} ({currency_label})</div>
             </div>
-            
-            <!-- ========================================== -->
-            <!-- SECTION 2: BASE CASE FINANCIAL MODEL -->
-            <!-- ========================================== -->
-            <div class="section">
-                <h2 class="section-title">2. Base Case Financial Model</h2>
-                
-                <h3 class="subsection-title">Model Parameters</h3>
-                <div class="param-grid">
-                    <div class="param-item">
-                        <div class="label">Volume</div>
-                        <div class="value">{patients} patients/year</div>
-                    </div>
-                    <div class="param-item">
-                        <div class="label">Tariff</div>
-                        <div class="value">{format_currency(tariff)}</div>
-                    </div>
-                    <div class="param-item">
-                        <div class="label">Tax Rate</div>
-                        <div class="value">{format_percentage(tax_rate)}</div>
+
+            <div class="content">
+                <!-- ========================================== -->
+                <!-- SECTION 1: EXECUTIVE SUMMARY -->
+                <!-- ========================================== -->
+                <div class="section">
+                    <h2 class="section-title">1. Executive Summary & Investment Recommendation</h2>
+
+                    <div class="recommendation-box">
+                        <div class="rec-label">Investment Recommendation</div>
+                        <div class="rec-value">
+                            <span class="tag {rec_class}" style="font-size: 1.1rem; padding: 0.4rem 1rem;">
+                                {recommendation}
+                            </span>
+                        </div>
+                        <div class="rec-text">{rec_text}</div>
                     </div>
-                    <div class="param-item">
-                        <div class="label">Growth Rate</div>
-                        <div class="value">{format_percentage(rev_growth)}</div>
+
+                    <h3 class="subsection-title">Financial Profile</h3>
+                    <div class="kpi-grid">
+                        {create_kpi_card("Annual Revenue", format_currency(rev_y), f"{patients} pts × {format_currency(tariff)}")}
+                        {create_kpi_card("EBITDA", format_currency(ebitda_y), f"{format_percentage(ebitda_margin)} margin")}
+                        {create_kpi_card("Net Profit", format_currency(net_y), f"{format_percentage(net_margin)} after tax")}
+                        {create_kpi_card("Free Cash Flow", format_currency(net_y * fcf_factor), f"{format_percentage(fcf_factor)} conversion")}
                     </div>
-                    <div class="param-item">
-                        <div class="label">Discount Rate</div>
-                        <div class="value">{format_percentage(ke)}</div>
+
+                    <h3 class="subsection-title">Investment Metrics</h3>
+                    <div class="kpi-grid">
+                        {create_kpi_card("NPV", format_currency(npv_val), f"@ {format_percentage(ke)} discount rate")}
+                        {create_kpi_card("IRR", irr_str, f"vs {format_percentage(ke)} hurdle")}
+                        {create_kpi_card("Payback Period", payback_str, f"EV/EBITDA: {ev_ebitda_str}")}
+                        {create_kpi_card("ROIC (proxy)", format_percentage(roic_proxy), f"on {format_currency(initial_investment)} invested")}
                     </div>
-                    <div class="param-item">
-                        <div class="label">Initial Investment</div>
-                        <div class="value">{format_currency(initial_investment)}</div>
+
+                    <h3 class="subsection-title">Risk Profile</h3>
+                    <div class="kpi-grid">
+                        {create_kpi_card("Break-Even Volume", f"{be_patients_str} pts", f"Current: {patients} pts")}
+                        {create_kpi_card("Margin of Safety", mos_pct_str, f"{mos_pat_str} patient buffer")}
+                        {create_kpi_card("Strategic Position", strategic_position, f"vs industry benchmarks")}
+                        {create_kpi_card("Stress EBITDA", format_currency(worst_ebitda) if has_stress_data else "N/A", f"{worst_impact:+.1f}% worst case" if has_stress_data else "N/A")}
                     </div>
+
+                    {create_insight_section(
+                        "1",
+                        "Executive Assessment",
+                        f'''<p>This outpatient clinic generates <b>{format_currency(ebitda_y)}</b> in annual EBITDA 
+                        with a <b>{format_percentage(ebitda_margin)}</b> margin on <b>{format_currency(rev_y)}</b> of revenue 
+                        from {patients} patients. The business is positioned as a <span class="tag {position_class}">{strategic_position}</span> 
+                        within the specialized healthcare services sector.</p>
+
+                        <p><b>Value creation:</b> {'Positive NPV of <b>' + format_currency(npv_val) + '</b> and IRR of <b>' + irr_str + '</b> (above the ' + format_percentage(ke) + ' hurdle rate) support the investment thesis.' if npv_val > 0 and irr_val and irr_val > ke else 'Current parameters do not create sufficient value; operational improvements or structural changes required before investment.'}</p>
+
+                        <p><b>Risk assessment:</b> The model maintains a <b>{mos_pct_str}</b> 
+                        margin of safety, breaking even at <b>{be_patients_str} patients</b>. 
+                        {'Resilience to downside scenarios is adequate for healthcare operations.' if not np.isnan(mos_pct) and mos_pct >= 0.3 else 'Limited buffer requires tight operational discipline and continuous monitoring.'}</p>
+
+                        <p><b>Strategic implications:</b> Revenue efficiency of <b>{currency_symbol}{revenue_per_dollar_cost:.2f}</b> per {currency_symbol}1 of cost 
+                        and an implied <b>{ev_ebitda_str}</b> EV/EBITDA multiple {'aligns with market valuations for specialized outpatient facilities (6–10x benchmark).' if ev_ebitda and 5 <= ev_ebitda <= 12 else 'suggests reassessment of operating model or exit strategy.'}</p>'''
+                    )}
                 </div>
-                
-                <h3 class="subsection-title">Profit & Loss Statement</h3>
-                {df_to_html_custom(pnl_df, "", False)}
-                
-                {create_insight_section(
-                    "2",
-                    "P&L Structure Analysis",
-                    f'''<p>{interpret_margin(ebitda_margin, 'EBITDA')}</p>
-                    <p>{interpret_margin(net_margin, 'Net')}</p>
-                    <p><b>Profitability cascade:</b> For every dollar of revenue, <b>{gross_margin*100:.1f}%</b> remains 
-                    after direct costs, <b>{ebitda_margin*100:.1f}%</b> after operating expenses, and 
-                    <b>{net_margin*100:.1f}%</b> flows to bottom line.</p>
-                    <p><b>Cost efficiency:</b> The business generates <b>{currency_symbol}{revenue_per_dollar_cost:.2f}</b> of revenue 
-                    for every dollar of total costs {'(excellent efficiency)' if revenue_per_dollar_cost >= 1.5 else '(good efficiency)' if revenue_per_dollar_cost >= 1.3 else '(adequate efficiency)' if revenue_per_dollar_cost >= 1.2 else '(low efficiency - requires attention)'}.</p>'''
-                )}
-            </div>
-            
-            <!-- ========================================== -->
-            <!-- SECTION 3: UNIT ECONOMICS & COST STRUCTURE -->
-            <!-- ========================================== -->
-            <div class="section">
-                <h2 class="section-title">3. Unit Economics & Cost Structure</h2>
-                
-                <h3 class="subsection-title">Cost Breakdown</h3>
-                <div class="kpi-grid">
-                    {create_kpi_card("Clinical Staff", format_currency(clinical_y), f"{format_percentage(clinical_y/rev_y)} of revenue")}
-                    {create_kpi_card("Drugs (w/ contingency)", format_currency(drugs_y), f"{format_percentage(drugs_y/rev_y)} of revenue")}
-                    {create_kpi_card("Labs & Imaging", format_currency(labs_y), f"{format_percentage(labs_y/rev_y)} of revenue")}
-                    {create_kpi_card("Administrative", format_currency(admin_y), f"{format_percentage(admin_y/rev_y)} of revenue")}
-                    {create_kpi_card("Other OpEx", format_currency(other_y), f"{format_percentage(other_y/rev_y)} of revenue")}
-                    {create_kpi_card("Total Costs", format_currency(clinical_y + drugs_y + labs_y + admin_y + other_y), f"{format_percentage((clinical_y+drugs_y+labs_y+admin_y+other_y)/rev_y)} of revenue")}
-                </div>
-                
-                <h3 class="subsection-title">Fixed vs Variable Analysis</h3>
-                <div class="kpi-grid">
-                    {create_kpi_card("Fixed Costs", format_currency(fixed_y), f"{format_percentage(fixed_ratio)} of revenue")}
-                    {create_kpi_card("Variable Costs", format_currency(drugs_y + labs_y), f"{format_percentage(var_ratio)} of revenue")}
-                    {create_kpi_card("Contribution/Patient", format_currency(contrib_pp), f"{format_percentage(contrib_pp/tariff)} of tariff")}
-                    {create_kpi_card("EBITDA/Patient", format_currency(ebitda_per_patient), f"from {format_currency(tariff)} tariff")}
-                </div>
-                
-                {create_insight_section(
-                    "3",
-                    "Cost Structure & Unit Economics",
-                    interpret_cost_structure(fixed_ratio, var_ratio, clinical_y, admin_y) + "<br><br>" +
-                    interpret_unit_economics(contrib_pp, ebitda_per_patient, tariff)
-                )}
-            </div>
-            
-            <!-- ========================================== -->
-            <!-- SECTION 4: VALUATION & DCF MODEL -->
-            <!-- ========================================== -->
-            <div class="section">
-                <h2 class="section-title">4. DCF Valuation Model</h2>
-                
-                <h3 class="subsection-title">5-Year Cash Flow Projection</h3>
-                {df_to_html_custom(cf_df, "", False)}
-                
-                <h3 class="subsection-title">Valuation Metrics</h3>
-                <div class="kpi-grid">
-                    {create_kpi_card("Discount Rate (Ke)", format_percentage(ke), "Cost of equity / hurdle rate")}
-                    {create_kpi_card("Net Present Value", format_currency(npv_val), "Present value of FCF")}
-                    {create_kpi_card("Internal Rate of Return", irr_str, f"Spread: {format_percentage(irr_val - ke) if irr_val else 'N/A'} vs hurdle")}
-                    {create_kpi_card("Payback & Multiple", payback_str, f"EV/EBITDA: {ev_ebitda_str}")}
-                </div>
-                
-                {create_insight_section(
-                    "4",
-                    "DCF Valuation Analysis",
-                    interpret_valuation(npv_val, irr_val, payback_year, ebitda_y, ke)
-                )}
-            </div>
-            
-            <!-- ========================================== -->
-            <!-- SECTION 5: SENSITIVITY & RISK ANALYSIS -->
-            <!-- ========================================== -->
-            <div class="section">
-                <h2 class="section-title">5. Sensitivity & Risk Analysis</h2>
-                
-                <h3 class="subsection-title">Break-Even Analysis</h3>
-                <div class="kpi-grid">
-                    {create_kpi_card("Unit Contribution", format_currency(contrib_pp), f"{format_percentage(contrib_pp/tariff)} of tariff")}
-                    {create_kpi_card("Break-Even Volume", f"{be_patients_str} pts", f"Revenue: {be_revenue_str}")}
-                    {create_kpi_card("Margin of Safety", mos_pct_str, f"{mos_pat_str} patient buffer")}
-                    {create_kpi_card("Fixed Cost Share", format_percentage(fixed_ratio), f"{format_currency(fixed_y)} annual")}
-                </div>
-                
-                {create_insight_section(
-                    "5",
-                    "Break-Even & CVP Analysis",
-                    interpret_breakeven(patients, be_patients, mos_pct)
-                )}
-                
-                {"<h3 class='subsection-title'>Downside Stress Testing</h3>" + df_to_html_custom(stress_df_report[['name', 'ebitda', 'margin', 'impact_pct']].rename(columns={'name': 'Scenario', 'ebitda': f'EBITDA ({currency_label})', 'margin': 'Margin', 'impact_pct': 'Δ%'}), "", False) if has_stress_data else ""}
-                
-                {create_insight_section(
-                    "6",
-                    "Risk Assessment",
-                    f'''<p><b>Downside resilience:</b> Under combined adverse scenarios (payer mix erosion, volume decline, cost inflation), 
-                    EBITDA {'remains positive at <b>' + format_currency(worst_ebitda) + '</b>, representing a <b>' + str(abs(worst_impact)) + '%</b> reduction from baseline.' if has_stress_data and worst_ebitda > 0 else 'falls below break-even, indicating vulnerability to simultaneous adverse shocks.' if has_stress_data else 'has not been fully stress-tested in this analysis.'}</p>
-                    
-                    <p><b>Primary risk factors:</b></p>
-                    <ul>
-                        <li><b>Volume risk:</b> High fixed-cost base ({format_percentage(fixed_ratio)} of revenue) creates operating leverage—profits are highly sensitive to patient volume changes</li>
-                        <li><b>Payer mix risk:</b> Tariff erosion or shift to lower-reimbursement payers directly impacts unit economics</li>
-                        <li><b>Cost inflation risk:</b> Clinical labor represents {format_percentage(clinical_y/(clinical_y+admin_y))} of payroll—wage inflation could pressure margins</li>
-                    </ul>
-                    
-                    <p><b>Mitigation strategies:</b> Maintain diversified payer contracts with minimum reimbursement floors, implement systematic referral network development, negotiate multi-year supply contracts, and establish quarterly stress testing protocols.</p>'''
-                ) if has_stress_data else ""}
-            </div>
-            
-            <!-- ========================================== -->
-            <!-- SECTION 6: STRATEGIC POSITIONING -->
-            <!-- ========================================== -->
-            <div class="section">
-                <h2 class="section-title">6. Strategic Positioning & Market Context</h2>
-                
-                <h3 class="subsection-title">Competitive Position</h3>
-                <div class="param-grid">
-                    <div class="param-item">
-                        <div class="label">Classification</div>
-                        <div class="value">
-                            <span class="tag {position_class}">{strategic_position}</span>
+
+                <!-- ========================================== -->
+                <!-- SECTION 2: BASE CASE FINANCIAL MODEL -->
+                <!-- ========================================== -->
+                <div class="section">
+                    <h2 class="section-title">2. Base Case Financial Model</h2>
+
+                    <h3 class="subsection-title">Model Parameters</h3>
+                    <div class="param-grid">
+                        <div class="param-item">
+                            <div class="label">Volume</div>
+                            <div class="value">{patients} patients/year</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">Tariff</div>
+                            <div class="value">{format_currency(tariff)}</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">Tax Rate</div>
+                            <div class="value">{format_percentage(tax_rate)}</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">Growth Rate</div>
+                            <div class="value">{format_percentage(rev_growth)}</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">Discount Rate</div>
+                            <div class="value">{format_percentage(ke)}</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">Initial Investment</div>
+                            <div class="value">{format_currency(initial_investment)}</div>
                         </div>
                     </div>
-                    <div class="param-item">
-                        <div class="label">EBITDA Margin</div>
-                        <div class="value">{format_percentage(ebitda_margin)}</div>
-                        <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">vs 25-35% benchmark</div>
+
+                    <h3 class="subsection-title">Profit & Loss Statement</h3>
+                    {df_to_html_custom(pnl_df, "", False)}
+
+                    {create_insight_section(
+                        "2",
+                        "P&L Structure Analysis",
+                        f'''<p>{interpret_margin(ebitda_margin, 'EBITDA')}</p>
+                        <p>{interpret_margin(net_margin, 'Net')}</p>
+                        <p><b>Profitability cascade:</b> For every dollar of revenue, <b>{gross_margin*100:.1f}%</b> remains 
+                        after direct costs, <b>{ebitda_margin*100:.1f}%</b> after operating expenses, and 
+                        <b>{net_margin*100:.1f}%</b> flows to bottom line.</p>
+                        <p><b>Cost efficiency:</b> The business generates <b>{currency_symbol}{revenue_per_dollar_cost:.2f}</b> of revenue 
+                        for every dollar of total costs {'(excellent efficiency)' if revenue_per_dollar_cost >= 1.5 else '(good efficiency)' if revenue_per_dollar_cost >= 1.3 else '(adequate efficiency)' if revenue_per_dollar_cost >= 1.2 else '(low efficiency - requires attention)'}.</p>'''
+                    )}
+                </div>
+
+                <!-- ========================================== -->
+                <!-- SECTION 3: UNIT ECONOMICS & COST STRUCTURE -->
+                <!-- ========================================== -->
+                <div class="section">
+                    <h2 class="section-title">3. Unit Economics & Cost Structure</h2>
+
+                    <h3 class="subsection-title">Cost Breakdown</h3>
+                    <div class="kpi-grid">
+                        {create_kpi_card("Clinical Staff", format_currency(clinical_y), f"{format_percentage(clinical_y/rev_y)} of revenue")}
+                        {create_kpi_card("Drugs (w/ contingency)", format_currency(drugs_y), f"{format_percentage(drugs_y/rev_y)} of revenue")}
+                        {create_kpi_card("Labs & Imaging", format_currency(labs_y), f"{format_percentage(labs_y/rev_y)} of revenue")}
+                        {create_kpi_card("Administrative", format_currency(admin_y), f"{format_percentage(admin_y/rev_y)} of revenue")}
+                        {create_kpi_card("Other OpEx", format_currency(other_y), f"{format_percentage(other_y/rev_y)} of revenue")}
+                        {create_kpi_card("Total Costs", format_currency(clinical_y + drugs_y + labs_y + admin_y + other_y), f"{format_percentage((clinical_y+drugs_y+labs_y+admin_y+other_y)/rev_y)} of revenue")}
                     </div>
-                    <div class="param-item">
-                        <div class="label">Safety Margin</div>
-                        <div class="value">{mos_pct_str}</div>
-                        <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">above break-even</div>
+
+                    <h3 class="subsection-title">Fixed vs Variable Analysis</h3>
+                    <div class="kpi-grid">
+                        {create_kpi_card("Fixed Costs", format_currency(fixed_y), f"{format_percentage(fixed_ratio)} of revenue")}
+                        {create_kpi_card("Variable Costs", format_currency(drugs_y + labs_y), f"{format_percentage(var_ratio)} of revenue")}
+                        {create_kpi_card("Contribution/Patient", format_currency(contrib_pp), f"{format_percentage(contrib_pp/tariff)} of tariff")}
+                        {create_kpi_card("EBITDA/Patient", format_currency(ebitda_per_patient), f"from {format_currency(tariff)} tariff")}
                     </div>
-                    <div class="param-item">
-                        <div class="label">Revenue Efficiency</div>
-                        <div class="value">{currency_symbol}{revenue_per_dollar_cost:.2f}</div>
-                        <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">per dollar of cost</div>
+
+                    {create_insight_section(
+                        "3",
+                        "Cost Structure & Unit Economics",
+                        interpret_cost_structure(fixed_ratio, var_ratio, clinical_y, admin_y) + "<br><br>" +
+                        interpret_unit_economics(contrib_pp, ebitda_per_patient, tariff)
+                    )}
+                </div>
+
+                <!-- ========================================== -->
+                <!-- SECTION 4: VALUATION & DCF MODEL -->
+                <!-- ========================================== -->
+                <div class="section">
+                    <h2 class="section-title">4. DCF Valuation Model</h2>
+
+                    <h3 class="subsection-title">5-Year Cash Flow Projection</h3>
+                    {df_to_html_custom(cf_df, "", False)}
+
+                    <h3 class="subsection-title">Valuation Metrics</h3>
+                    <div class="kpi-grid">
+                        {create_kpi_card("Discount Rate (Ke)", format_percentage(ke), "Cost of equity / hurdle rate")}
+                        {create_kpi_card("Net Present Value", format_currency(npv_val), "Present value of FCF")}
+                        {create_kpi_card("Internal Rate of Return", irr_str, f"Spread: {format_percentage(irr_val - ke) if irr_val else 'N/A'} vs hurdle")}
+                        {create_kpi_card("Payback & Multiple", payback_str, f"EV/EBITDA: {ev_ebitda_str}")}
                     </div>
-                    <div class="param-item">
-                        <div class="label">ROIC (proxy)</div>
-                        <div class="value">{format_percentage(roic_proxy)}</div>
-                        <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">return on invested capital</div>
+
+                    {create_insight_section(
+                        "4",
+                        "DCF Valuation Analysis",
+                        interpret_valuation(npv_val, irr_val, payback_year, ebitda_y, ke)
+                    )}
+                </div>
+
+                <!-- ========================================== -->
+                <!-- SECTION 5: SENSITIVITY & RISK ANALYSIS -->
+                <!-- ========================================== -->
+                <div class="section">
+                    <h2 class="section-title">5. Sensitivity & Risk Analysis</h2>
+
+                    <h3 class="subsection-title">Break-Even Analysis</h3>
+                    <div class="kpi-grid">
+                        {create_kpi_card("Unit Contribution", format_currency(contrib_pp), f"{format_percentage(contrib_pp/tariff)} of tariff")}
+                        {create_kpi_card("Break-Even Volume", f"{be_patients_str} pts", f"Revenue: {be_revenue_str}")}
+                        {create_kpi_card("Margin of Safety", mos_pct_str, f"{mos_pat_str} patient buffer")}
+                        {create_kpi_card("Fixed Cost Share", format_percentage(fixed_ratio), f"{format_currency(fixed_y)} annual")}
                     </div>
-                    <div class="param-item">
-                        <div class="label">EV/EBITDA Multiple</div>
-                        <div class="value">{ev_ebitda_str}</div>
-                        <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">vs 6-10x benchmark</div>
+
+                    {create_insight_section(
+                        "5",
+                        "Break-Even & CVP Analysis",
+                        interpret_breakeven(patients, be_patients, mos_pct)
+                    )}
+
+                    {"<h3 class='subsection-title'>Downside Stress Testing</h3>" + df_to_html_custom(stress_df_report[['name', 'ebitda', 'margin', 'impact_pct']].rename(columns={'name': 'Scenario', 'ebitda': f'EBITDA ({currency_label})', 'margin': 'Margin', 'impact_pct': 'Δ%'}), "", False) if has_stress_data else ""}
+
+                    {create_insight_section(
+                        "6",
+                        "Risk Assessment",
+                        f'''<p><b>Downside resilience:</b> Under combined adverse scenarios (payer mix erosion, volume decline, cost inflation), 
+                        EBITDA {'remains positive at <b>' + format_currency(worst_ebitda) + '</b>, representing a <b>' + str(abs(worst_impact)) + '%</b> reduction from baseline.' if has_stress_data and worst_ebitda > 0 else 'falls below break-even, indicating vulnerability to simultaneous adverse shocks.' if has_stress_data else 'has not been fully stress-tested in this analysis.'}</p>
+
+                        <p><b>Primary risk factors:</b></p>
+                        <ul>
+                            <li><b>Volume risk:</b> High fixed-cost base ({format_percentage(fixed_ratio)} of revenue) creates operating leverage—profits are highly sensitive to patient volume changes</li>
+                            <li><b>Payer mix risk:</b> Tariff erosion or shift to lower-reimbursement payers directly impacts unit economics</li>
+                            <li><b>Cost inflation risk:</b> Clinical labor represents {format_percentage(clinical_y/(clinical_y+admin_y))} of payroll—wage inflation could pressure margins</li>
+                        </ul>
+
+                        <p><b>Mitigation strategies:</b> Maintain diversified payer contracts with minimum reimbursement floors, implement systematic referral network development, negotiate multi-year supply contracts, and establish quarterly stress testing protocols.</p>'''
+                    ) if has_stress_data else ""}
+                </div>
+
+                <!-- ========================================== -->
+                <!-- SECTION 6: STRATEGIC POSITIONING -->
+                <!-- ========================================== -->
+                <div class="section">
+                    <h2 class="section-title">6. Strategic Positioning & Market Context</h2>
+
+                    <h3 class="subsection-title">Competitive Position</h3>
+                    <div class="param-grid">
+                        <div class="param-item">
+                            <div class="label">Classification</div>
+                            <div class="value">
+                                <span class="tag {position_class}">{strategic_position}</span>
+                            </div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">EBITDA Margin</div>
+                            <div class="value">{format_percentage(ebitda_margin)}</div>
+                            <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">vs 25-35% benchmark</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">Safety Margin</div>
+                            <div class="value">{mos_pct_str}</div>
+                            <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">above break-even</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">Revenue Efficiency</div>
+                            <div class="value">{currency_symbol}{revenue_per_dollar_cost:.2f}</div>
+                            <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">per dollar of cost</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">ROIC (proxy)</div>
+                            <div class="value">{format_percentage(roic_proxy)}</div>
+                            <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">return on invested capital</div>
+                        </div>
+                        <div class="param-item">
+                            <div class="label">EV/EBITDA Multiple</div>
+                            <div class="value">{ev_ebitda_str}</div>
+                            <div style="font-size:0.7rem;color:#64748b;margin-top:0.2rem;">vs 6-10x benchmark</div>
+                        </div>
                     </div>
+
+                    {create_insight_section(
+                        "7",
+                        "Strategic Assessment",
+                        f'''<p><b>Market positioning:</b> The business demonstrates 
+                        {"strong" if ebitda_margin >= 0.25 else "moderate" if ebitda_margin >= 0.15 else "weak"} 
+                        competitive positioning within the specialized healthcare delivery sector. Operating margins 
+                        {'exceed' if ebitda_margin > 0.30 else 'align with' if ebitda_margin >= 0.20 else 'fall below'} 
+                        industry benchmarks for outpatient facilities (25–35%).</p>
+
+                        <p><b>Competitive advantages:</b></p>
+                        <ul>
+                            <li>Specialized transplant follow-up creates referral barriers and clinical expertise moats</li>
+                            <li>{'Strong' if revenue_per_dollar_cost >= 1.5 else 'Adequate' if revenue_per_dollar_cost >= 1.3 else 'Limited'} 
+                            operational efficiency with {currency_symbol}{revenue_per_dollar_cost:.2f} revenue per cost {currency_symbol}1</li>
+                            <li>{'Robust' if not np.isnan(mos_pct) and mos_pct >= 0.4 else 'Moderate' if not np.isnan(mos_pct) and mos_pct >= 0.25 else 'Limited'} 
+                            margin of safety provides operational flexibility</li>
+                        </ul>
+
+                        <p><b>Strategic imperatives:</b></p>
+                        <ul>
+                            <li><b>Volume growth:</b> With {format_percentage(fixed_ratio)} fixed costs, incremental patients are highly accretive—focus on referral network expansion</li>
+                            <li><b>Payer optimization:</b> Current {format_currency(tariff)} tariff must be defended; shift payer mix toward higher-reimbursement contracts</li>
+                            <li><b>Cost discipline:</b> Variable costs at {format_percentage(var_ratio)} provide some flexibility, but clinical labor inflation must be monitored</li>
+                            <li><b>Scale benefits:</b> Break-even at {be_patients_str} patients vs {patients} current—operating leverage supports expansion</li>
+                        </ul>
+
+                        <p><b>Investment thesis:</b> {'This asset creates value through a combination of specialized clinical positioning, operating scale, and favorable unit economics. The <b>' + format_currency(npv_val) + '</b> NPV and <b>' + irr_str + '</b> IRR support investment at current parameters.' if npv_val > 0 and irr_val and irr_val > ke else 'Current operating parameters do not generate sufficient returns. Structural improvements in volume, tariff, or cost structure are required before investment is recommended.'}</p>'''
+                    )}
                 </div>
-                
-                {create_insight_section(
-                    "7",
-                    "Strategic Assessment",
-                    f'''<p><b>Market positioning:</b> The business demonstrates 
-                    {"strong" if ebitda_margin >= 0.25 else "moderate" if ebitda_margin >= 0.15 else "weak"} 
-                    competitive positioning within the specialized healthcare delivery sector. Operating margins 
-                    {'exceed' if ebitda_margin > 0.30 else 'align with' if ebitda_margin >= 0.20 else 'fall below'} 
-                    industry benchmarks for outpatient facilities (25–35%).</p>
-                    
-                    <p><b>Competitive advantages:</b></p>
-                    <ul>
-                        <li>Specialized transplant follow-up creates referral barriers and clinical expertise moats</li>
-                        <li>{'Strong' if revenue_per_dollar_cost >= 1.5 else 'Adequate' if revenue_per_dollar_cost >= 1.3 else 'Limited'} 
-                        operational efficiency with {currency_symbol}{revenue_per_dollar_cost:.2f} revenue per cost {currency_symbol}1</li>
-                        <li>{'Robust' if not np.isnan(mos_pct) and mos_pct >= 0.4 else 'Moderate' if not np.isnan(mos_pct) and mos_pct >= 0.25 else 'Limited'} 
-                        margin of safety provides operational flexibility</li>
-                    </ul>
-                    
-                    <p><b>Strategic imperatives:</b></p>
-                    <ul>
-                        <li><b>Volume growth:</b> With {format_percentage(fixed_ratio)} fixed costs, incremental patients are highly accretive—focus on referral network expansion</li>
-                        <li><b>Payer optimization:</b> Current {format_currency(tariff)} tariff must be defended; shift payer mix toward higher-reimbursement contracts</li>
-                        <li><b>Cost discipline:</b> Variable costs at {format_percentage(var_ratio)} provide some flexibility, but clinical labor inflation must be monitored</li>
-                        <li><b>Scale benefits:</b> Break-even at {be_patients_str} patients vs {patients} current—operating leverage supports expansion</li>
-                    </ul>
-                    
-                    <p><b>Investment thesis:</b> {'This asset creates value through a combination of specialized clinical positioning, operating scale, and favorable unit economics. The <b>' + format_currency(npv_val) + '</b> NPV and <b>' + irr_str + '</b> IRR support investment at current parameters.' if npv_val > 0 and irr_val and irr_val > ke else 'Current operating parameters do not generate sufficient returns. Structural improvements in volume, tariff, or cost structure are required before investment is recommended.'}</p>'''
-                )}
+
+            </div>
+
+            <!-- FOOTER -->
+            <div class="footer">
+                <p><b>Colombiana de Trasplantes</b> · Outpatient Follow-up Division Financial Analysis</p>
+                <p>Report generated automatically from Streamlit financial model · {report_date}</p>
+                <p style="margin-top:0.5rem;font-size:0.7rem;">
+                    This analysis is based on current operating assumptions and market conditions. 
+                    Actual results may vary. All projections are subject to execution risk and market dynamics.
+                </p>
             </div>
-            
-        </div>
-        
-        <!-- FOOTER -->
-        <div class="footer">
-            <p><b>Colombiana de Trasplantes</b> · Outpatient Follow-up Division Financial Analysis</p>
-            <p>Report generated automatically from Streamlit financial model · {report_date}</p>
-            <p style="margin-top:0.5rem;font-size:0.7rem;">
-                This analysis is based on current operating assumptions and market conditions. 
-                Actual results may vary. All projections are subject to execution risk and market dynamics.
-            </p>
         </div>
-    </div>
-</body>
-</html>
-"""
+    </body>
+    </html>
+    """
+    return report_html
 
 # =========================================================
 # DOWNLOAD BUTTON IN SIDEBAR
@@ -4039,14 +4910,54 @@ st.sidebar.markdown(
     unsafe_allow_html=True
 )
 
-st.sidebar.download_button(
-    label="Download Full Report\n(HTML)",
-    data=report_html,
-    file_name=f"Clinic_Financial_Report_{report_filename}.html",
-    mime="text/html",
-    help="Download complete financial analysis report with all charts and interpretations",
-    use_container_width=True
-)
+# The report is only built when the button is clicked (deferred data),
+# so reruns no longer build it or store it for download. Built reports
+# are kept per input hash: every assumption, the currency and the rates.
+@st.cache_resource
+def shared_report_cache():
+    """Built reports by input hash, shared by every session"""
+    return new_lru(max_bytes=16 * 2**20)
+
+
+report_cache = shared_report_cache()
+report_key = input_hash({
+    "inputs": {name: st.session_state[f"in_{name}"] for name in ASSUMPTION_INPUTS},
+    "currency": currency,
+    "rates_date": rates_date,
+})
+
+
+def report_download():
+    """
+    Deferred download data: the cached report for these inputs, else
+    built now, stamped with the time of this download. Runs outside the
+    rerun (on the download request), so in debug mode it is traced as a
+    run of its own.
+    """
+    traced = debug_mode and not tracing.active()
+    if traced:
+        tracing.begin("report download", enabled=True)
+    hit, html = lru_get(report_cache, report_key)
+    if not hit:
+        with tracing.span("report build"):
+            html = build_report_html()
+        lru_put(report_cache, report_key, html)
+    html = html.replace(REPORT_DATE_MARK, datetime.now().strftime("%B %d, %Y at %H:%M"))
+    if traced:
+        keep_trace(tracing.end())
+    return html
+
+
+with tracing.span("download button"):
+    st.sidebar.download_button(
+        label="Download Full Report\n(HTML)",
+        data=report_download,
+        file_name=f"Clinic_Financial_Report_{report_filename}.html",
+        mime="text/html",
+        on_click="ignore",
+        help="Download complete financial analysis report with all charts and interpretations",
+        width="stretch"
+    )
 
 st.sidebar.markdown(
     '<div style="font-size:0.68rem;color:rgba(255,255,255,0.7);margin-top:0.5rem;line-height:1.4;">'
@@ -4056,6 +4967,42 @@ st.sidebar.markdown(
     unsafe_allow_html=True
 )
 
+tracing.section("logs + footer")
+
+# =========================================================
+# RECALCULATION LOG (graph.py) – which nodes ran this rerun
+# =========================================================
+calc_nodes, calc_recomputed, calc_ms = run_summary(calc_graph)
+with st.sidebar.expander(f"Recalculation log ({calc_recomputed}/{calc_nodes} nodes, {calc_ms:,.0f} ms)"):
+    st.dataframe(
+        pd.DataFrame(
+            [
+                {
+                    "Node": e["node"],
+                    "Status": e["status"],
+                    "Time (ms)": round(e["ms"], 1),
+                    "Depends on": ", ".join(e["deps"]) or "inputs",
+                }
+                for e in calc_graph["log"]
+            ]
+        ),
+        width="stretch",
+        hide_index=True,
+    )
+    st.caption(
+        "recomputed: inputs or upstream nodes changed · unchanged: recomputed, same result "
+        "(dependants kept) · cached: served from memory · shared: figure reused from the "
+        "cross-session figure cache"
+    )
+    fig_stats = lru_stats(figure_cache)
+    st.caption(
+        f"Figure cache: {fig_stats['entries']} figures, "
+        f"{fig_stats['bytes'] / 2**20:,.1f} / {fig_stats['max_bytes'] / 2**20:,.0f} MB · "
+        f"{fig_stats['hits']} hits / {fig_stats['misses']} misses"
+        + ("" if np.isnan(fig_stats["hit_rate"]) else f" ({fig_stats['hit_rate']:.0%} hit rate)")
+        + f" · {fig_stats['evictions']} evicted"
+    )
+
 # =========================================================
 # FOOTER
 # =========================================================
@@ -4068,3 +5015,205 @@ footer_html = f"""
 </div>
 """
 st.markdown(footer_html, unsafe_allow_html=True)
+
+# =========================================================
+# STARTUP PROFILE (CLINIC_PROFILE_STARTUP=1, startup.py)
+# This run next to the first run of the process (cold imports)
+# =========================================================
+startup_report = startup.end()
+if startup_report is not None:
+    cold = startup_report["cold"]
+    with st.sidebar.expander(f"Startup profile (run {startup_report['run']}, {startup_report['total_ms']:,.0f} ms)"):
+        cold_phases = {p["phase"]: p for p in cold["phases"]}
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Phase": p["phase"],
+                        "This run (ms)": round(p["ms"], 1),
+                        "First run (ms)": round(cold_phases[p["phase"]]["ms"], 1) if p["phase"] in cold_phases else None,
+                        "Imported on first run": ", ".join(cold_phases.get(p["phase"], p)["imported"]),
+                    }
+                    for p in startup_report["phases"]
+                ]
+            ),
+            width="stretch",
+            hide_index=True,
+        )
+        st.caption(
+            f"First render: {startup_report['first_render_ms']:,.0f} ms this run · "
+            f"{cold['first_render_ms']:,.0f} ms on the first run · "
+            f"first run total {cold['total_ms']:,.0f} ms"
+        )
+
+# =========================================================
+# RERUN TRACE (?debug=1 or CLINIC_TRACE=1, tracing.py)
+# Flame breakdown of this rerun (sections, spans and the graph nodes
+# evaluated) and Chrome trace export of the last reruns of the session
+# =========================================================
+TRACE_KEEP = 20
+trace_runs = st.session_state.setdefault("trace_runs", [])
+
+
+def keep_trace(run):
+    """Keep the last TRACE_KEEP traced runs of this session"""
+    trace_runs.append(run)
+    del trace_runs[:-TRACE_KEEP]
+
+
+for e in calc_graph["log"]:
+    if e["t0"] is not None:
+        tracing.add_span(
+            f"node: {e['node']}", e["t0"], e["t0"] + e["ms"] / 1000, cat="node", args={"status": e["status"]}
+        )
+trace_run = tracing.end()
+if trace_run is not None:
+    keep_trace(trace_run)
+
+if debug_mode and trace_runs:
+    with st.sidebar.expander(f"Rerun trace (#{trace_runs[-1]['run']}, {trace_runs[-1]['total_ms']:,.0f} ms)"):
+        shown = st.selectbox(
+            "Run",
+            range(len(trace_runs) - 1, -1, -1),
+            format_func=lambda i: f"#{trace_runs[i]['run']} {trace_runs[i]['name']} · {trace_runs[i]['total_ms']:,.0f} ms",
+            key="trace_shown",
+        )
+        rows = tracing.flame(trace_runs[shown])
+        fig_flame = go.Figure(
+            go.Bar(
+                orientation="h",
+                base=[r["start_ms"] for r in rows],
+                x=[r["ms"] for r in rows],
+                y=[r["depth"] for r in rows],
+                text=[r["name"] for r in rows],
+                textposition="inside",
+                insidetextanchor="start",
+                marker_color=[
+                    {"section": PALETTE["primary"], "node": PALETTE["success"]}.get(r["cat"], PALETTE["secondary"])
+                    for r in rows
+                ],
+                hovertemplate="%{text}<br>%{x:,.1f} ms<extra></extra>",
+            )
+        )
+        fig_flame.update_layout(
+            height=120 + 28 * (max(r["depth"] for r in rows) + 1) if rows else 150,
+            margin=dict(l=10, r=10, t=10, b=30),
+            xaxis_title="ms",
+            yaxis=dict(autorange="reversed", showticklabels=False),
+            showlegend=False,
+        )
+        st.plotly_chart(fig_flame, width="stretch")
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Span": "· " * r["depth"] + r["name"],
+                        "Start (ms)": round(r["start_ms"], 1),
+                        "Time (ms)": round(r["ms"], 1),
+                        "Self (ms)": round(r["self_ms"], 1),
+                        "Share": r["share"],
+                    }
+                    for r in rows
+                ]
+            ),
+            column_config={"Share": st.column_config.ProgressColumn("Share", min_value=0.0, max_value=1.0, format="percent")},
+            width="stretch",
+            hide_index=True,
+        )
+        st.download_button(
+            "Chrome trace (this run)",
+            data=tracing.chrome_trace_json([trace_runs[shown]]),
+            file_name=f"trace-{trace_runs[shown]['name'].replace(' ', '-')}-{trace_runs[shown]['run']}.json",
+            mime="application/json",
+            on_click="ignore",
+            width="stretch",
+        )
+        st.download_button(
+            f"Chrome trace (last {len(trace_runs)} runs)",
+            data=tracing.chrome_trace_json(trace_runs),
+            file_name="trace-session.json",
+            mime="application/json",
+            on_click="ignore",
+            width="stretch",
+        )
+        st.caption(
+            "Open in chrome://tracing, ui.perfetto.dev or speedscope.app (one track per run). "
+            "Set CLINIC_TRACE_DIR to write slow reruns to disk (CLINIC_TRACE_SLOW_MS)."
+        )
+
+# =========================================================
+# RERUN ANALYTICS (rerun_stats.py) – which widgets drive the reruns
+# Every session's reruns go to one table per process; the report is
+# shown in debug mode (?debug=1)
+# =========================================================
+rerun_table = shared_rerun_stats()
+if rerun_triggers is None:
+    rerun_triggers = [rerun_stats.SESSION_START]
+rerun_stats.record(
+    rerun_table,
+    rerun_session_id,
+    rerun_triggers or [rerun_stats.NO_CHANGE],
+    (time.perf_counter() - _script_t0) * 1000,
+    rerun_sent["bytes"] if rerun_sent is not None else None,
+)
+st.session_state["rerun_snapshot"] = rerun_stats.snapshot(st.session_state, RERUN_STATE_KEYS)
+
+if debug_mode:
+    rerun_labels = {f"in_{k}": INPUT_LABELS[k] for k in INPUT_FIELDS}
+    rerun_labels.update(section="Section", sidebar_edit_mode="Edit mode (form)", currency="Currency")
+    rerun_report = rerun_stats.report(rerun_table, rerun_labels)
+    with st.sidebar.expander(f"Rerun analytics ({rerun_report['runs']:,} reruns, {len(rerun_report['sessions'])} sessions)"):
+        fragment_runs = ", ".join(f"{name} {runs:,}" for name, runs in rerun_report["fragments"].items())
+        st.caption(
+            (f"Fragment reruns: {fragment_runs}. " if fragment_runs else "")
+            + ("" if rerun_stats.COUNT_BYTES else "Bytes sent are counted with CLINIC_RERUN_BYTES=1.")
+        )
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Trigger": t["trigger"],
+                        "Reruns": t["runs"],
+                        "Share": t["share"],
+                        "Sessions": t["sessions"],
+                        "p50 (ms)": round(t["p50_ms"], 1),
+                        "p95 (ms)": round(t["p95_ms"], 1),
+                        "Total (s)": round(t["total_ms"] / 1000, 2),
+                        "Mean sent (KB)": round(t["mean_bytes"] / 1024, 1) if t["mean_bytes"] is not None else None,
+                    }
+                    for t in rerun_report["triggers"]
+                ]
+            ),
+            column_config={"Share": st.column_config.ProgressColumn("Share", min_value=0.0, max_value=1.0, format="percent")},
+            width="stretch",
+            hide_index=True,
+        )
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Session": s["session"][:8],
+                        "Reruns": s["runs"],
+                        "Total (s)": round(s["total_ms"] / 1000, 2),
+                        "Sent (MB)": round(s["total_bytes"] / 2**20, 2) if s["total_bytes"] is not None else None,
+                        "Top trigger": s["top_trigger"],
+                    }
+                    for s in rerun_report["sessions"]
+                ]
+            ),
+            width="stretch",
+            hide_index=True,
+        )
+        st.download_button(
+            "Rerun analytics (JSON)",
+            data=json.dumps(rerun_report, default=str, indent=2),
+            file_name="rerun-analytics.json",
+            mime="application/json",
+            on_click="ignore",
+            width="stretch",
+        )
+        st.caption(
+            f"Since {datetime.fromtimestamp(rerun_report['since']):%Y-%m-%d %H:%M} · sorted by total server time · "
+            "sent = bytes enqueued for the browser before caching of repeated elements · "
+            "a form submit counts for every widget it changed"
+        )
@@ -0,0 +1,388 @@
+"""
+Clinic P&L – benchmark suite.
+
+Repeatable timings for the hot paths of the app: the model kernel
+(P&L block, batch engine, NPV / IRR / MIRR), the sensitivity grids,
+the stress scenarios, the HTML report build and a full headless
+rerun of app.py through Streamlit's AppTest.
+
+    python bench.py                   run, compare with the baseline if there is one
+    python bench.py --save            run and store the results as the baseline
+    python bench.py --only irr,npv    benchmarks whose name contains any of these
+    python bench.py --threshold 0.3   flag benchmarks more than 30% slower
+    python bench.py --list            names only
+
+Each benchmark is timed over several rounds (calls per round sized to
+~0.2 s, as timeit does); the fastest round per call is compared, since
+it is the least disturbed by the rest of the machine. A benchmark
+counts as regressed when it is slower than the baseline by more than
+the threshold (default 20%) and by at least --min-delta-ms. The exit
+status is 1 when anything regressed, so it can gate a CI step.
+Baselines are JSON (BASELINE_PATH) and belong to one machine: the file
+records python / numpy / streamlit versions and the platform, and a
+mismatch is reported next to the comparison. bench_baseline.json is
+tracked in git as the reference; on another machine compare against a
+local one (--baseline my_baseline.json --save, then --baseline
+my_baseline.json). Re-save the tracked file on its reference machine
+when a change is meant to move the numbers.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from model import (
+    DEFAULT_INPUTS,
+    DEFAULT_STRESS,
+    compute_batch,
+    generate_stress_scenarios,
+    irr_calc,
+    make_batch,
+    mirr_from_cf,
+    npv_calc,
+    npv_growth_discount_grid,
+    npv_zero_discount_rates,
+    pnl_block,
+    scenario_row,
+)
+from sensitivity import axis_values, sensitivity_surface
+
+APP_PATH = Path(__file__).parent / "app.py"
+BASELINE_PATH = Path(__file__).parent / "bench_baseline.json"
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_MIN_DELTA_MS = 0.05
+
+
+# =========================================================
+# TIMING
+# =========================================================
+def time_call(func, rounds=7, target_s=0.2, max_number=100_000):
+    """
+    Time func() like timeit: calls per round grow until a round takes
+    ~target_s, then `rounds` rounds are measured. Returns per-call ms
+    (min, median) and the loop sizes.
+    """
+    func()   # warm-up (imports, caches, first-call allocations)
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= target_s or number >= max_number:
+            break
+        number = min(max_number, number * (2 if elapsed == 0 else max(2, int(target_s / elapsed) + 1)))
+
+    per_call = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - t0) / number * 1000)
+    return {
+        "min_ms": min(per_call),
+        "median_ms": statistics.median(per_call),
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+def time_steps(setup, step, rounds=7):
+    """
+    Time `step` only, with an untimed `setup` before every call (for
+    work that can't be looped, e.g. a cold report build).
+    """
+    setup()
+    step()   # warm-up
+    per_call = []
+    for _ in range(rounds):
+        setup()
+        t0 = time.perf_counter()
+        step()
+        per_call.append((time.perf_counter() - t0) * 1000)
+    return {
+        "min_ms": min(per_call),
+        "median_ms": statistics.median(per_call),
+        "rounds": rounds,
+        "number": 1,
+    }
+
+
+# =========================================================
+# BENCHMARKS
+# Each entry: name -> function returning a time_call / time_steps
+# result. Inputs are the model defaults, so runs are comparable.
+# =========================================================
+def _default_cash_flows():
+    return scenario_row(compute_batch(make_batch(DEFAULT_INPUTS)))["cf"]
+
+
+def bench_pnl_block():
+    return time_call(lambda: pnl_block(DEFAULT_INPUTS))
+
+
+def bench_compute_batch_10k():
+    rng = np.random.default_rng(0)
+    batch = make_batch(DEFAULT_INPUTS, patients=rng.integers(100, 600, 10_000))
+    return time_call(lambda: compute_batch(batch))
+
+
+def bench_npv_calc():
+    cf = _default_cash_flows()
+    return time_call(lambda: npv_calc(DEFAULT_INPUTS["ke"], cf))
+
+
+def bench_irr_calc():
+    cf = _default_cash_flows()
+    return time_call(lambda: irr_calc(cf))
+
+
+def bench_mirr_from_cf():
+    cf = _default_cash_flows()
+    return time_call(lambda: mirr_from_cf(cf, DEFAULT_INPUTS["ke"], DEFAULT_INPUTS["ke"]))
+
+
+def _surface(points):
+    xs = axis_values("patients", DEFAULT_INPUTS["patients"], points=points)
+    ys = axis_values("tariff", DEFAULT_INPUTS["tariff"], points=points)
+    return time_call(lambda: sensitivity_surface(DEFAULT_INPUTS, "patients", xs, "tariff", ys, output="ebitda_y"))
+
+
+def bench_surface_ebitda_15x15():
+    return _surface(15)
+
+
+def bench_surface_ebitda_200x200():
+    return _surface(200)
+
+
+def bench_npv_growth_discount_grid():
+    cf = _default_cash_flows()
+    growth = np.linspace(0.07, 0.30, 41)
+    discount = np.linspace(0.12, 0.24, 41)
+
+    def grid():
+        npv_growth_discount_grid(cf[0], cf[1], growth, discount)
+        npv_zero_discount_rates(cf[0], cf[1], growth)
+    return time_call(grid)
+
+
+def bench_stress_scenarios():
+    row = scenario_row(compute_batch(make_batch(DEFAULT_INPUTS)))
+    return time_call(lambda: generate_stress_scenarios(
+        patients=DEFAULT_INPUTS["patients"], tariff=DEFAULT_INPUTS["tariff"],
+        clinical_y=row["clinical_y"], drugs_y=row["drugs_y"], labs_y=row["labs_y"],
+        admin_y=row["admin_y"], other_y=row["other_y"], **DEFAULT_STRESS,
+    ))
+
+
+def _app_test():
+    """AppTest on app.py after a first (cold) run; offline exchange rates"""
+    os.environ.setdefault("CLINIC_RATES_OFFLINE", "1")
+    from streamlit.testing.v1 import AppTest
+
+    logging.disable(logging.WARNING)   # deprecation notices on every rerun
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=300)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+    return at
+
+
+def bench_app_rerun():
+    """Full rerun after a sidebar change (Ke alternates, so the model recomputes)"""
+    at = _app_test()
+    values = iter(np.tile([19.0, 18.0], 1000))
+
+    def rerun():
+        at.number_input(key="in_ke").set_value(float(next(values)))
+        at.run()
+    return time_call(rerun, rounds=5, target_s=0)
+
+
+def bench_app_rerun_unchanged():
+    """Full rerun with nothing changed (every graph node served from memory)"""
+    at = _app_test()
+    return time_call(at.run, rounds=5, target_s=0)
+
+
+def bench_report_build():
+    """Cold build of the HTML report: the deferred download callable, caches cleared"""
+    import streamlit as st
+    from streamlit.delta_generator import DeltaGenerator
+
+    # the report is a deferred download (data=callable); AppTest tears the
+    # runtime down after each run, so keep the callable as it is passed
+    captured = {}
+    download_button = DeltaGenerator.download_button
+
+    def capture(self, label, data, *args, **kwargs):
+        captured["build"] = data
+        return download_button(self, label, data, *args, **kwargs)
+
+    DeltaGenerator.download_button = capture
+    try:
+        at = _app_test()
+
+        def setup():
+            st.cache_resource.clear()   # report LRU, figure LRU and logo
+            at.run()
+        return time_steps(setup, lambda: captured["build"](), rounds=5)
+    finally:
+        DeltaGenerator.download_button = download_button
+
+
+BENCHMARKS = {
+    "pnl_block": bench_pnl_block,
+    "compute_batch_10k": bench_compute_batch_10k,
+    "npv_calc": bench_npv_calc,
+    "irr_calc": bench_irr_calc,
+    "mirr_from_cf": bench_mirr_from_cf,
+    "surface_ebitda_15x15": bench_surface_ebitda_15x15,
+    "surface_ebitda_200x200": bench_surface_ebitda_200x200,
+    "npv_growth_discount_grid": bench_npv_growth_discount_grid,
+    "stress_scenarios": bench_stress_scenarios,
+    "report_build": bench_report_build,
+    "app_rerun": bench_app_rerun,
+    "app_rerun_unchanged": bench_app_rerun_unchanged,
+}
+
+
+# =========================================================
+# BASELINES
+# =========================================================
+def environment():
+    """What a baseline was measured on"""
+    import streamlit
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "streamlit": streamlit.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_benchmarks(names):
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name]()
+        r = results[name]
+        print(f"  {name:<28}{r['min_ms']:>12.4f} ms  (median {r['median_ms']:.4f}, {r['rounds']}×{r['number']})", flush=True)
+    return results
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results, previous=None):
+    """Write results as the baseline (benchmarks not run this time are kept from `previous`)"""
+    merged = dict((previous or {}).get("results", {}))
+    merged.update(results)
+    data = {"created": datetime.now().isoformat(timespec="seconds"), "environment": environment(), "results": merged}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Rows (name, baseline ms, current ms, relative change, status) with
+    status "regressed", "improved", "ok" or "new".
+    """
+    rows = []
+    for name, r in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append((name, None, r["min_ms"], None, "new"))
+            continue
+        delta = r["min_ms"] - base["min_ms"]
+        change = delta / base["min_ms"] if base["min_ms"] > 0 else 0.0
+        if change > threshold and delta >= min_delta_ms:
+            status = "regressed"
+        elif change < -threshold and -delta >= min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, base["min_ms"], r["min_ms"], change, status))
+    return rows
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clinic P&L benchmark suite")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown flagged as a regression (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="ignore slowdowns smaller than this many ms per call")
+    parser.add_argument("--only", default="", help="comma-separated name filters")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    args = parser.parse_args(argv)
+
+    names = list(BENCHMARKS)
+    if args.only:
+        filters = [f.strip() for f in args.only.split(",") if f.strip()]
+        names = [n for n in names if any(f in n for f in filters)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if not names:
+        print("No benchmark matches --only", file=sys.stderr)
+        return 2
+
+    baseline = load_baseline(args.baseline)
+    print(f"Running {len(names)} benchmark(s)")
+    results = run_benchmarks(names)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+
+    regressed = []
+    if baseline is not None:
+        env = environment()
+        mismatch = {k: (baseline["environment"].get(k), v) for k, v in env.items() if baseline["environment"].get(k) != v}
+        print(f"\nCompared with {args.baseline} ({baseline['created']}), threshold {args.threshold:.0%}")
+        for key, (old, new) in mismatch.items():
+            print(f"  note: {key} differs from the baseline ({old} -> {new})")
+        for name, base_ms, ms, change, status in compare(results, baseline, args.threshold, args.min_delta_ms):
+            if status == "new":
+                print(f"  {name:<28}{'':>12}  {ms:>12.4f} ms  new")
+                continue
+            print(f"  {name:<28}{base_ms:>12.4f} → {ms:>12.4f} ms  {change:+7.1%}  {status}")
+            if status == "regressed":
+                regressed.append(name)
+    elif not args.save:
+        print(f"\nNo baseline at {args.baseline}: run with --save to create one")
+
+    if args.save:
+        save_baseline(args.baseline, results, baseline)
+        print(f"\nBaseline written to {args.baseline}")
+
+    if regressed:
+        print(f"\n{len(regressed)} regression(s): {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
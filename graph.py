@@ -0,0 +1,215 @@
+"""
+Clinic P&L – incremental recalculation graph.
+
+Derived quantities of the dashboard are declared as nodes: a name,
+the upstream nodes it reads (deps) and the raw inputs it reads
+(sidebar / widget values). Each node keeps its last value together
+with a stamp of what it was built from, so on a rerun a node only
+recomputes when one of its own inputs or one of its upstream nodes
+actually changed – everything else is served from memory.
+
+    inputs → pnl → breakeven / kpis → cash_flows → valuation → figures
+
+Nodes are evaluated in script order (a dep must be evaluated before
+the nodes that read it). A node whose new value equals the previous
+one keeps its version (early cutoff), so its dependants stay cached.
+Every evaluation is logged with its status, start (perf_counter) and
+time.
+
+Nodes can also read through a shared LRU (new_lru): a bounded,
+size-aware cache keyed by a canonical hash of the node name and the
+exact values it is built from, so identical results are reused
+across graph states (app.py shares one for figures between sessions).
+
+Standard library + NumPy, no Streamlit: the caller owns the state
+dict (app.py keeps one per session in st.session_state).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def new_state():
+    """Empty graph state: node records plus the log of the current run"""
+    return {"nodes": {}, "log": [], "clock": 0}
+
+
+def begin_run(state):
+    """Start a new rerun: clear the evaluation log"""
+    state["log"] = []
+
+
+def fingerprint(value):
+    """
+    Hashable, exact summary of an input or node value. Arrays are
+    hashed by content, floats by repr (so NaN == NaN), containers
+    recursively.
+    """
+    if isinstance(value, np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(value).view(np.uint8), digest_size=16).hexdigest()
+        return ("nd", value.shape, value.dtype.str, digest)
+    if isinstance(value, (bool, np.bool_)):
+        return ("b", bool(value))
+    if isinstance(value, (int, np.integer)):
+        return ("i", int(value))
+    if isinstance(value, (float, np.floating)):
+        return ("f", repr(float(value)))
+    if isinstance(value, str) or value is None:
+        return value
+    if isinstance(value, dict):
+        return ("d", tuple(sorted((str(k), fingerprint(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return ("l", tuple(fingerprint(v) for v in value))
+    return ("r", repr(value))
+
+
+def approx_size(value):
+    """
+    Rough memory footprint in bytes: array buffers, strings and numbers,
+    containers recursively. Objects exposing to_plotly_json() (Plotly
+    figures) are measured through their JSON-able dict.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(approx_size(v) for v in value)
+    if hasattr(value, "to_plotly_json"):
+        return approx_size(value.to_plotly_json())
+    return 8
+
+
+# =========================================================
+# SHARED LRU (across graph states / sessions)
+# =========================================================
+def new_lru(max_bytes=64 * 2**20, sizeof=approx_size):
+    """
+    Bounded, size-aware LRU: least recently used entries are evicted
+    once the summed size passes max_bytes. Thread-safe (one lock), so
+    one instance can be shared by every session of the app.
+    """
+    return {
+        "entries": OrderedDict(), "bytes": 0, "max_bytes": max_bytes, "sizeof": sizeof,
+        "hits": 0, "misses": 0, "evictions": 0, "lock": threading.Lock(),
+    }
+
+
+def lru_get(cache, key):
+    """(True, value) on a hit – the entry becomes most recent – else (False, None)"""
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry is None:
+            cache["misses"] += 1
+            return False, None
+        cache["entries"].move_to_end(key)
+        cache["hits"] += 1
+        return True, entry[0]
+
+
+def lru_put(cache, key, value):
+    """Store value, then evict from the least recent end down to the budget"""
+    size = cache["sizeof"](value)
+    if size > cache["max_bytes"]:
+        return
+    with cache["lock"]:
+        old = cache["entries"].pop(key, None)
+        if old is not None:
+            cache["bytes"] -= old[1]
+        cache["entries"][key] = (value, size)
+        cache["bytes"] += size
+        while cache["bytes"] > cache["max_bytes"]:
+            _, (_, evicted) = cache["entries"].popitem(last=False)
+            cache["bytes"] -= evicted
+            cache["evictions"] += 1
+
+
+def lru_stats(cache):
+    """Counters for display: entries, bytes, hits, misses, evictions, hit_rate"""
+    with cache["lock"]:
+        lookups = cache["hits"] + cache["misses"]
+        return {
+            "entries": len(cache["entries"]),
+            "bytes": cache["bytes"],
+            "max_bytes": cache["max_bytes"],
+            "hits": cache["hits"],
+            "misses": cache["misses"],
+            "evictions": cache["evictions"],
+            "hit_rate": cache["hits"] / lookups if lookups else float("nan"),
+        }
+
+
+def input_hash(value):
+    """Canonical hex digest of a value (through its fingerprint)"""
+    return hashlib.blake2b(repr(fingerprint(value)).encode(), digest_size=16).hexdigest()
+
+
+def shared_key(state, name, deps, inputs):
+    """Canonical hash of a node: its name, the values of its deps and its inputs"""
+    records = state["nodes"]
+    dep_fps = tuple(
+        (d, records[d]["value_fp"] if records[d]["value_fp"] is not None else fingerprint(records[d]["value"]))
+        for d in deps
+    )
+    return hashlib.blake2b(repr((name, dep_fps, fingerprint(inputs))).encode(), digest_size=16).hexdigest()
+
+
+def node(state, name, func, deps=(), inputs=None, cutoff=True, shared=None):
+    """
+    Evaluate (or reuse) node `name`.
+
+    func is called as func(**dep_values, **inputs) – dep names are the
+    names of nodes already evaluated, inputs a dict of raw values.
+    cutoff=False skips the value comparison after a recompute (figures:
+    always treated as changed, never compared).
+    shared: optional LRU (new_lru) looked up before computing; a hit is
+    logged as "shared". The value must not be mutated by the caller.
+    Returns the node value.
+    """
+    inputs = inputs or {}
+    records = state["nodes"]
+    missing = [d for d in deps if d not in records]
+    if missing:
+        raise KeyError(f"Node '{name}' evaluated before its deps: {', '.join(missing)}")
+
+    stamp = (
+        tuple((d, records[d]["version"]) for d in deps),
+        fingerprint(inputs),
+    )
+    rec = records.get(name)
+    if rec is not None and rec["stamp"] == stamp:
+        state["log"].append({"node": name, "status": "cached", "ms": 0.0, "t0": None, "deps": tuple(deps)})
+        return rec["value"]
+
+    t0 = time.perf_counter()
+    hit = False
+    if shared is not None:
+        key = shared_key(state, name, deps, inputs)
+        hit, value = lru_get(shared, key)
+    if not hit:
+        value = func(**{d: records[d]["value"] for d in deps}, **inputs)
+        if shared is not None:
+            lru_put(shared, key, value)
+    ms = (time.perf_counter() - t0) * 1000
+
+    value_fp = fingerprint(value) if cutoff else None
+    if rec is not None and cutoff and rec["value_fp"] == value_fp:
+        status, version = "unchanged", rec["version"]
+    else:
+        state["clock"] += 1
+        status, version = ("shared" if hit else "recomputed"), state["clock"]
+    records[name] = {"stamp": stamp, "value": value, "value_fp": value_fp, "version": version}
+    state["log"].append({"node": name, "status": status, "ms": ms, "t0": t0, "deps": tuple(deps)})
+    return value
+
+
+def run_summary(state):
+    """(nodes evaluated, nodes recomputed, total ms) for the current run"""
+    log = state["log"]
+    recomputed = sum(1 for e in log if e["status"] in ("recomputed", "unchanged"))
+    return len(log), recomputed, sum(e["ms"] for e in log)
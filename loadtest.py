@@ -0,0 +1,443 @@
+"""
+Clinic P&L – load test.
+
+Simulates N concurrent planners against a local Streamlit server: each
+session is a websocket client speaking Streamlit's protocol (as the
+browser does) and replays a planner-like sequence of actions with
+think time in between:
+
+    tariff / patients nudges   bursts of step-button clicks on the input
+    tab visits                 another section of the app
+    currency switches          USD ↔ COP / EUR
+    report downloads           the deferred HTML report (build + fetch)
+
+For every number of sessions N (default 1, 2, 5, 10, 20, 50, 100, 200)
+all sessions run for --duration seconds; the harness reports rerun
+latency percentiles (p50 / p95 / p99), throughput, errors, download
+latency, and the server's CPU and RSS (from /proc, Linux).
+
+    python loadtest.py                             start a server, sweep N
+    python loadtest.py --sessions 1,10,50 --duration 20
+    python loadtest.py --url http://host:8501 --pid 1234   existing server
+    python loadtest.py --output load.json          also save the results
+
+By default the server is started once (offline exchange rates) and
+kept for the whole sweep, as in production: caches stay warm between
+levels and the RSS column shows growth. AppTest is not used since it
+swaps a process-wide runtime on every run, so concurrent sessions
+can't share one process through it.
+Standard library + NumPy + websockets (installed with Streamlit).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+import numpy as np
+
+APP_PATH = Path(__file__).parent / "app.py"
+DEFAULT_SESSIONS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# action -> weight in a planner's sequence
+ACTIONS = {
+    "tariff_nudge": 0.35,
+    "patients_nudge": 0.20,
+    "tab_visit": 0.25,
+    "currency_switch": 0.10,
+    "report_download": 0.10,
+}
+NUDGE_KEYS = {"tariff_nudge": "in_tariff", "patients_nudge": "in_patients"}
+BURST = (1, 5)            # clicks per nudge burst
+CLICK_GAP = (0.1, 0.4)    # seconds between clicks of a burst
+
+
+# =========================================================
+# STREAMLIT PROTOCOL CLIENT
+# One session = one websocket; a rerun sends the changed widget
+# state and reads forward messages until the script finishes.
+# =========================================================
+def _protos():
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+    return BackMsg, ForwardMsg, WidgetState
+
+
+def open_session(url, timeout=120):
+    """Connect a session and run the app once; returns the session dict"""
+    from websockets.sync.client import connect
+
+    ws_url = url.replace("http", "ws", 1).rstrip("/") + "/_stcore/stream"
+    stack = ExitStack()
+    sess = {
+        "url": url.rstrip("/"), "timeout": timeout, "stack": stack,
+        "ws": stack.enter_context(connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout)),
+        "session_id": "", "widgets": {}, "values": {}, "download_id": None, "cached": set(),
+    }
+    sess["first"] = rerun(sess)
+    return sess
+
+
+def close_session(sess):
+    try:
+        sess["stack"].close()
+    except Exception:
+        pass
+
+
+def _read_until_finished(sess, ForwardMsg, request_id=None):
+    """Forward messages until script_finished (or the backend response for request_id)"""
+    nbytes, error, response = 0, None, None
+    while True:
+        data = sess["ws"].recv(timeout=sess["timeout"])
+        nbytes += len(data)
+        msg = ForwardMsg()
+        msg.ParseFromString(data)
+        if msg.metadata.cacheable and msg.hash:
+            sess["cached"].add(msg.hash)
+        kind = msg.WhichOneof("type")
+        if kind == "new_session":
+            sess["session_id"] = msg.new_session.initialize.session_id
+        elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            _track_element(sess, msg.delta.new_element)
+            if msg.delta.new_element.WhichOneof("type") == "exception":
+                error = msg.delta.new_element.exception.message or "exception"
+        elif kind == "script_finished" and request_id is None:
+            if msg.script_finished not in (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_EARLY_FOR_RERUN):
+                error = error or f"script finished with status {msg.script_finished}"
+            return nbytes, error, response
+        elif kind == "backend_operation_response" and msg.backend_operation_response.request_id == request_id:
+            return nbytes, error, msg.backend_operation_response
+
+
+def _track_element(sess, element):
+    """Remember widget ids by key, current values and the report's deferred file id"""
+    kind = element.WhichOneof("type")
+    proto = getattr(element, kind)
+    widget_id = getattr(proto, "id", "")
+    if not widget_id.startswith("$$ID-"):
+        return
+    key = widget_id.split("-", 2)[2]
+    sess["widgets"][key] = (kind, proto)
+    if kind == "number_input":
+        if proto.set_value or key not in sess["values"]:
+            sess["values"][key] = proto.value if proto.set_value else proto.default
+    elif kind in ("radio", "selectbox"):
+        if proto.set_value or key not in sess["values"]:
+            sess["values"][key] = proto.raw_value if proto.set_value else proto.options[proto.default]
+    elif kind == "download_button" and proto.deferred_file_id:
+        sess["download_id"] = proto.deferred_file_id
+
+
+def rerun(sess, key=None, value=None):
+    """
+    Rerun the script, optionally with widget `key` set to `value`.
+    Returns {"ms", "bytes", "error"}.
+    """
+    BackMsg, ForwardMsg, WidgetState = _protos()
+    msg = BackMsg()
+    msg.rerun_script.query_string = ""
+    msg.rerun_script.cached_message_hashes.extend(sess["cached"])
+    if key is not None:
+        kind, proto = sess["widgets"][key]
+        state = WidgetState(id=proto.id)
+        if kind == "number_input":
+            state.double_value = float(value)
+        else:
+            state.string_value = str(value)
+        msg.rerun_script.widget_states.widgets.append(state)
+        sess["values"][key] = value
+    t0 = time.perf_counter()
+    try:
+        sess["ws"].send(msg.SerializeToString())
+        nbytes, error, _ = _read_until_finished(sess, ForwardMsg)
+    except Exception as e:
+        return {"ms": (time.perf_counter() - t0) * 1000, "bytes": 0, "error": f"{type(e).__name__}: {e}"}
+    return {"ms": (time.perf_counter() - t0) * 1000, "bytes": nbytes, "error": error}
+
+
+def download_report(sess):
+    """Ask for the deferred report (built on the server) and fetch it over HTTP"""
+    BackMsg, ForwardMsg, _ = _protos()
+    if sess["download_id"] is None:
+        return {"ms": 0.0, "bytes": 0, "error": "no download button"}
+    msg = BackMsg()
+    request_id = uuid.uuid4().hex
+    msg.backend_operation_request.request_id = request_id
+    msg.backend_operation_request.session_id = sess["session_id"]
+    msg.backend_operation_request.deferred_file.file_id = sess["download_id"]
+    t0 = time.perf_counter()
+    try:
+        sess["ws"].send(msg.SerializeToString())
+        _, _, response = _read_until_finished(sess, ForwardMsg, request_id=request_id)
+        if response.error_msg:
+            raise RuntimeError(response.error_msg)
+        media_url = response.deferred_file.url
+        if not media_url.startswith("http"):
+            media_url = sess["url"] + "/" + media_url.lstrip("/")
+        with urllib.request.urlopen(media_url, timeout=sess["timeout"]) as r:
+            nbytes = len(r.read())
+    except Exception as e:
+        return {"ms": (time.perf_counter() - t0) * 1000, "bytes": 0, "error": f"{type(e).__name__}: {e}"}
+    return {"ms": (time.perf_counter() - t0) * 1000, "bytes": nbytes, "error": None}
+
+
+# =========================================================
+# PLANNER SESSIONS
+# =========================================================
+def _nudge(sess, key, rng):
+    kind, proto = sess["widgets"][key]
+    value = sess["values"][key] + proto.step * rng.choice((-1, 1))
+    if proto.has_min:
+        value = max(value, proto.min)
+    if proto.has_max:
+        value = min(value, proto.max)
+    return value
+
+
+def play_action(sess, action, rng):
+    """Run one action; returns a list of (action, result) (a nudge burst is several reruns)"""
+    if action in NUDGE_KEYS:
+        key = NUDGE_KEYS[action]
+        results = []
+        for click in range(rng.integers(BURST[0], BURST[1] + 1)):
+            if click:
+                time.sleep(rng.uniform(*CLICK_GAP))
+            results.append((action, rerun(sess, key, _nudge(sess, key, rng))))
+        return results
+    if action == "tab_visit":
+        _, proto = sess["widgets"]["section"]
+        options = [o for o in proto.options if o != sess["values"]["section"]]
+        return [(action, rerun(sess, "section", rng.choice(options)))]
+    if action == "currency_switch":
+        _, proto = sess["widgets"]["currency"]
+        current = sess["values"]["currency"]
+        target = "USD" if current != "USD" else rng.choice([o for o in proto.options if o != "USD"])
+        return [(action, rerun(sess, "currency", target))]
+    return [(action, download_report(sess))]
+
+
+def run_session(url, window, think, seed, out, timeout):
+    """
+    One planner: connect, wait for every session of the level
+    (window["ready"], a barrier), then weighted actions with exponential
+    think time until window["stop_at"].
+    """
+    rng = np.random.default_rng(seed)
+    names = list(ACTIONS)
+    weights = np.array([ACTIONS[n] for n in names]) / sum(ACTIONS.values())
+    sess = None
+    try:
+        sess = open_session(url, timeout)
+        out.append(("connect", sess["first"]))
+    except Exception as e:
+        out.append(("connect", {"ms": 0.0, "bytes": 0, "error": f"{type(e).__name__}: {e}"}))
+    window["ready"].wait()
+    if sess is None:
+        return
+    try:
+        while time.perf_counter() < window["stop_at"]:
+            time.sleep(rng.exponential(think) if think > 0 else 0)
+            if time.perf_counter() >= window["stop_at"]:
+                break
+            out.extend(play_action(sess, rng.choice(names, p=weights), rng))
+    finally:
+        close_session(sess)
+
+
+# =========================================================
+# SERVER PROCESS (CPU, RSS)
+# =========================================================
+def start_server(port, app=APP_PATH, offline=True):
+    env = dict(os.environ)
+    if offline:
+        env.setdefault("CLINIC_RATES_OFFLINE", "1")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(app), "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false", "--logger.level", "error"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://localhost:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/_stcore/health", timeout=2) as r:
+                if r.status == 200:
+                    return proc, url
+        except OSError:
+            time.sleep(0.3)
+    proc.kill()
+    raise RuntimeError("Streamlit server did not start within 60 s")
+
+
+def process_usage(pid):
+    """(cpu seconds, rss bytes) of a process from /proc; (None, None) elsewhere"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        return cpu, rss
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None, None
+
+
+def _sample_rss(pid, stop, peak):
+    while not stop.is_set():
+        _, rss = process_usage(pid)
+        if rss is not None:
+            peak[0] = max(peak[0], rss)
+        stop.wait(0.25)
+
+
+# =========================================================
+# LOAD LEVELS
+# =========================================================
+def _percentiles(values):
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "max_ms": float(max(values))}
+
+
+def run_level(url, n, duration, think, pid=None, seed=0, timeout=120):
+    """
+    N sessions for `duration` seconds, timed from the moment all of them
+    have connected (first runs are reported apart, as "connect").
+    Returns the level summary: reruns, throughput, latency
+    percentiles overall and per action, downloads, errors, server CPU
+    (% of one core) and RSS (end and peak).
+    """
+    results = [[] for _ in range(n)]
+    stop, peak = threading.Event(), [0]
+    sampler = threading.Thread(target=_sample_rss, args=(pid, stop, peak), daemon=True) if pid else None
+    if sampler:
+        sampler.start()
+
+    window = {}
+
+    def start_window():
+        window["t0"] = time.perf_counter()
+        window["stop_at"] = window["t0"] + duration
+        window["cpu0"] = process_usage(pid)[0] if pid else None
+    window["ready"] = threading.Barrier(n, action=start_window)
+    threads = [
+        threading.Thread(target=run_session, args=(url, window, think, seed * 10_000 + i, results[i], timeout), daemon=True)
+        for i in range(n)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - window["t0"]
+
+    stop.set()
+    cpu0 = window["cpu0"]
+    cpu1, rss = process_usage(pid) if pid else (None, None)
+    records = [r for session in results for r in session]
+    ok = [(a, r) for a, r in records if r["error"] is None]
+    reruns = [r["ms"] for a, r in ok if a not in ("connect", "report_download")]
+    downloads = [r["ms"] for a, r in ok if a == "report_download"]
+    errors = [f"{a}: {r['error']}" for a, r in records if r["error"] is not None]
+    return {
+        "sessions": n,
+        "wall_s": wall,
+        "reruns": len(reruns),
+        "throughput": len(reruns) / wall,
+        **_percentiles(reruns),
+        "connect": _percentiles([r["ms"] for a, r in ok if a == "connect"]),
+        "downloads": len(downloads),
+        "download": _percentiles(downloads),
+        "by_action": {
+            name: {"count": sum(1 for a, _ in ok if a == name), **_percentiles([r["ms"] for a, r in ok if a == name])}
+            for name in ACTIONS
+        },
+        "kb_per_rerun": (
+            sum(r["bytes"] for a, r in ok if a not in ("connect", "report_download")) / len(reruns) / 1024
+            if reruns else None
+        ),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "cpu_pct": (cpu1 - cpu0) / wall * 100 if cpu0 is not None and cpu1 is not None else None,
+        "rss_mb": rss / 2**20 if rss else None,
+        "rss_peak_mb": peak[0] / 2**20 if peak[0] else None,
+    }
+
+
+def format_level(level):
+    def ms(v):
+        return f"{v:>8,.0f}" if v is not None else f"{'–':>8}"
+
+    def opt(v, fmt):
+        return format(v, fmt) if v is not None else "–"
+    return (
+        f"{level['sessions']:>5} {level['reruns']:>7} {level['throughput']:>8.1f}/s "
+        f"{ms(level['p50_ms'])} {ms(level['p95_ms'])} {ms(level['p99_ms'])} "
+        f"{ms(level['download']['p50_ms'])} {level['errors']:>6} "
+        f"{opt(level['cpu_pct'], '>6.0f')}% {opt(level['rss_mb'], '>7.0f')} MB {opt(level['rss_peak_mb'], '>7.0f')} MB"
+    )
+
+
+HEADER = (
+    f"{'N':>5} {'reruns':>7} {'throughput':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+    f"{'dl p50':>8} {'errors':>6} {'CPU':>7} {'RSS':>10} {'RSS peak':>10}"
+)
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clinic P&L concurrent-session load test")
+    parser.add_argument("--sessions", default=",".join(map(str, DEFAULT_SESSIONS)),
+                        help="comma-separated session counts (N)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per level")
+    parser.add_argument("--think", type=float, default=2.0,
+                        help="mean think time between actions in seconds (0: closed loop)")
+    parser.add_argument("--url", help="existing server (default: start one)")
+    parser.add_argument("--pid", type=int, help="server process id for CPU / RSS (with --url)")
+    parser.add_argument("--port", type=int, default=8599, help="port of the started server")
+    parser.add_argument("--live-rates", action="store_true", help="started server fetches live exchange rates")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds before a rerun counts as failed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to a JSON file")
+    args = parser.parse_args(argv)
+
+    levels = [int(n) for n in args.sessions.split(",") if n.strip()]
+    proc = None
+    if args.url:
+        url, pid = args.url, args.pid
+    else:
+        proc, url = start_server(args.port, offline=not args.live_rates)
+        pid = proc.pid
+    print(f"Load test against {url} · {args.duration:.0f} s per level · think {args.think:.1f} s")
+    print(HEADER)
+    summary = []
+    try:
+        for n in levels:
+            level = run_level(url, n, args.duration, args.think, pid=pid, seed=args.seed, timeout=args.timeout)
+            summary.append(level)
+            print(format_level(level), flush=True)
+            for sample in level["error_samples"]:
+                print(f"      error: {sample}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": url, "duration_s": args.duration, "think_s": args.think, "levels": summary}, f, indent=2)
+    return 1 if any(level["errors"] for level in summary) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,697 @@
+"""
+Clinic P&L – financial core.
+
+Pure NumPy module: no Streamlit, no network, no UI side effects at
+import time. app.py layers the dashboard on top of it; batch jobs,
+benchmarks and worker processes can import it directly.
+"""
+import math
+
+import numpy as np
+
+# =========================================================
+# UTILITY FUNCTIONS
+# =========================================================
+def format_currency(value, decimals=0, curr_label="kUSD", curr_symbol="$"):
+    """Format currency values consistently"""
+    return f"{curr_symbol}{value:,.{decimals}f}{curr_label[-1]}"
+
+def format_percentage(value, decimals=1):
+    """Format percentage values consistently"""
+    return f"{value*100:.{decimals}f}%"
+
+def safe_divide(numerator, denominator, default=0):
+    """Safe division with default value"""
+    return numerator / denominator if denominator != 0 else default
+
+# =========================================================
+# BATCH SCENARIO ENGINE
+# Struct-of-arrays P&L block. Every input is a 1-D array
+# (scalars broadcast), every output is an array of the same
+# length, so one call evaluates N scenarios in a single NumPy
+# pass. The sidebar scenario is simply a batch of size one.
+# =========================================================
+
+# Sidebar inputs in the order they appear in the app.
+# Percentages are stored as fractions (20% -> 0.20).
+INPUT_FIELDS = (
+    "patients",
+    "tariff",
+    "drugs_base",
+    "drugs_cont",
+    "labs_base",
+    "labs_cont",
+    "clinical_pay",
+    "clinical_bur",
+    "admin_pay",
+    "admin_bur",
+    "rent",
+    "util_pct",
+    "ehr_m",
+    "it_m",
+    "office_y",
+    "licenses_y",
+    "mal_md_y",
+    "mal_np_y",
+    "tax_rate",
+    "rev_growth",
+    "ke",
+    "initial_investment",
+    "fcf_factor",
+)
+
+# Sidebar defaults (kUSD) – same values the app starts with
+DEFAULT_INPUTS = {
+    "patients": 250,
+    "tariff": 54.0,
+    "drugs_base": 1.34,
+    "drugs_cont": 0.20,
+    "labs_base": 0.17,
+    "labs_cont": 0.20,
+    "clinical_pay": 831.0,
+    "clinical_bur": 0.25,
+    "admin_pay": 399.0,
+    "admin_bur": 0.25,
+    "rent": 125.0,
+    "util_pct": 0.15,
+    "ehr_m": 2.0,
+    "it_m": 1.0,
+    "office_y": 10.0,
+    "licenses_y": 5.0,
+    "mal_md_y": 20.0,
+    "mal_np_y": 3.0,
+    "tax_rate": 0.21,
+    "rev_growth": 0.15,
+    "ke": 0.18,
+    "initial_investment": 650.0,
+    "fcf_factor": 0.40,
+}
+
+# Stress-testing sidebar defaults (kUSD) – same values the app starts with
+DEFAULT_STRESS = {
+    "mix_low_pct": 0.30,
+    "low_tariff": 42.0,
+    "stress_costs": 0.10,
+}
+
+# Display labels (same wording as the sidebar, without currency)
+INPUT_LABELS = {
+    "patients": "Patients per year",
+    "tariff": "Tariff per patient/year",
+    "drugs_base": "Drugs (per patient/month)",
+    "drugs_cont": "Drugs contingency",
+    "labs_base": "Labs & imaging (per patient/month)",
+    "labs_cont": "Labs contingency",
+    "clinical_pay": "Clinical staff",
+    "clinical_bur": "Clinical burden",
+    "admin_pay": "Administrative staff",
+    "admin_bur": "Admin burden",
+    "rent": "Rent (annual)",
+    "util_pct": "Utilities (% of rent)",
+    "ehr_m": "EHR (monthly)",
+    "it_m": "IT/phone/internet (monthly)",
+    "office_y": "Office & supplies (annual)",
+    "licenses_y": "Licenses & dues (annual)",
+    "mal_md_y": "Malpractice MD (annual)",
+    "mal_np_y": "Malpractice NP (annual)",
+    "tax_rate": "Income tax rate",
+    "rev_growth": "Revenue/FCF growth",
+    "ke": "Discount rate / Ke",
+    "initial_investment": "Initial investment",
+    "fcf_factor": "FCF as % of net profit",
+}
+
+# Unit of each input: "count", "currency" or "percent" (fraction)
+INPUT_UNITS = {k: "currency" for k in INPUT_FIELDS}
+INPUT_UNITS["patients"] = "count"
+INPUT_UNITS.update({k: "percent" for k in (
+    "drugs_cont", "labs_cont", "clinical_bur", "admin_bur", "util_pct",
+    "tax_rate", "rev_growth", "ke", "fcf_factor",
+)})
+
+# Explicit DCF horizon (years after Year 0)
+DCF_YEARS = 5
+
+
+def make_batch(base=None, **overrides):
+    """
+    Build a struct-of-arrays batch.
+    base: dict of inputs (defaults to DEFAULT_INPUTS)
+    overrides: any input as scalar or array; everything is broadcast
+    to a common 1-D length.
+    """
+    values = dict(DEFAULT_INPUTS if base is None else base)
+    values.update(overrides)
+    missing = [k for k in INPUT_FIELDS if k not in values]
+    if missing:
+        raise KeyError(f"Missing model inputs: {', '.join(missing)}")
+
+    arrays = np.broadcast_arrays(*[np.asarray(values[k], dtype=float) for k in INPUT_FIELDS])
+    return {k: np.atleast_1d(a).ravel() for k, a in zip(INPUT_FIELDS, arrays)}
+
+
+def _div(num, den, default, where):
+    """Elementwise num / den, `default` wherever the condition is False"""
+    out = np.full(np.broadcast(num, den).shape, default, dtype=float)
+    np.divide(num, den, out=out, where=where)
+    return out
+
+
+# Inputs read by each stage of the engine. The stages only see
+# these fields, so the dependency graph in app.py can tell which
+# results an input change actually touches.
+PNL_FIELDS = (
+    "patients", "tariff",
+    "drugs_base", "drugs_cont", "labs_base", "labs_cont",
+    "clinical_pay", "clinical_bur", "admin_pay", "admin_bur",
+    "rent", "util_pct", "ehr_m", "it_m",
+    "office_y", "licenses_y", "mal_md_y", "mal_np_y",
+    "tax_rate",
+)
+BREAKEVEN_FIELDS = ("patients", "tariff", "drugs_base", "drugs_cont", "labs_base", "labs_cont")
+CASH_FLOW_FIELDS = ("initial_investment", "fcf_factor", "rev_growth")
+VALUATION_FIELDS = ("ke",)
+
+
+def stage_arrays(values, fields):
+    """Broadcast just the inputs a stage needs to common 1-D float arrays"""
+    missing = [k for k in fields if k not in values]
+    if missing:
+        raise KeyError(f"Missing model inputs: {', '.join(missing)}")
+    arrays = np.broadcast_arrays(*[np.asarray(values[k], dtype=float) for k in fields])
+    return {k: np.atleast_1d(a).ravel() for k, a in zip(fields, arrays)}
+
+
+def pnl_block(values):
+    """Monthly / annual P&L lines down to net profit (PNL_FIELDS)"""
+    b = stage_arrays(values, PNL_FIELDS)
+    patients = b["patients"]
+
+    # REVENUE
+    rev_m = patients * b["tariff"] / 12
+    rev_y = rev_m * 12
+
+    # CLINICAL STAFF (fixed)
+    clinical_m = b["clinical_pay"] * (1 + b["clinical_bur"]) / 12
+    clinical_y = clinical_m * 12
+
+    # VARIABLE COSTS
+    drugs_m = b["drugs_base"] * patients * (1 + b["drugs_cont"])
+    labs_m = b["labs_base"] * patients * (1 + b["labs_cont"])
+    drugs_y = drugs_m * 12
+    labs_y = labs_m * 12
+
+    # GROSS PROFIT
+    gross_m = rev_m - (clinical_m + drugs_m + labs_m)
+    gross_y = gross_m * 12
+
+    # ADMIN (fixed)
+    admin_m = b["admin_pay"] * (1 + b["admin_bur"]) / 12
+    admin_y = admin_m * 12
+
+    # OTHER OPEX (fixed)
+    other_m = (
+        (b["rent"] / 12) * (1 + b["util_pct"]) +
+        (b["ehr_m"] + b["it_m"]) +
+        (b["office_y"] + b["licenses_y"] + b["mal_md_y"] + b["mal_np_y"]) / 12
+    )
+    other_y = other_m * 12
+
+    # EBITDA, TAXES, NET
+    ebitda_m = gross_m - admin_m - other_m
+    ebitda_y = ebitda_m * 12
+    taxes_y = np.maximum(0, ebitda_y * b["tax_rate"])
+    net_y = ebitda_y - taxes_y
+
+    return {
+        "rev_m": rev_m,
+        "rev_y": rev_y,
+        "clinical_m": clinical_m,
+        "clinical_y": clinical_y,
+        "drugs_m": drugs_m,
+        "drugs_y": drugs_y,
+        "labs_m": labs_m,
+        "labs_y": labs_y,
+        "gross_m": gross_m,
+        "gross_y": gross_y,
+        "admin_m": admin_m,
+        "admin_y": admin_y,
+        "other_m": other_m,
+        "other_y": other_y,
+        "ebitda_m": ebitda_m,
+        "ebitda_y": ebitda_y,
+        "taxes_y": taxes_y,
+        "net_y": net_y,
+    }
+
+
+def breakeven_block(values, pnl):
+    """Break-even volume / tariff and margin of safety (BREAKEVEN_FIELDS + P&L)"""
+    b = stage_arrays(values, BREAKEVEN_FIELDS)
+    patients = b["patients"]
+    tariff = b["tariff"]
+
+    var_pp_m = (b["drugs_base"] * (1 + b["drugs_cont"])) + (b["labs_base"] * (1 + b["labs_cont"]))
+    var_pp_y = var_pp_m * 12
+    contrib_pp = tariff - var_pp_y
+    fixed_y = pnl["clinical_y"] + pnl["admin_y"] + pnl["other_y"]
+
+    has_contrib = contrib_pp > 0
+    has_patients = patients > 0
+    be_patients = _div(fixed_y, contrib_pp, np.nan, has_contrib)
+    be_revenue = be_patients * tariff
+    mos_pat = np.where(has_contrib, patients - be_patients, np.nan)
+    mos_pct = np.where(has_contrib, _div(patients - be_patients, patients, 0.0, has_patients), np.nan)
+
+    be_tariff_at_plan = np.where(has_patients, var_pp_y + _div(fixed_y, patients, 0.0, has_patients), np.nan)
+    tariff_headroom = np.where(has_patients, np.maximum(0, tariff - be_tariff_at_plan), np.nan)
+
+    return {
+        "var_pp_m": var_pp_m,
+        "var_pp_y": var_pp_y,
+        "contrib_pp": contrib_pp,
+        "fixed_y": fixed_y,
+        "be_patients": be_patients,
+        "be_revenue": be_revenue,
+        "mos_pat": mos_pat,
+        "mos_pct": mos_pct,
+        "be_tariff_at_plan": be_tariff_at_plan,
+        "tariff_headroom": tariff_headroom,
+    }
+
+
+def kpi_block(values, pnl):
+    """Margins and per-patient ratios (patients + P&L)"""
+    patients = stage_arrays(values, ("patients",))["patients"]
+    rev_y, ebitda_y, net_y = pnl["rev_y"], pnl["ebitda_y"], pnl["net_y"]
+    clinical_y = pnl["clinical_y"]
+    fixed_y = clinical_y + pnl["admin_y"] + pnl["other_y"]
+
+    has_rev = rev_y > 0
+    has_patients = patients > 0
+    total_costs = clinical_y + pnl["drugs_y"] + pnl["labs_y"] + pnl["admin_y"] + pnl["other_y"]
+
+    return {
+        "ebitda_margin": _div(ebitda_y, rev_y, 0.0, has_rev),
+        "net_margin": _div(net_y, rev_y, 0.0, has_rev),
+        "gross_margin": _div(pnl["gross_y"], rev_y, 0.0, has_rev),
+        "fixed_ratio": _div(fixed_y, rev_y, 0.0, has_rev),
+        "var_ratio": _div(pnl["drugs_y"] + pnl["labs_y"], rev_y, 0.0, has_rev),
+        "ebitda_per_patient": _div(ebitda_y, patients, 0.0, has_patients),
+        "revenue_per_patient": _div(rev_y, patients, 0.0, has_patients),
+        "total_costs": total_costs,
+        "revenue_per_dollar_cost": _div(rev_y, total_costs, 0.0, total_costs > 0),
+        "clinical_cost_per_patient": _div(clinical_y, patients, 0.0, has_patients),
+        "total_cost_per_patient": _div(total_costs, patients, 0.0, has_patients),
+    }
+
+
+def payback_years(cf):
+    """First year in which cumulative cash flow turns non-negative (NaN if never)"""
+    recovered = np.cumsum(cf, axis=1) >= 0
+    return np.where(recovered.any(axis=1), recovered.argmax(axis=1), np.nan)
+
+
+def cash_flow_block(values, net_y):
+    """
+    Steady-state DCF cash flows (CASH_FLOW_FIELDS + net profit):
+    Year 0 = -(initial investment), Y1 = net × FCF, then growth.
+    """
+    b = stage_arrays(values, CASH_FLOW_FIELDS)
+    net_y = np.atleast_1d(np.asarray(net_y, dtype=float))
+    n = np.broadcast(net_y, b["fcf_factor"]).size
+
+    cf = np.empty((n, DCF_YEARS + 1))
+    cf[:, 0] = -b["initial_investment"]
+    cf[:, 1] = net_y * b["fcf_factor"]
+    for t in range(2, DCF_YEARS + 1):
+        cf[:, t] = cf[:, t - 1] * (1 + b["rev_growth"])
+    return {"cf": cf, "payback_year": payback_years(cf)}
+
+
+def valuation_block(cf, ke, with_irr=True):
+    """NPV at ke (and IRR) of an (N, T) cash-flow matrix"""
+    ke = np.atleast_1d(np.asarray(ke, dtype=float))
+    years = np.arange(cf.shape[1])
+    out = {"npv": np.sum(cf / (1 + ke[:, None]) ** years, axis=1)}
+    if with_irr:
+        out["irr"] = irr_batch(cf)
+    return out
+
+
+def compute_batch(batch, with_irr=True):
+    """
+    Evaluate the full P&L, break-even, KPI and DCF block for every
+    scenario in `batch` (see make_batch). Returns a dict of arrays.
+    with_irr=False skips the IRR solve (the "irr" key is then absent)
+    for large sweeps that don't need it.
+    Formulas keep the original per-scenario operation order so a batch
+    of one reproduces the sidebar numbers exactly.
+    Cost is linear in rows: about 0.65 s per million scenarios on one
+    core, about 2 s with the IRR solve, so large runs go through
+    chunks (montecarlo) or shards (parallel.map_batch).
+    """
+    b = make_batch(batch)
+    pnl = pnl_block(b)
+
+    results = dict(pnl)
+    results.update(breakeven_block(b, pnl))
+    results.update(kpi_block(b, pnl))
+    results.update(cash_flow_block(b, pnl["net_y"]))
+    results.update(valuation_block(results["cf"], b["ke"], with_irr))
+    return results
+
+
+def scenario_row(results, i=0):
+    """Pull scenario `i` out of a batch result as plain Python scalars / arrays"""
+    return {k: (v[i] if v.ndim > 1 else float(v[i])) for k, v in results.items()}
+
+
+# =========================================================
+# CURRENCY
+# The engine runs in canonical USD. Every money amount is
+# linear in the inputs' money amounts, so a result converts
+# to another currency by scaling its money outputs alone.
+# =========================================================
+CURRENCY_INPUTS = tuple(k for k in INPUT_FIELDS if INPUT_UNITS[k] == "currency")
+
+# Money outputs of compute_batch (counts, ratios, years and IRR
+# are the same in any currency)
+CURRENCY_OUTPUTS = frozenset((
+    "rev_m", "rev_y", "clinical_m", "clinical_y", "drugs_m", "drugs_y", "labs_m", "labs_y",
+    "gross_m", "gross_y", "admin_m", "admin_y", "other_m", "other_y",
+    "ebitda_m", "ebitda_y", "taxes_y", "net_y",
+    "var_pp_m", "var_pp_y", "contrib_pp", "fixed_y", "be_revenue", "be_tariff_at_plan", "tariff_headroom",
+    "ebitda_per_patient", "revenue_per_patient", "total_costs",
+    "clinical_cost_per_patient", "total_cost_per_patient",
+    "cf", "npv",
+))
+
+
+def to_currency(values, rate, fields=CURRENCY_OUTPUTS):
+    """Copy of a result (or input) dict with the money entries in `fields` multiplied by rate"""
+    return {k: (v * rate if k in fields else v) for k, v in values.items()}
+
+
+# =========================================================
+# DCF VALUATION FUNCTIONS
+# =========================================================
+def npv_calc(rate, cfs):
+    """Calculate Net Present Value"""
+    years = np.arange(len(cfs))
+    return float(np.sum(cfs / (1 + rate) ** years))
+
+def sign_changes(cash_flows):
+    """Number of sign changes per row of an (N, T) cash-flow matrix (zeros ignored)"""
+    cf = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    changes = np.zeros(cf.shape[0], dtype=int)
+    last = np.sign(cf[:, 0])
+    for t in range(1, cf.shape[1]):
+        s = np.sign(cf[:, t])
+        changes += (s * last) < 0
+        last = np.where(s != 0, s, last)
+    return changes
+
+
+def irr_batch(cash_flows, guess=0.2, tol=1e-12, max_iter=100):
+    """
+    Vectorized IRR for an (N, T) cash-flow matrix (row = one project,
+    column t = period t). Returns an (N,) array, NaN where the IRR is
+    not unique or does not exist.
+
+    Solved in discount-factor space x = 1/(1+r), where NPV is the
+    polynomial sum(cf_t * x^t). By Descartes' rule a row with exactly
+    one sign change has exactly one positive root, so:
+      - rows with 0 or 2+ sign changes -> NaN (no / ambiguous IRR)
+      - remaining rows get a guaranteed bracket (0, B] with B the
+        Cauchy bound, and a safeguarded Newton iteration that falls
+        back to bisection whenever the step leaves the bracket.
+    All rows iterate together; converged rows drop out of the loop.
+    """
+    cf = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    n, T = cf.shape
+    irr = np.full(n, np.nan)
+    if T < 2:
+        return irr
+
+    # rows with NaN/inf flows have no IRR; keep them out of the iteration
+    rows = np.flatnonzero((sign_changes(cf) == 1) & np.isfinite(cf).all(axis=1))
+    if rows.size == 0:
+        return irr
+    # period-major copy (T, n) so each Horner step reads a contiguous row
+    c = np.ascontiguousarray(cf[rows].T)
+    k = np.arange(rows.size)
+
+    nz = c != 0
+    first = nz.argmax(axis=0)
+    last = T - 1 - nz[::-1].argmax(axis=0)
+    # NPV sign as x -> 0+ (r -> inf) is the sign of the first non-zero flow
+    pos_lo = c[first, k] > 0
+
+    # Cauchy bound on positive roots: x <= 1 + max|cf_t| / |cf_last|
+    lo = np.zeros(rows.size)
+    hi = 1 + np.max(np.abs(c), axis=0) / np.abs(c[last, k])
+    x = np.full(rows.size, 1 / (1 + guess))
+    x = np.where((x <= lo) | (x >= hi), 0.5 * (lo + hi), x)
+
+    # working set is kept compact: finished rows are written out and dropped
+    root = np.full(rows.size, np.nan)
+    # overflow in P(x) far from the root is expected and handled by the bracket
+    with np.errstate(over="ignore", invalid="ignore"):
+        for _ in range(max_iter):
+            # Horner: f = P(x), df = P'(x)
+            f = c[-1].copy()
+            df = np.zeros_like(f)
+            for t in range(T - 2, -1, -1):
+                df *= x
+                df += f
+                f *= x
+                f += c[t]
+
+            # shrink the bracket (overflow counts as the far side)
+            same_as_lo = np.isfinite(f) & ((f > 0) == pos_lo) & (f != 0)
+            lo = np.where(same_as_lo, x, lo)
+            hi = np.where(same_as_lo, hi, x)
+
+            with np.errstate(divide="ignore"):
+                x_new = x - f / df
+            bisect = ~np.isfinite(x_new) | (x_new <= lo) | (x_new >= hi)
+            x_new[bisect] = 0.5 * (lo[bisect] + hi[bisect])
+            x_new[f == 0] = x[f == 0]
+
+            done = (np.abs(x_new - x) <= tol * np.maximum(1.0, x)) | (f == 0) | ((hi - lo) <= tol * x)
+            x = x_new
+            if done.any():
+                root[k[done]] = x[done]
+                keep = ~done
+                if not keep.any():
+                    break
+                k, c, x, lo, hi, pos_lo = k[keep], c[:, keep], x[keep], lo[keep], hi[keep], pos_lo[keep]
+
+    with np.errstate(divide="ignore"):
+        r = 1 / root - 1
+    r[~np.isfinite(r)] = np.nan
+    irr[rows] = r
+    return irr
+
+
+def irr_calc(cfs, guess=0.2, tol=1e-12, max_iter=100):
+    """
+    Calculate Internal Rate of Return for one cash-flow vector (None if
+    undefined). Same method and answer as irr_batch, in plain Python
+    floats: for one short vector the array overhead of a batch of one
+    costs more than the solve.
+    """
+    c = [float(v) for v in cfs]
+    nz = [t for t, v in enumerate(c) if v != 0]
+    if len(c) < 2 or not nz or not all(math.isfinite(v) for v in c):
+        return None
+    signs = [v > 0 for v in c if v != 0]
+    if sum(a != b for a, b in zip(signs, signs[1:])) != 1:
+        return None
+
+    pos_lo = c[nz[0]] > 0
+    lo, hi = 0.0, 1 + max(abs(v) for v in c) / abs(c[nz[-1]])
+    x = 1 / (1 + guess)
+    if x <= lo or x >= hi:
+        x = 0.5 * (lo + hi)
+    for _ in range(max_iter):
+        # Horner: f = P(x), df = P'(x)
+        f, df = c[-1], 0.0
+        for v in reversed(c[:-1]):
+            df = df * x + f
+            f = f * x + v
+        if math.isfinite(f) and f != 0 and (f > 0) == pos_lo:
+            lo = x
+        else:
+            hi = x
+        x_new = x - f / df if df != 0 else math.nan
+        if not math.isfinite(x_new) or x_new <= lo or x_new >= hi:
+            x_new = 0.5 * (lo + hi)
+        if f == 0:
+            x_new = x
+        done = abs(x_new - x) <= tol * max(1.0, x) or f == 0 or hi - lo <= tol * x
+        x = x_new
+        if done:
+            r = 1 / x - 1 if x != 0 else math.inf
+            return float(r) if math.isfinite(r) else None
+    return None
+
+def mirr_from_cf(cash_flows, finance_rate, reinvest_rate):
+    """
+    cash_flows: array-like, cash_flows[0] = CF0
+    finance_rate: rate for negative CFs (cost of capital)
+    reinvest_rate: rate at which positive CFs are reinvested
+    """
+    cf = np.array(cash_flows, dtype=float)
+    n = len(cf) - 1  # años posteriores al 0
+
+    # PV de los negativos (traídos a t0 con finance_rate)
+    pv_neg = 0.0
+    for t, c in enumerate(cf):
+        if c < 0:
+            pv_neg += c / ((1 + finance_rate) ** t)
+
+    # FV de los positivos (llevados a tN con reinvest_rate)
+    fv_pos = 0.0
+    for t, c in enumerate(cf):
+        if c > 0:
+            fv_pos += c * ((1 + reinvest_rate) ** (n - t))
+
+    if pv_neg == 0 or n == 0:
+        return None
+
+    mirr_val = (abs(fv_pos / pv_neg) ** (1 / n)) - 1
+    return mirr_val
+
+
+
+# =========================================================
+# NPV SENSITIVITY GRID (Growth × Discount) – closed form
+# Y1 = cf1 and Years 2..H grow geometrically, so with
+# q = (1+g)/(1+d):
+#   NPV = cf0 + cf1/(1+d) * (1 - q^H) / (1 - q)
+# which broadcasts over the whole grid in one pass.
+# =========================================================
+def npv_growth_discount_grid(cf0, cf1, growth_rates, discount_rates, years=DCF_YEARS):
+    """NPV matrix of shape (len(discount_rates), len(growth_rates))"""
+    g = np.asarray(growth_rates, dtype=float)[None, :]
+    d = np.asarray(discount_rates, dtype=float)[:, None]
+    q = (1 + g) / (1 + d)
+    gap = 1 - q
+    near_one = np.abs(gap) < 1e-9
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(
+            near_one,
+            years + years * (years - 1) / 2 * (q - 1),   # series limit at q -> 1
+            (1 - q ** years) / gap,
+        )
+    return cf0 + cf1 / (1 + d) * annuity
+
+
+def npv_zero_discount_rates(cf0, cf1, growth_rates, years=DCF_YEARS):
+    """
+    Exact NPV = 0 contour of the growth × discount grid: for each growth
+    rate, the discount rate at which NPV vanishes (the IRR of that
+    cash-flow path). NaN where no unique break-even rate exists.
+    """
+    g = np.asarray(growth_rates, dtype=float)
+    cf = np.empty((g.size, years + 1))
+    cf[:, 0] = cf0
+    cf[:, 1:] = cf1 * (1 + g[:, None]) ** np.arange(years)
+    return irr_batch(cf)
+
+# =========================================================
+# STRESS SCENARIOS
+# =========================================================
+def generate_stress_scenarios(
+    patients,
+    tariff,
+    mix_low_pct,
+    low_tariff,
+    clinical_y,
+    drugs_y,
+    labs_y,
+    admin_y,
+    other_y,
+    stress_costs,
+    currency_label="kUSD",
+    currency_symbol="$",
+    volume_drop=0.15,
+    severity=1.0,
+):
+    """
+    Generate stress scenarios with same blue logic.
+    volume_drop: patient volume lost in the volume scenario.
+    severity: multiplier on every shock (payer shift, volume drop,
+    cost inflation); shares are capped at 100%.
+    """
+    scenarios = []
+    mix_low_pct = min(mix_low_pct * severity, 1.0)
+    volume_drop = min(volume_drop * severity, 1.0)
+    stress_costs = stress_costs * severity
+    
+    base_rev = patients * tariff
+    base_costs = clinical_y + drugs_y + labs_y + admin_y + other_y
+    base_ebitda = base_rev - base_costs
+    base_margin = safe_divide(base_ebitda, base_rev)
+    
+    # 1. Payer mix erosion
+    stress1_rev = (patients * (1 - mix_low_pct) * tariff) + (patients * mix_low_pct * low_tariff)
+    stress1_ebitda = stress1_rev - base_costs
+    stress1_margin = safe_divide(stress1_ebitda, stress1_rev)
+    stress1_impact = safe_divide((stress1_ebitda - base_ebitda) * 100, base_ebitda, -100)
+    scenarios.append({
+        "name": "Payer Mix Erosion",
+        "description": f"{mix_low_pct*100:.0f}% patients at {format_currency(low_tariff, curr_label=currency_label, curr_symbol=currency_symbol)} tariff",
+        "ebitda": stress1_ebitda,
+        "margin": stress1_margin,
+        "impact_pct": stress1_impact,
+    })
+    
+    # 2. Volume decline
+    stress2_patients = patients * (1 - volume_drop)
+    stress2_rev = stress2_patients * tariff
+    stress2_var_costs = (drugs_y + labs_y) * (1 - volume_drop)
+    stress2_costs = clinical_y + stress2_var_costs + admin_y + other_y
+    stress2_ebitda = stress2_rev - stress2_costs
+    stress2_margin = safe_divide(stress2_ebitda, stress2_rev)
+    stress2_impact = safe_divide((stress2_ebitda - base_ebitda) * 100, base_ebitda, -100)
+    scenarios.append({
+        "name": "Volume Decline",
+        "description": f"{volume_drop*100:.0f}% patient volume reduction",
+        "ebitda": stress2_ebitda,
+        "margin": stress2_margin,
+        "impact_pct": stress2_impact,
+    })
+    
+    # 3. Cost inflation
+    stress3_clinical = clinical_y * (1 + stress_costs)
+    stress3_costs = stress3_clinical + drugs_y + labs_y + admin_y + other_y
+    stress3_ebitda = base_rev - stress3_costs
+    stress3_margin = safe_divide(stress3_ebitda, base_rev)
+    stress3_impact = safe_divide((stress3_ebitda - base_ebitda) * 100, base_ebitda, -100)
+    scenarios.append({
+        "name": "Clinical Cost Inflation",
+        "description": f"{stress_costs*100:.0f}% clinical cost increase",
+        "ebitda": stress3_ebitda,
+        "margin": stress3_margin,
+        "impact_pct": stress3_impact,
+    })
+    
+    # 4. Combined stress
+    stress4_rev = stress2_patients * ((1 - mix_low_pct) * tariff + mix_low_pct * low_tariff)
+    stress4_var_costs = (drugs_y + labs_y) * (1 - volume_drop)
+    stress4_costs = stress3_clinical + stress4_var_costs + admin_y + other_y
+    stress4_ebitda = stress4_rev - stress4_costs
+    stress4_margin = safe_divide(stress4_ebitda, stress4_rev)
+    stress4_impact = safe_divide((stress4_ebitda - base_ebitda) * 100, base_ebitda, -100)
+    scenarios.append({
+        "name": "Combined Stress",
+        "description": "All adverse conditions",
+        "ebitda": stress4_ebitda,
+        "margin": stress4_margin,
+        "impact_pct": stress4_impact,
+    })
+    
+    return scenarios, base_ebitda, base_margin
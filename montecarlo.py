@@ -0,0 +1,364 @@
+"""
+Clinic P&L – Monte Carlo simulation.
+
+Draws the uncertain sidebar inputs from configurable distributions and
+pushes them through the batch engine in fixed-size chunks. Each chunk
+only updates running statistics (sums, counts and fixed-bin
+histograms), so memory stays bounded however many draws are requested.
+Pure NumPy, no Streamlit.
+"""
+import numpy as np
+
+from model import INPUT_UNITS, compute_batch, make_batch, irr_batch
+from projection import project_monthly
+
+# =========================================================
+# DISTRIBUTIONS
+# =========================================================
+# Inputs that can be made uncertain
+MC_FIELDS = (
+    "patients",
+    "tariff",
+    "drugs_base",
+    "labs_base",
+    "clinical_pay",
+    "rent",
+    "rev_growth",
+    "ke",
+)
+
+DISTRIBUTIONS = ("Fixed", "Normal", "Lognormal", "Triangular", "Uniform")
+
+# Default uncertainty: (distribution, spread as fraction of the base value)
+DEFAULT_DISTRIBUTIONS = {
+    "patients": ("Triangular", 0.20),
+    "tariff": ("Triangular", 0.10),
+    "drugs_base": ("Normal", 0.15),
+    "labs_base": ("Normal", 0.15),
+    "clinical_pay": ("Triangular", 0.10),
+    "rent": ("Uniform", 0.05),
+    "rev_growth": ("Triangular", 0.33),
+    "ke": ("Normal", 0.10),
+}
+
+# Quantiles reported for every metric (P5 … P95)
+QUANTILES = (0.05, 0.25, 0.50, 0.75, 0.95)
+
+
+def draw(dist, base, spread, size, rng):
+    """
+    Draw `size` values around `base`.
+    Normal: sd = spread × base · Lognormal: median = base, sigma = spread
+    Triangular / Uniform: base × (1 ± spread) · Fixed: base
+    A zero base or spread has no range to draw from: Fixed.
+    """
+    if not np.isfinite(spread) or spread < 0:
+        raise ValueError(f"Spread must be a finite value >= 0, got {spread}")
+    if dist == "Fixed" or base * spread == 0:
+        return np.full(size, float(base))
+    if dist == "Normal":
+        return rng.normal(base, abs(base) * spread, size)
+    if dist == "Lognormal":
+        return base * rng.lognormal(0.0, spread, size)
+    if dist == "Triangular":
+        return rng.triangular(base * (1 - spread), base, base * (1 + spread), size)
+    if dist == "Uniform":
+        return rng.uniform(base * (1 - spread), base * (1 + spread), size)
+    raise ValueError(f"Unknown distribution: {dist}")
+
+
+def draw_inputs(base_inputs, distributions, size, rng):
+    """
+    Struct-of-arrays batch with the uncertain inputs drawn and every
+    other input at its base value. Draws are clipped to the sidebar
+    domain (>= 0, percentages <= 100%).
+    """
+    batch = make_batch(base_inputs)
+    drawn = {}
+    for field in MC_FIELDS:
+        dist, spread = distributions.get(field, ("Fixed", 0.0))
+        values = draw(dist, batch[field][0], spread, size, rng)
+        drawn[field] = np.clip(values, 0.0, 1.0 if INPUT_UNITS[field] == "percent" else None)
+    return make_batch(base_inputs, **drawn)
+
+
+# =========================================================
+# CHUNK EVALUATION
+# =========================================================
+def evaluate_chunk(batch, with_irr=False, projection=None):
+    """
+    Tracked outputs for one chunk as (rows, columns) arrays:
+    ebitda_y, net_y, npv, irr (optional) and cum_cf (Year 0..N).
+    projection: keyword arguments for project_monthly to take the DCF
+    from the monthly engine instead of the steady-state one.
+    """
+    res = compute_batch(batch, with_irr=False)
+    if projection:
+        proj = project_monthly(batch, with_irr=False, **projection)
+        cf, npv = proj["cf"], proj["npv"]
+    else:
+        cf, npv = res["cf"], res["npv"]
+
+    out = {
+        "ebitda_y": res["ebitda_y"][:, None],
+        "net_y": res["net_y"][:, None],
+        "npv": npv[:, None],
+        "cum_cf": np.cumsum(cf, axis=1),
+    }
+    if with_irr:
+        out["irr"] = irr_batch(cf)[:, None]
+    out["_ke"] = batch["ke"][:, None]
+    return out
+
+
+# =========================================================
+# STREAMING STATISTICS
+# Every metric keeps, per column: finite count, NaN count,
+# shifted sum / sum of squares, min, max and a fixed-bin
+# histogram (+ under/overflow). All of it is additive: each
+# chunk is accumulated on its own and merged in chunk order.
+# =========================================================
+def histogram_layout(pilot, bins=2000, pad=0.25):
+    """Fixed bin layout per metric/column from a pilot chunk (range ± pad × span)"""
+    layout = {}
+    for key, values in pilot.items():
+        if key.startswith("_"):
+            continue
+        finite = np.isfinite(values)
+        has = finite.any(axis=0)
+        lo = np.where(has, np.where(finite, values, np.inf).min(axis=0), 0.0)
+        hi = np.where(has, np.where(finite, values, -np.inf).max(axis=0), 0.0)
+        centre = 0.5 * (lo + hi)
+        span = hi - lo
+        span = np.where(span > 0, span, np.maximum(np.abs(hi) * 0.01, 1e-9))
+        layout[key] = {
+            "lo": lo - pad * span,
+            "width": (span * (1 + 2 * pad)) / bins,
+            "bins": bins,
+            "shift": centre,
+        }
+    return layout
+
+
+def empty_stats(layout):
+    """Zeroed accumulators for a histogram layout"""
+    stats = {"draws": 0, "npv_neg": 0, "ebitda_neg": 0, "irr_below_ke": 0, "irr_defined": 0}
+    for key, lay in layout.items():
+        cols = lay["lo"].size
+        stats[key] = {
+            "n": np.zeros(cols, dtype=np.int64),
+            "nan": np.zeros(cols, dtype=np.int64),
+            "sum": np.zeros(cols),
+            "sumsq": np.zeros(cols),
+            "min": np.full(cols, np.inf),
+            "max": np.full(cols, -np.inf),
+            "counts": np.zeros((cols, lay["bins"]), dtype=np.int64),
+            "under": np.zeros(cols, dtype=np.int64),
+            "over": np.zeros(cols, dtype=np.int64),
+        }
+    return stats
+
+
+def accumulate(stats, layout, chunk):
+    """Fold one evaluated chunk into the running statistics (in place)"""
+    rows = chunk["npv"].shape[0]
+    stats["draws"] += rows
+    stats["npv_neg"] += int(np.sum(chunk["npv"] < 0))
+    stats["ebitda_neg"] += int(np.sum(chunk["ebitda_y"] < 0))
+    if "irr" in chunk and "irr" in stats:
+        with np.errstate(invalid="ignore"):
+            stats["irr_below_ke"] += int(np.sum(chunk["irr"] < chunk["_ke"]))
+            stats["irr_defined"] += int(np.sum(np.isfinite(chunk["irr"])))
+
+    for key, lay in layout.items():
+        if key not in chunk:
+            continue
+        x, s, bins = chunk[key], stats[key], lay["bins"]
+        finite = np.isfinite(x)
+        s["n"] += finite.sum(axis=0)
+        s["nan"] += (~finite).sum(axis=0)
+
+        xs = np.where(finite, x - lay["shift"], 0.0)
+        s["sum"] += xs.sum(axis=0)
+        s["sumsq"] += (xs * xs).sum(axis=0)
+        s["min"] = np.minimum(s["min"], np.where(finite, x, np.inf).min(axis=0))
+        s["max"] = np.maximum(s["max"], np.where(finite, x, -np.inf).max(axis=0))
+
+        idx = np.floor((np.where(finite, x, 0.0) - lay["lo"]) / lay["width"])
+        under = finite & (idx < 0)
+        over = finite & (idx >= bins)
+        s["under"] += under.sum(axis=0)
+        s["over"] += over.sum(axis=0)
+
+        inside = finite & ~under & ~over
+        flat = (idx + np.arange(x.shape[1]) * bins)[inside].astype(np.int64)
+        s["counts"] += np.bincount(flat, minlength=x.shape[1] * bins).reshape(x.shape[1], bins)
+    return stats
+
+
+def merge_stats(stats, other):
+    """Add the accumulators of `other` into `stats` (in place)"""
+    for key, value in other.items():
+        if isinstance(value, dict):
+            s = stats[key]
+            for k in ("n", "nan", "sum", "sumsq", "counts", "under", "over"):
+                s[k] += value[k]
+            s["min"] = np.minimum(s["min"], value["min"])
+            s["max"] = np.maximum(s["max"], value["max"])
+        else:
+            stats[key] += value
+    return stats
+
+
+def histogram_cdf(s, lay, x, col=0):
+    """Share of finite draws <= x, interpolated inside the bins"""
+    total = s["n"][col]
+    if total == 0:
+        return np.full(np.shape(x), np.nan)
+    pos = (np.asarray(x, dtype=float) - lay["lo"][col]) / lay["width"]
+    cum = np.concatenate(([0], np.cumsum(s["counts"][col]))) + s["under"][col]
+    inside = np.interp(np.clip(pos, 0, lay["bins"]), np.arange(lay["bins"] + 1), cum)
+    return np.clip(inside, 0, total) / total
+
+
+def histogram_quantile(s, lay, q, col=0):
+    """Quantile(s) from a streamed histogram (bin-width accurate)"""
+    q = np.atleast_1d(np.asarray(q, dtype=float))
+    total = s["n"][col]
+    if total == 0:
+        return np.full(q.shape, np.nan)
+    cum = np.concatenate(([0], np.cumsum(s["counts"][col]))) + s["under"][col]
+    target = q * total
+    # posición (en bins) donde la CDF acumulada alcanza el objetivo
+    pos = np.interp(target, cum, np.arange(lay["bins"] + 1))
+    values = lay["lo"][col] + pos * lay["width"][col]
+    values = np.where(target <= s["under"][col], s["min"][col], values)
+    values = np.where(target > cum[-1], s["max"][col], values)
+    return np.clip(values, s["min"][col], s["max"][col])
+
+
+def summarize(stats, layout):
+    """Means, standard deviations, quantiles and probabilities from the accumulators"""
+    draws = stats["draws"]
+    summary = {
+        "draws": draws,
+        "p_npv_neg": stats["npv_neg"] / draws if draws else np.nan,
+        "p_ebitda_neg": stats["ebitda_neg"] / draws if draws else np.nan,
+        "quantiles": QUANTILES,
+    }
+    if "irr" in layout:
+        # draws without an IRR are reported as summary["irr"]["nan_share"]
+        defined = stats["irr_defined"]
+        summary["p_irr_below_ke"] = stats["irr_below_ke"] / defined if defined else np.nan
+
+    for key, lay in layout.items():
+        s = stats[key]
+        n = np.maximum(s["n"], 1)
+        mean_shifted = s["sum"] / n
+        cols = lay["lo"].size
+        summary[key] = {
+            "mean": lay["shift"] + mean_shifted,
+            "std": np.sqrt(np.maximum(s["sumsq"] / n - mean_shifted ** 2, 0.0)),
+            "min": s["min"],
+            "max": s["max"],
+            "q": np.array([histogram_quantile(s, lay, QUANTILES, col=c) for c in range(cols)]),
+            "nan_share": s["nan"] / np.maximum(s["n"] + s["nan"], 1),
+        }
+    return summary
+
+
+# Money metrics of a run (the probabilities, IRR and counts are
+# the same in any currency)
+CURRENCY_METRICS = ("ebitda_y", "net_y", "npv", "cum_cf")
+
+
+def summary_in_currency(summary, rate, keys=CURRENCY_METRICS):
+    """
+    Copy of a run_monte_carlo summary in another currency: the money
+    metrics, their accumulators and bin layout scaled by rate (the
+    draws are relative to the base inputs, so the run itself is
+    currency-free). Histogram counts and probabilities are unchanged.
+    """
+    out = dict(summary)
+    stats, layout = dict(summary["stats"]), dict(summary["layout"])
+    for key in keys:
+        if key not in layout:
+            continue
+        out[key] = {k: (v if k == "nan_share" else v * rate) for k, v in summary[key].items()}
+        lay = layout[key]
+        layout[key] = {**lay, "lo": lay["lo"] * rate, "width": lay["width"] * rate, "shift": lay["shift"] * rate}
+        s = stats[key]
+        stats[key] = {
+            **s, "sum": s["sum"] * rate, "sumsq": s["sumsq"] * rate ** 2,
+            "min": s["min"] * rate, "max": s["max"] * rate,
+        }
+    out["stats"], out["layout"] = stats, layout
+    return out
+
+
+# =========================================================
+# DRIVER
+# =========================================================
+def chunk_sizes(n_draws, chunk_size):
+    """Sizes of the fixed-size chunks covering n_draws (last one may be shorter)"""
+    full, rest = divmod(int(n_draws), int(chunk_size))
+    return [int(chunk_size)] * full + ([rest] if rest else [])
+
+
+def plan_simulation(base_inputs, distributions, n_draws, chunk_size=100_000, seed=0,
+                    bins=2000, with_irr=False, projection=None):
+    """
+    Seeds and histogram layout for a run. Chunk k always uses child
+    seed k of SeedSequence(seed), so the draws do not depend on how
+    the chunks are scheduled.
+    """
+    sizes = chunk_sizes(n_draws, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes) + 1)
+
+    pilot_rng = np.random.default_rng(seeds[0])
+    pilot = evaluate_chunk(
+        draw_inputs(base_inputs, distributions, min(20_000, max(1, int(n_draws))), pilot_rng),
+        with_irr=with_irr,
+        projection=projection,
+    )
+    return {
+        "sizes": sizes,
+        "seeds": seeds[1:],
+        "layout": histogram_layout(pilot, bins=bins),
+    }
+
+
+def simulate_chunk(task):
+    """
+    One chunk of a plan: (base_inputs, distributions, layout, size,
+    seed_seq, with_irr, projection) -> accumulators for that chunk only.
+    Top-level and tuple-argument so it can be shipped to worker processes.
+    """
+    base_inputs, distributions, layout, size, seed_seq, with_irr, projection = task
+    rng = np.random.default_rng(seed_seq)
+    batch = draw_inputs(base_inputs, distributions, size, rng)
+    return accumulate(empty_stats(layout), layout, evaluate_chunk(batch, with_irr=with_irr, projection=projection))
+
+
+def run_monte_carlo(base_inputs, distributions, n_draws, chunk_size=100_000, seed=0,
+                    bins=2000, with_irr=False, projection=None, mapper=map):
+    """
+    Full Monte Carlo run in bounded memory.
+    mapper: map-like callable used to run the chunks (the built-in map
+    runs them one after another; parallel.py supplies a process pool).
+    Per-chunk accumulators are merged in chunk order, so the result is
+    bit-for-bit the same whichever mapper runs them.
+    Returns summarize() output plus the raw accumulators and layout
+    (for histograms).
+    """
+    plan = plan_simulation(base_inputs, distributions, n_draws, chunk_size, seed, bins, with_irr, projection)
+    tasks = (
+        (base_inputs, distributions, plan["layout"], size, seed_seq, with_irr, projection)
+        for size, seed_seq in zip(plan["sizes"], plan["seeds"])
+    )
+    stats = empty_stats(plan["layout"])
+    for part in mapper(simulate_chunk, tasks):
+        merge_stats(stats, part)
+    summary = summarize(stats, plan["layout"])
+    summary["stats"], summary["layout"] = stats, plan["layout"]
+    return summary
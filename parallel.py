@@ -0,0 +1,121 @@
+"""
+Clinic P&L – multi-core execution layer.
+
+Shards Monte Carlo runs and large sweeps across a process pool. Monte
+Carlo chunks do not depend on the worker count (each has its own
+SeedSequence child); sweep batches are cut into one row range per
+worker, and rows are independent. Partial results are merged in shard
+order, so the same seed gives the same answer on 1 or 32 workers.
+Pure NumPy + standard library, no Streamlit.
+"""
+import atexit
+import math
+import multiprocessing as mp
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from montecarlo import run_monte_carlo
+
+# one pool per worker count, reused across calls (and Streamlit reruns);
+# sessions run in their own threads, so _POOLS is guarded by a lock
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+# smallest sweep shard worth sending to another process
+MIN_SHARD = 10_000
+
+
+def available_workers():
+    """CPU cores usable by this process"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def get_pool(workers):
+    """
+    Shared process pool. "spawn" start method: workers never inherit
+    the threads/sockets of the parent (Streamlit server), only import
+    the pure NumPy modules.
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+            _POOLS[workers] = pool
+    return pool
+
+
+@atexit.register
+def shutdown_pools():
+    """Stop every pool started by this module"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def pool_mapper(workers=None, window=4):
+    """
+    map-like callable that runs tasks on `workers` processes and yields
+    results in task order. At most workers × window tasks are in flight,
+    so finished results never pile up in memory. workers <= 1 runs in
+    this process (built-in map).
+    """
+    workers = available_workers() if workers is None else int(workers)
+    if workers <= 1:
+        return map
+    pool = get_pool(workers)
+
+    def mapper(fn, tasks):
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, task))
+            if len(pending) >= workers * window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    return mapper
+
+
+# =========================================================
+# SIMULATIONS
+# =========================================================
+def run_monte_carlo_parallel(base_inputs, distributions, n_draws, workers=None, **kwargs):
+    """run_monte_carlo with its chunks sharded over a process pool"""
+    return run_monte_carlo(base_inputs, distributions, n_draws, mapper=pool_mapper(workers), **kwargs)
+
+
+# =========================================================
+# SWEEPS
+# =========================================================
+def split_batch(batch, shard_size):
+    """Row shards of a struct-of-arrays batch (views, no copies)"""
+    n = next(iter(batch.values())).size
+    for start in range(0, n, shard_size):
+        yield {k: v[start:start + shard_size] for k, v in batch.items()}
+
+
+def map_batch(func, batch, workers=None, shard_size=None, min_shard=MIN_SHARD):
+    """
+    Evaluate func (batch -> dict of arrays, e.g. compute_batch) over row
+    shards of `batch` and concatenate the results in row order.
+    func must be picklable (top-level function or functools.partial).
+    shard_size: rows per shard, default one shard per worker but at
+    least min_shard rows (smaller batches stay in this process).
+    """
+    workers = available_workers() if workers is None else int(workers)
+    n = next(iter(batch.values())).size
+    if shard_size is None:
+        shard_size = max(int(min_shard), math.ceil(n / max(workers, 1)))
+    if workers <= 1 or n <= shard_size:
+        return func(batch)
+    parts = list(pool_mapper(workers)(func, split_batch(batch, int(shard_size))))
+    return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
@@ -0,0 +1,169 @@
+"""
+Clinic P&L – monthly projection engine.
+
+Month-level build of the same P&L lines as model.compute_batch, over
+a 60–120 month horizon, with patient ramp-up, seasonal volume and
+staged hiring. Everything is an (N scenarios, months) array and rolls
+up to the annual P&L and the DCF cash-flow vector.
+Pure NumPy, no Streamlit.
+"""
+import numpy as np
+
+from model import make_batch, PNL_FIELDS, CASH_FLOW_FIELDS, stage_arrays, payback_years, valuation_block
+
+# Inputs the projection reads (everything except the discount rate)
+PROJECTION_FIELDS = PNL_FIELDS + CASH_FLOW_FIELDS
+
+# =========================================================
+# PROFILES
+# =========================================================
+# Seasonal volume multipliers, January → December (mean 1)
+SEASONALITY_PROFILES = {
+    "Flat": [1.0] * 12,
+    "Year-end slowdown": [0.94, 0.99, 1.03, 1.04, 1.04, 1.03, 1.02, 1.02, 1.03, 1.02, 0.98, 0.86],
+    "Mid-year holidays": [1.03, 1.04, 1.04, 1.02, 1.00, 0.94, 0.90, 0.96, 1.02, 1.03, 1.02, 1.00],
+}
+
+RAMP_CURVES = ("Linear", "S-curve")
+
+# Monthly line items, in P&L order
+LINE_ITEMS = (
+    "rev", "clinical", "drugs", "labs", "gross",
+    "admin", "other", "ebitda", "taxes", "net", "fcf",
+)
+
+# Money outputs of project_monthly (see model.to_currency)
+PROJECTION_CURRENCY_OUTPUTS = frozenset(
+    LINE_ITEMS + tuple(f"{k}_y" for k in LINE_ITEMS) + ("cf", "cash", "cash_trough", "npv")
+)
+
+
+def ramp_profile(months, ramp_months=0, start_pct=0.3, curve="Linear"):
+    """
+    Share of steady-state volume reached in each month.
+    Month 1 opens at start_pct, full volume from month ramp_months + 1.
+    """
+    t = np.arange(months, dtype=float)
+    if ramp_months <= 0:
+        return np.ones(months)
+    x = np.minimum(1.0, t / ramp_months)
+    if curve == "S-curve":
+        x = x * x * (3 - 2 * x)
+    return start_pct + (1 - start_pct) * x
+
+
+def seasonality_profile(months, profile="Flat", start_month=1):
+    """Seasonal multiplier per month (profile name or 12 values), normalised to mean 1"""
+    values = SEASONALITY_PROFILES[profile] if isinstance(profile, str) else profile
+    values = np.asarray(values, dtype=float)
+    values = values / values.mean()
+    return values[(np.arange(months) + start_month - 1) % 12]
+
+
+def staffing_profile(months, opening_pct=1.0, full_month=1):
+    """Share of the annual payroll in place each month (step up at full_month)"""
+    month_no = np.arange(1, months + 1)
+    return np.where(month_no >= full_month, 1.0, opening_pct)
+
+
+# =========================================================
+# MONTHLY ENGINE
+# =========================================================
+def project_cash_flows(
+    batch,
+    months=60,
+    ramp_months=0,
+    ramp_start=0.3,
+    ramp_curve="Linear",
+    seasonality="Flat",
+    start_month=1,
+    clinical_opening=1.0,
+    clinical_full_month=1,
+    admin_opening=1.0,
+    admin_full_month=1,
+):
+    """
+    Month-by-month projection for every scenario in `batch`, up to the
+    cash-flow vector. Reads PROJECTION_FIELDS only (no discount rate),
+    see project_monthly for the full description and valuation.
+    """
+    if months % 12:
+        raise ValueError("months must be a whole number of years")
+    b = stage_arrays(batch, PROJECTION_FIELDS)
+    col = {k: v[:, None] for k, v in b.items()}
+    n, years = b["patients"].size, months // 12
+
+    year_idx = np.arange(months) // 12
+    growth = (1 + col["rev_growth"]) ** year_idx
+    volume = ramp_profile(months, ramp_months, ramp_start, ramp_curve) * seasonality_profile(months, seasonality, start_month)
+    clinical_staff = staffing_profile(months, clinical_opening, clinical_full_month)
+    admin_staff = staffing_profile(months, admin_opening, admin_full_month)
+
+    patients = col["patients"] * volume
+    m = {"patients": np.broadcast_to(patients, (n, months))}
+    m["rev"] = patients * col["tariff"] / 12 * growth
+    m["clinical"] = col["clinical_pay"] * (1 + col["clinical_bur"]) / 12 * clinical_staff * growth
+    m["drugs"] = col["drugs_base"] * patients * (1 + col["drugs_cont"]) * growth
+    m["labs"] = col["labs_base"] * patients * (1 + col["labs_cont"]) * growth
+    m["gross"] = m["rev"] - (m["clinical"] + m["drugs"] + m["labs"])
+    m["admin"] = col["admin_pay"] * (1 + col["admin_bur"]) / 12 * admin_staff * growth
+    m["other"] = (
+        (col["rent"] / 12) * (1 + col["util_pct"]) +
+        (col["ehr_m"] + col["it_m"]) +
+        (col["office_y"] + col["licenses_y"] + col["mal_md_y"] + col["mal_np_y"]) / 12
+    ) * growth
+    m["ebitda"] = m["gross"] - m["admin"] - m["other"]
+
+    # annual roll-up: (N, years, 12) summed over the month axis
+    def _roll(x):
+        return np.broadcast_to(x, (n, months)).reshape(n, years, 12).sum(axis=2)
+
+    ebitda_y = _roll(m["ebitda"])
+    taxed_year = (ebitda_y * col["tax_rate"]) > 0
+    m["taxes"] = m["ebitda"] * col["tax_rate"] * np.repeat(taxed_year, 12, axis=1)
+    m["net"] = m["ebitda"] - m["taxes"]
+    m["fcf"] = m["net"] * col["fcf_factor"]
+
+    out = {k: np.broadcast_to(v, (n, months)) for k, v in m.items()}
+    for k in LINE_ITEMS:
+        out[f"{k}_y"] = _roll(m[k])
+
+    # DCF on the annual roll-up (Year 0 = -initial investment)
+    cf = np.empty((n, years + 1))
+    cf[:, 0] = -b["initial_investment"]
+    cf[:, 1:] = out["fcf_y"]
+    out["cf"] = cf
+    out["payback_year"] = payback_years(cf)
+
+    # monthly cash position: investment at opening, then cumulative FCF
+    cash = -b["initial_investment"][:, None] + np.cumsum(out["fcf"], axis=1)
+    out["cash"] = cash
+    out["cash_trough"] = np.minimum(cash.min(axis=1), -b["initial_investment"])
+    out["trough_month"] = np.where(cash.min(axis=1) < -b["initial_investment"], cash.argmin(axis=1) + 1, 0)
+    cash_ok = cash >= 0
+    out["payback_month"] = np.where(cash_ok.any(axis=1), cash_ok.argmax(axis=1) + 1, np.nan)
+    return out
+
+
+def project_monthly(batch, with_irr=True, **settings):
+    """
+    Month-by-month projection for every scenario in `batch`.
+
+    Volume-driven lines (revenue, drugs, labs) follow ramp × seasonality,
+    payroll follows the hiring steps, and every line grows at rev_growth
+    once per projection year. Taxes are assessed on annual EBITDA (same
+    rule as the steady-state model) and spread over that year's months.
+
+    With no ramp, flat seasonality and full staffing the annual roll-up
+    equals the steady-state DCF of model.compute_batch.
+
+    settings: months, ramp and hiring options of project_cash_flows.
+    Returns a dict: monthly (N, months) arrays for LINE_ITEMS plus
+    "patients" and "cash"; annual (N, years) roll-ups with a "_y"
+    suffix; "cf" (N, years + 1), "npv", "payback_year", "irr",
+    "cash_trough", "trough_month" and "payback_month".
+    """
+    b = make_batch(batch)
+    out = project_cash_flows(b, **settings)
+    out.update(valuation_block(out["cf"], b["ke"], with_irr))
+    return out
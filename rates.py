@@ -0,0 +1,310 @@
+"""
+Clinic P&L – exchange rates.
+
+Only the USD payload of the currency API is fetched (CDN and mirror
+requested concurrently) and every cross rate between USD, COP and EUR
+is derived from it. Results go to an on-disk cache with their fetch
+time; stale-while-revalidate: a cached table older than max_age is
+served at once while a background thread refreshes it.
+Where the rates come from is pluggable (provider): the live API, a
+local JSON file or a static table, for offline runs and tests. Each
+provider has its own cache file, so rates cached by an offline run are
+never served as live ones.
+Standard library + requests (imported on the first HTTP fetch only),
+no Streamlit.
+"""
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+CURRENCIES = ("USD", "COP", "EUR")
+
+RATES_URLS = (
+    "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json",
+    "https://latest.currency-api.pages.dev/v1/currencies/usd.json",
+)
+
+# units of each currency per 1 USD, used when nothing else is available
+FALLBACK_USD_RATES = {"usd": 1.0, "cop": 3855.0, "eur": 0.868}
+
+# longest wait of a session's first run on a fetch already in flight
+FIRST_FETCH_WAIT = 10.0
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "CLINIC_RATES_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "clinic-app", "exchange_rates.json"),
+)
+
+# in-memory copy of each cache file, the refresh thread running per
+# path, the time of the last fetch attempt and the last fetch error
+# per path (failed fetches are retried at most every RETRY_AFTER seconds)
+RETRY_AFTER = 60
+_MEMORY = {}
+_REFRESHING = {}
+_LAST_ATTEMPT = {}
+_ERRORS = {}
+_LOCK = threading.Lock()
+
+
+# =========================================================
+# PROVIDERS
+# A provider is a callable returning (usd_rates, date):
+# usd_rates maps lower-case codes to units per 1 USD. Its
+# .name picks its cache file (cache_path_for).
+# =========================================================
+def _get_usd_payload(url, timeout):
+    import requests
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    return data["usd"], data["date"]
+
+
+def http_provider(urls=RATES_URLS, timeout=5):
+    """
+    Live API: the USD payload from the CDN and its mirror, requested
+    concurrently; the first valid answer wins, so a cold fetch waits
+    at most one timeout.
+    """
+    def fetch():
+        pool = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="rates-http")
+        futures = [pool.submit(_get_usd_payload, url, timeout) for url in urls]
+        pool.shutdown(wait=False)
+        error = None
+        for future in as_completed(futures):
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        raise error
+    fetch.name = "http"
+    return fetch
+
+
+def file_provider(path):
+    """Local JSON file in the API's format: {"date": ..., "usd": {"cop": ..., "eur": ...}}"""
+    def fetch():
+        with open(path) as f:
+            data = json.load(f)
+        return data["usd"], data["date"]
+    fetch.name = "file"
+    return fetch
+
+
+def static_provider(usd_rates=FALLBACK_USD_RATES, date="Offline"):
+    """Fixed table, no I/O"""
+    def fetch():
+        return dict(usd_rates), date
+    fetch.name = "static"
+    return fetch
+
+
+def default_provider():
+    """
+    Live API unless configured otherwise by environment:
+    CLINIC_RATES_FILE=<path> reads a local file, CLINIC_RATES_OFFLINE=1
+    uses the fallback table.
+    """
+    if os.environ.get("CLINIC_RATES_FILE"):
+        return file_provider(os.environ["CLINIC_RATES_FILE"])
+    if os.environ.get("CLINIC_RATES_OFFLINE", "") not in ("", "0"):
+        return static_provider()
+    return http_provider()
+
+
+def check_usd_rates(usd_rates):
+    """
+    Raise ValueError unless the payload has a positive, finite rate for
+    every currency in CURRENCIES (a partial payload would make
+    cross_rates fail on every rerun while it sits in the cache).
+    """
+    if not isinstance(usd_rates, dict):
+        raise ValueError(f"rates payload is {type(usd_rates).__name__}, not a mapping")
+    rates = {str(k).lower(): v for k, v in usd_rates.items()}
+    for code in CURRENCIES:
+        if code == "USD":
+            continue
+        try:
+            value = float(rates[code.lower()])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"rates payload has no usable {code} rate") from None
+        if not (value > 0 and math.isfinite(value)):
+            raise ValueError(f"rates payload has an invalid {code} rate: {value}")
+    return usd_rates
+
+
+# =========================================================
+# CROSS RATES
+# =========================================================
+def cross_rates(usd_rates, currencies=CURRENCIES):
+    """
+    Full conversion table from one USD payload:
+    table[a][b] = units of b per 1 unit of a = usd[b] / usd[a].
+    """
+    usd = {"usd": 1.0, **{k.lower(): float(v) for k, v in usd_rates.items()}}
+    return {
+        a: {b: 1.0 if a == b else usd[b.lower()] / usd[a.lower()] for b in currencies}
+        for a in currencies
+    }
+
+
+# =========================================================
+# DISK CACHE
+# =========================================================
+def cache_path_for(provider, cache_path):
+    """
+    Cache file of a provider: cache_path itself for the live API,
+    next to it for any other provider (exchange_rates.static.json, …).
+    """
+    name = getattr(provider, "name", "http")
+    if name == "http":
+        return cache_path
+    stem, ext = os.path.splitext(cache_path)
+    return f"{stem}.{name}{ext or '.json'}"
+
+
+def read_cache(path):
+    """Cached entry {"fetched_at", "date", "usd"} or None"""
+    entry = _MEMORY.get(path)
+    if entry is not None:
+        return entry
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        entry = {"fetched_at": float(entry["fetched_at"]), "date": entry["date"], "usd": check_usd_rates(entry["usd"])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    _MEMORY[path] = entry
+    return entry
+
+
+def write_cache(path, entry):
+    """Store an entry (atomic replace); an unwritable location only keeps it in memory"""
+    _MEMORY[path] = entry
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def fetch_into_cache(provider, path):
+    """
+    Call the provider and cache its answer; returns the new entry.
+    A payload missing a currency raises ValueError and is not cached.
+    """
+    _LAST_ATTEMPT[path] = time.time()
+    usd_rates, date = provider()
+    entry = {"fetched_at": time.time(), "date": date, "usd": check_usd_rates(usd_rates)}
+    write_cache(path, entry)
+    _ERRORS.pop(path, None)
+    return entry
+
+
+def _refresh(provider, path):
+    try:
+        fetch_into_cache(provider, path)
+    except Exception as e:
+        # keep serving the stale entry (if any); the next call retries
+        _ERRORS[path] = str(e) or type(e).__name__
+    finally:
+        with _LOCK:
+            _REFRESHING.pop(path, None)
+
+
+def refresh_in_background(provider, path):
+    """
+    Start one refresh thread per cache path. No-op while one is running
+    or within RETRY_AFTER seconds of the last attempt.
+    """
+    with _LOCK:
+        if path in _REFRESHING or time.time() - _LAST_ATTEMPT.get(path, 0.0) < RETRY_AFTER:
+            return False
+        thread = _REFRESHING[path] = threading.Thread(
+            target=_refresh, args=(provider, path), daemon=True, name="rates-refresh"
+        )
+        thread.start()
+    return True
+
+
+def prefetch_rates(provider=None, cache_path=DEFAULT_CACHE_PATH):
+    """
+    With nothing cached yet, start the fetch in the background right
+    away (cold start: it overlaps the app's imports); the next
+    get_rates() waits for it instead of fetching again. No-op once
+    rates are cached.
+    """
+    provider = provider or default_provider()
+    cache_path = cache_path_for(provider, cache_path)
+    if read_cache(cache_path) is None and cache_path not in _ERRORS:
+        refresh_in_background(provider, cache_path)
+
+
+# =========================================================
+# ENTRY POINT
+# =========================================================
+def get_rates(provider=None, cache_path=DEFAULT_CACHE_PATH, max_age=3600):
+    """
+    Exchange-rate table with stale-while-revalidate.
+
+    Returns a dict:
+      rates       table[a][b] for CURRENCIES (cross_rates)
+      date        date of the rates ("Cached" for the fallback table)
+      status      "fresh" (cache younger than max_age), "stale" (older,
+                  refresh started in the background), "fetched" (no
+                  cache yet, fetched now) or "fallback" (no cache and the
+                  fetch failed, returned a payload missing a currency or
+                  was still running after FIRST_FETCH_WAIT:
+                  FALLBACK_USD_RATES, not cached; later calls retry in
+                  the background instead of blocking)
+      fetched_at  epoch seconds of the cached fetch (None for fallback)
+      error       fetch error message (fallback only)
+    """
+    provider = provider or default_provider()
+    cache_path = cache_path_for(provider, cache_path)
+    entry = read_cache(cache_path)
+    if entry is not None:
+        stale = time.time() - entry["fetched_at"] > max_age
+        if stale:
+            refresh_in_background(provider, cache_path)
+        status = "stale" if stale else "fresh"
+    else:
+        # first fetch already in flight (prefetch_rates): wait for it, up
+        # to FIRST_FETCH_WAIT, rather than fetch twice; background
+        # retries after an error are not waited on
+        thread = _REFRESHING.get(cache_path)
+        waited = thread is not None and cache_path not in _ERRORS
+        if waited:
+            thread.join(timeout=FIRST_FETCH_WAIT)
+            entry = read_cache(cache_path)
+        error = _ERRORS.get(cache_path)
+        if entry is not None:
+            status = "fetched"
+        elif waited and thread.is_alive():
+            # hung fetch: fall back now (later sessions don't wait on it
+            # either); it fills the cache and clears the error when it ends
+            error = _ERRORS[cache_path] = f"rates fetch still running after {FIRST_FETCH_WAIT:g} s"
+        elif error is None:
+            try:
+                entry = fetch_into_cache(provider, cache_path)
+                status = "fetched"
+            except Exception as e:
+                error = _ERRORS[cache_path] = str(e) or type(e).__name__
+        else:
+            refresh_in_background(provider, cache_path)
+        if entry is None:
+            return {
+                "rates": cross_rates(FALLBACK_USD_RATES), "date": "Cached",
+                "status": "fallback", "fetched_at": None, "error": error,
+            }
+    return {
+        "rates": cross_rates(entry["usd"]), "date": entry["date"],
+        "status": status, "fetched_at": entry["fetched_at"], "error": None,
+    }
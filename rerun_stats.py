@@ -0,0 +1,211 @@
+"""
+Clinic P&L – rerun analytics.
+
+Every rerun is attributed to what triggered it: the widget values that
+changed since the end of the previous run of the session (widget keys
+in session state), the form submit button that was clicked,
+"(session start)" or "(no widget change)". Each rerun's latency and
+the bytes it enqueued for the browser are aggregated per trigger and
+per session in one process-wide table, so debouncing and caching can
+go where the load comes from. Fragment reruns (st.fragment) skip the
+end of the script, so fragments record themselves; they are
+attributed the same way and also counted per fragment. Streamlit has no public hook for the
+messages of a run: counting bytes wraps a private method of the script
+run context and sizes every message, so it is off unless asked for
+(CLINIC_RERUN_BYTES=1), and logs a warning once if that method is gone.
+
+    changed_keys(snapshot, state) → rerun → record(stats, session, triggers, ms, bytes)
+
+A rerun that changes several widgets at once (a submitted form)
+counts once for each of them; shares are of all reruns.
+Standard library + NumPy, no Streamlit.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from graph import fingerprint
+
+SESSION_START = "(session start)"
+NO_CHANGE = "(no widget change)"
+FRAGMENT_RERUN = "(fragment {} rerun)"
+
+# session state key of a form's submit button: FormSubmitter:<form>-<label>
+FORM_SUBMITTER = "FormSubmitter:"
+
+COUNT_BYTES = os.environ.get("CLINIC_RERUN_BYTES", "") not in ("", "0")
+_WARNED = {"enqueue": False}
+
+# latency / bytes samples kept per trigger, sessions kept in the table
+SAMPLES = 2000
+MAX_SESSIONS = 500
+
+# value types of widget state (everything else in session state is app data)
+WIDGET_TYPES = (bool, int, float, str, list, tuple, dict, type(None))
+
+
+# =========================================================
+# TRIGGERS
+# =========================================================
+def snapshot(state, exclude=()):
+    """Fingerprints of the widget-like entries of a session state mapping"""
+    return {
+        k: fingerprint(v) for k, v in state.items()
+        if k not in exclude and not k.startswith(("_", FORM_SUBMITTER)) and isinstance(v, WIDGET_TYPES)
+    }
+
+
+def changed_keys(previous, state, exclude=()):
+    """
+    Keys whose value differs from `previous` (a snapshot from the end of
+    the last run), plus the form submit button pressed for this run;
+    None when there is no previous run. Keys that are new or gone
+    (widgets of a section opened or left) don't count.
+    """
+    if previous is None:
+        return None
+    current = snapshot(state, exclude)
+    changed = sorted(k for k, fp in current.items() if k in previous and previous[k] != fp)
+    submitted = sorted(k for k, v in state.items() if k.startswith(FORM_SUBMITTER) and v is True)
+    return submitted + changed
+
+
+def label(name, labels=None):
+    """Display name of a trigger: labels[name], a form button's text or the key itself"""
+    if labels and name in labels:
+        return labels[name]
+    if name.startswith(FORM_SUBMITTER):
+        form, _, button = name[len(FORM_SUBMITTER):].partition("-")
+        return f"{button} ({form})"
+    return name
+
+
+def count_enqueued(ctx, enabled=COUNT_BYTES):
+    """
+    Count the bytes of the messages a script run context enqueues for
+    the browser. Wraps ctx._enqueue once per context; returns the
+    counter ({"bytes", "msgs"}) reset for this run (None when not
+    enabled, without ctx or if Streamlit no longer has ctx._enqueue).
+    """
+    if not enabled or ctx is None:
+        return None
+    if not callable(getattr(ctx, "_enqueue", None)):
+        if not _WARNED["enqueue"]:
+            _WARNED["enqueue"] = True
+            logging.getLogger(__name__).warning(
+                "CLINIC_RERUN_BYTES: this Streamlit version has no ScriptRunContext._enqueue, bytes are not counted"
+            )
+        return None
+    counter = getattr(ctx._enqueue, "counter", None)
+    if counter is None:
+        enqueue = ctx._enqueue
+        counter = {"bytes": 0, "msgs": 0}
+
+        def counting_enqueue(msg):
+            counter["bytes"] += msg.ByteSize()
+            counter["msgs"] += 1
+            return enqueue(msg)
+        counting_enqueue.counter = counter
+        ctx._enqueue = counting_enqueue
+    counter.update(bytes=0, msgs=0)
+    return counter
+
+
+# =========================================================
+# AGGREGATION
+# =========================================================
+def new_stats():
+    """Empty process-wide table (share one per process, e.g. st.cache_resource)"""
+    return {
+        "since": time.time(), "runs": 0,
+        "triggers": {}, "sessions": OrderedDict(), "fragments": {}, "lock": threading.Lock(),
+    }
+
+
+def _new_entry():
+    return {"runs": 0, "ms": 0.0, "bytes": 0, "bytes_runs": 0, "ms_samples": deque(maxlen=SAMPLES), "sessions": 0}
+
+
+def record(stats, session_id, triggers, ms, nbytes=None, fragment=None):
+    """
+    Add one rerun (triggers: list of names, see changed_keys; nbytes:
+    None when bytes were not counted; fragment: name of the fragment for
+    a fragment rerun). A trigger's session count goes
+    up the first time a session in the table uses it, so a session
+    dropped from the table and back counts again.
+    """
+    with stats["lock"]:
+        stats["runs"] += 1
+        if fragment is not None:
+            stats["fragments"][fragment] = stats["fragments"].get(fragment, 0) + 1
+        sessions = stats["sessions"]
+        sess = sessions.pop(session_id, None) or {
+            "first": time.time(), "runs": 0, "ms": 0.0, "bytes": 0, "bytes_runs": 0, "triggers": {},
+        }
+        for name in triggers:
+            entry = stats["triggers"].setdefault(name, _new_entry())
+            entry["runs"] += 1
+            entry["ms"] += ms
+            entry["ms_samples"].append(ms)
+            if nbytes is not None:
+                entry["bytes"] += nbytes
+                entry["bytes_runs"] += 1
+            if name not in sess["triggers"]:
+                entry["sessions"] += 1
+
+        sess["runs"] += 1
+        sess["ms"] += ms
+        if nbytes is not None:
+            sess["bytes"] += nbytes
+            sess["bytes_runs"] += 1
+        sess["last"] = time.time()
+        for name in triggers:
+            sess["triggers"][name] = sess["triggers"].get(name, 0) + 1
+        sessions[session_id] = sess   # most recent last
+        while len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+
+
+def report(stats, labels=None):
+    """
+    Aggregated table as plain data:
+      runs, since   reruns recorded and since when (epoch seconds)
+      fragments     fragment reruns by fragment name (included in runs)
+      triggers      per trigger: runs, share of reruns, sessions, mean /
+                    p50 / p95 ms, total ms, mean and total bytes
+                    (busiest first, by total ms)
+      sessions      per session: runs, total ms / bytes, top trigger
+    Bytes are None where no rerun had them counted.
+    labels: optional display names by trigger key.
+    """
+    with stats["lock"]:
+        runs = stats["runs"]
+        fragments = dict(stats["fragments"])
+        triggers = []
+        for name, e in stats["triggers"].items():
+            samples = np.fromiter(e["ms_samples"], dtype=float)
+            p50, p95 = np.percentile(samples, [50, 95]) if samples.size else (np.nan, np.nan)
+            triggers.append({
+                "trigger": label(name, labels), "key": name,
+                "runs": e["runs"], "share": e["runs"] / runs if runs else 0.0,
+                "sessions": e["sessions"],
+                "mean_ms": e["ms"] / e["runs"], "p50_ms": float(p50), "p95_ms": float(p95),
+                "total_ms": e["ms"],
+                "mean_bytes": e["bytes"] / e["bytes_runs"] if e["bytes_runs"] else None,
+                "total_bytes": e["bytes"] if e["bytes_runs"] else None,
+            })
+        sessions = [
+            {
+                "session": sid, "runs": s["runs"], "total_ms": s["ms"],
+                "total_bytes": s["bytes"] if s["bytes_runs"] else None,
+                "top_trigger": label(top, labels) if top else None, "first": s["first"], "last": s["last"],
+            }
+            for sid, s in reversed(stats["sessions"].items())
+            for top in [max(s["triggers"], key=s["triggers"].get) if s["triggers"] else None]
+        ]
+    triggers.sort(key=lambda t: t["total_ms"], reverse=True)
+    return {"runs": runs, "since": stats["since"], "fragments": fragments, "triggers": triggers, "sessions": sessions}
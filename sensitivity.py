@@ -0,0 +1,283 @@
+"""
+Clinic P&L – sensitivity tools.
+
+Built on the batch engine in model.py: every analysis here is turned
+into one struct-of-arrays batch and evaluated in a single call.
+Pure NumPy, no Streamlit.
+"""
+from functools import partial
+
+import numpy as np
+
+from model import INPUT_UNITS, compute_batch, make_batch
+from parallel import map_batch
+
+# =========================================================
+# OUTPUT METRICS
+# Outputs that can be put on a sensitivity chart.
+# hurdle: value that separates "good" from "bad" – a number,
+# or the name of an input (IRR is judged against Ke).
+# =========================================================
+OUTPUT_METRICS = {
+    "ebitda_y": {"label": "EBITDA", "unit": "currency", "hurdle": 0.0, "line": "EBITDA = 0"},
+    "net_y": {"label": "Net profit", "unit": "currency", "hurdle": 0.0, "line": "Net profit = 0"},
+    "npv": {"label": "NPV", "unit": "currency", "hurdle": 0.0, "line": "NPV = 0"},
+    "irr": {"label": "IRR", "unit": "percent", "hurdle": "ke", "line": "IRR = Ke"},
+    "mos_pct": {"label": "Margin of safety", "unit": "percent", "hurdle": 0.0, "line": "Margin of safety = 0"},
+    "ebitda_margin": {"label": "EBITDA margin", "unit": "percent", "hurdle": 0.0, "line": "EBITDA margin = 0"},
+}
+
+
+def evaluate_output(batch, output, workers=1):
+    """
+    Evaluate one output metric over a batch.
+    workers > 1 shards the rows over a process pool (parallel.py).
+    Returns (values, hurdle) as arrays of the batch length.
+    """
+    if output not in OUTPUT_METRICS:
+        raise KeyError(f"Unknown output metric: {output}")
+    compute = partial(compute_batch, with_irr=(output == "irr"))
+    results = compute(batch) if workers == 1 else map_batch(compute, make_batch(batch), workers)
+    values = results[output]
+
+    hurdle = OUTPUT_METRICS[output]["hurdle"]
+    hurdle = batch[hurdle] if isinstance(hurdle, str) else np.full_like(values, hurdle)
+    return values, hurdle
+
+
+# =========================================================
+# 2D SENSITIVITY SURFACE
+# =========================================================
+def axis_values(field, base_value, span=0.40, points=15):
+    """
+    Evenly spaced test values around the current input.
+    span: ± fraction of the base value. Inputs at zero get a
+    generic 0–50% (percent) or 0–10 (amounts) axis instead.
+    """
+    unit = INPUT_UNITS[field]
+    base_value = float(base_value)
+
+    if base_value == 0:
+        lo, hi = 0.0, (0.5 if unit == "percent" else 10.0)
+    else:
+        lo = max(0.0, base_value * (1 - span))
+        hi = base_value * (1 + span)
+        if unit == "percent":
+            hi = min(hi, 1.0)
+    return np.linspace(lo, hi, int(points))
+
+
+def sensitivity_surface(base_inputs, x_field, x_values, y_field, y_values, output="ebitda_y", workers=1):
+    """
+    Any two inputs × any output.
+    Every (x, y) combination is one row of a single batch, all other
+    inputs are held at base_inputs.
+    Returns (z, hurdle) with shape (len(y_values), len(x_values)).
+    """
+    if x_field == y_field:
+        raise ValueError("x_field and y_field must be different inputs")
+
+    xs = np.asarray(x_values, dtype=float)
+    ys = np.asarray(y_values, dtype=float)
+    grid_x, grid_y = np.meshgrid(xs, ys)
+
+    batch = make_batch(base_inputs, **{x_field: grid_x.ravel(), y_field: grid_y.ravel()})
+    values, hurdle = evaluate_output(batch, output, workers)
+    return values.reshape(grid_x.shape), hurdle.reshape(grid_x.shape)
+
+
+# =========================================================
+# TORNADO / SPIDER (one-at-a-time driver sweep)
+# =========================================================
+def driver_sweep(base_inputs, fields, ranges=None, span=0.20, points=41, output="ebitda_y", workers=1):
+    """
+    Vary each input on its own, all others at base_inputs.
+    ranges: {field: (low, high)} relative changes (-0.2 = -20%);
+    fields without an entry use (-span, +span). Inputs are clipped to
+    the sidebar domain (>= 0, percentages <= 100%).
+
+    Every field × point plus the base case is one row of a single
+    batch. Returns a dict with
+      offsets (n_fields, points) relative change applied,
+      inputs  (n_fields, points) input values tested,
+      values  (n_fields, points) output,
+      base    output at base_inputs (float).
+    """
+    fields = list(fields)
+    ranges = ranges or {}
+    n, p = len(fields), int(points)
+
+    offsets = np.empty((n, p))
+    for i, field in enumerate(fields):
+        low, high = ranges.get(field, (-span, span))
+        offsets[i] = np.linspace(low, high, p)
+
+    base = make_batch(base_inputs)
+    base_vals = np.array([base[field][0] for field in fields])
+    tested = base_vals[:, None] * (1 + offsets)
+    upper = np.array([1.0 if INPUT_UNITS[f] == "percent" else np.inf for f in fields])
+    tested = np.clip(tested, 0.0, upper[:, None])
+
+    # struct-of-arrays: every column at its base value, then the row
+    # block of field i overwritten with its own test values
+    columns = {k: np.full(n * p + 1, v[0]) for k, v in base.items()}
+    for i, field in enumerate(fields):
+        columns[field][i * p:(i + 1) * p] = tested[i]
+
+    values, _ = evaluate_output(columns, output, workers)
+    return {
+        "fields": fields,
+        "offsets": offsets,
+        "inputs": tested,
+        "values": values[:-1].reshape(n, p),
+        "base": float(values[-1]),
+    }
+
+
+# =========================================================
+# GOAL SEEK (batched)
+# =========================================================
+def solve_bounds(field, base_value):
+    """Default search interval for an input: 0–100% or 0–10× the base value"""
+    base_value = np.asarray(base_value, dtype=float)
+    if INPUT_UNITS[field] == "percent":
+        return np.zeros_like(base_value), np.ones_like(base_value)
+    return np.zeros_like(base_value), np.maximum(10 * base_value, 10.0)
+
+
+def goal_seek(base_inputs, solve_field, output, target, bounds=None, scan_points=33,
+              refine=4, tol=1e-10, max_iter=80, workers=1, **overrides):
+    """
+    Find the value of solve_field that makes `output` hit `target`.
+
+    overrides: other inputs as scalars or arrays; every element of the
+    broadcast batch is an independent solve, e.g.
+        goal_seek(inputs, "tariff", "npv", 0.0, patients=np.arange(100, 601, 10))
+    gives the break-even tariff for every volume in one call.
+    target may be an array of the same length.
+
+    The interval (bounds, default solve_bounds) is scanned on a grid in
+    one batch; the first sign change is then refined by Illinois
+    regula falsi, one batch per iteration on the still-open rows.
+    Returns a dict of arrays: value (NaN when the target is not reachable
+    inside the interval), achieved, converged.
+    """
+    batch = make_batch(base_inputs, **overrides)
+    target = np.atleast_1d(np.asarray(target, dtype=float))
+    n = np.broadcast_shapes(batch[solve_field].shape, target.shape)[0]
+    batch = {k: np.broadcast_to(v, (n,)) for k, v in batch.items()}
+    target = np.broadcast_to(target, (n,))
+    lo, hi = bounds if bounds is not None else solve_bounds(solve_field, batch[solve_field])
+    lo = np.broadcast_to(np.asarray(lo, dtype=float), (n,)).copy()
+    hi = np.broadcast_to(np.asarray(hi, dtype=float), (n,)).copy()
+
+    def f(rows, x):
+        sub = {k: v[rows] for k, v in batch.items()}
+        sub[solve_field] = x
+        return evaluate_output(sub, output, workers)[0] - target[rows]
+
+    # 1) scan: (rows × scan_points) in one batch, first sign change per
+    # row. Where the output is undefined on part of the interval (IRR
+    # without a sign change in the cash flows) the first NaN/finite
+    # boundary cell is rescanned, up to `refine` times.
+    s = int(scan_points)
+    found = np.zeros(n, dtype=bool)
+    a, b = np.full(n, np.nan), np.full(n, np.nan)
+    fa, fb = np.full(n, np.nan), np.full(n, np.nan)
+    pending, s_lo, s_hi = np.arange(n), lo.copy(), hi.copy()
+    for _ in range(refine + 1):
+        if pending.size == 0:
+            break
+        grid = s_lo[pending, None] + (s_hi - s_lo)[pending, None] * np.linspace(0.0, 1.0, s)
+        f_grid = f(np.repeat(pending, s), grid.ravel()).reshape(pending.size, s)
+        finite = np.isfinite(f_grid)
+        with np.errstate(invalid="ignore"):
+            crossing = (np.sign(f_grid[:, :-1]) * np.sign(f_grid[:, 1:]) <= 0) & finite[:, :-1] & finite[:, 1:]
+        hit = crossing.any(axis=1)
+        first = crossing.argmax(axis=1)
+        k = np.arange(pending.size)
+
+        rows = pending[hit]
+        found[rows] = True
+        a[rows], b[rows] = grid[k, first][hit], grid[k, first + 1][hit]
+        fa[rows], fb[rows] = f_grid[k, first][hit], f_grid[k, first + 1][hit]
+
+        edge = finite[:, :-1] != finite[:, 1:]
+        retry = ~hit & edge.any(axis=1)
+        cell = edge.argmax(axis=1)
+        s_lo[pending[retry]] = grid[k, cell][retry]
+        s_hi[pending[retry]] = grid[k, cell + 1][retry]
+        pending = pending[retry]
+
+    value = np.full(n, np.nan)
+    converged = np.zeros(n, dtype=bool)
+    exact_a = found & (fa == 0)
+    exact_b = found & ~exact_a & (fb == 0)
+    value[exact_a], value[exact_b] = a[exact_a], b[exact_b]
+    converged[exact_a | exact_b] = True
+
+    # 2) Illinois regula falsi on the open rows
+    idx = np.flatnonzero(found & ~converged)
+    a, b, fa, fb = a[idx], b[idx], fa[idx], fb[idx]
+    for _ in range(max_iter):
+        if idx.size == 0:
+            break
+        c = b - fb * (b - a) / (fb - fa)
+        fc = f(idx, c)
+
+        done = (fc == 0) | (np.abs(b - a) <= tol * (1 + np.abs(c)))
+        value[idx[done]] = c[done]
+        converged[idx[done]] = np.isfinite(fc[done])
+
+        flip = fc * fb < 0
+        a = np.where(flip, b, a)
+        fa = np.where(flip, fb, fa / 2)
+        b, fb = c, fc
+
+        keep = ~done & np.isfinite(fc)
+        idx, a, b, fa, fb = idx[keep], a[keep], b[keep], fa[keep], fb[keep]
+
+    value[~converged] = np.nan
+    achieved = np.full(n, np.nan)
+    ok = np.flatnonzero(converged)
+    if ok.size:
+        achieved[ok] = f(ok, value[ok]) + target[ok]
+    return {"value": value, "achieved": achieved, "converged": converged}
+
+
+# =========================================================
+# CURRENCY
+# The analyses run on canonical (USD) inputs; these convert a
+# result to the display currency (money scales with the rate).
+# =========================================================
+def unit_rate(unit, rate):
+    """Conversion factor for a quantity of the given unit"""
+    return rate if unit == "currency" else 1.0
+
+
+def surface_in_currency(surface, output, rate):
+    """(z, hurdle) of sensitivity_surface in the display currency"""
+    values, hurdle = surface
+    r = unit_rate(OUTPUT_METRICS[output]["unit"], rate)
+    return values * r, hurdle * r
+
+
+def sweep_in_currency(sweep, output, rate):
+    """driver_sweep result with tested inputs and outputs in the display currency"""
+    r = unit_rate(OUTPUT_METRICS[output]["unit"], rate)
+    input_rates = np.array([unit_rate(INPUT_UNITS[f], rate) for f in sweep["fields"]])
+    return {
+        **sweep,
+        "inputs": sweep["inputs"] * input_rates[:, None],
+        "values": sweep["values"] * r,
+        "base": sweep["base"] * r,
+    }
+
+
+def goal_seek_in_currency(result, solve_field, output, rate):
+    """goal_seek result with the solved input and achieved output in the display currency"""
+    return {
+        **result,
+        "value": result["value"] * unit_rate(INPUT_UNITS[solve_field], rate),
+        "achieved": result["achieved"] * unit_rate(OUTPUT_METRICS[output]["unit"], rate),
+    }
@@ -0,0 +1,319 @@
+"""
+Clinic P&L – memory soak test.
+
+Drives thousands of reruns of app.py in-process (Streamlit's AppTest),
+with several sessions taking turns and the planner action mix of
+loadtest.py (input nudges, tab visits, currency switches, report
+downloads). tracemalloc and the process RSS are sampled every
+--interval reruns and reported as:
+
+    intervals      RSS, traced memory, session state per session and the
+                   peak transient allocation of a rerun
+    top sites      source lines holding more memory at the end than
+                   after the warm-up, in bytes per 1,000 reruns
+    growth         slope and monotonicity of RSS / traced memory / session
+                   state after the warm-up (a leak keeps growing; caches
+                   fill up, then stay flat)
+    session state  largest entries of one session (base_values,
+                   calc_graph, …)
+
+    python soak.py                                10,000 reruns, 4 sessions
+    python soak.py --reruns 20000 --sessions 8 --budget-mb 30
+    python soak.py --output soak.json
+    python soak.py --reruns 50000 --no-tracemalloc   RSS and session state only
+
+tracemalloc slows a rerun down about 3x (10,000 reruns take a few
+hours); --no-tracemalloc keeps the RSS and session state figures and
+drops the allocation sites, for long runs.
+The exit status is 1 when a session's state exceeds --budget-mb or,
+with --fail-on-growth, when memory keeps growing after the warm-up.
+Sessions run one after the other, so the figure / report caches shared
+through st.cache_resource are exercised as on a server.
+Standard library + NumPy, AppTest from Streamlit.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from graph import approx_size
+from loadtest import ACTIONS, NUDGE_KEYS, process_usage
+
+APP_PATH = Path(__file__).parent / "app.py"
+DEFAULT_BUDGET_MB = 25.0
+DEFAULT_GROWTH_KB = 256.0     # per 1,000 reruns, tolerated after the warm-up
+
+# frames that are the measurement itself, not the app
+IGNORED_FILES = ("<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>", tracemalloc.__file__)
+
+
+# =========================================================
+# SESSIONS (AppTest)
+# =========================================================
+def _capture_downloads():
+    """Keep the deferred data callable of each download button, by label, as the app passes it"""
+    from streamlit.delta_generator import DeltaGenerator
+
+    captured = {}
+    download_button = DeltaGenerator.download_button
+
+    def capture(self, label, data, *args, **kwargs):
+        captured[label] = data
+        return download_button(self, label, data, *args, **kwargs)
+    DeltaGenerator.download_button = capture
+    return captured
+
+
+def new_session(captured):
+    """One app session: an AppTest after its first run, with its report callable"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=300)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+    return {"at": at, "report": _report_callable(captured)}
+
+
+def _report_callable(captured):
+    return next((data for label, data in captured.items() if label.startswith("Download Full Report")), None)
+
+
+def play(sess, action, rng, captured):
+    """Apply one planner action; returns the number of reruns it took"""
+    at = sess["at"]
+    if action == "report_download":
+        if sess["report"] is not None:
+            sess["report"]()
+        return 0
+    if action in NUDGE_KEYS:
+        widget = at.number_input(key=NUDGE_KEYS[action])
+        widget.increment() if rng.random() < 0.5 else widget.decrement()
+    elif action == "tab_visit":
+        radio = at.radio(key="section")
+        radio.set_value(rng.choice([o for o in radio.options if o != radio.value]))
+    elif action == "currency_switch":
+        box = at.selectbox(key="currency")
+        box.set_value("USD" if box.value != "USD" else rng.choice([o for o in box.options if o != "USD"]))
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app.py raised during {action}: {at.exception[0].message}")
+    sess["report"] = _report_callable(captured)
+    return 1
+
+
+def session_state_bytes(sess):
+    """(total, {key: bytes}) of a session's state (approx_size)"""
+    sizes = {k: approx_size(v) for k, v in sess["at"].session_state.items()}
+    return sum(sizes.values()), sizes
+
+
+# =========================================================
+# MEASUREMENT
+# =========================================================
+def take_snapshot():
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    return snapshot.filter_traces([tracemalloc.Filter(False, f) for f in IGNORED_FILES])
+
+
+def top_sites(before, after, reruns, limit=15):
+    """Source lines whose retained memory grew the most between two snapshots, per 1,000 reruns"""
+    rows = []
+    for stat in after.compare_to(before, "lineno")[:limit]:
+        if stat.size_diff <= 0:
+            break
+        frame = stat.traceback[0]
+        rows.append({
+            "site": f"{_short_path(frame.filename)}:{frame.lineno}",
+            "kb_per_1k_reruns": stat.size_diff / 1024 / reruns * 1000,
+            "kb_total": stat.size / 1024,
+            "blocks_diff": stat.count_diff,
+        })
+    return rows
+
+
+def _short_path(path):
+    here = str(Path(__file__).parent)
+    if path.startswith(here):
+        return os.path.relpath(path, here)
+    marker = "site-packages" + os.sep
+    return path.split(marker, 1)[1] if marker in path else path
+
+
+def growth(reruns, values):
+    """
+    Trend of a series sampled at rerun counts: least-squares slope in
+    bytes per 1,000 reruns and the share of intervals that grew.
+    """
+    x, y = np.asarray(reruns, dtype=float), np.asarray(values, dtype=float)
+    if x.size < 3:
+        return {"kb_per_1k_reruns": None, "rising_share": None}
+    slope = np.polyfit(x, y, 1)[0]
+    return {"kb_per_1k_reruns": slope * 1000 / 1024, "rising_share": float(np.mean(np.diff(y) > 0))}
+
+
+def is_growing(trend, tolerance_kb):
+    """A leak-like trend: rises in most intervals and faster than the tolerance"""
+    return (
+        trend["kb_per_1k_reruns"] is not None
+        and trend["kb_per_1k_reruns"] > tolerance_kb
+        and trend["rising_share"] >= 0.7
+    )
+
+
+# =========================================================
+# SOAK
+# =========================================================
+def soak(reruns=10_000, sessions=4, interval=500, warmup=None, frames=1, seed=0, top=15, trace=True, log=print):
+    """
+    Run the soak; returns the report dict (see module docstring).
+    warmup: reruns before the baseline snapshot (default: one interval).
+    trace: False to run without tracemalloc (no traced memory, peaks
+    or allocation sites).
+    """
+    os.environ.setdefault("CLINIC_RATES_OFFLINE", "1")
+    logging.disable(logging.WARNING)
+    warmup = interval if warmup is None else warmup
+    rng = np.random.default_rng(seed)
+    names = list(ACTIONS)
+    weights = np.array([ACTIONS[n] for n in names]) / sum(ACTIONS.values())
+
+    if trace:
+        tracemalloc.start(frames)
+    captured = _capture_downloads()
+    pool = [new_session(captured) for _ in range(sessions)]
+    done, samples, peaks, baseline, last = 0, [], [], None, None
+    t0 = time.perf_counter()
+    while done < reruns:
+        sess = pool[done % sessions]
+        if trace:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        ran = play(sess, rng.choice(names, p=weights), rng, captured)
+        if trace:
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        done += ran
+
+        if ran and done % interval == 0:
+            snapshot = take_snapshot() if trace else None
+            states = [session_state_bytes(s)[0] for s in pool]
+            sample = {
+                "reruns": done,
+                "elapsed_s": time.perf_counter() - t0,
+                "rss_mb": (process_usage(os.getpid())[1] or 0) / 2**20,
+                "traced_mb": sum(stat.size for stat in snapshot.statistics("filename")) / 2**20 if trace else None,
+                "session_state_mb": max(states) / 2**20,
+                "rerun_peak_kb": float(np.median(peaks)) / 1024 if peaks else None,
+            }
+            peaks = []
+            if baseline is None and done >= warmup:
+                baseline = (done, snapshot)
+            elif baseline is not None and trace:
+                sample["top_sites"] = top_sites(baseline[1], snapshot, done - baseline[0], limit=3)
+            samples.append(sample)
+            last = (done, snapshot)
+            log(format_sample(sample))
+
+    after_warmup = [s for s in samples if baseline is not None and s["reruns"] >= baseline[0]]
+    _, sizes = session_state_bytes(pool[0])
+    report = {
+        "reruns": done, "sessions": sessions, "interval": interval, "warmup": warmup,
+        "samples": samples,
+        "top_sites": (
+            top_sites(baseline[1], last[1], last[0] - baseline[0], limit=top)
+            if trace and baseline and last[0] > baseline[0] else []
+        ),
+        "growth": {
+            key: growth([s["reruns"] for s in after_warmup], [s[key] * 2**20 for s in after_warmup])
+            for key in ("rss_mb", "traced_mb", "session_state_mb") if trace or key != "traced_mb"
+        },
+        "session_state": sorted(
+            ({"key": k, "kb": v / 1024} for k, v in sizes.items()), key=lambda r: r["kb"], reverse=True
+        )[:10],
+        "session_state_mb": max(session_state_bytes(s)[0] for s in pool) / 2**20,
+    }
+    if trace:
+        tracemalloc.stop()
+    return report
+
+
+def format_sample(s):
+    traced = f"{s['traced_mb']:>10.1f}" if s["traced_mb"] is not None else f"{'-':>10}"
+    peak = f"{s['rerun_peak_kb']:>13,.0f}" if s["rerun_peak_kb"] is not None else f"{'-':>13}"
+    return f"{s['reruns']:>8,} {s['elapsed_s']:>8.0f} s {s['rss_mb']:>9.1f} {traced} {s['session_state_mb']:>11.2f} {peak}"
+
+
+HEADER = f"{'reruns':>8} {'elapsed':>10} {'RSS MB':>9} {'traced MB':>10} {'session MB':>11} {'rerun peak KB':>13}"
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clinic P&L memory soak test")
+    parser.add_argument("--reruns", type=int, default=10_000)
+    parser.add_argument("--sessions", type=int, default=4, help="sessions taking turns")
+    parser.add_argument("--interval", type=int, default=500, help="reruns between samples")
+    parser.add_argument("--warmup", type=int, help="reruns before the baseline snapshot (default: --interval)")
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc frames per allocation")
+    parser.add_argument("--top", type=int, default=15, help="allocation sites to report")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="RSS and session state only (about 3x faster, no allocation sites)")
+    parser.add_argument("--budget-mb", type=float, default=DEFAULT_BUDGET_MB, help="session state budget per session")
+    parser.add_argument("--growth-kb", type=float, default=DEFAULT_GROWTH_KB,
+                        help="growth per 1,000 reruns tolerated after the warm-up")
+    parser.add_argument("--fail-on-growth", action="store_true", help="exit 1 on monotonic growth too")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report to a JSON file")
+    args = parser.parse_args(argv)
+
+    print(f"Soak: {args.reruns:,} reruns, {args.sessions} sessions, sample every {args.interval}")
+    print(HEADER)
+    report = soak(args.reruns, args.sessions, args.interval, args.warmup, args.frames, args.seed, args.top,
+                  trace=not args.no_tracemalloc)
+
+    print(f"\nTop allocation sites since the warm-up (KB retained per 1,000 reruns)")
+    for row in report["top_sites"]:
+        print(f"  {row['kb_per_1k_reruns']:>10,.1f}  {row['site']}  ({row['kb_total']:,.0f} KB held, {row['blocks_diff']:+,} blocks)")
+    if not report["top_sites"]:
+        print("  none (no growth, not enough reruns after the warm-up, or --no-tracemalloc)")
+
+    print("\nGrowth after the warm-up")
+    growing = []
+    for key, trend in report["growth"].items():
+        if trend["kb_per_1k_reruns"] is None:
+            print(f"  {key:<18} not enough samples")
+            continue
+        flag = is_growing(trend, args.growth_kb)
+        if flag:
+            growing.append(key)
+        print(f"  {key:<18} {trend['kb_per_1k_reruns']:>+10,.1f} KB / 1k reruns, "
+              f"rising in {trend['rising_share']:.0%} of intervals{'  ← monotonic growth' if flag else ''}")
+
+    print(f"\nSession state (largest entries of one session, {report['session_state_mb']:.2f} MB max per session)")
+    for row in report["session_state"]:
+        print(f"  {row['kb']:>10,.1f} KB  {row['key']}")
+
+    over_budget = report["session_state_mb"] > args.budget_mb
+    report.update(budget_mb=args.budget_mb, over_budget=over_budget, growing=growing)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if over_budget:
+        print(f"\nFAIL: session state {report['session_state_mb']:.2f} MB exceeds the {args.budget_mb:.2f} MB budget")
+    if growing and args.fail_on_growth:
+        print(f"\nFAIL: memory keeps growing ({', '.join(growing)})")
+    return 1 if over_budget or (growing and args.fail_on_growth) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Clinic P&L – startup profile.
+
+With CLINIC_PROFILE_STARTUP=1 every run of app.py is timed phase by
+phase: wall time of each phase, the packages first imported during it
+(in the first run of a fresh server process that is where the import
+cost lands) and the time to the first rendered element. Each run's
+report goes to the server log; app.py also shows it in the sidebar.
+The first run after a deploy is the one that matters: it is kept as
+the "cold" profile for every later report.
+Each session's script runs in its own thread, so the run being timed
+is per thread (as in tracing.py); sys.modules is process-wide, so with
+concurrent sessions an import is listed under whichever run saw it
+first.
+Standard library only, no Streamlit.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get("CLINIC_PROFILE_STARTUP", "") not in ("", "0")
+
+log = logging.getLogger("clinic.startup")
+
+# the run being timed in this thread; the first (cold) run and the run
+# counter of the process, shared by all sessions behind _LOCK
+_LOCAL = threading.local()
+_COLD = {}
+_COUNTER = {"runs": 0}
+_LOCK = threading.Lock()
+
+
+def _run():
+    return getattr(_LOCAL, "run", None)
+
+
+def _packages():
+    return {name.partition(".")[0] for name in list(sys.modules)}
+
+
+def begin(t0=None):
+    """Start timing a run (t0: perf_counter at the very top of the script)"""
+    if not ENABLED:
+        return
+    with _LOCK:
+        _COUNTER["runs"] += 1
+        number = _COUNTER["runs"]
+    now = time.perf_counter()
+    _LOCAL.run = {
+        "run": number, "t0": t0 or now, "mark": t0 or now, "phase": "imports",
+        "packages": _packages(), "phases": [], "first_render": None,
+    }
+
+
+def phase(name):
+    """Close the current phase and start `name`"""
+    run = _run()
+    if not ENABLED or run is None:
+        return
+    now = time.perf_counter()
+    packages = _packages()
+    run["phases"].append({
+        "phase": run["phase"],
+        "ms": (now - run["mark"]) * 1000,
+        "imported": sorted(p for p in packages - run["packages"] if not p.startswith("_")),
+    })
+    run.update(mark=now, phase=name, packages=packages)
+
+
+def first_render():
+    """Mark the first element on screen (header drawn)"""
+    run = _run()
+    if ENABLED and run is not None and run["first_render"] is None:
+        run["first_render"] = (time.perf_counter() - run["t0"]) * 1000
+
+
+def end():
+    """Close the run; returns {"run", "phases", "total_ms", "first_render_ms", "cold"} (None when disabled)"""
+    run = _run()
+    if not ENABLED or run is None:
+        return None
+    phase(None)
+    _LOCAL.run = None
+    report = {
+        "run": run["run"],
+        "phases": run["phases"],
+        "total_ms": sum(p["ms"] for p in run["phases"]),
+        "first_render_ms": run["first_render"],
+    }
+    with _LOCK:
+        if not _COLD:
+            _COLD.update(report)
+        report["cold"] = dict(_COLD)
+    log.warning(format_report(report))
+    return report
+
+
+def format_report(report):
+    """Plain-text table of a run report"""
+    lines = [f"startup profile – run {report['run']}"]
+    for p in report["phases"]:
+        imported = f"  [imports: {', '.join(p['imported'])}]" if p["imported"] else ""
+        lines.append(f"  {p['phase']:<24}{p['ms']:>9.1f} ms{imported}")
+    first = report["first_render_ms"]
+    lines.append(f"  {'total':<24}{report['total_ms']:>9.1f} ms")
+    if first is not None:
+        lines.append(f"  {'first render':<24}{first:>9.1f} ms")
+    return "\n".join(lines)
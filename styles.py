@@ -0,0 +1,525 @@
+"""
+Clinic P&L – palette and stylesheet.
+
+The dashboard CSS is built once per process, at import, with the
+palette baked in. app.py emits the same string on every rerun, so
+Streamlit's message cache sends it in full once per browser session
+and as a hash reference afterwards. Inter is self-hosted
+(static/fonts, [[theme.fontFaces]] in .streamlit/config.toml), so the
+first paint waits on no external CDN.
+No Streamlit.
+"""
+
+# =========================================================
+# UNIFIED PROFESSIONAL PALETTE
+# One single blue scale for the whole app
+# =========================================================
+PALETTE = {
+    "bg_page": "#F8FAFC",
+    "surface": "#FFFFFF",
+    "surface_alt": "#F1F5F9",
+    "primary": "#1E40AF",
+    "primary_light": "#3B82F6",
+    "primary_dark": "#1E3A8A",
+    "secondary": "#0EA5E9",
+    "accent": "#60A5FA",
+    "success": "#10B981",
+    "warning": "#F59E0B",
+    "danger": "#EF4444",
+    "text_primary": "#0F172A",
+    "text_secondary": "#475569",
+    "text_tertiary": "#64748B",
+    "border": "#E2E8F0",
+    "grid": "#F1F5F9",
+    "chart": ["#1E40AF", "#3B82F6", "#0EA5E9", "#60A5FA", "#93C5FD", "#BFDBFE"],
+}
+
+# =========================================================
+# GLOBAL STYLES – force white cards even in dark theme
+# =========================================================
+GLOBAL_CSS = f"""
+    <style>
+    /* Force light theme - override system preferences */
+    :root {{
+        color-scheme: light !important;
+    }}
+
+    * {{
+        font-family: 'Inter', -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
+        box-sizing: border-box;
+    }}
+
+    /* Override Streamlit's dark theme completely */
+    .stApp {{
+        background: {PALETTE["bg_page"]} !important;
+        color: {PALETTE["text_primary"]} !important;
+    }}
+
+    /* Force all backgrounds to light */
+    [data-testid="stAppViewContainer"] {{
+        background: {PALETTE["bg_page"]} !important;
+    }}
+
+    [data-testid="stHeader"] {{
+        background: transparent !important;
+    }}
+
+    /* Force all text to dark on light background */
+    .stMarkdown, .stMarkdown p, .stMarkdown li, .stMarkdown span {{
+        color: {PALETTE["text_primary"]} !important;
+    }}
+
+    .block-container {{
+        padding-top: 0rem !important;
+        max-width: 1900px;
+        padding-left: 2.5rem !important;
+        padding-right: 2.5rem !important;
+    }}
+
+    /* HEADER */
+    .ct-header {{
+        background: linear-gradient(135deg, {PALETTE["primary"]} 0%, {PALETTE["primary_dark"]} 100%);
+        padding: 2.5rem 3rem;
+        margin-top: 3.4rem;
+        margin-bottom: 2.5rem;
+        border-radius: 0 0 24px 24px;
+        box-shadow: 0 4px 20px rgba(30,64,175,0.15);
+    }}
+    .ct-main-title {{
+        font-size: 2rem;
+        font-weight: 800;
+        color: #FFFFFF;
+        margin: 0;
+        letter-spacing: -0.03em;
+        line-height: 1.2;
+    }}
+    .ct-subtitle {{
+        font-size: 1rem;
+        color: rgba(255,255,255,0.9);
+        margin: 0.75rem 0 0 0;
+        font-weight: 400;
+        line-height: 1.4;
+    }}
+
+    /* SIDEBAR */
+    section[data-testid="stSidebar"] {{
+        background: linear-gradient(180deg, {PALETTE["primary_dark"]} 0%, #1E293B 100%) !important;
+        border-right: 1px solid rgba(255,255,255,0.08);
+    }}
+    .sidebar-logo {{
+        text-align: center;
+        padding: 0rem 1rem 1.5rem 1rem;
+        margin-top: -2.5rem;
+        border-bottom: 2px solid rgba(255,255,255,0.12);
+        margin-bottom: 1.5rem;
+    }}
+    .sidebar-logo img {{
+        max-width: 110%;
+        height: auto;
+        filter: brightness(1.2);
+    }}
+    .ct-side-title {{
+        color: #E2E8F0 !important;
+        font-size: 0.7rem !important;
+        font-weight: 700 !important;
+        text-transform: uppercase;
+        letter-spacing: 0.08em;
+        margin-top: 1.6rem !important;
+        margin-bottom: 0.6rem !important;
+    }}
+
+    /* Sidebar labels - always white */
+    section[data-testid="stSidebar"] label {{
+        color: #F9FAFB !important;
+        font-size: 0.75rem !important;
+        font-weight: 600 !important;
+        letter-spacing: 0.03em;
+    }}
+
+    /* Sidebar subheaders - white */
+    section[data-testid="stSidebar"] h3,
+    section[data-testid="stSidebar"] .stMarkdown h3 {{
+        color: #FFFFFF !important;
+        font-size: 0.85rem !important;
+        font-weight: 700 !important;
+        margin-top: 1.5rem !important;
+        margin-bottom: 0.8rem !important;
+        padding-bottom: 0.5rem !important;
+        border-bottom: 1px solid rgba(255,255,255,0.2) !important;
+    }}
+
+    /* Inputs: white background, black text */
+    section[data-testid="stSidebar"] .stNumberInput input,
+    section[data-testid="stSidebar"] .stSelectbox select,
+    section[data-testid="stSidebar"] select {{
+        background: #FFFFFF !important;
+        border: 1px solid rgba(255,255,255,0.3) !important;
+        color: #0F172A !important;
+        border-radius: 8px !important;
+        font-weight: 600 !important;
+        font-size: 0.875rem !important;
+        padding: 0.5rem !important;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1) !important;
+        transition: all 0.2s ease !important;
+    }}
+
+    section[data-testid="stSidebar"] .stNumberInput input:focus,
+    section[data-testid="stSidebar"] .stSelectbox select:focus,
+    section[data-testid="stSidebar"] select:focus {{
+        border: 2px solid {PALETTE["primary_light"]} !important;
+        box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.1) !important;
+        outline: none !important;
+    }}
+
+    /* Selectbox specific styling */
+    section[data-testid="stSidebar"] .stSelectbox > div > div {{
+        background: #FFFFFF !important;
+        border-radius: 8px !important;
+    }}
+
+    /* Help icon styling - visible in both light and dark mode */
+    section[data-testid="stSidebar"] .stTooltipIcon {{
+        color: #FFFFFF !important;
+        background-color: rgba(255,255,255,0.25) !important;
+        border-radius: 50% !important;
+        padding: 3px !important;
+        width: 18px !important;
+        height: 18px !important;
+        display: inline-flex !important;
+        align-items: center !important;
+        justify-content: center !important;
+    }}
+
+    section[data-testid="stSidebar"] .stTooltipIcon:hover {{
+        background-color: {PALETTE["primary_light"]} !important;
+    }}
+
+    section[data-testid="stSidebar"] .stTooltipIcon svg {{
+        fill: #FFFFFF !important;
+        stroke: #FFFFFF !important;
+        color: #FFFFFF !important;
+        width: 12px !important;
+        height: 12px !important;
+    }}
+
+    section[data-testid="stSidebar"] .stTooltipIcon svg path {{
+        fill: #FFFFFF !important;
+        stroke: #FFFFFF !important;
+    }}
+
+    section[data-testid="stSidebar"] .stTooltipIcon svg circle {{
+        stroke: #FFFFFF !important;
+        fill: none !important;
+    }}
+
+    section[data-testid="stSidebar"] .stTooltipIcon svg text {{
+        fill: #FFFFFF !important;
+    }}
+
+    section[data-testid="stSidebar"] .stTooltipIcon * {{
+        color: #FFFFFF !important;
+    }}
+
+    /* Number input buttons */
+    section[data-testid="stSidebar"] .stNumberInput button {{
+        color: #0F172A !important;
+    }}
+
+    /* Input spacing and containers */
+    section[data-testid="stSidebar"] .stNumberInput,
+    section[data-testid="stSidebar"] .stSelectbox {{
+        margin-bottom: 1rem !important;
+    }}
+
+    /* Sidebar dividers for visual separation */
+    section[data-testid="stSidebar"] hr {{
+        border: none !important;
+        border-top: 1px solid rgba(255,255,255,0.15) !important;
+        margin: 1.5rem 0 !important;
+    }}
+
+    /* Download button container - remove ALL background circles and elements */
+    section[data-testid="stSidebar"] .stDownloadButton {{
+        background: transparent !important;
+    }}
+
+    section[data-testid="stSidebar"] .stDownloadButton * {{
+        background: transparent !important;
+    }}
+
+    section[data-testid="stSidebar"] .stDownloadButton > div {{
+        background: transparent !important;
+    }}
+
+    section[data-testid="stSidebar"] .stDownloadButton div {{
+        background: transparent !important;
+    }}
+
+    section[data-testid="stSidebar"] .stDownloadButton::before,
+    section[data-testid="stSidebar"] .stDownloadButton::after,
+    section[data-testid="stSidebar"] .stDownloadButton *::before,
+    section[data-testid="stSidebar"] .stDownloadButton *::after {{
+        display: none !important;
+        background: transparent !important;
+        content: none !important;
+    }}
+
+    section[data-testid="stSidebar"] .stDownloadButton button {{
+        background: {PALETTE["primary_light"]} !important;
+    }}
+
+    /* Download button - simple and clean */
+    section[data-testid="stSidebar"] .stDownloadButton button {{
+        background: {PALETTE["primary_light"]} !important;
+        color: #FFFFFF !important;
+        border-radius: 8px !important;
+        border: none !important;
+        font-weight: 600 !important;
+        padding: 0.75rem 1rem !important;
+        width: 100% !important;
+        margin-top: 3.5rem !important;
+        margin-left: 16rem !important;
+        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1) !important;
+        transition: all 0.2s ease !important;
+        font-size: 0.8rem !important;
+        line-height: 1.5 !important;
+        text-align: center !important;
+        white-space: pre-line !important;
+        min-height: 3.5rem !important;
+    }}
+
+    section[data-testid="stSidebar"] .stDownloadButton button:hover {{
+        background: {PALETTE["primary"]} !important;
+        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.15) !important;
+        transform: translateY(-1px) !important;
+    }}
+
+    section[data-testid="stSidebar"] .stDownloadButton button p,
+    section[data-testid="stSidebar"] .stDownloadButton button div,
+    section[data-testid="stSidebar"] .stDownloadButton button span {{
+        writing-mode: horizontal-tb !important;
+        display: inline !important;
+        white-space: nowrap !important;
+    }}
+
+    /* Markdown text in sidebar */
+    section[data-testid="stSidebar"] .stMarkdown p {{
+        color: rgba(255,255,255,0.9) !important;
+        font-size: 0.75rem !important;
+        line-height: 1.5 !important;
+    }}
+
+    /* DATAFRAMES */
+    div[data-testid="stDataFrame"] {{
+        background: white !important;
+        border: 1px solid {PALETTE["border"]} !important;
+        border-radius: 16px !important;
+        overflow: hidden;
+        box-shadow: 0 2px 8px rgba(15,23,42,0.04);
+    }}
+    .dataframe thead tr th {{
+        background: {PALETTE["primary"]} !important;
+        color: white !important;
+        text-transform: uppercase;
+    }}
+
+    /* Download button style (report) */
+    .report-btn button {{
+        background: {PALETTE["primary"]} !important;
+        color: #ffffff !important;
+        border-radius: 9999px !important;
+        border: none !important;
+        font-weight: 600 !important;
+        padding: .5rem 1.5rem !important;
+    }}
+    </style>
+"""
+
+# =========================================================
+# COMPONENTS – scenario bar, sidebar, KPI cards, footer
+# =========================================================
+COMPONENT_CSS = f"""
+    <style>
+    /* ===== SCENARIO BAR ===== */
+    .ct-scenario {{
+        display: grid;
+        grid-template-columns: repeat(auto-fit, minmax(140px, 1fr));
+        gap: 1rem;
+        background: {PALETTE["surface"]};
+        border: 1px solid {PALETTE["border"]};
+        border-radius: 18px;
+        padding: 1.2rem 1.4rem;
+        margin-bottom: 1.8rem;
+        box-shadow: 0 2px 8px rgba(15,23,42,0.03);
+    }}
+    .scenario-item {{
+        display: flex;
+        flex-direction: column;
+        gap: .15rem;
+    }}
+    .scenario-label {{
+        font-size: .65rem;
+        text-transform: uppercase;
+        letter-spacing: .05em;
+        color: {PALETTE["text_tertiary"]};
+        font-weight: 600;
+    }}
+    .scenario-value {{
+        font-size: 1rem;
+        font-weight: 700;
+        color: {PALETTE["text_primary"]};
+    }}
+
+    /* ===== KPI CARDS (4 en una fila) ===== */
+    .kpi-grid {{
+        display: grid;
+        grid-template-columns: repeat(auto-fit, minmax(210px, 1fr));
+        gap: 1.25rem;
+        margin-bottom: 2rem;
+    }}
+    .kpi-card {{
+        background: {PALETTE["surface"]};
+        border: 1px solid {PALETTE["border"]};
+        border-radius: 1rem;
+        padding: 1.2rem 1.2rem 1.05rem 1.2rem;
+        box-shadow: 0 6px 20px rgba(15,23,42,0.04);
+        position: relative;
+        overflow: hidden;
+    }}
+    .kpi-accent {{
+        position: absolute;
+        inset: 0;
+        height: 4px;
+        background: linear-gradient(90deg, {PALETTE["primary"]} 0%, {PALETTE["secondary"]} 100%);
+    }}
+    .kpi-label {{
+        margin-top: .6rem;
+        font-size: .70rem;
+        text-transform: uppercase;
+        letter-spacing: .05em;
+        color: {PALETTE["text_tertiary"]};
+        font-weight: 600;
+    }}
+    .kpi-value {{
+        font-size: 1.5rem;
+        font-weight: 800;
+        color: {PALETTE["text_primary"]};
+        margin-top: .3rem;
+        margin-bottom: .2rem;
+    }}
+    .kpi-meta {{
+        font-size: .72rem;
+        color: {PALETTE["text_secondary"]};
+    }}
+
+    /* ===== SECTION HEADERS ===== */
+    .section-header {{
+        display: flex;
+        align-items: center;
+        justify-content: space-between;
+        gap: 1rem;
+        margin: 1.5rem 0 1rem 0;
+    }}
+    .section-title {{
+        font-size: 1.1rem;
+        font-weight: 700;
+        color: {PALETTE["text_primary"]};
+    }}
+
+    /* ===== INSIGHT BOXES ===== */
+    .insight-box {{
+        background: {PALETTE["surface"]};
+        border: 1px solid {PALETTE["border"]};
+        border-radius: 1rem;
+        padding: 1.2rem 1.2rem 1rem 1.2rem;
+        margin-top: 1.1rem;
+        margin-bottom: 1.1rem;
+        box-shadow: 0 6px 18px rgba(15,23,42,0.03);
+    }}
+    .insight-title {{
+        font-weight: 700;
+        margin-bottom: .9rem;
+        display: flex;
+        gap: .5rem;
+        align-items: center;
+    }}
+    .insight-number {{
+        background: {PALETTE["primary_light"]};
+        color: white;
+        width: 28px;
+        height: 28px;
+        border-radius: 999px;
+        display: grid;
+        place-items: center;
+        font-size: .7rem;
+    }}
+    .insight-content {{
+        font-size: .78rem;
+        color: {PALETTE["text_secondary"]};
+        line-height: 1.45;
+    }}
+
+    /* TAGS */
+    .insight-tag {{
+        display: inline-block;
+        padding: .20rem .55rem .25rem .55rem;
+        border-radius: 9999px;
+        background: rgba(99, 102, 241, .1);
+        color: {PALETTE["text_primary"]};
+        font-size: .63rem;
+        font-weight: 600;
+        text-transform: uppercase;
+        letter-spacing: .04em;
+        margin-right: .35rem;
+    }}
+    .insight-tag.positive {{
+        background: rgba(16, 185, 129, .12);
+        color: #065f46;
+    }}
+    .insight-tag.warning {{
+        background: rgba(245, 158, 11, .12);
+        color: #92400e;
+    }}
+    .insight-tag.negative {{
+        background: rgba(239, 68, 68, .1);
+        color: #7f1d1d;
+    }}
+
+    /* SECTION NAVIGATION (horizontal radio styled as tabs) */
+    .st-key-section [role="radiogroup"] {{
+        gap: 0 !important;
+        border-bottom: 2px solid {PALETTE["border"]};
+        margin-bottom: 1rem;
+    }}
+    .st-key-section [role="radiogroup"] label {{
+        padding: .55rem 1rem;
+        margin: 0 0 -2px 0 !important;
+        border-bottom: 2px solid transparent;
+        cursor: pointer;
+    }}
+    .st-key-section [role="radiogroup"] label > div:first-child {{
+        display: none;
+    }}
+    .st-key-section [role="radiogroup"] label p {{
+        font-size: .85rem;
+        font-weight: 600;
+        color: {PALETTE["text_secondary"]} !important;
+    }}
+    .st-key-section [role="radiogroup"] label:has(input:checked) {{
+        border-bottom-color: {PALETTE["primary"]};
+    }}
+    .st-key-section [role="radiogroup"] label:has(input:checked) p {{
+        color: {PALETTE["primary"]} !important;
+    }}
+
+    /* FOOTER */
+    .footer {{
+        text-align: center;
+        font-size: .7rem;
+        color: {PALETTE["text_tertiary"]};
+        margin-bottom: 2rem;
+    }}
+    </style>
+"""
+
+APP_CSS = GLOBAL_CSS + COMPONENT_CSS
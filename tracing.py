@@ -0,0 +1,187 @@
+"""
+Clinic P&L – rerun tracing.
+
+Timing spans around the sections of app.py. A traced rerun is a list
+of spans (name, category, start, end); app.py opens one top-level
+span per section with section() and nested spans with span(), and
+adds the graph nodes evaluated during the run (graph.py logs their
+start and time). Spans nest by time, as in a profiler's flame graph.
+
+    begin() → section("sidebar") → span("exchange rates") … → end()
+
+A finished run can be shown as a flame breakdown (flame) and exported
+in the Chrome trace event format (chrome_trace: chrome://tracing,
+Perfetto, speedscope), one track per run so reruns can be compared.
+With CLINIC_TRACE_DIR=<dir> every rerun slower than
+CLINIC_TRACE_SLOW_MS (default 0) is also written there as a trace
+file, to capture slow reruns in production.
+
+Tracing is per thread (each session's script runs in its own thread)
+and off unless begin() is called with enabled=True; spans outside a
+traced run cost one attribute lookup.
+Standard library only, no Streamlit.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+ENABLED = os.environ.get("CLINIC_TRACE", "") not in ("", "0")
+TRACE_DIR = os.environ.get("CLINIC_TRACE_DIR", "")
+SLOW_MS = float(os.environ.get("CLINIC_TRACE_SLOW_MS", "0") or 0)
+
+# the run being traced in this thread, and a process-wide run counter
+_LOCAL = threading.local()
+_COUNTER = {"runs": 0}
+_LOCK = threading.Lock()
+
+
+def begin(name="rerun", t0=None, enabled=ENABLED):
+    """Start tracing a run in this thread (t0: perf_counter at the very top of the script)"""
+    if not (enabled or TRACE_DIR):
+        _LOCAL.run = None
+        return
+    with _LOCK:
+        _COUNTER["runs"] += 1
+        number = _COUNTER["runs"]
+    now = time.perf_counter()
+    _LOCAL.run = {
+        "name": name, "run": number, "t0": t0 or now,
+        "wall": datetime.now().isoformat(timespec="milliseconds"),
+        "spans": [], "section": None,
+    }
+
+
+def active():
+    """True while a run is being traced in this thread"""
+    return getattr(_LOCAL, "run", None) is not None
+
+
+def add_span(name, start, end, cat="span", args=None):
+    """Record a span measured elsewhere (perf_counter start / end)"""
+    run = getattr(_LOCAL, "run", None)
+    if run is not None:
+        run["spans"].append({"name": name, "cat": cat, "start": start, "end": end, "args": args or {}})
+
+
+def section(name):
+    """Close the open section and start `name` (top-level spans, in script order)"""
+    run = getattr(_LOCAL, "run", None)
+    if run is None:
+        return
+    now = time.perf_counter()
+    if run["section"] is not None:
+        add_span(run["section"][0], run["section"][1], now, cat="section")
+    run["section"] = (name, now) if name is not None else None
+
+
+@contextmanager
+def span(name, cat="span", **args):
+    """Time the enclosed block as a span of the current section"""
+    if getattr(_LOCAL, "run", None) is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(name, start, time.perf_counter(), cat=cat, args=args)
+
+
+def end():
+    """
+    Close the run. Returns {"name", "run", "wall", "t0", "total_ms",
+    "spans"} (None when the run was not traced) and writes it to
+    TRACE_DIR when set and the run took at least SLOW_MS.
+    """
+    run = getattr(_LOCAL, "run", None)
+    if run is None:
+        return None
+    section(None)
+    _LOCAL.run = None
+    now = time.perf_counter()
+    result = {
+        "name": run["name"], "run": run["run"], "wall": run["wall"], "t0": run["t0"],
+        "total_ms": (now - run["t0"]) * 1000,
+        "spans": sorted(run["spans"], key=lambda s: (s["start"], -s["end"])),
+    }
+    if TRACE_DIR and result["total_ms"] >= SLOW_MS:
+        write_trace([result], TRACE_DIR)
+    return result
+
+
+# =========================================================
+# FLAME BREAKDOWN
+# =========================================================
+def flame(run):
+    """
+    Spans of a run in flame order with their nesting: rows of
+    {"name", "cat", "depth", "start_ms", "ms", "self_ms", "share", "args"}.
+    start_ms is relative to the start of the run, self_ms excludes the
+    time of nested spans, share is ms / total run time.
+    """
+    rows, stack = [], []
+    total = run["total_ms"] or 1.0
+    for s in run["spans"]:
+        while stack and s["start"] >= stack[-1][1]["end"]:
+            stack.pop()
+        ms = (s["end"] - s["start"]) * 1000
+        row = {
+            "name": s["name"], "cat": s["cat"], "depth": len(stack),
+            "start_ms": (s["start"] - run["t0"]) * 1000, "ms": ms, "self_ms": ms,
+            "share": ms / total, "args": s["args"],
+        }
+        if stack:
+            stack[-1][0]["self_ms"] -= ms
+        rows.append(row)
+        stack.append((row, s))
+    return rows
+
+
+# =========================================================
+# CHROME TRACE EXPORT
+# =========================================================
+def chrome_trace(runs):
+    """
+    Runs as a Chrome trace ({"traceEvents": [...]}, complete "X"
+    events in microseconds). Each run is its own track (tid) with time
+    relative to its start, so reruns line up for comparison.
+    """
+    pid = os.getpid()
+    events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "clinic-app"}}]
+    for tid, run in enumerate(runs, start=1):
+        events.append({
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+            "args": {"name": f"{run['name']} #{run['run']} ({run['total_ms']:,.0f} ms, {run['wall']})"},
+        })
+        events.append({
+            "name": run["name"], "cat": "run", "ph": "X", "pid": pid, "tid": tid,
+            "ts": 0.0, "dur": run["total_ms"] * 1000, "args": {"wall": run["wall"]},
+        })
+        for s in run["spans"]:
+            events.append({
+                "name": s["name"], "cat": s["cat"], "ph": "X", "pid": pid, "tid": tid,
+                "ts": (s["start"] - run["t0"]) * 1e6, "dur": (s["end"] - s["start"]) * 1e6,
+                "args": s["args"],
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def chrome_trace_json(runs):
+    return json.dumps(chrome_trace(runs), default=str)
+
+
+def write_trace(runs, directory):
+    """Write runs as one Chrome trace file in `directory`; returns its path (None if unwritable)"""
+    last = runs[-1]
+    stamp = last["wall"].replace(":", "").replace("-", "").replace(".", "")
+    path = os.path.join(directory, f"trace-{stamp}-{last['name']}-{last['run']}.json")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(chrome_trace_json(runs))
+    except OSError:
+        return None
+    return path